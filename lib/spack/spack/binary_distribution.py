@@ -19,6 +19,7 @@
 import tarfile
 import tempfile
 import textwrap
+import threading
 import time
 import urllib.error
 import urllib.parse
@@ -31,6 +32,7 @@
 import spack.caches
 import spack.config
 import spack.database
+import spack.database_binary
 import spack.deptypes as dt
 import spack.error
 import spack.hash_types as ht
@@ -82,7 +84,6 @@
 from spack.stage import Stage
 from spack.util.executable import which
 
-from .enums import InstallRecordStatus
 from .url_buildcache import (
     CURRENT_BUILD_CACHE_LAYOUT_VERSION,
     BlobRecord,
@@ -109,8 +110,8 @@ class BuildCacheDatabase(spack.database.Database):
 
     record_fields = ("spec", "ref_count", "in_buildcache")
 
-    def __init__(self, root):
-        super().__init__(root, lock_cfg=spack.database.NO_LOCK, layout=None)
+    def __init__(self, root, lazy: bool = False):
+        super().__init__(root, lock_cfg=spack.database.NO_LOCK, layout=None, lazy=lazy)
         self._write_transaction_impl = spack.llnl.util.lang.nullcontext
         self._read_transaction_impl = spack.llnl.util.lang.nullcontext
 
@@ -167,6 +168,9 @@ def __init__(self, cache_root: Optional[str] = None):
 
         # a FileCache instance storing copies of remote binary cache indices
         self._index_file_cache: file_cache.FileCache = file_cache.FileCache(self._index_cache_root)
+
+        # directory storing the shards of sharded remote indices, by checksum
+        self._index_shards_dir = os.path.join(self._index_cache_root, "shards")
         self._index_file_cache_initialized = False
 
         # stores a map of mirror URL and version layout to index hash and cache key (index path)
@@ -182,6 +186,9 @@ def __init__(self, cache_root: Optional[str] = None):
 
         #: Dictionary mapping DAG hashes of specs to Spec objects
         self._known_specs: Dict[str, spack.spec.Spec] = {}
+        #: Databases of the indices associated with mirrors, whose specs have not been added to
+        #: ``_known_specs`` yet, with the hashes of their specs that are available
+        self._unmaterialized_specs: List[Tuple[BuildCacheDatabase, List[str]]] = []
         #: Dictionary mapping DAG hashes of specs to a list of mirrors where they can be found
         self._mirrors_for_spec: Dict[str, Set[MirrorMetadata]] = defaultdict(set)
 
@@ -216,6 +223,7 @@ def regenerate_spec_cache(self, clear_existing=False):
             self._specs_already_associated = set()
             self._mirrors_for_spec = defaultdict(set)
             self._known_specs = {}
+            self._unmaterialized_specs = []
 
         for mirror_metadata in self._local_index_cache:
             cache_entry = self._local_index_cache[mirror_metadata]
@@ -228,39 +236,67 @@ def regenerate_spec_cache(self, clear_existing=False):
                 self._specs_already_associated.add(cached_index_hash)
 
     def _associate_built_specs_with_mirror(self, cache_key, mirror_metadata: MirrorMetadata):
-        with tempfile.TemporaryDirectory(dir=spack.stage.get_stage_root()) as tmpdir:
-            db = BuildCacheDatabase(tmpdir)
+        # Only the records of the index are decoded here, specs are constructed the first time
+        # they are needed by ``get_all_built_specs``.
+        db = BuildCacheDatabase(self._index_cache_root)
+        try:
+            index = self._load_binary_index(cache_key)
+            db._read_binary_index(index)
+        except spack.database.InvalidDatabaseVersionError as e:
+            tty.warn(
+                "you need a newer Spack version to read the buildcache index for the "
+                f"following v{mirror_metadata.version} mirror: '{mirror_metadata.url}'. "
+                f"{e.database_version_message}"
+            )
+            return
 
-            try:
-                self._index_file_cache.init_entry(cache_key)
-                cache_path = self._index_file_cache.cache_path(cache_key)
-                with self._index_file_cache.read_transaction(cache_key):
-                    db._read_from_file(pathlib.Path(cache_path))
-            except spack.database.InvalidDatabaseVersionError as e:
-                tty.warn(
-                    "you need a newer Spack version to read the buildcache index for the "
-                    f"following v{mirror_metadata.version} mirror: '{mirror_metadata.url}'. "
-                    f"{e.database_version_message}"
-                )
-                return
+        mirror = mirror_metadata.strip_view()
+        hashes = []
+        for dag_hash, position in index.hashes.items():
+            if index.is_external(position) or index.in_buildcache(position):
+                self._mirrors_for_spec[dag_hash].add(mirror)
+                hashes.append(dag_hash)
+        self._unmaterialized_specs.append((db, hashes))
+
+    def _load_binary_index(self, cache_key: str) -> spack.database_binary.BinaryIndex:
+        """Return the locally cached index with the given key in binary format, which can be
+        mapped in memory instead of being parsed. It's converted from the JSON index, the first
+        time it's needed.
+        """
+        binary_key = _binary_index_key(cache_key)
+        self._index_file_cache.init_entry(binary_key)
+        binary_path = self._index_file_cache.cache_path(binary_key)
+        with self._index_file_cache.read_transaction(binary_key) as binary_file:
+            if binary_file is not None:
+                try:
+                    return spack.database_binary.load(binary_path)
+                except (OSError, spack.database_binary.BinaryDatabaseError) as e:
+                    tty.debug(f"Regenerating the binary buildcache index {binary_path}: {e}")
 
-            spec_list = [
-                s
-                for s in db.query_local(installed=InstallRecordStatus.ANY)
-                # todo, make it easer to get install records associated with specs
-                if s.external or db._data[s.dag_hash()].in_buildcache
-            ]
+        with tempfile.TemporaryDirectory(dir=spack.stage.get_stage_root()) as tmpdir:
+            db = BuildCacheDatabase(tmpdir, lazy=True)
+            self._index_file_cache.init_entry(cache_key)
+            cache_path = self._index_file_cache.cache_path(cache_key)
+            with self._index_file_cache.read_transaction(cache_key):
+                db._read_from_file(pathlib.Path(cache_path))
 
-            for spec in spec_list:
-                dag_hash = spec.dag_hash()
-                mirrors = self._mirrors_for_spec[dag_hash]
+            with self._index_file_cache.write_transaction(binary_key) as (_, new):
+                # The cache file is opened in text mode, write to its underlying binary buffer
+                db._write_binary_to_file(new.buffer)
 
-                mirrors.add(mirror_metadata.strip_view())
+        return spack.database_binary.load(binary_path)
+
+    def _materialize_known_specs(self) -> None:
+        """Construct the specs of the indices associated with mirrors, that are not yet known"""
+        for db, hashes in self._unmaterialized_specs:
+            for dag_hash in hashes:
                 if dag_hash not in self._known_specs:
-                    self._known_specs[dag_hash] = spec
+                    self._known_specs[dag_hash] = db._data[dag_hash].spec
+        self._unmaterialized_specs = []
 
     def get_all_built_specs(self) -> List[spack.spec.Spec]:
         """Returns a list of all concrete specs known to be available in a binary cache."""
+        self._materialize_known_specs()
         return list(self._known_specs.values())
 
     def find_built_spec(self, spec: spack.spec.Spec) -> List[MirrorMetadata]:
@@ -312,7 +348,6 @@ def update(self, with_cooldown: bool = False) -> None:
             for m in spack.mirrors.mirror.MirrorCollection(binary=True).values()
             for layout_version in m.supported_layout_versions
         ]
-        items_to_remove = []
         spec_cache_clear_needed = False
         spec_cache_regenerate_needed = not self._mirrors_for_spec
 
@@ -344,7 +379,10 @@ def update(self, with_cooldown: bool = False) -> None:
         ttl = spack.config.get("config:binary_index_ttl", 600)
         now = time.time()
 
-        for local_index_cache_key in self._local_index_cache:
+        # Mirrors whose index needs to be fetched, with their cache entry if they have one
+        to_fetch: Dict[MirrorMetadata, dict] = {}
+
+        for local_index_cache_key in list(self._local_index_cache):
             urlAndVersion = MirrorMetadata.from_string(local_index_cache_key)
             cached_mirror_url = urlAndVersion.url
             cache_entry = self._local_index_cache[local_index_cache_key]
@@ -364,75 +402,80 @@ def update(self, with_cooldown: bool = False) -> None:
                         all_methods_failed = False
                 else:
                     # May need to fetch the index and update the local caches
-                    needs_regen = False
-                    try:
-                        needs_regen = self._fetch_and_cache_index(
-                            urlAndVersion, cache_entry=cache_entry
-                        )
-                        self._last_fetch_times[urlAndVersion] = (now, True)
-                        all_methods_failed = False
-                    except FetchIndexError as e:
-                        fetch_errors.append(e)
-                        self._last_fetch_times[urlAndVersion] = (now, False)
-                    except BuildcacheIndexNotExists as e:
-                        fetch_errors.append(e)
-                        self._last_fetch_times[urlAndVersion] = (now, False)
-                        # Binary caches are not required to have an index, don't raise
-                        # if it doesn't exist.
-                        all_methods_failed = False
-
-                    # The need to regenerate implies a need to clear as well.
-                    spec_cache_clear_needed |= needs_regen
-                    spec_cache_regenerate_needed |= needs_regen
+                    to_fetch[urlAndVersion] = cache_entry
             else:
                 # No longer have this mirror, cached index should be removed
-                items_to_remove.append(
-                    {
-                        "url": local_index_cache_key,
-                        "cache_key": os.path.join(self._index_cache_root, cached_index_path),
-                    }
-                )
+                cache_key = os.path.join(self._index_cache_root, cached_index_path)
+                self._index_file_cache.remove(cache_key)
+                self._index_file_cache.remove(_binary_index_key(cache_key))
+                del self._local_index_cache[local_index_cache_key]
                 if urlAndVersion in self._last_fetch_times:
                     del self._last_fetch_times[urlAndVersion]
                 spec_cache_clear_needed = True
                 spec_cache_regenerate_needed = True
 
-        # Clean up items to be removed, identified above
-        for item in items_to_remove:
-            url = item["url"]
-            cache_key = item["cache_key"]
-            self._index_file_cache.remove(cache_key)
-            del self._local_index_cache[url]
-
-        # Iterate the configured mirrors now.  Any mirror urls we do not
-        # already have in our cache must be fetched, stored, and represented
-        # locally.
+        # Any mirror urls we do not already have in our cache must be fetched, stored, and
+        # represented locally.
         for urlAndVersion in configured_mirrors:
-            if str(urlAndVersion) in self._local_index_cache:
-                continue
-
-            # Need to fetch the index and update the local caches
-            needs_regen = False
-            try:
-                needs_regen = self._fetch_and_cache_index(urlAndVersion)
-                self._last_fetch_times[urlAndVersion] = (now, True)
-                all_methods_failed = False
-            except FetchIndexError as e:
-                fetch_errors.append(e)
-                self._last_fetch_times[urlAndVersion] = (now, False)
-            except BuildcacheIndexNotExists as e:
-                fetch_errors.append(e)
-                self._last_fetch_times[urlAndVersion] = (now, False)
-                # Binary caches are not required to have an index, don't raise
-                # if it doesn't exist.
-                all_methods_failed = False
+            if str(urlAndVersion) not in self._local_index_cache:
+                to_fetch[urlAndVersion] = {}
+
+        # Indices are fetched concurrently, and stored and parsed as soon as they are available,
+        # while other fetches are still outstanding. Mirrors that do not respond in time are
+        # reported like any other fetch error. Fetches run in threads, since worker processes
+        # that hang would be joined when Spack exits, regardless of the timeout.
+        timeout = spack.config.get("config:binary_index_timeout", 300) or None
+        executor = spack.util.parallel.make_thread_executor(
+            min(len(to_fetch), MAX_CONCURRENT_INDEX_FETCHES) or 1
+        )
+        futures = {
+            executor.submit(
+                _fetch_index, urlAndVersion, cache_entry, self._index_shards_dir
+            ): urlAndVersion
+            for urlAndVersion, cache_entry in to_fetch.items()
+        }
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout=timeout):
+                urlAndVersion = futures.pop(future)
+                needs_regen = False
+                try:
+                    needs_regen = self._cache_index(
+                        urlAndVersion, future.result(), to_fetch[urlAndVersion]
+                    )
+                    self._last_fetch_times[urlAndVersion] = (now, True)
+                    all_methods_failed = False
+                except FetchIndexError as e:
+                    fetch_errors.append(e)
+                    self._last_fetch_times[urlAndVersion] = (now, False)
+                except BuildcacheIndexNotExists as e:
+                    fetch_errors.append(e)
+                    self._last_fetch_times[urlAndVersion] = (now, False)
+                    # Binary caches are not required to have an index, don't raise
+                    # if it doesn't exist.
+                    all_methods_failed = False
+
+                if not needs_regen:
+                    continue
 
-            # Generally speaking, a new mirror wouldn't imply the need to
-            # clear the spec cache, so leave it as is.
-            if needs_regen:
+                # An updated index of a mirror we already had implies the need to clear the spec
+                # cache, while a new mirror generally does not.
                 spec_cache_regenerate_needed = True
+                if to_fetch[urlAndVersion]:
+                    spec_cache_clear_needed = True
+                elif not spec_cache_clear_needed:
+                    self._associate_index_with_mirror(urlAndVersion)
+        except concurrent.futures.TimeoutError:
+            for future, urlAndVersion in futures.items():
+                future.cancel()
+                fetch_errors.append(
+                    FetchIndexError(f"Timed out fetching the index of {urlAndVersion.url}")
+                )
+                self._last_fetch_times[urlAndVersion] = (now, False)
+        finally:
+            executor.shutdown(wait=not futures)
 
         self._write_local_index_cache()
+        self._remove_unused_index_shards()
 
         if configured_mirrors and all_methods_failed:
             raise FetchCacheError(fetch_errors)
@@ -444,6 +487,13 @@ def update(self, with_cooldown: bool = False) -> None:
         if spec_cache_regenerate_needed:
             self.regenerate_spec_cache(clear_existing=spec_cache_clear_needed)
 
+    def _associate_index_with_mirror(self, mirror_metadata: MirrorMetadata) -> None:
+        """Populate the concrete spec cache from the locally cached index of a single mirror"""
+        cache_entry = self._local_index_cache[str(mirror_metadata)]
+        if cache_entry["index_hash"] not in self._specs_already_associated:
+            self._associate_built_specs_with_mirror(cache_entry["index_path"], mirror_metadata)
+            self._specs_already_associated.add(cache_entry["index_hash"])
+
     def _fetch_and_cache_index(self, mirror_metadata: MirrorMetadata, cache_entry={}):
         """Fetch a buildcache index file from a remote mirror and cache it.
 
@@ -462,22 +512,20 @@ def _fetch_and_cache_index(self, mirror_metadata: MirrorMetadata, cache_entry={}
             FetchIndexError
             BuildcacheIndexNotExists
         """
-        mirror_url = mirror_metadata.url
-        mirror_view = mirror_metadata.view
-        layout_version = mirror_metadata.version
-
-        # TODO: get rid of this request, handle 404 better
-        scheme = urllib.parse.urlparse(mirror_url).scheme
-
-        if scheme != "oci":
-            cache_class = get_url_buildcache_class(layout_version=layout_version)
-            index_url = cache_class.get_index_url(mirror_url, mirror_view)
-            if not web_util.url_exists(index_url):
-                raise BuildcacheIndexNotExists(f"Index not found in cache {index_url}")
+        return self._cache_index(
+            mirror_metadata,
+            _fetch_index(mirror_metadata, cache_entry, self._index_shards_dir),
+            cache_entry,
+        )
 
-        fetcher: IndexFetcher = get_index_fetcher(scheme, mirror_metadata, cache_entry)
-        result = fetcher.conditional_fetch()
+    def _cache_index(
+        self, mirror_metadata: MirrorMetadata, result: "FetchIndexResult", cache_entry: dict
+    ) -> bool:
+        """Store an index fetched from a remote mirror in the local cache, unless it is fresh.
 
+        Returns:
+            True if the local index.json was updated.
+        """
         # Nothing to do
         if result.fresh:
             return False
@@ -494,16 +542,76 @@ def _fetch_and_cache_index(self, mirror_metadata: MirrorMetadata, cache_entry={}
             "index_path": cache_key,
             "etag": result.etag,
         }
+        if result.shards is not None:
+            self._local_index_cache[str(mirror_metadata)]["shards"] = result.shards
 
         # clean up the old cache_key if necessary
         old_cache_key = cache_entry.get("index_path", None)
         if old_cache_key:
             self._index_file_cache.remove(old_cache_key)
+            self._index_file_cache.remove(_binary_index_key(old_cache_key))
 
         # We fetched an index and updated the local index cache, we should
         # regenerate the spec cache as a result.
         return True
 
+    def _remove_unused_index_shards(self) -> None:
+        """Remove cached shards that are not part of the current index of any mirror"""
+        used = {
+            f"{checksum}.json"
+            for cache_entry in self._local_index_cache.values()
+            for checksum in cache_entry.get("shards", ())
+        }
+        try:
+            # Only shards, not the temporary files of concurrent fetches
+            unused = [
+                f
+                for f in os.listdir(self._index_shards_dir)
+                if f.endswith(".json") and f not in used
+            ]
+        except OSError:
+            return
+        for name in unused:
+            with contextlib.suppress(OSError):
+                os.unlink(os.path.join(self._index_shards_dir, name))
+
+
+def _binary_index_key(cache_key: str) -> str:
+    """Key of the binary form of a buildcache index in the local index cache"""
+    return f"{os.path.splitext(cache_key)[0]}.bin"
+
+
+#: Maximum number of buildcache indices fetched concurrently
+MAX_CONCURRENT_INDEX_FETCHES = 8
+
+
+def _fetch_index(
+    mirror_metadata: MirrorMetadata, cache_entry: dict, shards_dir: Optional[str] = None
+) -> "FetchIndexResult":
+    """Fetch the buildcache index of a mirror, unless the cache entry is still fresh. Runs in a
+    worker of ``BinaryCacheIndex.update``, so it does not touch the local index cache, except for
+    adding shards of sharded indices to ``shards_dir``.
+
+    Throws:
+        FetchIndexError
+        BuildcacheIndexNotExists
+    """
+    mirror_url = mirror_metadata.url
+    mirror_view = mirror_metadata.view
+    layout_version = mirror_metadata.version
+
+    # TODO: get rid of this request, handle 404 better
+    scheme = urllib.parse.urlparse(mirror_url).scheme
+
+    if scheme != "oci":
+        cache_class = get_url_buildcache_class(layout_version=layout_version)
+        index_url = cache_class.get_index_url(mirror_url, mirror_view)
+        if not web_util.url_exists(index_url):
+            raise BuildcacheIndexNotExists(f"Index not found in cache {index_url}")
+
+    fetcher: IndexFetcher = get_index_fetcher(scheme, mirror_metadata, cache_entry, shards_dir)
+    return fetcher.conditional_fetch()
+
 
 def binary_index_location():
     """Set up a BinaryCacheIndex for remote buildcache dbs in the user's homedir."""
@@ -662,6 +770,212 @@ def _push_index(db: BuildCacheDatabase, temp_dir: str, cache_prefix: str, name:
     cache_class.maybe_push_layout_json(cache_prefix)
 
 
+#: Specs are assigned to the shards of a buildcache index by this many leading characters of
+#: their DAG hash, which makes for at most 32 shards.
+INDEX_SHARD_PREFIX_LENGTH = 1
+
+
+def _hash_from_manifest_name(file: str) -> str:
+    # All supported versions of build caches put the hash as the last
+    # parameter before the extension
+    try:
+        return file.split("/")[-1].split("-")[-1].split(".")[0]
+    except IndexError:
+        raise GenerateIndexError(f"Malformed metadata file name detected {file}")
+
+
+def _index_shard_record(shard: dict) -> BlobRecord:
+    """Blob record of a shard of a buildcache index, from its entry in the table of shards"""
+    cache_class = get_url_buildcache_class(layout_version=CURRENT_BUILD_CACHE_LAYOUT_VERSION)
+    return BlobRecord(
+        shard["contentLength"],
+        cache_class.BUILDCACHE_INDEX_MEDIATYPE,
+        "none",
+        "sha256",
+        shard["checksum"],
+    )
+
+
+def index_shard_records(cache_entry: URLBuildcacheEntry, record: BlobRecord) -> List[BlobRecord]:
+    """Return the blob records of the shards listed in the table of shards given by record"""
+    with open(cache_entry.fetch_blob(record), encoding="utf-8") as f:
+        return [_index_shard_record(shard) for shard in json.load(f)["shards"].values()]
+
+
+def _merge_index_installs(installs: Dict[str, dict], index: dict) -> None:
+    """Merge the installation records of a buildcache index shard into ``installs``. Shards also
+    contain records of dependencies that belong to other shards, where they are not marked as
+    ``in_buildcache``."""
+    for dag_hash, record in index["database"]["installs"].items():
+        current = installs.get(dag_hash)
+        if current is None or record.get("in_buildcache") and not current.get("in_buildcache"):
+            installs[dag_hash] = record
+
+
+def _index_from_installs(installs: Dict[str, dict]) -> dict:
+    return {"database": {"version": str(spack.database._DB_VERSION), "installs": installs}}
+
+
+def _read_index_shards(url: str, cache_entry: URLBuildcacheEntry) -> Dict[str, dict]:
+    """Return the table of shards of the current index of a mirror, or an empty table if the
+    index does not exist, is not sharded, or is sharded differently."""
+    try:
+        manifest = cache_entry.read_manifest(cache_entry.get_index_url(url))
+        (record,) = manifest.get_blob_records(cache_entry.BUILDCACHE_INDEX_SHARDS_MEDIATYPE)
+        with open(cache_entry.fetch_blob(record), encoding="utf-8") as f:
+            table = json.load(f)
+    except Exception as e:
+        tty.debug(f"Regenerating all index shards of {url}: {e}")
+        return {}
+    if table.get("prefix_length") != INDEX_SHARD_PREFIX_LENGTH:
+        return {}
+    return table["shards"]
+
+
+#: Maximum number of spec manifests fetched concurrently when generating buildcache indices
+MAX_CONCURRENT_MANIFEST_FETCHES = 16
+
+
+def _read_specs_into_db(
+    file_list: List[str],
+    read_method: Callable[[str], URLBuildcacheEntry],
+    db: BuildCacheDatabase,
+    filter_fn: Callable[[str], bool] = lambda x: True,
+) -> None:
+    """Read the listed spec manifests that pass the filter, and add their specs to the db.
+
+    Manifests and spec files are fetched concurrently, and specs are added to the db in the
+    order of the list as soon as they are available.
+    """
+    files = [f for f in file_list if filter_fn(_hash_from_manifest_name(f))]
+    if not files:
+        return
+
+    with spack.util.parallel.make_thread_executor(
+        min(len(files), MAX_CONCURRENT_MANIFEST_FETCHES)
+    ) as executor:
+        for file, (spec_dict, error) in zip(
+            files, executor.map(_fetch_spec_dict, itertools.repeat(read_method), files)
+        ):
+            if error is not None:
+                tty.warn(f"Unable to fetch spec for manifest {file} due to: {error}")
+                continue
+            try:
+                fetched_spec = spack.spec.Spec.from_dict(spec_dict)
+            except Exception as e:
+                tty.warn(f"Unable to fetch spec for manifest {file} due to: {e}")
+                continue
+            db.add(fetched_spec)
+            db.mark(fetched_spec, "in_buildcache", True)
+
+
+def _fetch_spec_dict(
+    read_method: Callable[[str], URLBuildcacheEntry], file: str
+) -> Tuple[Optional[dict], Optional[str]]:
+    """Fetch the spec dict of a spec manifest. Runs in a worker of ``_read_specs_into_db``, and
+    returns the error message instead of raising, so that errors are reported per manifest."""
+    cache_entry: Optional[URLBuildcacheEntry] = None
+    try:
+        cache_entry = read_method(file)
+        return cache_entry.fetch_metadata(), None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        if cache_entry:
+            cache_entry.destroy()
+
+
+def _push_sharded_index(
+    url: str,
+    filename_to_mtime: Dict[str, float],
+    read_method: Callable[[str], URLBuildcacheEntry],
+    tmpdir: str,
+) -> None:
+    """Generate the index of all specs in a mirror, sharded by DAG hash prefix, and push it.
+
+    The index manifest refers to a table of shards, which maps each hash prefix to the checksum
+    of the shard blob and a digest of the names and modification times of the spec manifests in
+    the shard. Only shards whose digest changed are regenerated, which requires reading their spec
+    manifests, while other shards are reused from the previous index. The manifest also refers to
+    the monolithic index merged from all shards, for clients that do not support sharding.
+
+    Args:
+        url: base url of the mirror
+        filename_to_mtime: urls or file paths of all spec manifests, with their modification time
+        read_method: function reading the spec manifest at the given url or file path
+        tmpdir: location to write the index files before pushing them
+    """
+    cache_class = get_url_buildcache_class(layout_version=CURRENT_BUILD_CACHE_LAYOUT_VERSION)
+    files_by_shard: Dict[str, List[str]] = defaultdict(list)
+    for file in filename_to_mtime:
+        files_by_shard[_hash_from_manifest_name(file)[:INDEX_SHARD_PREFIX_LENGTH]].append(file)
+
+    shards: Dict[str, dict] = {}
+    installs: Dict[str, dict] = {}
+    cache_entry = cache_class(url, allow_unsigned=True)
+    try:
+        previous_shards = _read_index_shards(url, cache_entry)
+        for key, files in sorted(files_by_shard.items()):
+            members = compute_hash(
+                "\n".join(sorted(f"{f.split('/')[-1]} {filename_to_mtime[f]}" for f in files))
+            )
+            shard, shard_path = previous_shards.get(key), None
+            if shard and shard["members"] == members:
+                try:
+                    shard_path = cache_entry.fetch_blob(_index_shard_record(shard))
+                except spack.error.SpackError as e:
+                    tty.debug(f"Regenerating index shard {key} of {url}: {e}")
+
+            if shard_path is None:
+                tty.debug(f"Generating index shard {key} of {url} from {len(files)} specs")
+                db = BuildCacheDatabase(os.path.join(tmpdir, "shards", key))
+                db._write()
+                _read_specs_into_db(files, read_method, db)
+                shard_path = os.path.join(tmpdir, f"shard-{key}.json")
+                with open(shard_path, "w", encoding="utf-8") as f:
+                    db._write_to_file(f)
+                record = cache_class.push_local_file_as_blob_only(
+                    shard_path, url, cache_class.BUILDCACHE_INDEX_MEDIATYPE
+                )
+                shard = {
+                    "checksum": record.checksum,
+                    "contentLength": record.content_length,
+                    "members": members,
+                }
+
+            with open(shard_path, encoding="utf-8") as f:
+                _merge_index_installs(installs, json.load(f))
+            shards[key] = shard
+    finally:
+        cache_entry.destroy()
+
+    index_path = os.path.join(tmpdir, spack.database.INDEX_JSON_FILE)
+    with open(index_path, "w", encoding="utf-8") as f:
+        sjson.dump(_index_from_installs(installs), f)
+
+    shards_path = os.path.join(tmpdir, "index.shards.json")
+    with open(shards_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": 1, "prefix_length": INDEX_SHARD_PREFIX_LENGTH, "shards": shards}, f
+        )
+
+    manifest = BuildcacheManifest(
+        layout_version=CURRENT_BUILD_CACHE_LAYOUT_VERSION,
+        data=[
+            cache_class.push_local_file_as_blob_only(
+                shards_path, url, cache_class.BUILDCACHE_INDEX_SHARDS_MEDIATYPE
+            ),
+            cache_class.push_local_file_as_blob_only(
+                index_path, url, cache_class.BUILDCACHE_INDEX_MEDIATYPE
+            ),
+        ],
+    )
+    cache_class.push_manifest(
+        url, "index", manifest, tmpdir, component_type=BuildcacheComponent.INDEX
+    )
+    cache_class.maybe_push_layout_json(url)
+
+
 def _read_specs_and_push_index(
     file_list: List[str],
     read_method: Callable[[str], URLBuildcacheEntry],
@@ -681,31 +995,7 @@ def _read_specs_and_push_index(
         db: A spack database used for adding specs and then writing the index.
         temp_dir: Location to write index.json and hash for pushing
     """
-    for file in file_list:
-        # All supported versions of build caches put the hash as the last
-        # parameter before the extension
-        try:
-            x = file.split("/")[-1].split("-")[-1].split(".")[0]
-        except IndexError:
-            raise GenerateIndexError(f"Malformed metadata file name detected {file}")
-
-        if not filter_fn(x):
-            continue
-
-        cache_entry: Optional[URLBuildcacheEntry] = None
-        try:
-            cache_entry = read_method(file)
-            spec_dict = cache_entry.fetch_metadata()
-            fetched_spec = spack.spec.Spec.from_dict(spec_dict)
-        except Exception as e:
-            tty.warn(f"Unable to fetch spec for manifest {file} due to: {e}")
-            continue
-        finally:
-            if cache_entry:
-                cache_entry.destroy()
-        db.add(fetched_spec)
-        db.mark(fetched_spec, "in_buildcache", True)
-
+    _read_specs_into_db(file_list, read_method, db, filter_fn)
     _push_index(db, temp_dir, cache_prefix, name)
 
 
@@ -720,6 +1010,10 @@ def _url_generate_package_index(
     buildcache index contains an entry for each binary package under the
     cache_prefix.
 
+    The main index of a mirror is sharded and incrementally updated (see
+    ``_push_sharded_index``), while view indices, which are given a name, are regenerated from
+    scratch.
+
     Args:
         url: Base url of binary mirror.
 
@@ -737,11 +1031,15 @@ def _url_generate_package_index(
 
         tty.debug(f"Retrieving spec descriptor files from {url} to build index")
 
-        if not db:
-            db = BuildCacheDatabase(tmpdir)
-            db._write()
-
         try:
+            if not db and not name:
+                _push_sharded_index(url, filename_to_mtime_mapping, read_fn, tmpdir)
+                return
+
+            if not db:
+                db = BuildCacheDatabase(tmpdir)
+                db._write()
+
             _read_specs_and_push_index(
                 file_list, read_fn, name, filter_fn, url, db, str(db.database_directory)
             )
@@ -845,9 +1143,13 @@ def tarfile_of_spec_prefix(
 ) -> dict:
     """Create a tarfile of an install prefix of a spec. Skips existing buildinfo file.
 
+    Returns the files that need relocation, and an index of the offsets of the prefixes in ELF
+    binaries, which speeds up their relocation.
+
     Args:
         tar: tarfile object to add files to
-        prefix: absolute install prefix of spec"""
+        prefix: absolute install prefix of spec
+        prefixes_to_relocate: prefixes that need to be relocated upon extraction"""
     if not os.path.isabs(prefix) or not os.path.isdir(prefix):
         raise ValueError(f"prefix '{prefix}' must be an absolute path to a directory")
     stat_key = lambda stat: (stat.st_dev, stat.st_ino)
@@ -863,6 +1165,7 @@ def tarfile_of_spec_prefix(
     relocate_binaries = []
     relocate_links = []
     relocate_textfiles = []
+    binary_offsets = {}
 
     # use callbacks to add files and symlinks, so we can register which files need relocation upon
     # extraction.
@@ -875,7 +1178,10 @@ def add_file(tar: tarfile.TarFile, info: tarfile.TarInfo, path: str):
                 return
             f_type = file_type(f)
             if f_type == FileTypes.BINARY:
-                relocate_binaries.append(os.path.relpath(path, prefix))
+                relocate_binaries.append(relpath)
+                entry = relocate.elf_relocation_index_entry(f, prefixes_to_relocate)
+                if entry is not None:
+                    binary_offsets[relpath] = entry
             elif f_type == FileTypes.TEXT and file_matches(f, binary_regex):
                 relocate_textfiles.append(os.path.relpath(path, prefix))
             tar.addfile(info, f)
@@ -900,10 +1206,19 @@ def add_symlink(tar: tarfile.TarFile, info: tarfile.TarInfo, path: str):
         "relocate_binaries": relocate_binaries,
         "relocate_links": relocate_links,
         "relocate_textfiles": relocate_textfiles,
+        "relocation_index": {
+            "prefixes": [str(p) for p in prefixes_to_relocate],
+            "binaries": binary_offsets,
+        },
     }
 
 
-def create_tarball(spec: spack.spec.Spec, tarfile_path: str) -> Tuple[str, str]:
+def create_tarball(
+    spec: spack.spec.Spec,
+    tarfile_path: str,
+    compression: str = "gzip",
+    level: Optional[int] = None,
+) -> Tuple[str, str]:
     """Create a tarball of a spec and return the checksums of the compressed tarfile and the
     uncompressed tarfile."""
     return _do_create_tarball(
@@ -911,17 +1226,25 @@ def create_tarball(spec: spack.spec.Spec, tarfile_path: str) -> Tuple[str, str]:
         spec.prefix,
         buildinfo=get_buildinfo_dict(spec),
         prefixes_to_relocate=prefixes_to_relocate(spec),
+        compression=compression,
+        level=level,
     )
 
 
 def _do_create_tarball(
-    tarfile_path: str, prefix: str, buildinfo: dict, prefixes_to_relocate: List[str]
+    tarfile_path: str,
+    prefix: str,
+    buildinfo: dict,
+    prefixes_to_relocate: List[str],
+    compression: str = "gzip",
+    level: Optional[int] = None,
 ) -> Tuple[str, str]:
-    with spack.util.archive.gzip_compressed_tarfile(tarfile_path) as (
-        tar,
-        tar_gz_checksum,
-        tar_checksum,
-    ):
+    with spack.util.archive.compressed_tarfile(
+        tarfile_path,
+        compression=compression,
+        level=level,
+        jobs=spack.config.determine_number_of_jobs(parallel=True),
+    ) as (tar, tar_gz_checksum, tar_checksum):
         # Tarball the install prefix
         files_to_relocate = tarfile_of_spec_prefix(tar, prefix, prefixes_to_relocate)
         buildinfo.update(files_to_relocate)
@@ -955,13 +1278,36 @@ def prefixes_to_relocate(spec):
     return prefixes
 
 
+def buildcache_compression() -> Tuple[str, Optional[int]]:
+    """Return the compression format and level of the tarballs pushed to buildcaches, as
+    configured in ``config:buildcache_compression``. Falls back to gzip if the configured format
+    is not available, and to the maximum level of the format if the configured level is higher."""
+    compression = spack.config.get("config:buildcache_compression:type", "gzip")
+    level = spack.config.get("config:buildcache_compression:level", None)
+    if not spack.util.archive.compression_available(compression):
+        tty.warn(f"{compression} compression is not available, using gzip for buildcache tarballs")
+        return "gzip", None
+    max_level = spack.util.archive.MAX_COMPRESSION_LEVEL[compression]
+    if level is not None and level > max_level:
+        tty.warn(
+            f"config:buildcache_compression:level is {level}, but the maximum level of "
+            f"{compression} is {max_level}. Using level {max_level} for buildcache tarballs"
+        )
+        return compression, max_level
+    return compression, level
+
+
 def _url_upload_tarball_and_specfile(
     spec: spack.spec.Spec, tmpdir: str, cache_entry: URLBuildcacheEntry, signing_key: Optional[str]
 ):
-    tarball = os.path.join(tmpdir, f"{spec.dag_hash()}.tar.gz")
-    checksum, _ = create_tarball(spec, tarball)
+    compression, level = buildcache_compression()
+    extension = "gz" if compression == "gzip" else "zst"
+    tarball = os.path.join(tmpdir, f"{spec.dag_hash()}.tar.{extension}")
+    checksum, _ = create_tarball(spec, tarball, compression, level)
 
-    cache_entry.push_binary_package(spec, tarball, "sha256", checksum, tmpdir, signing_key)
+    cache_entry.push_binary_package(
+        spec, tarball, "sha256", checksum, tmpdir, signing_key, compression=compression
+    )
 
 
 class Uploader:
@@ -1942,14 +2288,22 @@ def relocate_package(spec: spack.spec.Spec) -> None:
     links = [os.path.join(spec_prefix, f) for f in buildinfo.get("relocate_links", [])]
 
     platform = spack.platforms.by_name(spec.platform)
-    if "macho" in platform.binary_formats:
-        relocate.relocate_macho_binaries(binaries, prefix_to_prefix)
-    elif "elf" in platform.binary_formats:
-        relocate.relocate_elf_binaries(binaries, prefix_to_prefix)
+    binary_format = next((f for f in ("macho", "elf") if f in platform.binary_formats), None)
+
+    # Binaries can be relocated at the offsets recorded when the tarball was created, provided
+    # that all prefixes that are relocated now were looked for back then.
+    relocation_index = buildinfo.get("relocation_index", {})
+    binary_index = None
+    if set(prefix_to_prefix) <= set(relocation_index.get("prefixes", [])):
+        binary_index = {
+            os.path.join(spec_prefix, f): entry
+            for f, entry in relocation_index.get("binaries", {}).items()
+        }
 
     relocate.relocate_links(links, prefix_to_prefix)
-    relocate.relocate_text(textfiles, prefix_to_prefix)
-    changed_files = relocate.relocate_text_bin(binaries, prefix_to_prefix)
+    changed_files = relocate.relocate_files(
+        textfiles, binaries, prefix_to_prefix, binary_format, binary_index=binary_index
+    )
 
     # Add ad-hoc signatures to patched macho files when on macOS.
     if "macho" in platform.binary_formats and sys.platform == "darwin":
@@ -2004,14 +2358,64 @@ def _tar_strip_component(tar: tarfile.TarFile, prefix: str):
         yield m
 
 
+def _tar_relative_members(tar: tarfile.TarFile) -> Iterable[tarfile.TarInfo]:
+    """Yield the members of a tarfile read as a stream, ensuring that they can't be extracted
+    outside of the extraction directory. Members with an absolute path, with ``..`` components,
+    or with a path through a symlink extracted before, are rejected. Symlinks themselves may be
+    absolute, since relocation takes care of them."""
+    symlinks: Set[pathlib.PurePosixPath] = set()
+    for m in tar:
+        for name in (m.name, m.linkname if m.islnk() else ""):
+            path = pathlib.PurePosixPath(name)
+            if (
+                path.is_absolute()
+                or ".." in path.parts
+                or any(parent in symlinks for parent in path.parents)
+            ):
+                raise ValueError(f"Tarball contains file {m.name} outside of prefix")
+        if m.issym():
+            symlinks.add(pathlib.PurePosixPath(m.name))
+        yield m
+
+
+def _merge_tree(src: str, dst: str) -> None:
+    """Move the contents of src into the existing directory dst, merging directories that exist
+    in both, and replacing other entries of dst with the same name."""
+    with os.scandir(src) as entries:
+        for entry in entries:
+            target = os.path.join(dst, entry.name)
+            if entry.is_dir(follow_symlinks=False) and os.path.isdir(target):
+                if not os.path.islink(target):
+                    _merge_tree(entry.path, target)
+                    continue
+                os.unlink(target)
+            os.replace(entry.path, target)
+    shutil.copystat(src, dst)
+
+
 def extract_buildcache_tarball(tarfile_path: str, destination: str) -> None:
-    with closing(tarfile.open(tarfile_path, "r")) as tar:
-        # For consistent behavior across all supported Python versions
-        tar.extraction_filter = lambda member, path: member
-        # Remove common prefix from tarball entries and directly extract them to the install dir.
-        tar.extractall(
-            path=destination, members=_tar_strip_component(tar, prefix=_ensure_common_prefix(tar))
-        )
+    """Extract the package prefix in a buildcache tarball into the destination directory.
+
+    The tarball is decompressed and extracted in a single pass, into a temporary directory within
+    the destination. Only when the common prefix of its entries has been validated, the contents
+    of the package prefix are moved into the destination, merging with any existing directories
+    there. The compression format is detected from
+    the contents of the tarball, which may consist of multiple gzip members or zstd frames.
+    """
+    fsys.mkdirp(destination)
+    extract_dir = tempfile.mkdtemp(prefix=".extract-", dir=destination)
+    try:
+        with open(tarfile_path, "rb") as f, closing(
+            spack.util.archive.decompressor(f)
+        ) as stream, closing(tarfile.open(fileobj=stream, mode="r|*")) as tar:
+            # For consistent behavior across all supported Python versions
+            tar.extraction_filter = lambda member, path: member
+            tar.extractall(path=extract_dir, members=_tar_relative_members(tar))
+            pkg_prefix = os.path.join(extract_dir, _ensure_common_prefix(tar))
+
+        _merge_tree(pkg_prefix, destination)
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
 
 
 def extract_tarball(spec, tarball_stage: spack.stage.Stage, force=False, timer=timer.NULL_TIMER):
@@ -2545,15 +2949,21 @@ class BuildcacheIndexNotExists(Exception):
     """Buildcache does not contain an index"""
 
 
-FetchIndexResult = collections.namedtuple("FetchIndexResult", "etag hash data fresh")
+FetchIndexResult = collections.namedtuple("FetchIndexResult", "etag hash data fresh shards")
+# Checksums of the shards the index was merged from, if it is sharded
+FetchIndexResult.__new__.__defaults__ = (None,)
 
 
 class IndexFetcher:
     def conditional_fetch(self) -> FetchIndexResult:
         raise NotImplementedError(f"{self.__class__.__name__} is abstract")
 
+    #: Local directory where shards of indices are cached, by checksum
+    shards_dir: Optional[str] = None
+
     def get_index_manifest(self, manifest_response) -> BlobRecord:
-        """Read the response of the manifest request and return a BlobRecord"""
+        """Read the response of the manifest request and return a BlobRecord, which is the one
+        of the table of shards if the index is sharded"""
         cache_class = get_url_buildcache_class(CURRENT_BUILD_CACHE_LAYOUT_VERSION)
         try:
             result = io.TextIOWrapper(manifest_response, encoding="utf-8").read()
@@ -2564,11 +2974,69 @@ def get_index_manifest(self, manifest_response) -> BlobRecord:
             # Currently we do not sign buildcache index, but we could
             cache_class.verify_and_extract_manifest(result, verify=False)
         )
+        for record in manifest.data:
+            if record.media_type == cache_class.BUILDCACHE_INDEX_SHARDS_MEDIATYPE:
+                return record
         blob_record = manifest.get_blob_records(
             cache_class.component_to_media_type(BuildcacheComponent.INDEX)
         )[0]
         return blob_record
 
+    def fetch_index(
+        self, cache_entry: URLBuildcacheEntry, blob_record: BlobRecord
+    ) -> Tuple[str, str, Optional[List[str]]]:
+        """Fetch the index indicated by the BlobRecord, and return the (checksum, contents,
+        shards) of the index. For sharded indices, the checksum is the one of the table of shards,
+        the contents are merged from all shards, and the checksums of the shards are returned.
+        Otherwise shards is None."""
+        cache_class = get_url_buildcache_class(CURRENT_BUILD_CACHE_LAYOUT_VERSION)
+        if blob_record.media_type != cache_class.BUILDCACHE_INDEX_SHARDS_MEDIATYPE:
+            return (*self.fetch_index_blob(cache_entry, blob_record), None)
+
+        checksum, contents = self.fetch_index_blob(cache_entry, blob_record)
+        try:
+            shards = json.loads(contents)["shards"]
+            installs: Dict[str, dict] = {}
+            for shard in shards.values():
+                _merge_index_installs(installs, json.loads(self.fetch_shard(cache_entry, shard)))
+        except (ValueError, KeyError, TypeError) as e:
+            raise FetchIndexError(f"Remote index at {cache_entry.mirror_url} is invalid", e) from e
+
+        merged = sjson.dump(_index_from_installs(installs))
+        return checksum, merged, sorted(shard["checksum"] for shard in shards.values())
+
+    def fetch_shard(self, cache_entry: URLBuildcacheEntry, shard: dict) -> str:
+        """Return the contents of a shard of an index, which is only fetched if it is not already
+        in the local shards directory"""
+        local_path = None
+        if self.shards_dir:
+            local_path = os.path.join(self.shards_dir, f"{shard['checksum']}.json")
+            try:
+                with open(local_path, encoding="utf-8") as f:
+                    contents = f.read()
+                if compute_hash(contents) == shard["checksum"]:
+                    return contents
+            except OSError:
+                pass
+
+        _, contents = self.fetch_index_blob(cache_entry, _index_shard_record(shard))
+
+        if local_path:
+            # Write atomically, since the directory is shared by concurrent fetches. If writing
+            # fails, the shard is fetched again next time.
+            tmp_path = f"{local_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                mkdirp(os.path.dirname(local_path))
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(contents)
+                os.replace(tmp_path, local_path)
+            except OSError as e:
+                tty.debug(f"Could not cache index shard at {local_path}: {e}")
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
+
+        return contents
+
     def fetch_index_blob(
         self, cache_entry: URLBuildcacheEntry, blob_record: BlobRecord
     ) -> Tuple[str, str]:
@@ -2758,12 +3226,19 @@ def conditional_fetch(self) -> FetchIndexResult:
 class DefaultIndexFetcher(IndexFetcher):
     """Fetcher for buildcache index, cache invalidation via manifest contents"""
 
-    def __init__(self, mirror_metadata: MirrorMetadata, local_hash, urlopen=web_util.urlopen):
+    def __init__(
+        self,
+        mirror_metadata: MirrorMetadata,
+        local_hash,
+        urlopen=web_util.urlopen,
+        shards_dir: Optional[str] = None,
+    ):
         self.url = mirror_metadata.url
         self.view = mirror_metadata.view
         self.layout_version = mirror_metadata.version
         self.local_hash = local_hash
         self.urlopen = urlopen
+        self.shards_dir = shards_dir
         self.headers = {"User-Agent": web_util.SPACK_USER_AGENT}
 
     def conditional_fetch(self) -> FetchIndexResult:
@@ -2787,7 +3262,7 @@ def conditional_fetch(self) -> FetchIndexResult:
 
         # Otherwise, download the index blob
         cache_entry = cache_class(self.url, allow_unsigned=True)
-        computed_hash, result = self.fetch_index_blob(cache_entry, index_blob_record)
+        computed_hash, result, shards = self.fetch_index(cache_entry, index_blob_record)
         cache_entry.destroy()
 
         # For now we only handle etags on http(s), since 304 error handling
@@ -2799,7 +3274,9 @@ def conditional_fetch(self) -> FetchIndexResult:
                 response.headers.get("Etag", None) or response.headers.get("etag", None)
             )
 
-        return FetchIndexResult(etag=etag, hash=computed_hash, data=result, fresh=False)
+        return FetchIndexResult(
+            etag=etag, hash=computed_hash, data=result, fresh=False, shards=shards
+        )
 
 
 class EtagIndexFetcher(IndexFetcher):
@@ -2817,12 +3294,19 @@ class EtagIndexFetcher(IndexFetcher):
     4. If it needs to actually read the manifest, it does not need to do any checks of the url
     scheme to determine whether an etag should be included in the return value."""
 
-    def __init__(self, mirror_metadata: MirrorMetadata, etag, urlopen=web_util.urlopen):
+    def __init__(
+        self,
+        mirror_metadata: MirrorMetadata,
+        etag,
+        urlopen=web_util.urlopen,
+        shards_dir: Optional[str] = None,
+    ):
         self.url = mirror_metadata.url
         self.view = mirror_metadata.view
         self.layout_version = mirror_metadata.version
         self.etag = etag
         self.urlopen = urlopen
+        self.shards_dir = shards_dir
 
     def conditional_fetch(self) -> FetchIndexResult:
         # Do a conditional fetch of the index manifest (i.e. using If-None-Match header)
@@ -2843,7 +3327,7 @@ def conditional_fetch(self) -> FetchIndexResult:
 
         # We need to read the index manifest and fetch the associated blob
         cache_entry = cache_class(self.url, allow_unsigned=True)
-        computed_hash, result = self.fetch_index_blob(
+        computed_hash, result, shards = self.fetch_index(
             cache_entry, self.get_index_manifest(response)
         )
         cache_entry.destroy()
@@ -2856,11 +3340,15 @@ def conditional_fetch(self) -> FetchIndexResult:
             hash=computed_hash,
             data=result,
             fresh=False,
+            shards=shards,
         )
 
 
 def get_index_fetcher(
-    scheme: str, mirror_metadata: MirrorMetadata, cache_entry: Dict[str, str]
+    scheme: str,
+    mirror_metadata: MirrorMetadata,
+    cache_entry: Dict[str, str],
+    shards_dir: Optional[str] = None,
 ) -> IndexFetcher:
     if scheme == "oci":
         # TODO: Actually etag and OCI are not mutually exclusive...
@@ -2869,7 +3357,7 @@ def get_index_fetcher(
         if mirror_metadata.version < 3:
             return EtagIndexFetcherV2(mirror_metadata.url, cache_entry["etag"])
         else:
-            return EtagIndexFetcher(mirror_metadata, cache_entry["etag"])
+            return EtagIndexFetcher(mirror_metadata, cache_entry["etag"], shards_dir=shards_dir)
 
     else:
         if mirror_metadata.version < 3:
@@ -2878,7 +3366,9 @@ def get_index_fetcher(
             )
         else:
             return DefaultIndexFetcher(
-                mirror_metadata, local_hash=cache_entry.get("index_hash", None)
+                mirror_metadata,
+                local_hash=cache_entry.get("index_hash", None),
+                shards_dir=shards_dir,
             )
 
 
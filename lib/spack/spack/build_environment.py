@@ -32,6 +32,8 @@
 calls you can make from within the install() function.
 """
 
+import contextlib
+import copy
 import inspect
 import io
 import multiprocessing
@@ -578,9 +580,13 @@ def set_wrapper_variables(pkg, env):
     env.set(SPACK_STORE_RPATH_DIRS, ":".join(rpath_dirs_spack))
 
 
-def set_package_py_globals(pkg, context: Context = Context.BUILD):
+def set_package_py_globals(
+    pkg, context: Context = Context.BUILD
+) -> "ModuleChangePropagator":
     """Populate the Python module of a package with some useful global names.
     This makes things easier for package writers.
+
+    Returns the object that recorded the globals that were set.
     """
     module = ModuleChangePropagator(pkg)
 
@@ -619,6 +625,7 @@ def static_to_shared_library(static_lib, shared_lib=None, **kwargs):
     module.static_to_shared_library = static_to_shared_library
 
     module.propagate_changes_to_mro()
+    return module
 
 
 def _static_to_shared_library(arch, compiler, static_lib, shared_lib=None, **kwargs):
@@ -967,6 +974,156 @@ def effective_deptypes(
     return nodes_with_type
 
 
+def _config_scopes() -> Tuple[str, ...]:
+    """Names of the configuration scopes in use"""
+    return tuple(spack.config.CONFIG.scopes)
+
+
+class RunEnvironmentMemo:
+    """Memoizes the parts of the run environment of a DAG that only depend on a single node or on
+    a single edge, i.e. the globals set in package.py modules and the output of
+    ``setup_run_environment``, ``setup_dependent_run_environment`` and prefix inspections.
+
+    When the run environment is needed separately for many specs with shared dependencies, like
+    when module files are generated, each node is then processed once instead of once per
+    dependent spec.
+
+    Setup methods and prefix inspections may read configuration, so results are also keyed by the
+    configuration scopes in use.
+    """
+
+    def __init__(self) -> None:
+        #: Globals set in package.py modules, as the modules and the values that were set in them
+        self._globals: Dict[tuple, Tuple[List[types.ModuleType], Dict[str, Any]]] = {}
+        #: Environment modifications, keyed by the node or edge they were computed for
+        self._env_mods: Dict[tuple, EnvironmentModifications] = {}
+
+    def set_globals(self, key: tuple, setup: Callable[[], "ModuleChangePropagator"]) -> None:
+        """Calls ``setup`` the first time a key is seen, and replays the globals it set in
+        package.py modules the next times."""
+        key = (_config_scopes(), *key)
+        if key not in self._globals:
+            module = setup()
+            modules = [module.current_module, *module.modules_in_mro]
+            self._globals[key] = (modules, dict(module._set_attributes))
+            return
+
+        modules, attributes = self._globals[key]
+        for module in modules:
+            module.__dict__.update(attributes)
+
+    def env_modifications(
+        self, key: tuple, setup: Callable[[EnvironmentModifications], None]
+    ) -> EnvironmentModifications:
+        """Returns a copy of the environment modifications that ``setup`` adds to an empty
+        instance, where ``setup`` is called only the first time a key is seen."""
+        key = (_config_scopes(), *key)
+        if key not in self._env_mods:
+            env = EnvironmentModifications()
+            setup(env)
+            self._env_mods[key] = env
+
+        # Consumers modify entries in place, e.g. to project prefixes onto views
+        result = EnvironmentModifications(traced=self._env_mods[key].traced)
+        result.env_modifications = [copy.copy(x) for x in self._env_mods[key]]
+        return result
+
+
+#: Memo of the run environment of nodes and edges, if one is active
+_RUN_ENVIRONMENT_MEMO: Optional[RunEnvironmentMemo] = None
+
+
+@contextlib.contextmanager
+def memoized_run_environment():
+    """Context manager that memoizes the run environment of each node and edge of the DAGs that
+    are processed within it. Nested uses share the memo of the outermost one."""
+    global _RUN_ENVIRONMENT_MEMO
+    if _RUN_ENVIRONMENT_MEMO is not None:
+        yield _RUN_ENVIRONMENT_MEMO
+        return
+
+    _RUN_ENVIRONMENT_MEMO = RunEnvironmentMemo()
+    try:
+        yield _RUN_ENVIRONMENT_MEMO
+    finally:
+        _RUN_ENVIRONMENT_MEMO = None
+
+
+def enable_run_environment_memo() -> None:
+    """Memoizes the run environment for the rest of the life of the current process, unless a
+    memo is already active. Meant to be the initializer of worker processes, which do not inherit
+    the memo of the parent process unless they are forked."""
+    global _RUN_ENVIRONMENT_MEMO
+    if _RUN_ENVIRONMENT_MEMO is None:
+        _RUN_ENVIRONMENT_MEMO = RunEnvironmentMemo()
+
+
+def set_run_package_py_globals(pkg: spack.package_base.PackageBase) -> None:
+    """Sets the globals in the package.py module of a package for the run context"""
+    if _RUN_ENVIRONMENT_MEMO is None:
+        set_package_py_globals(pkg, context=Context.RUN)
+        return
+
+    _RUN_ENVIRONMENT_MEMO.set_globals(
+        ("globals", pkg.spec.dag_hash()),
+        lambda: set_package_py_globals(pkg, context=Context.RUN),
+    )
+
+
+def setup_dependent_package_py_globals(
+    pkg: spack.package_base.PackageBase, dependent_spec: spack.spec.Spec, context: Context
+) -> None:
+    """Lets a package set globals in the package.py module of one of its dependents"""
+
+    def setup():
+        dependent_module = ModuleChangePropagator(dependent_spec.package)
+        pkg.setup_dependent_package(dependent_module, dependent_spec)
+        dependent_module.propagate_changes_to_mro()
+        return dependent_module
+
+    if _RUN_ENVIRONMENT_MEMO is None or context != Context.RUN:
+        setup()
+        return
+
+    _RUN_ENVIRONMENT_MEMO.set_globals(
+        ("dependent_globals", pkg.spec.dag_hash(), dependent_spec.dag_hash()), setup
+    )
+
+
+def run_environment_modifications(
+    key: tuple, setup: Callable[[EnvironmentModifications], None]
+) -> EnvironmentModifications:
+    """Returns the environment modifications that ``setup`` adds to an empty instance, memoized
+    by key if a run environment memo is active."""
+    if _RUN_ENVIRONMENT_MEMO is None:
+        env = EnvironmentModifications()
+        setup(env)
+        return env
+    return _RUN_ENVIRONMENT_MEMO.env_modifications(key, setup)
+
+
+def own_run_environment_modifications(
+    pkg: spack.package_base.PackageBase,
+) -> EnvironmentModifications:
+    """Returns the modifications from ``setup_run_environment`` of a package. Globals in the
+    package.py modules must have been set before calling this function."""
+    return run_environment_modifications(
+        ("run_environment", pkg.spec.dag_hash()), pkg.setup_run_environment
+    )
+
+
+def dependent_run_environment_modifications(
+    pkg: spack.package_base.PackageBase, dependent_spec: spack.spec.Spec
+) -> EnvironmentModifications:
+    """Returns the modifications from ``setup_dependent_run_environment`` of a package for one of
+    its dependents. Globals in the package.py modules must have been set before calling this
+    function."""
+    return run_environment_modifications(
+        ("dependent_run_environment", pkg.spec.dag_hash(), dependent_spec.dag_hash()),
+        lambda env: pkg.setup_dependent_run_environment(env, dependent_spec),
+    )
+
+
 class SetupContext:
     """This class encapsulates the logic to determine environment modifications, and is used as
     well to set globals in modules of package.py."""
@@ -1019,7 +1176,7 @@ def set_all_package_py_globals(self):
                     set_package_py_globals(pkg, context=Context.BUILD)
                 else:
                     # This includes runtime dependencies, also runtime deps of direct build deps.
-                    set_package_py_globals(pkg, context=Context.RUN)
+                    set_run_package_py_globals(pkg)
 
         # Looping over the set of packages a second time
         # ensures all globals are loaded into the module space prior to
@@ -1032,9 +1189,7 @@ def set_all_package_py_globals(self):
                 # setting globals for those.
                 if id(spec) not in self.nodes_in_subdag:
                     continue
-                dependent_module = ModuleChangePropagator(spec.package)
-                pkg.setup_dependent_package(dependent_module, spec)
-                dependent_module.propagate_changes_to_mro()
+                setup_dependent_package_py_globals(pkg, spec, context=self.context)
 
     def get_env_modifications(self) -> EnvironmentModifications:
         """Returns the environment variable modifications for the given input specs and context.
@@ -1070,8 +1225,16 @@ def get_env_modifications(self) -> EnvironmentModifications:
                 run_env_mods = EnvironmentModifications()
                 for spec in dspec.dependents(deptype=dt.LINK | dt.RUN):
                     if id(spec) in self.nodes_in_subdag:
-                        pkg.setup_dependent_run_environment(run_env_mods, spec)
-                pkg.setup_run_environment(run_env_mods)
+                        if self.context == Context.RUN:
+                            run_env_mods.extend(
+                                dependent_run_environment_modifications(pkg, spec)
+                            )
+                        else:
+                            pkg.setup_dependent_run_environment(run_env_mods, spec)
+                if self.context == Context.RUN:
+                    run_env_mods.extend(own_run_environment_modifications(pkg))
+                else:
+                    pkg.setup_run_environment(run_env_mods)
 
                 external_env = (dspec.extra_attributes or {}).get("environment", {})
                 if external_env:
@@ -232,10 +232,17 @@ def _prune_orphans(
         try:
             cache_entry = cast(URLBuildcacheEntry, read_fn(manifest))
             assert cache_entry.manifest is not None  # to satisfy type checker
+            records = list(cache_entry.manifest.data)
+            # Shards of a sharded index are referenced by its table of shards
+            for data in cache_entry.manifest.data:
+                if data.media_type == cache_entry.BUILDCACHE_INDEX_SHARDS_MEDIATYPE:
+                    records.extend(
+                        spack.binary_distribution.index_shard_records(cache_entry, data)
+                    )
             blob_to_manifest_mapping.update(
                 {
                     cache_entry.get_blob_url(mirror_url=mirror.fetch_url, record=data): manifest
-                    for data in cache_entry.manifest.data
+                    for data in records
                 }
             )
         except Exception as e:
@@ -14,6 +14,7 @@
 import spack.repo
 import spack.spec
 import spack.stage
+import spack.store
 import spack.util.path
 import spack.version
 from spack.cmd.common import arguments
@@ -242,6 +243,9 @@ def _dev_spec_generator(args, env):
                         " environment"
                     )
                 else:
+                    # Specs read lazily from the database are linked to their dependents once
+                    # constructed
+                    spack.store.STORE.db.materialize()
                     for s in concrete_specs:
                         for node_spec in s.traverse(direction="parents", root=True):
                             tty.debug(f"Recursive develop for {node_spec.name}")
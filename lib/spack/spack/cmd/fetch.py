@@ -8,6 +8,7 @@
 import spack.config
 import spack.environment as ev
 import spack.llnl.util.tty as tty
+import spack.prefetch
 import spack.traverse
 from spack.cmd.common import arguments
 
@@ -63,12 +64,18 @@ def fetch(parser, args):
     else:
         to_be_fetched = specs
 
-    for spec in to_be_fetched:
-        if args.missing and spec.installed:
-            continue
+    to_be_fetched = [s for s in to_be_fetched if not (args.missing and s.installed)]
 
-        pkg = spec.package
+    # Fetch concurrently what does not need user interaction, and the rest one by one
+    prefetchable = [s for s in to_be_fetched if spack.prefetch.can_prefetch(s, keep_stage=True)]
+    with spack.prefetch.SourcePrefetcher(prefetchable, keep_stage=True) as prefetcher:
+        for spec in to_be_fetched:
+            if spec in prefetcher:
+                prefetcher.wait(spec)
+                continue
 
-        pkg.stage.keep = True
-        with pkg.stage:
-            pkg.do_fetch()
+            pkg = spec.package
+
+            pkg.stage.keep = True
+            with pkg.stage:
+                pkg.do_fetch()
@@ -337,16 +337,7 @@ def refresh(module_type, specs, args):
     spack.modules.common.generate_module_index(
         module_type_root, writers, overwrite=args.delete_tree
     )
-    errors = []
-    for x in writers:
-        try:
-            x.write(overwrite=True)
-        except spack.error.SpackError as e:
-            msg = f"{x.layout.filename}: {e.message}"
-            errors.append(msg)
-        except Exception as e:
-            msg = f"{x.layout.filename}: {str(e)}"
-            errors.append(msg)
+    errors = spack.modules.common.write_module_files(writers, module_type_root)
 
     if errors:
         errors.insert(0, color.colorize("@*{some module files could not be written}"))
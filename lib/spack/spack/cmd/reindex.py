@@ -14,7 +14,8 @@
 
 
 def reindex(parser, args):
-    current_index = spack.store.STORE.db._index_path
+    db = spack.store.STORE.db
+    current_index = db._existing_index_path() or db._index_path
     needs_backup = os.path.isfile(current_index)
 
     if needs_backup:
@@ -26,5 +27,5 @@ def reindex(parser, args):
 
     extra = ["If you need to restore, replace it with the backup."] if needs_backup else []
     tty.msg(
-        f"The DB at {current_index} has been reindexed to v{spack.database._DB_VERSION}", *extra
+        f"The DB at {db._index_path} has been reindexed to v{spack.database._DB_VERSION}", *extra
     )
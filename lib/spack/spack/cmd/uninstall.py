@@ -140,6 +140,9 @@ def is_installed(spec):
         record = spack.store.STORE.db.query_local_by_spec_hash(spec.dag_hash())
         return record and record.installed
 
+    # Specs read lazily from the database are linked only to dependents that were read too
+    spack.store.STORE.db.materialize()
+
     all_specs = traverse.traverse_nodes(
         specs,
         root=False,
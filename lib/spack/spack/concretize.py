@@ -5,7 +5,7 @@
 import importlib
 import sys
 import time
-from typing import Iterable, List, Optional, Sequence, Tuple, Union
+from typing import TYPE_CHECKING, Iterable, List, Optional, Sequence, Tuple, Union
 
 import spack.compilers
 import spack.compilers.config
@@ -16,6 +16,9 @@
 import spack.util.parallel
 from spack.spec import ArchSpec, CompilerSpec, Spec
 
+if TYPE_CHECKING:
+    import spack.solver.asp
+
 SpecPairInput = Tuple[Spec, Optional[Spec]]
 SpecPair = Tuple[Spec, Spec]
 TestsType = Union[bool, Iterable[str]]
@@ -145,6 +148,12 @@ def concretize_separately(
             (abstract, concrete) for abstract, concrete in spec_list if concrete
         ]
 
+    # Select the reusable specs once, so that workers don't need to read the store, the
+    # buildcaches and the environments again
+    from spack.solver.reuse import ReusableSpecsSelector
+
+    reusable_candidates = ReusableSpecsSelector(spack.config.CONFIG).select_candidates()
+
     # Solve the environment in parallel on Linux
     num_procs = min(len(args), spack.config.determine_number_of_jobs(parallel=True))
 
@@ -154,18 +163,28 @@ def concretize_separately(
         msg += f" pool with {num_procs} processes"
     tty.msg(msg)
 
-    for j, (i, concrete, duration) in enumerate(
-        spack.util.parallel.imap_unordered(
-            _concretize_task, args, processes=num_procs, debug=tty.is_debug(), maxtaskperchild=1
-        )
-    ):
-        ret.append((i, concrete))
-        percentage = int((j + 1) / len(args) * 100)
-        tty.verbose(
-            f"{duration:6.1f}s [{percentage:3d}%] {concrete.cformat('{hash:7}')} "
-            f"{to_concretize[i].colored_str}"
-        )
-        sys.stdout.flush()
+    # Workers are kept alive for the whole concretization, and each of them reuses the same
+    # solver for all its tasks
+    try:
+        for j, (i, concrete, duration) in enumerate(
+            spack.util.parallel.imap_unordered(
+                _concretize_task,
+                args,
+                processes=num_procs,
+                debug=tty.is_debug(),
+                initializer=_initialize_concretization_worker,
+                initargs=(reusable_candidates,),
+            )
+        ):
+            ret.append((i, concrete))
+            percentage = int((j + 1) / len(args) * 100)
+            tty.verbose(
+                f"{duration:6.1f}s [{percentage:3d}%] {concrete.cformat('{hash:7}')} "
+                f"{to_concretize[i].colored_str}"
+            )
+            sys.stdout.flush()
+    finally:
+        _reset_concretization_worker()
 
     # Add specs in original order
     ret.sort(key=lambda x: x[0])
@@ -175,20 +194,48 @@ def concretize_separately(
     ]
 
 
+#: Solver shared by all the tasks executed by a concretization worker
+_WORKER_SOLVER: Optional["spack.solver.asp.Solver"] = None
+
+
+def _initialize_concretization_worker(reusable_candidates: List[Spec]) -> None:
+    """Creates the solver shared by all the tasks executed by the current worker.
+
+    Args:
+        reusable_candidates: specs selected from the reuse sources by the parent process
+    """
+    global _WORKER_SOLVER
+    from spack.solver.asp import Solver
+
+    _WORKER_SOLVER = Solver()
+    _WORKER_SOLVER.selector.candidates = reusable_candidates
+
+
+def _reset_concretization_worker() -> None:
+    global _WORKER_SOLVER
+    _WORKER_SOLVER = None
+
+
 def _concretize_task(packed_arguments: Tuple[int, str, TestsType]) -> Tuple[int, Spec, float]:
     index, spec_str, tests = packed_arguments
     with tty.SuppressOutput(msg_enabled=False):
         start = time.time()
-        spec = concretize_one(Spec(spec_str), tests=tests)
+        spec = concretize_one(Spec(spec_str), tests=tests, solver=_WORKER_SOLVER)
         return index, spec, time.time() - start
 
 
-def concretize_one(spec: Union[str, Spec], tests: TestsType = False) -> Spec:
+def concretize_one(
+    spec: Union[str, Spec],
+    tests: TestsType = False,
+    *,
+    solver: Optional["spack.solver.asp.Solver"] = None,
+) -> Spec:
     """Return a concretized copy of the given spec.
 
     Args:
         tests: if False disregard test dependencies, if a list of names activate them for
             the packages in the list, if True activate test dependencies for all packages.
+        solver: solver to be used. If None, a new solver is created.
     """
     from spack.solver.asp import Solver, SpecBuilder
 
@@ -205,8 +252,9 @@ def concretize_one(spec: Union[str, Spec], tests: TestsType = False) -> Spec:
                 f"Spec {node} has no name; cannot concretize an anonymous spec"
             )
 
+    solver = solver or Solver()
     allow_deprecated = spack.config.get("config:deprecated", False)
-    result = Solver().solve([spec], tests=tests, allow_deprecated=allow_deprecated)
+    result = solver.solve([spec], tests=tests, allow_deprecated=allow_deprecated)
 
     # take the best answer
     opt, i, answer = min(result.answers)
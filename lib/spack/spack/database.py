@@ -16,6 +16,7 @@
 provides a cache and a sanity checking mechanism for what is in the
 filesystem.
 """
+import bisect
 import contextlib
 import datetime
 import os
@@ -31,6 +32,7 @@
     Generator,
     Iterable,
     List,
+    Mapping,
     NamedTuple,
     Optional,
     Set,
@@ -50,6 +52,7 @@
     _use_uuid = False
     pass
 
+import spack.database_binary
 import spack.deptypes as dt
 import spack.hash_types as ht
 import spack.llnl.util.filesystem as fs
@@ -128,6 +131,15 @@
 #: File where the database is written
 INDEX_JSON_FILE = "index.json"
 
+#: File where the database is written, when using the binary format
+INDEX_BINARY_FILE = "index.bin"
+
+#: Formats of the database file, and the corresponding file names
+INDEX_FILES = {"json": INDEX_JSON_FILE, "binary": INDEX_BINARY_FILE}
+
+#: File where changes to the database are appended, when journaling is enabled
+_JOURNAL_FILE = "index.journal"
+
 # Verifier file to check last modification of the DB
 _INDEX_VERIFIER_FILE = "index_verifier"
 
@@ -150,6 +162,16 @@ def _now() -> float:
     return time.time()
 
 
+def _timestamp(date: Optional[datetime.datetime]) -> Optional[float]:
+    """Returns the time since the epoch for a date, or None if it can't be represented"""
+    if date is None:
+        return None
+    try:
+        return date.timestamp()
+    except (OverflowError, ValueError, OSError):
+        return None
+
+
 def _autospec(function):
     """Decorator that automatically converts the argument of a single-arg
     function to a Spec."""
@@ -217,6 +239,10 @@ def __init__(
         self.in_buildcache = in_buildcache
         self.origin = origin
 
+    def spec_dict(self) -> Dict[str, Any]:
+        """Node dictionary of the spec, as written in database files"""
+        return self.spec.node_dict_with_hashes()
+
     def install_type_matches(self, installed: InstallRecordStatus) -> bool:
         if self.installed:
             return InstallRecordStatus.INSTALLED in installed
@@ -229,7 +255,7 @@ def to_dict(self, include_fields=DEFAULT_INSTALL_RECORD_FIELDS):
 
         for field_name in include_fields:
             if field_name == "spec":
-                rec_dict.update({"spec": self.spec.node_dict_with_hashes()})
+                rec_dict.update({"spec": self.spec_dict()})
             elif field_name == "deprecated_for" and self.deprecated_for:
                 rec_dict.update({"deprecated_for": self.deprecated_for})
             else:
@@ -242,6 +268,11 @@ def to_dict(self, include_fields=DEFAULT_INSTALL_RECORD_FIELDS):
 
     @classmethod
     def from_dict(cls, spec, dictionary):
+        return InstallRecord(spec, **cls.fields_from_dict(dictionary))
+
+    @staticmethod
+    def fields_from_dict(dictionary) -> Dict[str, Any]:
+        """Arguments to construct a record from its dictionary, except for the spec"""
         d = dict(dictionary.items())
         d.pop("spec", None)
 
@@ -252,7 +283,374 @@ def from_dict(cls, spec, dictionary):
         if "installed" not in d:
             d["installed"] = False
 
-        return InstallRecord(spec, **d)
+        return d
+
+    @property
+    def install_status(self) -> InstallRecordStatus:
+        """Status of this record, as matched by ``install_type_matches``"""
+        if self.installed:
+            return InstallRecordStatus.INSTALLED
+        elif self.deprecated_for:
+            return InstallRecordStatus.DEPRECATED
+        return InstallRecordStatus.MISSING
+
+    def name_and_versions(self) -> Tuple[str, "vn.VersionList"]:
+        """Name and versions of the spec tracked by this record"""
+        return self.spec.name, self.spec.versions
+
+
+class LazyInstallRecord(InstallRecord):
+    """An install record read from a database file, whose spec is constructed on first access.
+
+    Accessing the spec constructs the specs of all the dependencies that have not been
+    constructed yet, so that specs in the database still share nodes.
+    """
+
+    def __init__(self, reader: "LazySpecReader", hash_key: str, **kwargs) -> None:
+        self._reader = reader
+        self._hash_key = hash_key
+        super().__init__(None, **kwargs)  # type: ignore[arg-type]
+
+    @property  # type: ignore[override]
+    def spec(self) -> "spack.spec.Spec":
+        if self._spec is None:
+            self._reader.materialize(self._hash_key)
+        return self._spec
+
+    @spec.setter
+    def spec(self, value: Optional["spack.spec.Spec"]) -> None:
+        self._spec = value
+
+    @property
+    def materialized(self) -> bool:
+        """Whether the spec of this record has been constructed"""
+        return self._spec is not None
+
+    def name_and_versions(self) -> Tuple[str, "vn.VersionList"]:
+        if self._spec is not None:
+            return super().name_and_versions()
+        return self._reader.name_and_versions(self._hash_key)
+
+    def spec_dict(self) -> Dict[str, Any]:
+        if self._spec is None and self._reader.is_current_format:
+            # The raw node is already in the format we would write, so don't construct the spec
+            return self._reader.installs[self._hash_key]["spec"]
+        return super().spec_dict()
+
+    def __reduce__(self):
+        # Child processes receive a plain record, with its spec already constructed
+        return InstallRecord, (
+            self.spec,
+            self.path,
+            self.installed,
+            self.ref_count,
+            self.explicit,
+            self.installation_time,
+            self.deprecated_for,
+            self.in_buildcache,
+            self.origin,
+        )
+
+
+class BinaryInstallRecord(LazyInstallRecord):
+    """A lazy install record read from a binary database file, whose fields are also decoded
+    on first access. Fields that are assigned before then keep their value.
+    """
+
+    #: attributes that are decoded from the binary database file
+    _FIELDS = (
+        "path",
+        "installed",
+        "ref_count",
+        "explicit",
+        "installation_time",
+        "deprecated_for",
+        "in_buildcache",
+        "origin",
+    )
+
+    def __init__(
+        self,
+        reader: "LazySpecReader",
+        hash_key: str,
+        index: "spack.database_binary.BinaryIndex",
+        position: int,
+    ) -> None:
+        self._reader = reader
+        self._hash_key = hash_key
+        self._binary_index = index
+        self._position = position
+        self._spec = None
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in BinaryInstallRecord._FIELDS:
+            raise AttributeError(name)
+        decoded = InstallRecord(None, **self._binary_index.fields(self._position))  # type: ignore
+        for field in BinaryInstallRecord._FIELDS:
+            self.__dict__.setdefault(field, getattr(decoded, field))
+        return self.__dict__[name]
+
+
+#: Fields of a record that are tracked by secondary indexes: package name, versions, explicit,
+#: install status and installation time.
+_IndexedFields = Tuple[str, "vn.VersionList", bool, InstallRecordStatus, float]
+
+
+class IndexedInstallRecords(Dict[str, InstallRecord]):
+    """Mapping from DAG hash to install record, which maintains secondary indexes on the records.
+
+    The indexes are used to narrow down the candidates of a query before calling the (expensive)
+    ``Spec.satisfies`` on each of them. Package name and versions of a record never change, while
+    the ``explicit``, ``installed``, ``deprecated_for`` and ``installation_time`` attributes are
+    mutated in place by the database. Whoever mutates them must call ``refresh`` afterwards.
+
+    The hashes of the records that were added, removed or refreshed are also tracked in
+    ``changed``, so that the database can write only those records to its journal. Records added
+    with ``add_unindexed`` are indexed only when the indexes are first queried.
+    """
+
+    def __init__(self, records: Optional[Dict[str, InstallRecord]] = None) -> None:
+        super().__init__()
+        #: hashes of records, by package name
+        self._by_name: Dict[str, Dict[str, None]] = {}
+        #: hashes of records, by package name and version
+        self._by_version: Dict[str, Dict["vn.VersionList", Dict[str, None]]] = {}
+        #: hashes of records, by value of the explicit attribute
+        self._by_explicit: Dict[bool, Dict[str, None]] = {True: {}, False: {}}
+        #: hashes of records, by install status
+        self._by_status: Dict[InstallRecordStatus, Dict[str, None]] = {
+            InstallRecordStatus.INSTALLED: {},
+            InstallRecordStatus.DEPRECATED: {},
+            InstallRecordStatus.MISSING: {},
+        }
+        #: installation times in ascending order, and the corresponding hashes, computed lazily
+        self._by_time: Optional[Tuple[List[float], List[str]]] = None
+        #: indexed values for each hash, needed to remove stale entries
+        self._indexed: Dict[str, _IndexedFields] = {}
+        #: hashes of the records that are not indexed yet
+        self._unindexed: Dict[str, None] = {}
+        #: hashes of the records changed since this set was last cleared
+        self.changed: Set[str] = set()
+        if records:
+            for key, record in records.items():
+                self[key] = record
+
+    def __reduce__(self):
+        return IndexedInstallRecords, (dict(self),)
+
+    def __setitem__(self, key: str, record: InstallRecord) -> None:
+        if key in self:
+            self._unindex(key)
+        super().__setitem__(key, record)
+        self._index(key, record)
+        self.changed.add(key)
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self._unindex(key)
+        self.changed.add(key)
+
+    def pop(self, key, *args):
+        if key in self:
+            self._unindex(key)
+            self.changed.add(key)
+        return super().pop(key, *args)
+
+    def add_unindexed(self, key: str, record: InstallRecord) -> None:
+        """Add a record that was read from a database file, without accessing its fields until
+        the indexes are first queried. The record is not considered changed."""
+        if key in self:
+            self._unindex(key)
+        super().__setitem__(key, record)
+        self._unindexed[key] = None
+
+    def clear(self) -> None:
+        for key in list(self):
+            del self[key]
+
+    def refresh(self, key: str) -> None:
+        """Update the indexes after the record associated with the hash has been mutated."""
+        if key in self:
+            self._unindex(key)
+            self._index(key, self[key])
+            self.changed.add(key)
+
+    def _index_pending(self) -> None:
+        """Index the records that were added with ``add_unindexed``"""
+        while self._unindexed:
+            key, _ = self._unindexed.popitem()
+            self._index(key, self[key])
+
+    def _index(self, key: str, record: InstallRecord) -> None:
+        name, versions = record.name_and_versions()
+        fields = (
+            name,
+            versions,
+            bool(record.explicit),
+            record.install_status,
+            record.installation_time,
+        )
+        name, versions, explicit, status, _ = fields
+        self._by_name.setdefault(name, {})[key] = None
+        self._by_version.setdefault(name, {}).setdefault(versions, {})[key] = None
+        self._by_explicit[explicit][key] = None
+        self._by_status[status][key] = None
+        self._by_time = None
+        self._indexed[key] = fields
+
+    def _unindex(self, key: str) -> None:
+        if key in self._unindexed:
+            del self._unindexed[key]
+            return
+        name, versions, explicit, status, _ = self._indexed.pop(key)
+        _discard(self._by_name, name, key)
+        by_version = self._by_version[name]
+        _discard(by_version, versions, key)
+        if not by_version:
+            del self._by_version[name]
+        del self._by_explicit[explicit][key]
+        del self._by_status[status][key]
+        self._by_time = None
+
+    def with_name(self, name: str) -> Dict[str, None]:
+        """Hashes of the records of the package with the given name"""
+        self._index_pending()
+        return self._by_name.get(name, {})
+
+    def with_name_and_versions(self, name: str, versions: "vn.VersionList") -> List[str]:
+        """Hashes of the records of the given package, whose versions satisfy the constraint"""
+        self._index_pending()
+        if versions == vn.any_version:
+            return list(self.with_name(name))
+        # Git versions may need a lookup to be compared, so leave them to Spec.satisfies
+        return [
+            key
+            for record_versions, keys in self._by_version.get(name, {}).items()
+            if isinstance(record_versions.concrete, vn.GitVersion)
+            or record_versions.satisfies(versions)
+            for key in keys
+        ]
+
+    def with_explicit(self, explicit: bool) -> Dict[str, None]:
+        """Hashes of the records that are (or are not) explicit"""
+        self._index_pending()
+        return self._by_explicit[explicit]
+
+    def with_status(self, installed: InstallRecordStatus) -> List[str]:
+        """Hashes of the records matching the install status"""
+        self._index_pending()
+        return [
+            key for status, keys in self._by_status.items() if status in installed for key in keys
+        ]
+
+    def installed_between(self, start: Optional[float], end: Optional[float]) -> List[str]:
+        """Hashes of the records installed between the two timestamps (if given).
+
+        Bounds are inclusive and slightly widened, since callers compare datetimes, not floats.
+        """
+        self._index_pending()
+        if self._by_time is None:
+            by_time = sorted((fields[4], key) for key, fields in self._indexed.items())
+            self._by_time = [t for t, _ in by_time], [key for _, key in by_time]
+        times, keys = self._by_time
+        lo = 0 if start is None else bisect.bisect_left(times, start - 1e-3)
+        hi = len(times) if end is None else bisect.bisect_right(times, end + 1e-3)
+        return keys[lo:hi]
+
+
+def _is_external_node(spec_reader: Type["spack.spec.SpecfileReaderBase"], node) -> bool:
+    """Whether a raw spec node in a database file is an external"""
+    _, data = spec_reader.name_and_data(node)
+    external = data.get("external")
+    return bool(external and (external.get("path") or external.get("module")))
+
+
+def _discard(index: Dict[Any, Dict[str, None]], value: Any, key: str) -> None:
+    """Remove a hash from a secondary index, and drop the entry for value if it is empty"""
+    keys = index[value]
+    del keys[key]
+    if not keys:
+        del index[value]
+
+
+class LazySpecReader:
+    """Constructs the specs of lazy install records from the raw records of a database file.
+
+    Args:
+        db: database the records were read for, used to look up dependencies in upstreams
+        spec_reader: reader for the specfile format of the database
+        installs: raw install records, by DAG hash
+        data: install records of the database, by DAG hash
+    """
+
+    def __init__(
+        self,
+        db: "Database",
+        spec_reader: Type["spack.spec.SpecfileReaderBase"],
+        installs: Mapping[str, Dict[str, Any]],
+        data: Dict[str, InstallRecord],
+    ) -> None:
+        self.db = db
+        self.spec_reader = spec_reader
+        self.installs = installs
+        self.data = data
+        #: whether raw nodes can be written back as they are
+        self.is_current_format = spec_reader is reader(_DB_VERSION)
+
+    def name_and_versions(self, hash_key: str) -> Tuple[str, "vn.VersionList"]:
+        """Name and versions of a raw record, without constructing its spec"""
+        if isinstance(self.installs, spack.database_binary.BinaryIndex):
+            name, version = self.installs.name_and_version(hash_key)
+            if version is not None:
+                return name, vn.VersionList([vn.Version(version)])
+
+        name, node = self.spec_reader.name_and_data(self.installs[hash_key]["spec"])
+        if "version" in node or "versions" in node:
+            return name, vn.VersionList.from_dict(node)
+        return name, vn.any_version
+
+    def _unmaterialized(self, hash_key: str) -> Optional[LazyInstallRecord]:
+        record = self.data.get(hash_key)
+        if isinstance(record, LazyInstallRecord) and not record.materialized:
+            return record
+        return None
+
+    def materialize(self, hash_key: str) -> None:
+        """Construct the spec for a hash, and for all of its dependencies that are not yet
+        constructed. Nodes are built in three passes, as in ``Database._read_from_file``.
+        """
+        pending: Dict[str, LazyInstallRecord] = {}
+        stack = [hash_key]
+        while stack:
+            current = stack.pop()
+            record = self._unmaterialized(current)
+            if current in pending or record is None:
+                continue
+            pending[current] = record
+            _, node = self.spec_reader.name_and_data(self.installs[current]["spec"])
+            stack.extend(
+                dep_hash
+                for _, dep_hash, *_ in self.spec_reader.dependencies_from_node_dict(node)
+            )
+
+        for current, record in pending.items():
+            try:
+                record.spec = self.db._read_spec_from_dict(
+                    self.spec_reader, current, self.installs
+                )
+            except Exception as e:
+                raise self.db._invalid_record(current, e) from e
+
+        for current in pending:
+            try:
+                self.db._assign_dependencies(self.spec_reader, current, self.installs, self.data)
+            except MissingDependenciesError:
+                raise
+            except Exception as e:
+                raise self.db._invalid_record(current, e) from e
+
+        for record in pending.values():
+            record.spec._mark_root_concrete()
 
 
 class ForbiddenLockError(SpackError):
@@ -565,6 +963,9 @@ def __init__(
         is_upstream: bool = False,
         lock_cfg: LockConfiguration = DEFAULT_LOCK_CFG,
         layout: Optional[DirectoryLayout] = None,
+        lazy: bool = False,
+        index_format: str = "json",
+        journal_size: int = 0,
     ) -> None:
         """Database for Spack installations.
 
@@ -584,18 +985,44 @@ def __init__(
             is_upstream: whether this repository is an upstream.
             lock_cfg: configuration for the locks to be used by this repository.
                 Relevant only if the repository is not an upstream.
+            layout: directory layout of the store, used to reindex the database.
+            lazy: if True, reading the database file only decodes the raw records, and the spec
+                of each record is constructed the first time it is accessed.
+            index_format: format of the database file, either ``"json"`` or ``"binary"``.
+                Databases in binary format are always read lazily.
+            journal_size: if positive, write transactions append the records they changed to a
+                journal next to the database file, instead of rewriting it. Once the journal has
+                this many entries, it's compacted into a new database file. Only supported with
+                the JSON format.
         """
+        if index_format not in INDEX_FILES:
+            raise ValueError(f"invalid database format: {index_format}")
+
         self.root = root
+        self.lazy = lazy
+        self.index_format = index_format
+        self.journal_size = journal_size
         self.database_directory = pathlib.Path(self.root) / _DB_DIRNAME
         self.layout = layout
 
         # Set up layout of database files within the db dir
-        self._index_path = self.database_directory / INDEX_JSON_FILE
+        self._index_path = self.database_directory / INDEX_FILES[index_format]
+        # Database file in the format that is not used by this instance, if any
+        self._other_index_paths = [
+            self.database_directory / filename
+            for fmt, filename in INDEX_FILES.items()
+            if fmt != index_format
+        ]
+        self._journal_path = self.database_directory / _JOURNAL_FILE
         self._verifier_path = self.database_directory / _INDEX_VERIFIER_FILE
         self._lock_path = self.database_directory / _LOCK_FILE
 
         self.is_upstream = is_upstream
         self.last_seen_verifier = ""
+        # Identifier of the database file that was last read or written, which journal entries
+        # refer to, and number of entries in the journal. None if there's no journal to append to.
+        self._snapshot_id: Optional[str] = None
+        self._journal_entries = 0
         # Failed write transactions (interrupted by exceptions) will alert
         # _write. When that happens, we set this flag to indicate that
         # future read/write transactions should re-read the DB. Normally it
@@ -619,7 +1046,7 @@ def __init__(
                 desc="database",
                 enable=lock_cfg.enable,
             )
-        self._data: Dict[str, InstallRecord] = {}
+        self._data = IndexedInstallRecords()
 
         # For every installed spec we keep track of its install prefix, so that
         # we can answer the simple query whether a given path is already taken
@@ -664,9 +1091,7 @@ def _write_to_file(self, stream):
         self._ensure_parent_directories()
 
         # map from per-spec hash code to installation record.
-        installs = dict(
-            (k, v.to_dict(include_fields=self.record_fields)) for k, v in self._data.items()
-        )
+        installs = self._installs_to_dict()
 
         # database includes installation list and version.
 
@@ -684,11 +1109,34 @@ def _write_to_file(self, stream):
             }
         }
 
+        self._snapshot_id = None
+        self._journal_entries = 0
+        if self.journal_size > 0:
+            # entries of the journal apply only to the database file with the same identifier
+            if _use_uuid:
+                self._snapshot_id = str(uuid.uuid4())
+            else:
+                self._snapshot_id = f"{_gethostname()}.{os.getpid()}.{_now()}"
+            database["database"]["snapshot"] = self._snapshot_id
+
         try:
             sjson.dump(database, stream)
         except (TypeError, ValueError) as e:
             raise sjson.SpackJSONError("error writing JSON database:", str(e))
 
+    def _installs_to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return dict(
+            (k, v.to_dict(include_fields=self.record_fields)) for k, v in self._data.items()
+        )
+
+    def _write_binary_to_file(self, stream):
+        """Write out the database in binary format to the stream passed as argument.
+
+        This function does not do any locking or transactions.
+        """
+        self._ensure_parent_directories()
+        spack.database_binary.dump(stream, str(_DB_VERSION), self._installs_to_dict())
+
     def _read_spec_from_dict(self, spec_reader, hash_key, installs, hash=ht.dag_hash):
         """Recursively construct a spec from a hash in a YAML database.
 
@@ -796,6 +1244,10 @@ def _read_from_file(self, filename: pathlib.Path, *, reindex: bool = False) -> N
 
         Does not do any locking.
         """
+        if filename.name == INDEX_BINARY_FILE:
+            self._read_binary_from_file(filename, reindex=reindex)
+            return
+
         try:
             # In the future we may use a stream of JSON objects, hence `raw_decode` for compat.
             fdata, _ = JSONDecoder().raw_decode(filename.read_text(encoding="utf-8"))
@@ -825,14 +1277,16 @@ def check(cond, msg):
         else:
             installs = self._handle_current_version_read(check, db)
 
+        self._snapshot_id = db.get("snapshot")
+        self._journal_entries = 0
+        if self._snapshot_id is not None and self.db_version == _DB_VERSION:
+            self._replay_journal(installs)
+
         spec_reader = reader(self.db_version)
 
-        def invalid_record(hash_key, error):
-            return CorruptDatabaseError(
-                f"Invalid record in Spack database: hash: {hash_key}, cause: "
-                f"{type(error).__name__}: {error}",
-                str(self._index_path),
-            )
+        if self.lazy:
+            self._read_lazily(spec_reader, installs)
+            return
 
         # Build up the database in three passes:
         #
@@ -844,7 +1298,7 @@ def invalid_record(hash_key, error):
         # (i.e., its specs are a true Merkle DAG, unlike most specs.)
 
         # Pass 1: Iterate through database and build specs w/o dependencies
-        data: Dict[str, InstallRecord] = {}
+        data = IndexedInstallRecords()
         installed_prefixes: Set[str] = set()
         for hash_key, rec in installs.items():
             try:
@@ -860,7 +1314,7 @@ def invalid_record(hash_key, error):
                 if not spec.external and "installed" in rec and rec["installed"]:
                     installed_prefixes.add(rec["path"])
             except Exception as e:
-                raise invalid_record(hash_key, e) from e
+                raise self._invalid_record(hash_key, e) from e
 
         # Pass 2: Assign dependencies once all specs are created.
         for hash_key in data:
@@ -869,7 +1323,7 @@ def invalid_record(hash_key, error):
             except MissingDependenciesError:
                 raise
             except Exception as e:
-                raise invalid_record(hash_key, e) from e
+                raise self._invalid_record(hash_key, e) from e
 
         # Pass 3: Mark all specs concrete.  Specs representing real
         # installations must be explicitly marked.
@@ -882,6 +1336,123 @@ def invalid_record(hash_key, error):
         self._data = data
         self._installed_prefixes = installed_prefixes
 
+    def _read_binary_from_file(self, filename: pathlib.Path, *, reindex: bool = False) -> None:
+        """Fill database from a file in binary format. The file is memory-mapped, and specs are
+        constructed lazily.
+
+        Does not do any locking.
+        """
+        try:
+            index = spack.database_binary.load(filename)
+        except Exception as e:
+            raise CorruptDatabaseError(f"error reading database at {filename}:", str(e)) from e
+
+        self._read_binary_index(index, reindex=reindex)
+
+    def _read_binary_index(
+        self, index: "spack.database_binary.BinaryIndex", *, reindex: bool = False
+    ) -> None:
+        """Fill database from the records of a binary database file, constructing specs lazily.
+
+        Does not do any locking.
+        """
+        try:
+            self.db_version = vn.StandardVersion.from_string(index.db_version)
+        except Exception as e:
+            raise CorruptDatabaseError(
+                "invalid version in binary database:", str(self._index_path)
+            ) from e
+
+        if self.db_version > _DB_VERSION:
+            raise InvalidDatabaseVersionError(self, _DB_VERSION, self.db_version)
+        elif self.db_version < _DB_VERSION and not reindex and not self.is_upstream:
+            self.raise_explicit_database_upgrade_error()
+
+        self._snapshot_id = None
+        self._journal_entries = 0
+        # Only the DAG hashes are decoded here, the fields of each record on first access
+        data = IndexedInstallRecords()
+        lazy_reader = LazySpecReader(self, reader(self.db_version), index, data)
+        for hash_key, position in index.hashes.items():
+            data.add_unindexed(
+                hash_key, BinaryInstallRecord(lazy_reader, hash_key, index, position)
+            )
+
+        self._data = data
+        self._installed_prefixes = index.installed_prefixes()
+
+    def _replay_journal(self, installs: Dict[str, Any]) -> None:
+        """Apply the journal entries that refer to the database file that was just read to its
+        raw install records. Entries that can't be decoded, e.g. because the process writing them
+        was killed, are skipped.
+
+        Does not do any locking.
+        """
+        try:
+            lines = self._journal_path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return
+
+        decoder = JSONDecoder()
+        for line in lines:
+            if not line:
+                continue
+            try:
+                entry = decoder.decode(line)
+            except ValueError:
+                tty.debug(f"skipping invalid entry in {self._journal_path}")
+                continue
+            if entry.get("snapshot") != self._snapshot_id:
+                continue
+            for hash_key in entry.get("removed", ()):
+                installs.pop(hash_key, None)
+            installs.update(entry.get("installs", {}))
+            self._journal_entries += 1
+
+    def _read_lazily(
+        self, spec_reader: Type["spack.spec.SpecfileReaderBase"], installs: Dict[str, Any]
+    ) -> None:
+        """Fill database from the raw install records, deferring the construction of specs to
+        the first access of each record.
+
+        Does not do any locking.
+        """
+        data = IndexedInstallRecords()
+        installed_prefixes: Set[str] = set()
+        lazy_reader = LazySpecReader(self, spec_reader, installs, data)
+        for hash_key, rec in installs.items():
+            try:
+                fields = InstallRecord.fields_from_dict(rec)
+                data[hash_key] = LazyInstallRecord(lazy_reader, hash_key, **fields)
+
+                if fields["installed"] and not _is_external_node(spec_reader, rec["spec"]):
+                    installed_prefixes.add(fields["path"])
+            except Exception as e:
+                raise self._invalid_record(hash_key, e) from e
+
+        self._data = data
+        self._installed_prefixes = installed_prefixes
+
+    def _invalid_record(self, hash_key: str, error: Exception) -> "CorruptDatabaseError":
+        return CorruptDatabaseError(
+            f"Invalid record in Spack database: hash: {hash_key}, cause: "
+            f"{type(error).__name__}: {error}",
+            str(self._index_path),
+        )
+
+    def materialize(self) -> None:
+        """Construct the specs of all the records read lazily from the database file.
+
+        Specs constructed lazily are linked only to dependents whose spec has been constructed
+        too. Call this before traversing specs from the database towards their dependents.
+        """
+        with self.read_transaction():
+            self._materialize()
+
+    def _materialize(self) -> None:
+        for record in self._data.values():
+            record.spec
+
     def _handle_current_version_read(self, check, db):
         check("installs" in db, "no 'installs' in JSON DB.")
         installs = db["installs"]
@@ -926,6 +1497,21 @@ def raise_explicit_database_upgrade_error(self):
             ),
         )
 
+    def raise_explicit_format_conversion_error(self, existing_index: pathlib.Path):
+        """Raises an ExplicitDatabaseUpgradeError, when the database file is in a format
+        different from the one that is configured"""
+        raise ExplicitDatabaseUpgradeError(
+            f"database at {existing_index} is not in {self.index_format} format",
+            long_message=(
+                f"To convert the database at {self.root} to the {self.index_format} format, "
+                f"run:"
+                f"\n"
+                f"\n    spack reindex"
+                f"\n"
+                f"\nor change config:db_format to use the current format."
+            ),
+        )
+
     def reindex(self):
         """Build database index from scratch based on a directory layout.
 
@@ -940,15 +1526,18 @@ def reindex(self):
         # ignore errors if we need to rebuild a corrupt database.
         def _read_suppress_error():
             try:
-                if self._index_path.is_file():
-                    self._read_from_file(self._index_path, reindex=True)
+                existing_index = self._existing_index_path()
+                if existing_index is not None:
+                    self._read_from_file(existing_index, reindex=True)
             except (CorruptDatabaseError, DatabaseNotReadableError):
-                self._data = {}
+                self._data = IndexedInstallRecords()
                 self._installed_prefixes = set()
 
         with lk.WriteTransaction(self.lock, acquire=_read_suppress_error, release=self._write):
+            # The reindexed database is always written to a new file, not to the journal
+            self._snapshot_id = None
             old_installed_prefixes, self._installed_prefixes = self._installed_prefixes, set()
-            old_data, self._data = self._data, {}
+            old_data, self._data = self._data, IndexedInstallRecords()
             try:
                 self._reindex(old_data)
             except BaseException:
@@ -957,6 +1546,11 @@ def _read_suppress_error():
                 self._installed_prefixes = old_installed_prefixes
                 raise
 
+        # Database files in other formats are now stale
+        for path in self._other_index_paths:
+            if path.is_file():
+                path.unlink()
+
     def _reindex(self, old_data: Dict[str, InstallRecord]):
         # Specs on the file system are the source of truth for record.spec. The old database values
         # if available are the source of truth for the rest of the record.
@@ -1051,6 +1645,8 @@ def create_edge(edge: spack.spec.DependencySpec, is_upstream: bool):
             if record.deprecated_for:
                 self._data[record.deprecated_for].ref_count += 1
 
+        # Records have been mutated in place, so the indexes need to be rebuilt
+        self._data = IndexedInstallRecords(self._data)
         self._check_ref_counts()
 
     def _check_ref_counts(self):
@@ -1103,28 +1699,99 @@ def _write(self, type=None, value=None, traceback=None):
             self._state_is_inconsistent = True
             return
 
+        if self._can_append_to_journal():
+            if self._data.changed:
+                self._append_to_journal()
+                self._write_verifier()
+                self._data.changed.clear()
+            return
+
         temp_file = str(self._index_path) + (".%s.%s.temp" % (_gethostname(), os.getpid()))
 
         # Write a temporary database file them move it into place
         try:
-            with open(temp_file, "w", encoding="utf-8") as f:
-                self._write_to_file(f)
+            if self.index_format == "binary":
+                with open(temp_file, "wb") as f:
+                    self._write_binary_to_file(f)
+            else:
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    self._write_to_file(f)
             fs.rename(temp_file, str(self._index_path))
 
-            if _use_uuid:
-                with self._verifier_path.open("w", encoding="utf-8") as f:
-                    new_verifier = str(uuid.uuid4())
-                    f.write(new_verifier)
-                    self.last_seen_verifier = new_verifier
+            # Entries in the journal refer to the previous database file
+            if self._journal_path.exists():
+                self._journal_path.unlink()
+
+            self._write_verifier()
+            self._data.changed.clear()
         except BaseException as e:
             tty.debug(e)
+            self._snapshot_id = None
             # Clean up temp file if something goes wrong.
             if os.path.exists(temp_file):
                 os.remove(temp_file)
             raise
 
+    def _write_verifier(self) -> None:
+        if _use_uuid:
+            with self._verifier_path.open("w", encoding="utf-8") as f:
+                new_verifier = str(uuid.uuid4())
+                f.write(new_verifier)
+                self.last_seen_verifier = new_verifier
+
+    def _can_append_to_journal(self) -> bool:
+        """Whether a write transaction can append its changes to the journal, instead of writing
+        a new database file"""
+        return (
+            self.journal_size > 0
+            and self.index_format == "json"
+            and self._snapshot_id is not None
+            and self._journal_entries < self.journal_size
+            and self._index_path.is_file()
+        )
+
+    def _append_to_journal(self) -> None:
+        """Append the records changed since the database was last read or written to the
+        journal, as a single entry.
+
+        This function does not do any locking or transactions.
+        """
+        installs, removed = {}, []
+        for key in sorted(self._data.changed):
+            if key in self._data:
+                installs[key] = self._data[key].to_dict(include_fields=self.record_fields)
+            else:
+                removed.append(key)
+        entry = {"snapshot": self._snapshot_id, "installs": installs, "removed": removed}
+
+        try:
+            # Entries start on a new line, so that an entry truncated by a killed process
+            # doesn't corrupt the following ones
+            with self._journal_path.open("a", encoding="utf-8") as f:
+                f.write(f"\n{sjson.dump(entry)}")
+        except BaseException:
+            # The journal may now end with a partial entry: write a new database file next time
+            self._snapshot_id = None
+            raise
+        self._journal_entries += 1
+
+    def _existing_index_path(self) -> Optional[pathlib.Path]:
+        """Path of the database file to read, which may be in a format different from the one
+        this instance writes, or None if there's no database file."""
+        for path in (self._index_path, *self._other_index_paths):
+            if path.is_file():
+                return path
+        return None
+
     def _read(self):
         """Re-read Database from the data in the set location. This does no locking."""
+        existing_index = self._existing_index_path()
+        if existing_index is not None and existing_index != self._index_path:
+            # Upstreams are never written, so any format is fine
+            if not self.is_upstream:
+                self.raise_explicit_format_conversion_error(existing_index)
+            self._index_path = existing_index
+
         if self._index_path.is_file():
             current_verifier = ""
             if _use_uuid:
@@ -1137,8 +1804,10 @@ def _read(self):
                 self.last_seen_verifier = current_verifier
                 # Read from file if a database exists
                 self._read_from_file(self._index_path)
+                self._data.changed.clear()
             elif self._state_is_inconsistent:
                 self._read_from_file(self._index_path)
+                self._data.changed.clear()
                 self._state_is_inconsistent = False
             return
         elif self.is_upstream:
@@ -1235,6 +1904,7 @@ def _add(
                 new_spec._add_dependency(record.spec, depflag=dep.depflag, virtuals=dep.virtuals)
                 if not upstream:
                     record.ref_count += 1
+                    self._data.refresh(dkey)
 
             # Mark concrete once everything is built, and preserve the original hashes of concrete
             # specs.
@@ -1248,6 +1918,7 @@ def _add(
             self._data[key].installation_time = _now()
 
         self._data[key].explicit = explicit
+        self._data.refresh(key)
 
     @_autospec
     def add(self, spec: "spack.spec.Spec", *, explicit: bool = False, allow_missing=False) -> None:
@@ -1288,6 +1959,7 @@ def _decrement_ref_count(self, spec: "spack.spec.Spec") -> None:
 
         rec = self._data[key]
         rec.ref_count -= 1
+        self._data.refresh(key)
 
         if rec.ref_count == 0 and not rec.installed:
             del self._data[key]
@@ -1303,6 +1975,7 @@ def _increment_ref_count(self, spec: "spack.spec.Spec") -> None:
 
         rec = self._data[key]
         rec.ref_count += 1
+        self._data.refresh(key)
 
     def _remove(self, spec: "spack.spec.Spec") -> "spack.spec.Spec":
         """Non-locking version of remove(); does real work."""
@@ -1316,6 +1989,7 @@ def _remove(self, spec: "spack.spec.Spec") -> "spack.spec.Spec":
 
         if rec.ref_count > 0:
             rec.installed = False
+            self._data.refresh(key)
             return rec.spec
 
         del self._data[key]
@@ -1383,7 +2057,7 @@ def _deprecate(self, spec: "spack.spec.Spec", deprecator: "spack.spec.Spec") ->
 
         spec_rec.deprecated_for = deprecator_key
         spec_rec.installed = False
-        self._data[spec_key] = spec_rec
+        self._data.refresh(spec_key)
 
     @_autospec
     def mark(self, spec: "spack.spec.Spec", key: str, value: Any) -> None:
@@ -1392,8 +2066,9 @@ def mark(self, spec: "spack.spec.Spec", key: str, value: Any) -> None:
             return self._mark(spec, key, value)
 
     def _mark(self, spec: "spack.spec.Spec", key, value) -> None:
-        record = self._data[self._get_matching_spec_key(spec)]
-        setattr(record, key, value)
+        spec_key = self._get_matching_spec_key(spec)
+        setattr(self._data[spec_key], key, value)
+        self._data.refresh(spec_key)
 
     @_autospec
     def deprecate(self, spec: "spack.spec.Spec", deprecator: "spack.spec.Spec") -> None:
@@ -1413,6 +2088,9 @@ def installed_relatives(
         if direction not in ("parents", "children"):
             raise ValueError("Invalid direction: %s" % direction)
 
+        if direction == "parents":
+            self.materialize()
+
         relatives: Set[spack.spec.Spec] = set()
         for spec in self.query(spec):
             if transitive:
@@ -1539,26 +2217,126 @@ def _query(
     ) -> List["spack.spec.Spec"]:
         installed = normalize_query(installed)
 
-        # Restrict the set of records over which we iterate first
-        matching_hashes = self._data
-        if hashes is not None:
-            matching_hashes = {h: self._data[h] for h in hashes if h in self._data}
-
         if isinstance(query_spec, str):
             query_spec = spack.spec.Spec(query_spec)
 
+        # Restrict the set of records over which we iterate first, using the most selective of
+        # the secondary indexes that apply to this query
+        restricted: Optional[Dict[str, None]] = None
+        if hashes is not None:
+            restricted = dict.fromkeys(h for h in hashes if h in self._data)
+
+        candidates: Iterable[str]
         if query_spec is not None and query_spec.concrete:
             hash_key = query_spec.dag_hash()
-            if hash_key not in matching_hashes:
-                return []
-            matching_hashes = {hash_key: matching_hashes[hash_key]}
+            in_scope = hash_key in self._data if restricted is None else hash_key in restricted
+            candidates = [hash_key] if in_scope else []
+        elif restricted is not None:
+            candidates = restricted
+        else:
+            candidates = self._narrow_candidates(
+                query_spec, installed, explicit, start_date, end_date
+            )
 
+        results = self._select(
+            candidates,
+            query_spec,
+            predicate_fn=predicate_fn,
+            installed=installed,
+            explicit=explicit,
+            start_date=start_date,
+            end_date=end_date,
+            in_buildcache=in_buildcache,
+            origin=origin,
+        )
+
+        # Checking for virtuals is expensive, so we save it for last and only if needed.
+        # If we get here, we didn't find anything in the DB that matched by name.
+        # If we did find something, the query spec can't be virtual b/c we matched an actual
+        # package installation, so skip the virtual check entirely. If we *didn't* find anything,
+        # check the installations of providers *if* the query is virtual.
+        if (
+            not results
+            and query_spec is not None
+            and query_spec.name
+            and not query_spec.concrete
+            and len(self._data) > len(self._data.with_name(query_spec.name))
+            and spack.repo.PATH.is_virtual(query_spec.name)
+        ):
+            provider_names = {
+                p.name for p in spack.repo.PATH.provider_index.providers_for(query_spec.name)
+            }
+            provider_candidates = [
+                h
+                for name in sorted(provider_names)
+                for h in self._data.with_name(name)
+                if restricted is None or h in restricted
+            ]
+            results = self._select(
+                provider_candidates,
+                query_spec,
+                predicate_fn=predicate_fn,
+                installed=installed,
+                explicit=explicit,
+                start_date=start_date,
+                end_date=end_date,
+                in_buildcache=in_buildcache,
+                origin=origin,
+                match_name=False,
+            )
+
+        return results
+
+    def _narrow_candidates(
+        self,
+        query_spec: Optional["spack.spec.Spec"],
+        installed: InstallRecordStatus,
+        explicit: Optional[bool],
+        start_date: Optional[datetime.datetime],
+        end_date: Optional[datetime.datetime],
+    ) -> Iterable[str]:
+        """Returns the hashes of records that might match a query, using secondary indexes.
+
+        The result is a superset of the matching records: all the filters still need to be
+        applied to each candidate.
+        """
+        if query_spec is not None and query_spec.name:
+            return self._data.with_name_and_versions(query_spec.name, query_spec.versions)
+
+        narrowed: List[Iterable[str]] = []
+        if explicit is not None:
+            narrowed.append(self._data.with_explicit(explicit))
+        if installed != InstallRecordStatus.ANY:
+            narrowed.append(self._data.with_status(installed))
+        start, end = _timestamp(start_date), _timestamp(end_date)
+        if start is not None or end is not None:
+            narrowed.append(self._data.installed_between(start, end))
+        if not narrowed:
+            return list(self._data)
+        return min(narrowed, key=len)  # type: ignore[arg-type]
+
+    def _select(
+        self,
+        candidates: Iterable[str],
+        query_spec: Optional["spack.spec.Spec"],
+        *,
+        predicate_fn: Optional[SelectType],
+        installed: InstallRecordStatus,
+        explicit: Optional[bool],
+        start_date: Optional[datetime.datetime],
+        end_date: Optional[datetime.datetime],
+        in_buildcache: Optional[bool],
+        origin: Optional[str],
+        match_name: bool = True,
+    ) -> List["spack.spec.Spec"]:
+        """Filters the candidate records and returns the specs that match the query"""
         results = []
         start_date = start_date or datetime.datetime.min
         end_date = end_date or datetime.datetime.max
+        check_dates = start_date != datetime.datetime.min or end_date != datetime.datetime.max
 
-        deferred = []
-        for rec in matching_hashes.values():
+        for hash_key in candidates:
+            rec = self._data[hash_key]
             if origin and not (origin == rec.origin):
                 continue
 
@@ -1574,7 +2352,7 @@ def _query(
             if predicate_fn is not None and not predicate_fn(rec):
                 continue
 
-            if start_date or end_date:
+            if check_dates:
                 inst_date = datetime.datetime.fromtimestamp(rec.installation_time)
                 if not (start_date < inst_date < end_date):
                     continue
@@ -1583,27 +2361,11 @@ def _query(
                 results.append(rec.spec)
                 continue
 
-            # check anon specs and exact name matches first
-            if not query_spec.name or rec.spec.name == query_spec.name:
-                if rec.spec.satisfies(query_spec):
-                    results.append(rec.spec)
-
-            # save potential virtual matches for later, but not if we already found a match
-            elif not results:
-                deferred.append(rec.spec)
+            if match_name and query_spec.name and rec.spec.name != query_spec.name:
+                continue
 
-        # Checking for virtuals is expensive, so we save it for last and only if needed.
-        # If we get here, we didn't find anything in the DB that matched by name.
-        # If we did fine something, the query spec can't be virtual b/c we matched an actual
-        # package installation, so skip the virtual check entirely. If we *didn't* find anything,
-        # check all the deferred specs *if* the query is virtual.
-        if (
-            not results
-            and query_spec is not None
-            and deferred
-            and spack.repo.PATH.is_virtual(query_spec.name)
-        ):
-            results = [spec for spec in deferred if spec.satisfies(query_spec)]
+            if rec.spec.satisfies(query_spec):
+                results.append(rec.spec)
 
         return results
 
@@ -0,0 +1,371 @@
+# Copyright Spack Project Developers. See COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Compact binary format for the index of the installation database.
+
+The format is meant to be memory-mapped: reading it doesn't decode the spec of each record,
+which is stored as a blob, and repeated strings (names, versions, hashes, paths) are stored
+only once. All integers are little-endian. The file is laid out as follows::
+
+    header | string offsets | string data | records | edges | node blobs
+
+- The string table is an array of ``n_strings + 1`` offsets into the string data. String ``i``
+  is the UTF-8 data between offsets ``i`` and ``i + 1``.
+- Each record has a fixed width, and refers to strings by index. Its dependency edges are the
+  ``n_edges`` entries of the edge table starting at ``first_edge``.
+- Each edge refers to the record of the child by its index in the record table. Children that
+  are not in this database (i.e. they are in an upstream) are referred to by the index of their
+  hash in the string table, and have the ``_EDGE_UPSTREAM`` flag set.
+- Node blobs are the JSON node dictionaries of the specs, without the fields that are stored in
+  the record itself (name, version, hash and dependencies).
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import IO, Any, Dict, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+import spack.deptypes as dt
+import spack.hash_types as ht
+
+#: Magic number at the start of binary database files
+MAGIC = b"SPACKDB\x00"
+
+#: Version of the binary layout. This is independent of the database version, which is stored
+#: in the header, and refers to the content of the records.
+FORMAT_VERSION = 1
+
+#: Index used for missing strings
+NO_STRING = 0xFFFFFFFF
+
+# magic, format version, db version, n_strings, n_records, n_edges,
+# offsets of: string offsets, string data, records, edges, node blobs
+_HEADER = struct.Struct("<8sIIIII5Q")
+
+# hash, name, version, path, deprecated_for, origin, flags, ref_count, installation_time,
+# node blob offset, node blob size, first edge, number of edges
+_RECORD = struct.Struct("<6IB3xIdQ3I")
+
+# child, name, virtuals, depflag, flags
+_EDGE = struct.Struct("<3IBB2x")
+
+_STRING_OFFSET = struct.Struct("<Q")
+
+# Flags of records
+_INSTALLED = 1
+_EXPLICIT = 2
+_IN_BUILDCACHE = 4
+_EXTERNAL = 8
+
+# Flags of edges
+_EDGE_DIRECT = 1
+_EDGE_UPSTREAM = 2
+
+#: Fields of the node dictionary that are stored in the record, not in the node blob
+_RECORD_NODE_FIELDS = ("name", "version", ht.dag_hash.name, "dependencies")
+
+
+class BinaryDatabaseError(ValueError):
+    """Raised when a binary database file can't be read"""
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self.indices: Dict[str, int] = {}
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        index = self.indices.get(value)
+        if index is None:
+            index = self.indices[value] = len(self.indices)
+        return index
+
+
+def dump(stream: IO[bytes], db_version: str, installs: Dict[str, Dict[str, Any]]) -> None:
+    """Write install records to a stream in binary format.
+
+    Args:
+        stream: binary stream to write to
+        db_version: version of the database
+        installs: install records, as in the ``installs`` attribute of JSON database files. The
+            specs of the records must use the latest specfile format.
+    """
+    strings = _StringTable()
+    index_of = {hash_key: i for i, hash_key in enumerate(installs)}
+    records: List[bytes] = []
+    edges: List[bytes] = []
+    blobs: List[bytes] = []
+    blob_offset = 0
+
+    for hash_key, rec in installs.items():
+        node = rec["spec"]
+        first_edge = len(edges)
+        for dep in node.get("dependencies", ()):
+            params = dep["parameters"]
+            dep_hash = dep[ht.dag_hash.name]
+            flags = _EDGE_DIRECT if params.get("direct") else 0
+            if dep_hash in index_of:
+                child = index_of[dep_hash]
+            else:
+                child = strings.add(dep_hash)
+                flags |= _EDGE_UPSTREAM
+            virtuals = strings.add(",".join(params["virtuals"]) if params["virtuals"] else None)
+            edges.append(
+                _EDGE.pack(
+                    child,
+                    strings.add(dep["name"]),
+                    virtuals,
+                    dt.canonicalize(params["deptypes"]),
+                    flags,
+                )
+            )
+
+        blob = json.dumps(
+            {k: v for k, v in node.items() if k not in _RECORD_NODE_FIELDS},
+            separators=(",", ":"),
+        ).encode("utf-8")
+        blobs.append(blob)
+
+        flags = 0
+        if rec.get("installed"):
+            flags |= _INSTALLED
+        if rec.get("explicit"):
+            flags |= _EXPLICIT
+        if rec.get("in_buildcache"):
+            flags |= _IN_BUILDCACHE
+        external = node.get("external")
+        if external and (external.get("path") or external.get("module")):
+            flags |= _EXTERNAL
+
+        path = rec.get("path")
+        records.append(
+            _RECORD.pack(
+                strings.add(hash_key),
+                strings.add(node["name"]),
+                strings.add(node.get("version")),
+                strings.add(None if path is None else str(path)),
+                strings.add(rec.get("deprecated_for")),
+                strings.add(rec.get("origin")),
+                flags,
+                rec.get("ref_count", 0),
+                rec.get("installation_time") or 0.0,
+                blob_offset,
+                len(blob),
+                first_edge,
+                len(edges) - first_edge,
+            )
+        )
+        blob_offset += len(blob)
+
+    version_index = strings.add(db_version)
+    string_data = [value.encode("utf-8") for value in strings.indices]
+    string_offsets = [0]
+    for data in string_data:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    offsets_start = _HEADER.size
+    data_start = offsets_start + _STRING_OFFSET.size * len(string_offsets)
+    records_start = data_start + string_offsets[-1]
+    edges_start = records_start + _RECORD.size * len(records)
+    blobs_start = edges_start + _EDGE.size * len(edges)
+
+    stream.write(
+        _HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            version_index,
+            len(string_data),
+            len(records),
+            len(edges),
+            offsets_start,
+            data_start,
+            records_start,
+            edges_start,
+            blobs_start,
+        )
+    )
+    stream.write(b"".join(_STRING_OFFSET.pack(offset) for offset in string_offsets))
+    stream.write(b"".join(string_data))
+    stream.write(b"".join(records))
+    stream.write(b"".join(edges))
+    stream.write(b"".join(blobs))
+
+
+class BinaryIndex(Mapping[str, Dict[str, Any]]):
+    """Read-only view of a binary database file.
+
+    Fields of records are decoded from the buffer only when requested. As a mapping, it maps the
+    DAG hash of each record to a raw install record with a ``"spec"`` node dictionary, which is
+    decoded on first access.
+
+    Args:
+        buffer: content of the file, typically a memory map
+    """
+
+    def __init__(self, buffer: Union[bytes, memoryview, Any]) -> None:
+        self.buffer = buffer
+        if len(buffer) < _HEADER.size:
+            raise BinaryDatabaseError("file is too short for a binary database")
+
+        header = _HEADER.unpack_from(buffer, 0)
+        magic, format_version, version_index, *counts = header[:6]
+        if magic != MAGIC:
+            raise BinaryDatabaseError("not a binary database file")
+        if format_version != FORMAT_VERSION:
+            raise BinaryDatabaseError(
+                f"unsupported binary database format v{format_version}, "
+                f"expected v{FORMAT_VERSION}"
+            )
+        self.n_strings, self.n_records, self.n_edges = counts
+        (
+            self._offsets_start,
+            self._data_start,
+            self._records_start,
+            self._edges_start,
+            self._blobs_start,
+        ) = header[6:]
+
+        if len(buffer) < self._blobs_start or (
+            self.n_records
+            and len(buffer) < self._blobs_start + sum(self._record(self.n_records - 1)[9:11])
+        ):
+            raise BinaryDatabaseError("binary database file is truncated")
+
+        self.db_version = self.string(version_index)
+        self._hashes: Optional[Dict[str, int]] = None
+        self._nodes: Dict[int, Dict[str, Any]] = {}
+
+    def string(self, index: int) -> Optional[str]:
+        """Return the string with the given index in the string table"""
+        if index == NO_STRING:
+            return None
+        start, end = struct.unpack_from(
+            "<2Q", self.buffer, self._offsets_start + index * _STRING_OFFSET.size
+        )
+        return bytes(self.buffer[self._data_start + start : self._data_start + end]).decode(
+            "utf-8"
+        )
+
+    def _record(self, index: int) -> Tuple:
+        return _RECORD.unpack_from(self.buffer, self._records_start + index * _RECORD.size)
+
+    @property
+    def hashes(self) -> Dict[str, int]:
+        """Index of each record in the record table, by DAG hash"""
+        if self._hashes is None:
+            self._hashes = {
+                self.string(self._record(i)[0]): i for i in range(self.n_records)  # type: ignore
+            }
+        return self._hashes
+
+    def fields(self, index: int) -> Dict[str, Any]:
+        """Install record fields (except the spec) of the record with the given index"""
+        _, _, _, path, deprecated_for, origin, flags, ref_count, installation_time, *_ = (
+            self._record(index)
+        )
+        return {
+            "path": self.string(path),
+            "installed": bool(flags & _INSTALLED),
+            "ref_count": ref_count,
+            "explicit": bool(flags & _EXPLICIT),
+            "installation_time": installation_time,
+            "deprecated_for": self.string(deprecated_for),
+            "in_buildcache": bool(flags & _IN_BUILDCACHE),
+            "origin": self.string(origin),
+        }
+
+    def is_external(self, index: int) -> bool:
+        """Whether the spec of the record with the given index is external"""
+        return bool(self._record(index)[6] & _EXTERNAL)
+
+    def in_buildcache(self, index: int) -> bool:
+        """Whether the record with the given index is in a buildcache"""
+        return bool(self._record(index)[6] & _IN_BUILDCACHE)
+
+    def installed_prefixes(self) -> Set[str]:
+        """Install prefixes of the installed specs that are not external. Only the paths of those
+        records are decoded."""
+        prefixes = set()
+        for i in range(self.n_records):
+            _, _, _, path, _, _, flags, *_ = self._record(i)
+            if flags & _INSTALLED and not flags & _EXTERNAL:
+                prefixes.add(self.string(path))
+        return prefixes  # type: ignore
+
+    def name_and_version(self, hash_key: str) -> Tuple[str, Optional[str]]:
+        """Name and version of the spec of a record, without decoding its node"""
+        _, name, version, *_ = self._record(self.hashes[hash_key])
+        return self.string(name), self.string(version)  # type: ignore
+
+    def node(self, index: int) -> Dict[str, Any]:
+        """Node dictionary of the record with the given index, in the latest specfile format"""
+        node = self._nodes.get(index)
+        if node is not None:
+            return node
+
+        hash_index, name, version, *_, blob_offset, blob_size, first_edge, n_edges = self._record(
+            index
+        )
+        start = self._blobs_start + blob_offset
+        node = {"name": self.string(name)}
+        if version != NO_STRING:
+            node["version"] = self.string(version)
+        node.update(json.loads(bytes(self.buffer[start : start + blob_size])))
+        node[ht.dag_hash.name] = self.string(hash_index)
+
+        dependencies = []
+        for e in range(first_edge, first_edge + n_edges):
+            child, dep_name, virtuals, depflag, flags = _EDGE.unpack_from(
+                self.buffer, self._edges_start + e * _EDGE.size
+            )
+            if flags & _EDGE_UPSTREAM:
+                dep_hash = self.string(child)
+            else:
+                dep_hash = self.string(self._record(child)[0])
+            parameters: Dict[str, Any] = {
+                "deptypes": dt.flag_to_tuple(depflag),
+                "virtuals": (),
+            }
+            if virtuals != NO_STRING:
+                parameters["virtuals"] = tuple(self.string(virtuals).split(","))  # type: ignore
+            if flags & _EDGE_DIRECT:
+                parameters["direct"] = True
+            dependencies.append(
+                {
+                    "name": self.string(dep_name),
+                    ht.dag_hash.name: dep_hash,
+                    "parameters": parameters,
+                }
+            )
+        if dependencies:
+            node["dependencies"] = dependencies
+
+        self._nodes[index] = node
+        return node
+
+    def __getitem__(self, hash_key: str) -> Dict[str, Any]:
+        return {"spec": self.node(self.hashes[hash_key])}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.hashes)
+
+    def __len__(self) -> int:
+        return self.n_records
+
+
+def load(path: Union[str, os.PathLike]) -> BinaryIndex:
+    """Return a view of the binary database file at the given path, which is mapped in memory.
+
+    Raises:
+        OSError: if the file can't be read
+        BinaryDatabaseError: if the file is not a valid binary database
+    """
+    with open(path, "rb") as f:
+        if sys.platform == "win32" or os.fstat(f.fileno()).st_size == 0:
+            # Windows can't replace files that are mapped in memory
+            buffer: Any = f.read()
+        else:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return BinaryIndex(buffer)
@@ -681,6 +681,7 @@ def __init__(
         exclude=[],
         link=default_view_link,
         link_type="symlink",
+        incremental=False,
     ):
         self.base = base_path
         self.raw_root = root
@@ -690,6 +691,7 @@ def __init__(
         self.exclude = exclude
         self.link_type = fsv.canonicalize_link_type(link_type)
         self.link = link
+        self.incremental = incremental
 
     def select_fn(self, spec):
         return any(spec.satisfies(s) for s in self.select)
@@ -710,6 +712,7 @@ def __eq__(self, other):
                 self.exclude == other.exclude,
                 self.link == other.link,
                 self.link_type == other.link_type,
+                self.incremental == other.incremental,
             ]
         )
 
@@ -725,6 +728,8 @@ def to_dict(self):
             ret["link_type"] = self.link_type
         if self.link != default_view_link:
             ret["link"] = self.link
+        if self.incremental:
+            ret["incremental"] = True
         return ret
 
     @staticmethod
@@ -737,6 +742,7 @@ def from_dict(base_path, d):
             d.get("exclude", []),
             d.get("link", default_view_link),
             d.get("link_type", "symlink"),
+            d.get("incremental", False),
         )
 
     @property
@@ -800,6 +806,8 @@ def _view(self, root: str) -> fsv.SimpleFilesystemView:
             ignore_conflicts=True,
             projections=self.projections,
             link_type=self.link_type,
+            incremental=self.incremental,
+            settings={"link": self.link},
         )
 
     def __contains__(self, spec):
@@ -860,6 +868,9 @@ def regenerate(self, concrete_roots: List[Spec]) -> None:
             tty.debug(f"View at {self.root} does not need regeneration.")
             return
 
+        if self.incremental and self._update(specs, old_root, new_root):
+            return
+
         _error_on_nonempty_view_dir(new_root)
 
         # construct view at new_root
@@ -941,6 +952,45 @@ def regenerate(self, concrete_roots: List[Spec]) -> None:
                 msg += str(e)
                 tty.warn(msg)
 
+    def _update(self, specs: List[Spec], old_root: Optional[str], new_root: str) -> bool:
+        """Update the view at old_root in place with only the files of added and removed specs,
+        and move it to new_root. Returns False if the view has to be regenerated from scratch.
+
+        Unlike regeneration, this is not atomic: the view is modified while it is in use."""
+        # Copies are relocated to the view root, which would change when moving it
+        if old_root is None or self.link_type == "copy" or os.path.lexists(new_root):
+            return False
+
+        # Same for files that packages write to the view themselves, also by former regenerations
+        if not all(fsv.links_files_to_view(s.package) for s in specs):
+            return False
+
+        # Like with removal of the old root, only touch views created by the environment
+        try:
+            if not os.path.samefile(os.path.dirname(new_root), os.path.dirname(old_root)):
+                return False
+        except OSError:
+            return False
+
+        try:
+            if not self.view().update_specs(*specs):
+                return False
+        except Exception as e:
+            # The view is in an unknown state, so regenerate it from scratch
+            tty.debug(f"Failed to update view at {self.root} incrementally: {e}")
+            return False
+
+        tty.debug(f"Updated view at {self.root} incrementally")
+
+        # Move the view and swap the symlink to it
+        tmp_symlink_name = os.path.join(os.path.dirname(self.root), "._view_link")
+        if os.path.lexists(tmp_symlink_name):
+            os.unlink(tmp_symlink_name)
+        symlink(new_root, tmp_symlink_name)
+        fs.rename(old_root, new_root)
+        fs.rename(tmp_symlink_name, self.root)
+        return True
+
     def _exclude_duplicate_runtimes(self, nodes):
         all_runtimes = spack.repo.PATH.packages_with_tags("runtime")
         runtimes_by_name = {}
@@ -1524,6 +1574,10 @@ def mutate(
             if modified:
                 modified_specs.append(s)
 
+        # Specs read lazily from the database are linked to their dependents once constructed
+        if modified_specs:
+            spack.store.STORE.db.materialize()
+
         # Identify roots modified and invalidate all dependent hashes
         modified_roots = []
         for parent in traverse.traverse_nodes(modified_specs, direction="parents"):
@@ -1937,6 +1991,10 @@ def _dev_specs_that_need_overwrite(self):
             if _is_dev_spec_and_has_changed(s)
         ]
 
+        # Specs read lazily from the database are linked to their dependents once constructed
+        if changed_dev_specs:
+            spack.store.STORE.db.materialize()
+
         # Collect their hashes, and the hashes of their installed parents.
         # Notice: with order=breadth all changed dev specs are at depth 0,
         # even if they occur as parents of one another.
@@ -10,7 +10,7 @@
 import stat
 import sys
 import tempfile
-from typing import Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from spack.vendor.typing_extensions import Literal
 
@@ -21,6 +21,7 @@
 import spack.schema.projections
 import spack.spec
 import spack.store
+import spack.util.parallel
 import spack.util.spack_json as s_json
 import spack.util.spack_yaml as s_yaml
 from spack.error import SpackError
@@ -41,6 +42,7 @@
     MergeConflictSummary,
     SingleMergeConflictError,
     SourceMergeVisitor,
+    record_source_tree,
 )
 from spack.llnl.util.tty.color import colorize
 
@@ -49,6 +51,16 @@
 
 _projections_path = ".spack/projections.yaml"
 
+#: Where incrementally updated views persist the merge map of their last update
+_merge_map_path = ".spack/merge_map.json"
+
+#: Maximum number of threads that traverse prefixes and link files into a view. These tasks are
+#: bound by filesystem latency rather than CPU, in particular on network filesystems.
+MAX_VIEW_THREADS = 16
+
+#: Number of files linked into a view per task, when files are linked concurrently
+LINK_BATCH_SIZE = 1000
+
 
 LinkCallbackType = Callable[[str, str, "FilesystemView", Optional[spack.spec.Spec]], None]
 
@@ -141,6 +153,17 @@ def function_for_link_type(link_type: LinkType) -> LinkCallbackType:
     assert False, "invalid link type"
 
 
+def links_files_to_view(pkg) -> bool:
+    """Whether a package adds its files to views with the default
+    ``add_files_to_view``, which only links files from its prefix. Overrides may
+    instead write files whose contents depend on the view, e.g. relocated to its root."""
+    import spack.package_base  # break circular import
+
+    return (
+        type(pkg).add_files_to_view is spack.package_base.PackageViewMixin.add_files_to_view
+    )
+
+
 class FilesystemView:
     """
     Governs a filesystem view that is located at certain root-directory.
@@ -678,7 +701,25 @@ def unlink_meta_folder(self, spec):
 
 class SimpleFilesystemView(FilesystemView):
     """A simple and partial implementation of FilesystemView focused on performance and immutable
-    views, where specs cannot be removed after they were added."""
+    views, where specs cannot be removed after they were added.
+
+    When ``incremental`` is set, the view persists its merge map, so that it can later be updated
+    in place with :meth:`update_specs`, which only links and unlinks the files of the specs that
+    were added or removed. The merge map also records the projections and link type of the view,
+    and any ``settings`` of its owner: if they change, the view has to be regenerated."""
+
+    def __init__(
+        self,
+        root: str,
+        layout,
+        *,
+        incremental: bool = False,
+        settings: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ):
+        super().__init__(root, layout, **kwargs)
+        self.incremental = incremental
+        self.settings = {} if settings is None else settings
 
     def _sanity_check_view_projection(self, specs):
         """A very common issue is that we end up with two specs of the same package, that project
@@ -705,20 +746,10 @@ def add_specs(self, *specs, **kwargs) -> None:
 
         self._sanity_check_view_projection(specs)
 
-        # Ignore spack meta data folder.
-        def skip_list(file):
-            return os.path.basename(file) == spack.store.STORE.layout.metadata_dir
-
-        # Determine if the root is on a case-insensitive filesystem
-        normalize_paths = is_folder_on_case_insensitive_filesystem(self._root)
-
-        visitor = SourceMergeVisitor(ignore=skip_list, normalize_paths=normalize_paths)
+        visitor = self._source_merge_visitor()
 
         # Gather all the directories to be made and files to be linked
-        for spec in specs:
-            src_prefix = spec.package.view_source()
-            visitor.set_projection(self.get_relative_projection_for_spec(spec))
-            visit_directory_tree(src_prefix, visitor)
+        self._visit_specs(visitor, specs)
 
         # Check for conflicts in destination dir.
         visit_directory_tree(self._root, DestinationMergeVisitor(visitor))
@@ -741,32 +772,244 @@ def skip_list(file):
             os.mkdir(os.path.join(self._root, dst))
 
         # Link the files using a "merge map": full src => full dst
-        merge_map_per_prefix = self._source_merge_visitor_to_merge_map(visitor)
+        self._add_files_to_view(specs, visitor.files)
+
+        # Finally create the metadata dirs.
+        self.link_metadata(specs)
+
+        if self.incremental:
+            self._write_merge_map(specs, visitor)
+
+    def update_specs(self, *specs: spack.spec.Spec) -> bool:
+        """Update the view in place, so that it contains exactly the given root-to-leaf
+        topologically ordered list of specs. Only the files of specs that were added or removed
+        since the view was last written are linked or unlinked, based on its persisted merge map.
+
+        Returns False without modifying the view if it cannot be updated incrementally: when it
+        has no merge map, when its projections, link type or settings changed, or when file
+        conflicts could make the result differ from a view that is generated from scratch."""
+        assert all((s.concrete for s in specs))
+        state = self._read_merge_map()
+        if state is None:
+            return False
+
+        if state.get("settings") != self._settings():
+            tty.debug(f"Cannot update view at {self._root}: its settings changed")
+            return False
+
+        # Drop externals
+        specs = [s for s in specs if not s.external]
+
+        self._sanity_check_view_projection(specs)
+
+        old_specs: Dict[str, Dict[str, str]] = state["specs"]
+        new_sources = {s.dag_hash(): s.package.view_source() for s in specs}
+        removed = {
+            h: entry for h, entry in old_specs.items() if new_sources.get(h) != entry["source"]
+        }
+        added = [s for s in specs if s.dag_hash() not in old_specs or s.dag_hash() in removed]
+
+        if not removed and not added:
+            return True
+
+        # Which file conflicts win depends on the order of the specs, so we can only unlink the
+        # files of specs that were not involved in any conflict.
+        removed_sources = tuple(os.path.join(e["source"], "") for e in removed.values())
+        if any(path.startswith(removed_sources) for c in state["conflicts"] for path in c):
+            tty.debug(f"Cannot update view at {self._root}: removed specs have file conflicts")
+            return False
+
+        old_files = {dst: tuple(src) for dst, src in state["files"].items()}
+        old_directories = {dst: tuple(src) for dst, src in state["directories"].items()}
+
+        # Seed a visitor with the files and directories of the specs that stay in the view, and
+        # keep only the directories that still have contents.
+        visitor = self._source_merge_visitor()
+        removed_roots = {e["source"] for e in removed.values()}
+        for dst, (src_root, src_rel) in old_files.items():
+            if src_root not in removed_roots:
+                visitor._add_file(dst, src_root, src_rel)
+        needed: Set[str] = set()
+        kept = itertools.chain(
+            (os.path.dirname(dst) for dst in visitor.files),
+            (
+                dst
+                for dst, (src_root, _) in old_directories.items()
+                if src_root not in removed_roots and src_root != "<projection>"
+            ),
+        )
+        for path in kept:
+            while path and path not in needed:
+                needed.add(path)
+                path = os.path.dirname(path)
+        for dst, (src_root, src_rel) in old_directories.items():
+            if dst in needed:
+                visitor._add_directory(dst, src_root, src_rel)
+
+        kept_files = dict(visitor.files)
+        kept_directories = dict(visitor.directories)
+        self._visit_specs(visitor, added)
+
+        if visitor.fatal_conflicts or visitor.file_conflicts:
+            tty.debug(f"Cannot update view at {self._root}: added specs have conflicts")
+            return False
+
+        tty.debug(
+            f"Updating view at {self._root}: removing {len(removed)} and adding {len(added)} specs"
+        )
+
+        # Unlink files that are gone or provided by a different source now
+        for dst, src in old_files.items():
+            if visitor.files.get(dst) != src:
+                try:
+                    os.unlink(os.path.join(self._root, dst))
+                except FileNotFoundError:
+                    pass
+
+        for entry in removed.values():
+            metadata_dir = os.path.join(self._root, entry["metadata"])
+            shutil.rmtree(metadata_dir, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(metadata_dir))
+            except OSError:
+                pass
+
+        # Remove directories that have no contents anymore, from the deepest up
+        for dst in reversed(old_directories):
+            if dst not in visitor.directories:
+                try:
+                    os.rmdir(os.path.join(self._root, dst))
+                except OSError:
+                    pass
+
+        # Directories may remain on disk when they have untracked contents
+        for dst in visitor.directories:
+            path = os.path.join(self._root, dst)
+            if dst not in kept_directories and not os.path.isdir(path):
+                os.mkdir(path)
+
+        self._add_files_to_view(
+            specs,
+            {dst: src for dst, src in visitor.files.items() if kept_files.get(dst) != src},
+        )
+        self.link_metadata(added, visit_destination=False)
+
+        # Retain the file conflicts of the specs that stay in the view
+        state["conflicts"] = [
+            c for c in state["conflicts"] if not any(p.startswith(removed_sources) for p in c)
+        ]
+        self._write_merge_map(specs, visitor, conflicts=state["conflicts"])
+        return True
+
+    def _source_merge_visitor(self) -> SourceMergeVisitor:
+        # Ignore spack meta data folder.
+        def skip_list(file):
+            return os.path.basename(file) == spack.store.STORE.layout.metadata_dir
+
+        # Determine if the root is on a case-insensitive filesystem
+        normalize_paths = is_folder_on_case_insensitive_filesystem(self._root)
+
+        return SourceMergeVisitor(ignore=skip_list, normalize_paths=normalize_paths)
+
+    def _visit_specs(self, visitor: SourceMergeVisitor, specs) -> None:
+        # Traverse the prefixes concurrently, and replay the traversals in order of the specs, so
+        # that conflicts are resolved as if the prefixes were visited one after the other.
+        src_prefixes = [spec.package.view_source() for spec in specs]
+        projections = [self.get_relative_projection_for_spec(spec) for spec in specs]
+        record = ft.partial(record_source_tree, ignore=visitor.ignore)
+        with spack.util.parallel.make_thread_executor(self._jobs(len(specs))) as executor:
+            traversals = executor.map(record, src_prefixes)
+            for src_prefix, projection, traversal in zip(src_prefixes, projections, traversals):
+                visitor.set_projection(projection)
+                traversal.replay(src_prefix, visitor)
+
+    def _add_files_to_view(self, specs, files: Dict[str, Tuple[str, str]]) -> None:
+        # Conflicts are resolved and directories created already, so files can be linked in any
+        # order. Batches are contiguous in the merge map, which roughly follows directory subtrees.
+        # Only the default add_files_to_view is split, since overrides expect the full merge map,
+        # and are not required to be thread safe.
+        merge_map_per_prefix = self._files_to_merge_map(files)
+        batches = []
+        overrides = []
         for spec in specs:
             merge_map = merge_map_per_prefix.get(spec.package.view_source(), None)
             if not merge_map:
                 # Not every spec may have files to contribute.
                 continue
-            spec.package.add_files_to_view(self, merge_map, skip_if_exists=False)
-
-        # Finally create the metadata dirs.
-        self.link_metadata(specs)
-
-    def _source_merge_visitor_to_merge_map(self, visitor: SourceMergeVisitor):
+            if not links_files_to_view(spec.package):
+                overrides.append((spec.package, merge_map))
+                continue
+            items = list(merge_map.items())
+            for i in range(0, len(items), LINK_BATCH_SIZE):
+                batches.append((spec.package, dict(items[i : i + LINK_BATCH_SIZE])))
+
+        with spack.util.parallel.make_thread_executor(self._jobs(len(batches))) as executor:
+            futures = [
+                executor.submit(pkg.add_files_to_view, self, batch, skip_if_exists=False)
+                for pkg, batch in batches
+            ]
+            for future in futures:
+                future.result()
+
+        for pkg, merge_map in overrides:
+            pkg.add_files_to_view(self, merge_map, skip_if_exists=False)
+
+    @staticmethod
+    def _jobs(tasks: int) -> int:
+        return max(1, min(tasks, MAX_VIEW_THREADS))
+
+    def _read_merge_map(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._root, _merge_map_path), "r", encoding="utf-8") as f:
+                return s_json.load(f)
+        except (OSError, ValueError) as e:
+            tty.debug(f"Cannot read the merge map of view at {self._root}: {e}")
+            return None
+
+    def _write_merge_map(
+        self, specs, visitor: SourceMergeVisitor, conflicts: Optional[List] = None
+    ) -> None:
+        """Persist which specs are in the view, and which files and directories they provide."""
+        if conflicts is None:
+            conflicts = []
+        conflicts.extend((c.src_a, c.src_b) for c in visitor.file_conflicts)
+        state = {
+            "specs": {
+                s.dag_hash(): {
+                    "source": s.package.view_source(),
+                    "metadata": self.relative_metadata_dir_for_spec(s),
+                }
+                for s in specs
+            },
+            "directories": visitor.directories,
+            "files": visitor.files,
+            "conflicts": conflicts,
+            "settings": self._settings(),
+        }
+        path = os.path.join(self._root, _merge_map_path)
+        mkdirp(os.path.dirname(path))
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            s_json.dump(state, f)
+        os.replace(tmp, path)
+
+    def _settings(self) -> Dict[str, Any]:
+        """Everything other than the specs that determines the contents of the view"""
+        settings = {"projections": self.projections, "link_type": self.link_type}
+        settings.update(self.settings)
+        # Compare as read back from the merge map
+        return s_json.load(s_json.dump(settings))
+
+    def _files_to_merge_map(self, files: Dict[str, Tuple[str, str]]):
         # For compatibility with add_files_to_view, we have to create a
         # merge_map of the form join(src_root, src_rel) => join(dst_root, dst_rel),
         # but our visitor.files format is dst_rel => (src_root, src_rel).
-        # We exploit that visitor.files is an ordered dict, and files per source
-        # prefix are contiguous.
-        source_root = lambda item: item[1][0]
-        per_source = itertools.groupby(visitor.files.items(), key=source_root)
-        return {
-            src_root: {
-                os.path.join(src_root, src_rel): os.path.join(self._root, dst_rel)
-                for dst_rel, (_, src_rel) in group
-            }
-            for src_root, group in per_source
-        }
+        merge_map_per_prefix: Dict[str, Dict[str, str]] = {}
+        for dst_rel, (src_root, src_rel) in files.items():
+            merge_map_per_prefix.setdefault(src_root, {})[
+                os.path.join(src_root, src_rel)
+            ] = os.path.join(self._root, dst_rel)
+        return merge_map_per_prefix
 
     def relative_metadata_dir_for_spec(self, spec):
         return os.path.join(
@@ -775,7 +1018,7 @@ def relative_metadata_dir_for_spec(self, spec):
             spec.name,
         )
 
-    def link_metadata(self, specs):
+    def link_metadata(self, specs, *, visit_destination: bool = True):
         metadata_visitor = SourceMergeVisitor()
 
         for spec in specs:
@@ -786,8 +1029,10 @@ def link_metadata(self, specs):
             metadata_visitor.set_projection(proj)
             visit_directory_tree(src_prefix, metadata_visitor)
 
-        # Check for conflicts in destination dir.
-        visit_directory_tree(self._root, DestinationMergeVisitor(metadata_visitor))
+        # Check for conflicts in destination dir. Incremental updates skip this, since they already
+        # removed the metadata dirs of the specs that were removed.
+        if visit_destination:
+            visit_directory_tree(self._root, DestinationMergeVisitor(metadata_visitor))
 
         # Throw on dir-file conflicts -- unlikely, but who knows.
         if metadata_visitor.fatal_conflicts:
@@ -798,7 +1043,9 @@ def link_metadata(self, specs):
             raise MergeConflictSummary(metadata_visitor.file_conflicts)
 
         for dst in metadata_visitor.directories:
-            os.mkdir(os.path.join(self._root, dst))
+            path = os.path.join(self._root, dst)
+            if visit_destination or not os.path.isdir(path):
+                os.mkdir(path)
 
         for dst_relpath, (src_root, src_relpath) in metadata_visitor.files.items():
             self.link(os.path.join(src_root, src_relpath), os.path.join(self._root, dst_relpath))
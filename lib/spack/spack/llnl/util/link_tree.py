@@ -51,6 +51,19 @@ def _samefile(a: str, b: str):
         return False
 
 
+def _merge_symlinked_dir(root: str, rel_path: str, depth: int) -> bool:
+    """Whether a symlinked dir in a source prefix is merged like an ordinary directory."""
+    # Only follow symlinked dirs in <prefix>/**/**/*
+    if depth > 1:
+        return False
+
+    # Only follow symlinked dirs when pointing deeper
+    src = os.path.join(root, rel_path)
+    real_parent = os.path.realpath(os.path.dirname(src))
+    real_child = os.path.realpath(src)
+    return real_child.startswith(real_parent)
+
+
 class SourceMergeVisitor(fs.BaseDirectoryVisitor):
     """
     Visitor that produces actions:
@@ -216,17 +229,7 @@ def before_visit_symlinked_dir(self, root: str, rel_path: str, depth: int) -> bo
         if self.ignore(rel_path):
             return False
 
-        # Only follow symlinked dirs in <prefix>/**/**/*
-        if depth > 1:
-            handle_as_dir = False
-        else:
-            # Only follow symlinked dirs when pointing deeper
-            src = os.path.join(root, rel_path)
-            real_parent = os.path.realpath(os.path.dirname(src))
-            real_child = os.path.realpath(src)
-            handle_as_dir = real_child.startswith(real_parent)
-
-        if handle_as_dir:
+        if _merge_symlinked_dir(root, rel_path, depth):
             return self.before_visit_dir(root, rel_path, depth)
 
         self.visit_file(root, rel_path, depth, symlink=True)
@@ -301,6 +304,94 @@ def set_projection(self, projection: str) -> None:
                 )
 
 
+# Events recorded by SourceTreeRecorder
+_VISIT_FILE = 0
+_VISIT_SYMLINKED_FILE = 1
+_BEFORE_VISIT_DIR = 2
+_BEFORE_VISIT_SYMLINKED_DIR = 3
+_AFTER_VISIT_DIR = 4
+_AFTER_VISIT_SYMLINKED_DIR = 5
+
+
+class SourceTreeRecorder(fs.BaseDirectoryVisitor):
+    """Records the traversal of a source prefix, so that it can be replayed into a
+    :class:`SourceMergeVisitor` later with :meth:`replay`.
+
+    The traversal of a prefix only depends on the prefix itself, and is dominated by filesystem
+    latency, so multiple prefixes can be traversed concurrently. Replaying them one after the
+    other in a fixed order gives the same merge result as visiting the prefixes sequentially.
+    The recorder descends into every directory the merge visitor could descend into; parts of
+    the tree that the merge visitor skips during the replay are skipped again."""
+
+    def __init__(self, ignore: Optional[Callable[[str], bool]] = None):
+        self.ignore = ignore if ignore is not None else lambda f: False
+        self.events: List[Tuple[int, str, int]] = []
+
+    def before_visit_dir(self, root: str, rel_path: str, depth: int) -> bool:
+        if self.ignore(rel_path):
+            return False
+        self.events.append((_BEFORE_VISIT_DIR, rel_path, depth))
+        return True
+
+    def before_visit_symlinked_dir(self, root: str, rel_path: str, depth: int) -> bool:
+        if self.ignore(rel_path):
+            return False
+        self.events.append((_BEFORE_VISIT_SYMLINKED_DIR, rel_path, depth))
+        return _merge_symlinked_dir(root, rel_path, depth)
+
+    def after_visit_dir(self, root: str, rel_path: str, depth: int) -> None:
+        self.events.append((_AFTER_VISIT_DIR, rel_path, depth))
+
+    def after_visit_symlinked_dir(self, root: str, rel_path: str, depth: int) -> None:
+        self.events.append((_AFTER_VISIT_SYMLINKED_DIR, rel_path, depth))
+
+    def visit_file(self, root: str, rel_path: str, depth: int) -> None:
+        self.events.append((_VISIT_FILE, rel_path, depth))
+
+    def visit_symlinked_file(self, root: str, rel_path: str, depth: int) -> None:
+        self.events.append((_VISIT_SYMLINKED_FILE, rel_path, depth))
+
+    def replay(self, root: str, visitor: fs.BaseDirectoryVisitor) -> None:
+        """Replay the recorded traversal of ``root`` into ``visitor``"""
+        # Path and depth of the directory the visitor did not descend into, while skipping its
+        # contents. The recording has an after event for the directory only if the recorder
+        # descended into it, and that event must be skipped too.
+        skip: Optional[Tuple[str, int]] = None
+        for event, rel_path, depth in self.events:
+            if skip is not None:
+                if depth > skip[1]:
+                    continue
+                skipped, skip = skip, None
+                if (
+                    event == _AFTER_VISIT_DIR or event == _AFTER_VISIT_SYMLINKED_DIR
+                ) and skipped == (rel_path, depth):
+                    continue
+
+            if event == _VISIT_FILE:
+                visitor.visit_file(root, rel_path, depth)
+            elif event == _VISIT_SYMLINKED_FILE:
+                visitor.visit_symlinked_file(root, rel_path, depth)
+            elif event == _BEFORE_VISIT_DIR:
+                if not visitor.before_visit_dir(root, rel_path, depth):
+                    skip = (rel_path, depth)
+            elif event == _BEFORE_VISIT_SYMLINKED_DIR:
+                if not visitor.before_visit_symlinked_dir(root, rel_path, depth):
+                    skip = (rel_path, depth)
+            elif event == _AFTER_VISIT_DIR:
+                visitor.after_visit_dir(root, rel_path, depth)
+            else:
+                visitor.after_visit_symlinked_dir(root, rel_path, depth)
+
+
+def record_source_tree(
+    root: str, ignore: Optional[Callable[[str], bool]] = None
+) -> SourceTreeRecorder:
+    """Traverse the source prefix ``root``, and return a recording of the traversal"""
+    recorder = SourceTreeRecorder(ignore=ignore)
+    fs.visit_directory_tree(root, recorder)
+    return recorder
+
+
 class DestinationMergeVisitor(fs.BaseDirectoryVisitor):
     """DestinationMergeVisitor takes a SourceMergeVisitor and:
 
@@ -27,14 +27,17 @@
 import contextlib
 import copy
 import datetime
+import hashlib
 import inspect
 import os
 import re
 import string
-from typing import List, Optional
+import sys
+from typing import Dict, List, Optional, Tuple
 
 import spack.vendor.jinja2
 
+import spack
 import spack.build_environment
 import spack.config
 import spack.deptypes as dt
@@ -52,7 +55,9 @@
 import spack.user_environment
 import spack.util.environment
 import spack.util.file_permissions as fp
+import spack.util.parallel
 import spack.util.path
+import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
 from spack.context import Context
 from spack.llnl.util.lang import Singleton, dedupe, memoized
@@ -238,6 +243,105 @@ def generate_module_index(root, modules, overwrite=False):
         syaml.dump(index, default_flow_style=False, stream=index_file)
 
 
+#: Name of the file in a module root that records a hash of the inputs of each module file
+MODULE_HASHES_FILENAME = "module-hashes.json"
+
+
+def _template_files() -> List[Tuple[str, float]]:
+    """Returns all template files with their modification times. Templates can include other
+    templates, so any change to them may affect a module file."""
+    result = []
+    for template_dir in tengine.default_template_dirs(spack.config.CONFIG):
+        for dirpath, _, filenames in os.walk(template_dir):
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                result.append((path, os.stat(path).st_mtime))
+    return result
+
+
+def _render_module_file(args: Tuple[int, "BaseModuleFileWriter"]):
+    index, writer = args
+    try:
+        return index, writer.render(), None
+    except spack.error.SpackError as e:
+        return index, None, e.message
+    except Exception as e:
+        return index, None, str(e)
+
+
+def write_module_files(writers: List["BaseModuleFileWriter"], root: str) -> List[str]:
+    """Writes the module files of all writers, whose module files are in ``root``. Returns the
+    error messages of the module files that could not be written.
+
+    Module files whose inputs did not change since they were last written are skipped. The other
+    module files are rendered in worker processes, and written in order in this process, since
+    module defaults and hidden modules are shared between module files. The run environment of
+    dependencies is memoized while rendering, in this process and in each worker process, see
+    :func:`spack.build_environment.memoized_run_environment`."""
+    hashes_path = os.path.join(root, MODULE_HASHES_FILENAME)
+    try:
+        with open(hashes_path, encoding="utf-8") as f:
+            hashes: Dict[str, str] = sjson.load(f)
+    except (OSError, ValueError):
+        hashes = {}
+
+    templates = _template_files()
+    errors = []
+    outdated: List[Tuple[BaseModuleFileWriter, str]] = []
+    for writer in writers:
+        try:
+            inputs_hash = writer.inputs_hash(templates)
+        except spack.error.SpackError as e:
+            errors.append(f"{writer.layout.filename}: {e.message}")
+            continue
+        except Exception as e:
+            errors.append(f"{writer.layout.filename}: {str(e)}")
+            continue
+        if hashes.get(writer.spec.dag_hash()) == inputs_hash and os.path.exists(
+            writer.layout.filename
+        ):
+            continue
+        outdated.append((writer, inputs_hash))
+
+    tty.debug(f"{len(writers) - len(outdated)} module files in {root} are up to date")
+
+    tasks = [(i, writer) for i, (writer, _) in enumerate(outdated)]
+    jobs = min(len(tasks), spack.config.determine_number_of_jobs(parallel=True))
+    # Dependencies shared by many specs contribute to the run environment only once
+    with spack.build_environment.memoized_run_environment():
+        if jobs > 1:
+            rendered = spack.util.parallel.imap_unordered(
+                _render_module_file,
+                tasks,
+                processes=jobs,
+                initializer=spack.build_environment.enable_run_environment_memo,
+            )
+        else:
+            rendered = map(_render_module_file, tasks)
+        results = {index: (text, error) for index, text, error in rendered}
+
+    for i, (writer, inputs_hash) in enumerate(outdated):
+        key = writer.spec.dag_hash()
+        hashes.pop(key, None)
+        text, error = results[i]
+        try:
+            if error is not None:
+                raise ModulesError(error)
+            writer.write_text(text)
+        except spack.error.SpackError as e:
+            errors.append(f"{writer.layout.filename}: {e.message}")
+            continue
+        except Exception as e:
+            errors.append(f"{writer.layout.filename}: {str(e)}")
+            continue
+        hashes[key] = inputs_hash
+
+    spack.llnl.util.filesystem.mkdirp(root)
+    with open(hashes_path, "w", encoding="utf-8") as f:
+        sjson.dump(hashes, f)
+    return errors
+
+
 def _generate_upstream_module_index():
     module_indices = read_module_indices()
 
@@ -673,8 +777,12 @@ def environment_modifications(self):
 
         # Then run setup_dependent_run_environment before setup_run_environment.
         for dep in self.spec.dependencies(deptype=("link", "run")):
-            dep.package.setup_dependent_run_environment(env, self.spec)
-        self.spec.package.setup_run_environment(env)
+            env.extend(
+                spack.build_environment.dependent_run_environment_modifications(
+                    dep.package, self.spec
+                )
+            )
+        env.extend(spack.build_environment.own_run_environment_modifications(self.spec.package))
 
         # Project the environment variables from prefix to view if needed
         if view and self.spec in view:
@@ -858,22 +966,15 @@ def write(self, overwrite=False):
             tty.warn(message.format(self.layout))
             return
 
-        # If we are here it means it's ok to write the module file
-        msg = "\tWRITE: {0} [{1}]"
-        tty.debug(msg.format(self.spec.cshort_spec, self.layout.filename))
-
-        # If the directory where the module should reside does not exist
-        # create it
-        module_dir = os.path.dirname(self.layout.filename)
-        if not os.path.exists(module_dir):
-            spack.llnl.util.filesystem.mkdirp(module_dir)
+        self.write_text(self.render())
 
+    def _load_template(self) -> "spack.vendor.jinja2.Template":
         # Get the template for the module
         template_name = self._get_template()
 
         try:
             env = tengine.make_environment()
-            template = env.get_template(template_name)
+            return env.get_template(template_name)
         except spack.vendor.jinja2.TemplateNotFound:
             # If the template was not found raise an exception with a little
             # more information
@@ -882,6 +983,15 @@ def write(self, overwrite=False):
             msg = msg.format(template_name, name)
             raise ModulesTemplateNotFoundError(msg)
 
+    def _package_context(self) -> dict:
+        module_name = str(self.module.__name__).split(".")[-1]
+        attr_name = f"{module_name}_context"
+        return getattr(self.spec.package, attr_name, {})
+
+    def render(self) -> str:
+        """Renders the template of the module file, and returns its text."""
+        template = self._load_template()
+
         # Construct the context following the usual hierarchy of updates:
         # 1. start with the default context from the module writer class
         # 2. update with package specific context
@@ -890,17 +1000,53 @@ def write(self, overwrite=False):
         context = self.context.to_dict()
 
         # Attribute from package
-        module_name = str(self.module.__name__).split(".")[-1]
-        attr_name = f"{module_name}_context"
-        pkg_update = getattr(self.spec.package, attr_name, {})
-        context.update(pkg_update)
+        context.update(self._package_context())
 
         # Context key in modules.yaml
         conf_update = self.conf.context
         context.update(conf_update)
 
-        # Render the template
-        text = template.render(context)
+        return template.render(context)
+
+    def inputs_hash(self, templates: List[Tuple[str, float]]) -> str:
+        """Returns a hash of everything the module file is generated from, except for the
+        templates it includes, which are given as a list of template files and their modification
+        times. As long as the hash is the same, the module file does not need to be rendered
+        again."""
+        template = self._load_template()
+        # Include the modules of base classes, e.g. build systems, which affect the module file
+        # through their setup_run_environment and other methods
+        packages: Dict[str, float] = {}
+        for node in self.spec.traverse():
+            for cls in type(node.package).__mro__:
+                filename = getattr(sys.modules.get(cls.__module__), "__file__", None)
+                if filename and filename not in packages:
+                    packages[filename] = os.stat(filename).st_mtime
+        data = {
+            "spack": spack.get_version(),
+            "spec": self.spec.dag_hash(),
+            "prefix": self.spec.prefix,
+            "explicit": self.conf.explicit,
+            "modules": spack.config.get("modules"),
+            "template": template.filename,
+            "templates": templates,
+            "context": self._package_context(),
+            "packages": sorted(packages.items()),
+        }
+        return hashlib.sha256(sjson.dump(data).encode()).hexdigest()
+
+    def write_text(self, text: str) -> None:
+        """Writes the rendered text of the module file, and updates the default and hidden
+        state of the module."""
+        msg = "\tWRITE: {0} [{1}]"
+        tty.debug(msg.format(self.spec.cshort_spec, self.layout.filename))
+
+        # If the directory where the module should reside does not exist
+        # create it
+        module_dir = os.path.dirname(self.layout.filename)
+        if not os.path.exists(module_dir):
+            spack.llnl.util.filesystem.mkdirp(module_dir)
+
         # Write it to file
         with open(self.layout.filename, "w", encoding="utf-8") as f:
             f.write(text)
@@ -11,6 +11,13 @@
 runs through a build queue, always running at least one build. Concurrent builds run as jobserver
 tokens are obtained. This means only one -j flag is needed to control concurrency.
 
+Specs that can be installed from binaries do not take jobserver tokens, and their build processes
+are started ahead of the installation of their dependencies, so that fetching tarballs overlaps
+with other installs. They wait for their dependencies to be installed before extracting binaries.
+
+The sources of specs built from sources are fetched up front into the fetch cache by a prefetch
+process, and a source build is only started once its own sources are fetched.
+
 The UI process has two modes: an overview mode where it shows the status of all builds, and a
 mode where it follows the logs of a specific build. It listens to keyboard input to switch between
 modes.
@@ -52,6 +59,7 @@
 import spack.llnl.util.lock
 import spack.llnl.util.tty
 import spack.paths
+import spack.prefetch
 import spack.report
 import spack.spec
 import spack.stage
@@ -81,11 +89,30 @@
 #: Suffix for temporary cleanup during failed install
 OVERWRITE_GARBAGE_SUFFIX = ".garbage"
 
+#: Exit code of a build process that could not fetch a binary it was started for. The spec is
+#: then built from sources, once its dependencies are installed.
+EXIT_NO_BINARY = 2
+
+#: Exit code of a build process that was aborted, because a dependency failed to install
+EXIT_ABORTED = 3
+
+#: Messages sent to build processes waiting for their dependencies to be installed
+DEPENDENCIES_INSTALLED = b"installed"
+DEPENDENCIES_FAILED = b"failed"
+
 
 class ChildInfo:
     """Information about a child process."""
 
-    __slots__ = ("proc", "spec", "output_r_conn", "state_r_conn", "control_w_conn", "explicit")
+    __slots__ = (
+        "proc",
+        "spec",
+        "output_r_conn",
+        "state_r_conn",
+        "control_w_conn",
+        "explicit",
+        "dependencies_w_conn",
+    )
 
     def __init__(
         self,
@@ -95,6 +122,7 @@ def __init__(
         state_r_conn: Connection,
         control_w_conn: Connection,
         explicit: bool = False,
+        dependencies_w_conn: Optional[Connection] = None,
     ) -> None:
         self.proc = proc
         self.spec = spec
@@ -102,6 +130,19 @@ def __init__(
         self.state_r_conn = state_r_conn
         self.control_w_conn = control_w_conn
         self.explicit = explicit
+        #: Connection to notify a binary install that its dependencies are installed (if any)
+        self.dependencies_w_conn = dependencies_w_conn
+
+    def notify_dependencies(self, message: bytes) -> None:
+        """Tell a binary install waiting for its dependencies whether they were installed."""
+        if self.dependencies_w_conn is None:
+            return
+        try:
+            self.dependencies_w_conn.send_bytes(message)
+        except OSError:
+            pass  # the build process exited already
+        self.dependencies_w_conn.close()
+        self.dependencies_w_conn = None
 
     def cleanup(self, selector: selectors.BaseSelector) -> None:
         """Unregister and close file descriptors, and join the child process."""
@@ -120,6 +161,8 @@ def cleanup(self, selector: selectors.BaseSelector) -> None:
         self.output_r_conn.close()
         self.state_r_conn.close()
         self.control_w_conn.close()
+        if self.dependencies_w_conn is not None:
+            self.dependencies_w_conn.close()
         self.proc.join()
 
 
@@ -200,11 +243,20 @@ def close(self) -> None:
         os.close(self.log_fd)
 
 
+class BinaryNotAvailableError(spack.error.InstallError):
+    """Raised in a build process started for a binary, when no binary could be fetched."""
+
+
+class DependenciesNotInstalledError(spack.error.InstallError):
+    """Raised in a build process waiting for its dependencies, when any of them failed."""
+
+
 def install_from_buildcache(
     mirrors: List[spack.url_buildcache.MirrorMetadata],
     spec: spack.spec.Spec,
     unsigned: Optional[bool],
     state_stream: io.TextIOWrapper,
+    dependencies: Optional[Connection] = None,
 ) -> bool:
     send_state("fetching from build cache", state_stream)
     tarball_stage = spack.binary_distribution.download_tarball(spec.build_spec, unsigned, mirrors)
@@ -212,6 +264,14 @@ def install_from_buildcache(
     if tarball_stage is None:
         return False
 
+    # The tarball may be fetched before dependencies are installed, but post-install hooks
+    # inspect dependency prefixes, so extraction has to wait for them.
+    if dependencies is not None:
+        send_state("waiting for dependencies", state_stream)
+        if dependencies.recv_bytes() != DEPENDENCIES_INSTALLED:
+            tarball_stage.destroy()
+            raise DependenciesNotInstalledError(f"Dependencies of {spec} failed to install")
+
     send_state("relocating", state_stream)
     spack.binary_distribution.extract_tarball(spec, tarball_stage, force=False)
 
@@ -227,6 +287,62 @@ def install_from_buildcache(
     return True
 
 
+def prefetch_sources(
+    specs: List[spack.spec.Spec],
+    done: Connection,
+    store: spack.store.Store,
+    config: spack.config.Configuration,
+) -> None:
+    """Function run in the prefetch child process. Fetches the sources of specs into the fetch
+    cache, and sends the DAG hash of each spec whose fetch completed, successfully or not. Errors
+    are not reported here: the build process fetches the sources again, and fails if it can't."""
+    spack.store.STORE = store
+    spack.config.CONFIG = config
+    spack.paths.set_working_dir()
+
+    # Don't interfere with the terminal UI of the parent
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    try:
+        with spack.prefetch.SourcePrefetcher(specs) as prefetcher:
+            for spec in prefetcher.as_completed():
+                done.send_bytes(spec.dag_hash().encode())
+    finally:
+        done.close()
+
+
+class SourcePrefetch:
+    """The prefetch child process, and the specs whose sources it is still fetching."""
+
+    def __init__(self, specs: List[spack.spec.Spec]) -> None:
+        #: DAG hashes of the specs whose sources are still being fetched
+        self.pending: Set[str] = {spec.dag_hash() for spec in specs}
+        self.done_r_conn, done_w_conn = Pipe(duplex=False)
+        self.proc = Process(
+            target=prefetch_sources,
+            args=(specs, done_w_conn, spack.store.STORE, spack.config.CONFIG),
+        )
+        self.proc.start()
+        done_w_conn.close()
+
+    def receive(self) -> None:
+        """Receive the DAG hash of a spec whose sources are fetched. If the prefetch process
+        exited, no more sources are waited for."""
+        try:
+            self.pending.discard(self.done_r_conn.recv_bytes().decode())
+        except (EOFError, OSError):
+            self.pending.clear()
+
+    def close(self) -> None:
+        """Stop fetching sources that are no longer needed, and join the prefetch process."""
+        if self.pending:
+            self.proc.terminate()
+        self.proc.join()
+        self.done_r_conn.close()
+
+
 class PrefixPivoter:
     """Manages the installation prefix during overwrite installations."""
 
@@ -324,6 +440,7 @@ def worker_function(
     state: Connection,
     parent: Connection,
     echo_control: Connection,
+    dependencies: Optional[Connection],
     makeflags: str,
     js1: Optional[Connection],
     js2: Optional[Connection],
@@ -349,6 +466,8 @@ def worker_function(
         state: Connection to send state updates to
         parent: Connection to send build output to
         echo_control: Connection to receive echo control messages from
+        dependencies: Connection to receive a message from once dependencies are installed, for
+            binaries that are fetched ahead of their dependencies. None if they're installed.
         makeflags: MAKEFLAGS to set, so that the build process uses the POSIX jobserver
         js1: Connection for old style jobserver read fd (if any). Unused, just to inherit fd.
         js2: Connection for old style jobserver write fd (if any). Unused, just to inherit fd.
@@ -392,7 +511,12 @@ def worker_function(
                 state_stream,
                 log_path,
                 store,
+                dependencies,
             )
+    except BinaryNotAvailableError:
+        exit_code = EXIT_NO_BINARY
+    except DependenciesNotInstalledError:
+        exit_code = EXIT_ABORTED
     except Exception:
         traceback.print_exc()  # log the traceback to the log file
         exit_code = 1
@@ -400,6 +524,13 @@ def worker_function(
         tee.close()
         state_stream.close()
 
+    # Nothing was attempted, so there is nothing to log
+    if exit_code in (EXIT_NO_BINARY, EXIT_ABORTED):
+        try:
+            os.unlink(log_path)
+        except OSError:
+            pass
+
     if exit_code == 0 and not os.path.lexists(spec.package.install_log_path):
         # Try to install the compressed log file
         try:
@@ -428,6 +559,7 @@ def _install(
     state_stream: io.TextIOWrapper,
     log_path: str,
     store: spack.store.Store = spack.store.STORE,
+    dependencies: Optional[Connection] = None,
 ) -> None:
     """Install a spec from build cache or source."""
 
@@ -436,13 +568,20 @@ def _install(
 
     # Try to install from buildcache, unless user asked for source only
     if install_policy != "source_only":
-        if mirrors and install_from_buildcache(mirrors, spec, unsigned, state_stream):
+        if mirrors and install_from_buildcache(
+            mirrors, spec, unsigned, state_stream, dependencies
+        ):
             spack.hooks.post_install(spec, explicit)
             return
         elif install_policy == "cache_only":
             # Binary required but not available
             send_state("no binary available", state_stream)
             raise spack.error.InstallError(f"No binary available for {spec}")
+        elif dependencies is not None:
+            # A source build needs its dependencies installed and a jobserver token, so it has
+            # to be started again by the parent.
+            send_state("no binary available", state_stream)
+            raise BinaryNotAvailableError(f"No binary available for {spec}")
 
     spack.build_environment.setup_package(pkg, dirty=dirty)
     store.layout.create_install_directory(spec)
@@ -574,12 +713,18 @@ def start_build(
     keep_prefix: bool,
     skip_patch: bool,
     jobserver: JobServer,
+    ahead_of_dependencies: bool = False,
 ) -> ChildInfo:
-    """Start a new build."""
+    """Start a new build. If ``ahead_of_dependencies`` is True, the build process installs a
+    binary, and waits to be notified that its dependencies are installed before extracting it."""
     # Create pipes for the child's output, state reporting, and control.
     state_r_conn, state_w_conn = Pipe(duplex=False)
     output_r_conn, output_w_conn = Pipe(duplex=False)
     control_r_conn, control_w_conn = Pipe(duplex=False)
+    dependencies_r_conn: Optional[Connection] = None
+    dependencies_w_conn: Optional[Connection] = None
+    if ahead_of_dependencies:
+        dependencies_r_conn, dependencies_w_conn = Pipe(duplex=False)
 
     # Obtain the MAKEFLAGS to be set in the child process, and determine whether it's necessary
     # for the child process to inherit our jobserver fds.
@@ -604,6 +749,7 @@ def start_build(
             state_w_conn,
             output_w_conn,
             control_r_conn,
+            dependencies_r_conn,
             makeflags,
             None if fifo else jobserver.r_conn,
             None if fifo else jobserver.w_conn,
@@ -617,12 +763,16 @@ def start_build(
     state_w_conn.close()
     output_w_conn.close()
     control_r_conn.close()
+    if dependencies_r_conn is not None:
+        dependencies_r_conn.close()
 
     # Set the read ends to non-blocking: in principle redundant with epoll/kqueue, but safer.
     os.set_blocking(output_r_conn.fileno(), False)
     os.set_blocking(state_r_conn.fileno(), False)
 
-    return ChildInfo(proc, spec, output_r_conn, state_r_conn, control_w_conn, explicit)
+    return ChildInfo(
+        proc, spec, output_r_conn, state_r_conn, control_w_conn, explicit, dependencies_w_conn
+    )
 
 
 def get_jobserver_config(makeflags: Optional[str] = None) -> Optional[Union[str, Tuple[int, int]]]:
@@ -767,6 +917,11 @@ def add_build(self, spec: spack.spec.Spec, explicit: bool, control_w_conn: Conne
         self.builds[spec.dag_hash()] = BuildInfo(spec, explicit, control_w_conn)
         self.dirty = True
 
+    def remove_build(self, build_id: str) -> None:
+        """Remove a package that will not be installed from the display."""
+        if self.builds.pop(build_id, None) is not None:
+            self.dirty = True
+
     def toggle(self) -> None:
         """Toggle between overview mode and following a specific build."""
         if self.overview_mode:
@@ -1183,6 +1338,31 @@ def enqueue_parents(self, dag_hash: str, pending_builds: List[str]) -> None:
             if not children:
                 pending_builds.append(parent)
 
+    def topological_order(self) -> List[str]:
+        """Return the dag_hashes of the nodes in the graph, ordered so that every node comes after
+        all of its children."""
+        num_children = {key: len(self.parent_to_child.get(key, ())) for key in self.nodes}
+        order = [key for key, n in num_children.items() if n == 0]
+        # The list is extended while iterating over it
+        for key in order:
+            for parent in self.child_to_parent.get(key, ()):
+                num_children[parent] -= 1
+                if num_children[parent] == 0:
+                    order.append(parent)
+        return order
+
+    def dependents(self, dag_hash: str) -> Set[str]:
+        """Return the dag_hashes of all the nodes that depend, directly or transitively, on the
+        given node."""
+        result: Set[str] = set()
+        stack = [dag_hash]
+        while stack:
+            for parent in self.child_to_parent.get(stack.pop(), ()):
+                if parent not in result:
+                    result.add(parent)
+                    stack.append(parent)
+        return result
+
 
 class PackageInstaller:
 
@@ -1264,10 +1444,38 @@ def __init__(
         self.keep_stage = keep_stage
         self.skip_patch = skip_patch
 
-        #: queue of packages ready to install (no children)
-        self.pending_builds = [
-            parent for parent, children in self.build_graph.parent_to_child.items() if not children
+        #: specs to be installed from binaries known to be in a buildcache. They don't need a
+        #: jobserver token, and their tarballs are fetched before their dependencies are installed
+        self.binaries: Set[str] = {
+            key
+            for key in self.build_graph.nodes
+            if self.binary_cache_for_spec[key] and self._install_policy(key) != "source_only"
+        }
+        #: binaries whose build process was not started yet, in reverse dependency order
+        self.binaries_to_start = [
+            key for key in reversed(self.build_graph.topological_order()) if key in self.binaries
         ]
+        #: binaries whose dependencies are installed
+        self.ready_binaries: Set[str] = set()
+        #: build processes of binaries, by dag_hash
+        self.running_binaries: Dict[str, ChildInfo] = {}
+
+        #: specs built from sources, whose sources are fetched ahead of time, in install order
+        self.prefetch_specs = [
+            self.build_graph.nodes[key]
+            for key in self.build_graph.topological_order()
+            if key not in self.binaries
+            and self._install_policy(key) != "cache_only"
+            and not self.build_graph.nodes[key].is_develop
+            and spack.prefetch.can_prefetch(self.build_graph.nodes[key])
+        ]
+        self.prefetch: Optional[SourcePrefetch] = None
+
+        #: queue of packages ready to install (no children), excluding binaries
+        self.pending_builds: List[str] = []
+        self._enqueue(
+            [parent for parent, children in self.build_graph.parent_to_child.items() if not children]
+        )
 
         if explicit is True:
             self.explicit = {spec.dag_hash() for spec in specs}
@@ -1279,6 +1487,8 @@ def __init__(
         self.running_builds: Dict[int, ChildInfo] = {}
         self.build_status = BuildStatus(len(self.build_graph.nodes))
         self.jobs = spack.config.determine_number_of_jobs(parallel=True)
+        #: maximum number of concurrent build processes for binaries
+        self.binary_jobs: int = spack.config.get("config:concurrent_binary_installs") or self.jobs
         self.reports: Dict[str, spack.report.RequestRecord] = {}
 
     def install(self) -> None:
@@ -1318,15 +1528,24 @@ def _installer(self) -> None:
         failures: List[spack.spec.Spec] = []
 
         try:
+            if self.prefetch_specs:
+                self.prefetch = SourcePrefetch(self.prefetch_specs)
+                selector.register(
+                    self.prefetch.done_r_conn.fileno(), selectors.EVENT_READ, "prefetch"
+                )
+
+            self._start_binaries(selector, jobserver)
+
             # Start the first job immediately, as it does not require a jobserver token.
-            if self.pending_builds and not self.running_builds:
+            if self._num_startable_builds() and not self._num_source_builds():
                 self._start(selector, jobserver)
 
             while self.pending_builds or self.running_builds or to_insert_in_database:
-                # Only monitor the jobserver if we have pending builds.
-                if self.pending_builds and jobserver.r not in selector.get_map():
+                # Only monitor the jobserver if we have pending builds that can start.
+                startable = self._num_startable_builds() > 0
+                if startable and jobserver.r not in selector.get_map():
                     selector.register(jobserver.r, selectors.EVENT_READ, "jobserver")
-                elif not self.pending_builds and jobserver.r in selector.get_map():
+                elif not startable and jobserver.r in selector.get_map():
                     selector.unregister(jobserver.r)
 
                 jobserver_token_available = False
@@ -1351,17 +1570,30 @@ def _installer(self) -> None:
                         jobserver_token_available = True
                     elif data == "stdin":
                         stdin_ready = True
+                    elif data == "prefetch":
+                        self._handle_prefetch(selector)
 
                 for pid in finished_pids:
                     build = self.running_builds.pop(pid)
-                    jobserver.release()
+                    dag_hash = build.spec.dag_hash()
+                    if self.running_binaries.pop(dag_hash, None) is None:
+                        jobserver.release()
                     build.cleanup(selector)
                     if build.proc.exitcode == 0:
                         to_insert_in_database.append(build)
-                        self.build_status.update_state(build.spec.dag_hash(), "finished")
+                        self.build_status.update_state(dag_hash, "finished")
+                    elif build.proc.exitcode == EXIT_NO_BINARY:
+                        # Build from sources instead, once dependencies are installed
+                        self.binaries.discard(dag_hash)
+                        if dag_hash in self.ready_binaries:
+                            self.ready_binaries.discard(dag_hash)
+                            self.pending_builds.append(dag_hash)
+                    elif build.proc.exitcode == EXIT_ABORTED:
+                        self.build_status.remove_build(dag_hash)
                     else:
                         failures.append(build.spec)
-                        self.build_status.update_state(build.spec.dag_hash(), "failed")
+                        self.build_status.update_state(dag_hash, "failed")
+                        self._abort_dependents(dag_hash)
 
                 if stdin_ready:
                     try:
@@ -1383,27 +1615,32 @@ def _installer(self) -> None:
                 # Flush installed packages to the database and enqueue any parents that are now
                 # ready.
                 if to_insert_in_database and self._save_to_db(to_insert_in_database):
+                    ready: List[str] = []
                     for entry in to_insert_in_database:
-                        self.build_graph.enqueue_parents(
-                            entry.spec.dag_hash(), self.pending_builds
-                        )
+                        self.build_graph.enqueue_parents(entry.spec.dag_hash(), ready)
+                    self._enqueue(ready)
                     to_insert_in_database.clear()
 
+                # Binaries don't need a token
+                self._start_binaries(selector, jobserver)
+
                 # Again, the first job should start immediately and does not require a token.
-                if self.pending_builds and not self.running_builds:
+                if self._num_startable_builds() and not self._num_source_builds():
                     self._start(selector, jobserver)
 
                 # For the rest we try to obtain tokens from the jobserver.
-                if self.pending_builds and jobserver_token_available:
+                if self._num_startable_builds() and jobserver_token_available:
                     # Then we try to schedule as many jobs as we can acquire tokens for.
-                    max_new_jobs = len(self.pending_builds)
+                    max_new_jobs = self._num_startable_builds()
                     for _ in range(jobserver.acquire(max_new_jobs)):
                         self._start(selector, jobserver)
 
                 # Finally update the UI
                 self.build_status.update()
         except KeyboardInterrupt:
-            # Cleanup running builds.
+            # Cleanup running builds. Binaries waiting for their dependencies must be told first.
+            for child in self.running_binaries.values():
+                child.notify_dependencies(DEPENDENCIES_FAILED)
             for child in self.running_builds.values():
                 child.proc.join()
             raise
@@ -1418,6 +1655,8 @@ def _installer(self) -> None:
             self.build_status.update(finalize=True)
             selector.close()
             jobserver.close()
+            if self.prefetch is not None:
+                self.prefetch.close()
 
         if failures:
             lines = [f"{s}: {s.package.log_path}" for s in failures]
@@ -1440,8 +1679,76 @@ def _save_to_db(self, to_insert_in_database: List[ChildInfo]) -> bool:
         finally:
             db.lock.release_write(db._write)
 
-    def _start(self, selector: selectors.BaseSelector, jobserver: JobServer) -> None:
-        dag_hash = self.pending_builds.pop()
+    def _handle_prefetch(self, selector: selectors.BaseSelector) -> None:
+        """Handle a spec whose sources were prefetched, or the exit of the prefetch process."""
+        assert self.prefetch is not None
+        self.prefetch.receive()
+        if not self.prefetch.pending:
+            selector.unregister(self.prefetch.done_r_conn.fileno())
+
+    def _is_startable(self, dag_hash: str) -> bool:
+        """Whether a pending build can start, i.e. its sources are not being prefetched."""
+        return self.prefetch is None or dag_hash not in self.prefetch.pending
+
+    def _num_startable_builds(self) -> int:
+        """Number of pending builds that can start now. The others wait for their sources to be
+        prefetched, which is signaled by an event of the prefetch process."""
+        return sum(1 for dag_hash in self.pending_builds if self._is_startable(dag_hash))
+
+    def _next_pending_build(self) -> str:
+        """Pop the most recently enqueued pending build that can start."""
+        for i in reversed(range(len(self.pending_builds))):
+            if self._is_startable(self.pending_builds[i]):
+                return self.pending_builds.pop(i)
+        raise AssertionError("no pending build can start")
+
+    def _install_policy(self, dag_hash: str) -> InstallPolicy:
+        if dag_hash in self.build_graph.roots:
+            return self.root_policy
+        return self.dependencies_policy
+
+    def _num_source_builds(self) -> int:
+        """Number of running build processes that hold a jobserver token (or the implicit one)."""
+        return len(self.running_builds) - len(self.running_binaries)
+
+    def _enqueue(self, ready: List[str]) -> None:
+        """Enqueue specs whose dependencies are installed. Build processes of binaries waiting for
+        their dependencies are notified, while the other specs become pending builds."""
+        for dag_hash in ready:
+            if dag_hash not in self.binaries:
+                self.pending_builds.append(dag_hash)
+                continue
+            self.ready_binaries.add(dag_hash)
+            if dag_hash in self.running_binaries:
+                self.running_binaries[dag_hash].notify_dependencies(DEPENDENCIES_INSTALLED)
+
+    def _abort_dependents(self, dag_hash: str) -> None:
+        """Abort the installation of binaries depending on a spec that failed to install."""
+        for key in self.build_graph.dependents(dag_hash):
+            self.binaries.discard(key)
+            if key in self.running_binaries:
+                self.running_binaries[key].notify_dependencies(DEPENDENCIES_FAILED)
+
+    def _start_binaries(self, selector: selectors.BaseSelector, jobserver: JobServer) -> None:
+        """Start build processes for binaries, up to the maximum number of binary jobs. They are
+        started in dependency order, but without waiting for dependencies to be installed, so
+        that fetching tarballs overlaps with the installation of other specs."""
+        while self.binaries_to_start and len(self.running_binaries) < self.binary_jobs:
+            dag_hash = self.binaries_to_start.pop()
+            if dag_hash in self.binaries:
+                self._start(selector, jobserver, binary=dag_hash)
+
+    def _start(
+        self,
+        selector: selectors.BaseSelector,
+        jobserver: JobServer,
+        binary: Optional[str] = None,
+    ) -> None:
+        """Start the next pending build, or the build process of the given binary."""
+        if binary is None:
+            dag_hash = self._next_pending_build()
+        else:
+            dag_hash = binary
         explicit = dag_hash in self.explicit
         spec = self.build_graph.nodes[dag_hash]
         is_develop = spec.is_develop
@@ -1450,11 +1757,7 @@ def _start(self, selector: selectors.BaseSelector, jobserver: JobServer) -> None
             explicit=explicit,
             mirrors=self.binary_cache_for_spec[dag_hash],
             unsigned=self.unsigned,
-            install_policy=(
-                self.root_policy
-                if dag_hash in self.build_graph.roots
-                else self.dependencies_policy
-            ),
+            install_policy=self._install_policy(dag_hash),
             dirty=self.dirty,
             # keep_stage/restage logic taken from installer.py
             keep_stage=self.keep_stage or is_develop,
@@ -1463,10 +1766,15 @@ def _start(self, selector: selectors.BaseSelector, jobserver: JobServer) -> None
             keep_prefix=self.keep_prefix,
             skip_patch=self.skip_patch,
             jobserver=jobserver,
+            ahead_of_dependencies=binary is not None,
         )
         pid = child_info.proc.pid
         assert type(pid) is int
         self.running_builds[pid] = child_info
+        if binary is not None:
+            self.running_binaries[dag_hash] = child_info
+            if dag_hash in self.ready_binaries:
+                child_info.notify_dependencies(DEPENDENCIES_INSTALLED)
         selector.register(
             child_info.output_r_conn.fileno(), selectors.EVENT_READ, FdInfo(pid, "output")
         )
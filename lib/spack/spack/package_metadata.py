@@ -0,0 +1,283 @@
+# Copyright Spack Project Developers. See COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Classes and functions to cache the metadata of packages, so that it can be read without
+importing their ``package.py`` files.
+
+The metadata is extracted from the directives of each package class, and stored as plain
+strings. Conditions and constraints are parsed into specs only when they are accessed.
+"""
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+import spack.deptypes as dt
+import spack.error
+import spack.util.spack_json as sjson
+
+if TYPE_CHECKING:
+    import spack.package_base
+    import spack.repo
+    import spack.spec
+
+
+def _variant_value(value: Any) -> Any:
+    # Conditional values are stored without their condition
+    return value if isinstance(value, bool) else str(value)
+
+
+def metadata_from_package_class(
+    pkg_cls: "spack.package_base.PackageBase",
+) -> Dict[str, Any]:
+    """Returns the metadata of a package class, as a dictionary that can be serialized to JSON.
+
+    Args:
+        pkg_cls: package class the metadata is extracted from
+    """
+    versions = [str(v) for v in sorted(pkg_cls.versions, reverse=True)]
+    return {
+        "name": pkg_cls.name,
+        "description": pkg_cls.__doc__ or "",
+        "homepage": getattr(pkg_cls, "homepage", None),
+        "versions": versions,
+        "deprecated_versions": [
+            str(v) for v, args in pkg_cls.versions.items() if args.get("deprecated", False)
+        ],
+        "preferred_versions": [
+            str(v) for v, args in pkg_cls.versions.items() if args.get("preferred", False)
+        ],
+        "variants": [
+            {
+                "when": str(when),
+                "name": name,
+                "default": _variant_value(variant.default),
+                "values": (
+                    None
+                    if variant.values is None
+                    else [_variant_value(x) for x in variant.values]
+                ),
+                "multi": variant.multi,
+                "description": variant.description,
+            }
+            for when, variants_by_name in pkg_cls.variants.items()
+            for name, variant in variants_by_name.items()
+        ],
+        "dependencies": [
+            {
+                "when": str(when),
+                "spec": str(dependency.spec),
+                "type": list(dt.flag_to_tuple(dependency.depflag)),
+            }
+            for when, deps_by_name in pkg_cls.dependencies.items()
+            for dependency in deps_by_name.values()
+        ],
+        "provided": [
+            {"when": str(when), "virtuals": sorted(str(x) for x in virtuals)}
+            for when, virtuals in pkg_cls.provided.items()
+        ],
+        "provided_together": [
+            {"when": str(when), "virtuals": sorted(virtuals)}
+            for when, sets_of_virtuals in pkg_cls.provided_together.items()
+            for virtuals in sets_of_virtuals
+        ],
+        "extendees": sorted(pkg_cls.extendees),
+        "conflicts": [
+            {"when": str(when), "spec": str(conflict), "msg": msg}
+            for when, conflicts in pkg_cls.conflicts.items()
+            for conflict, msg in conflicts
+        ],
+        "requirements": [
+            {
+                "when": str(when),
+                "specs": [str(x) for x in specs],
+                "policy": policy,
+                "msg": msg,
+            }
+            for when, requirements in pkg_cls.requirements.items()
+            for specs, policy, msg in requirements
+        ],
+        "patches": [
+            {"when": str(when), **patch.to_dict()}
+            for when, patches in pkg_cls.patches.items()
+            for patch in patches
+        ],
+    }
+
+
+class PackageMetadata:
+    """Metadata of a single package, read from a ``MetadataIndex``.
+
+    The attributes that don't need any parsing are exposed directly, while conditions and
+    constraints are parsed into specs by the methods that return them.
+    """
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.data = data
+        self.name: str = data["name"]
+        self.description: str = data["description"]
+        self.homepage: Optional[str] = data["homepage"]
+        #: Versions of the package, from the newest to the oldest
+        self.versions: List[str] = data["versions"]
+        self.deprecated_versions: List[str] = data["deprecated_versions"]
+        self.preferred_versions: List[str] = data["preferred_versions"]
+        #: Names of the packages this package extends
+        self.extendees: List[str] = data["extendees"]
+        self._specs: Dict[str, "spack.spec.Spec"] = {}
+
+    def _spec(self, spec_str: str) -> "spack.spec.Spec":
+        """Parses a spec stored in the metadata, reusing the result for equal strings"""
+        spec = self._specs.get(spec_str)
+        if spec is None:
+            from spack.spec import Spec
+
+            spec = self._specs[spec_str] = Spec(spec_str)
+        return spec
+
+    def dependencies(
+        self,
+    ) -> Dict["spack.spec.Spec", Dict[str, Tuple["spack.spec.Spec", dt.DepFlag]]]:
+        """Dependencies of the package, as a mapping from conditions to dependency names, to
+        the ``(spec, depflag)`` pair of each dependency. Mirrors ``PackageBase.dependencies``.
+        """
+        result: Dict["spack.spec.Spec", Dict[str, Tuple["spack.spec.Spec", dt.DepFlag]]] = {}
+        for entry in self.data["dependencies"]:
+            spec = self._spec(entry["spec"])
+            depflag = dt.flag_from_strings(entry["type"])
+            result.setdefault(self._spec(entry["when"]), {})[spec.name] = (spec, depflag)
+        return result
+
+    def provided(self) -> Dict["spack.spec.Spec", Set["spack.spec.Spec"]]:
+        """Virtuals provided by the package, by condition. Mirrors ``PackageBase.provided``."""
+        return {
+            self._spec(entry["when"]): {self._spec(x) for x in entry["virtuals"]}
+            for entry in self.data["provided"]
+        }
+
+    def provided_together(self) -> Dict["spack.spec.Spec", List[Set[str]]]:
+        """Sets of virtuals that are provided together, by condition. Mirrors
+        ``PackageBase.provided_together``."""
+        result: Dict["spack.spec.Spec", List[Set[str]]] = {}
+        for entry in self.data["provided_together"]:
+            result.setdefault(self._spec(entry["when"]), []).append(set(entry["virtuals"]))
+        return result
+
+    def provided_virtual_names(self) -> List[str]:
+        """Sorted names of the virtuals provided by the package. Mirrors
+        ``PackageBase.provided_virtual_names``."""
+        return sorted({vpkg.name for virtuals in self.provided().values() for vpkg in virtuals})
+
+    def conflicts(self) -> Dict["spack.spec.Spec", List[Tuple["spack.spec.Spec", Optional[str]]]]:
+        """Conflicts of the package, by condition. Mirrors ``PackageBase.conflicts``."""
+        result: Dict["spack.spec.Spec", List[Tuple["spack.spec.Spec", Optional[str]]]] = {}
+        for entry in self.data["conflicts"]:
+            conflict = (self._spec(entry["spec"]), entry["msg"])
+            result.setdefault(self._spec(entry["when"]), []).append(conflict)
+        return result
+
+    def requirements(
+        self,
+    ) -> Dict["spack.spec.Spec", List[Tuple[Tuple["spack.spec.Spec", ...], str, Optional[str]]]]:
+        """Requirements of the package, by condition. Mirrors ``PackageBase.requirements``."""
+        result: Dict[
+            "spack.spec.Spec", List[Tuple[Tuple["spack.spec.Spec", ...], str, Optional[str]]]
+        ] = {}
+        for entry in self.data["requirements"]:
+            specs = tuple(self._spec(x) for x in entry["specs"])
+            requirement = (specs, entry["policy"], entry["msg"])
+            result.setdefault(self._spec(entry["when"]), []).append(requirement)
+        return result
+
+    def variants(self) -> Dict["spack.spec.Spec", Dict[str, Dict[str, Any]]]:
+        """Variants of the package, by condition and name. Each variant is a dictionary with the
+        ``name``, ``default``, ``values``, ``multi`` and ``description`` keys, where ``values`` is
+        ``None`` if the allowed values are defined by a validator.
+        """
+        result: Dict["spack.spec.Spec", Dict[str, Dict[str, Any]]] = {}
+        for entry in self.data["variants"]:
+            result.setdefault(self._spec(entry["when"]), {})[entry["name"]] = entry
+        return result
+
+    def patches(self) -> Dict["spack.spec.Spec", List[Dict[str, Any]]]:
+        """Patches of the package, by condition, in the format of ``spack.patch.Patch.to_dict``."""
+        result: Dict["spack.spec.Spec", List[Dict[str, Any]]] = {}
+        for entry in self.data["patches"]:
+            result.setdefault(self._spec(entry["when"]), []).append(entry)
+        return result
+
+
+class MetadataIndex:
+    """Maps package names to the metadata of the corresponding package."""
+
+    def __init__(self) -> None:
+        self.packages: Dict[str, Dict[str, Any]] = {}
+        #: Metadata objects returned by ``get``, which cache the specs parsed from the data
+        self._metadata: Dict[str, PackageMetadata] = {}
+
+    def to_json(self, stream) -> None:
+        sjson.dump({"packages": self.packages}, stream)
+
+    @staticmethod
+    def from_json(stream) -> "MetadataIndex":
+        d = sjson.load(stream)
+
+        if not isinstance(d, dict):
+            raise MetadataIndexError("MetadataIndex data was not a dict.")
+
+        if "packages" not in d:
+            raise MetadataIndexError("MetadataIndex data does not start with 'packages'")
+
+        r = MetadataIndex()
+        r.packages.update(d["packages"])
+        return r
+
+    def get(self, pkg_name: str) -> Optional[PackageMetadata]:
+        """Returns the metadata of a package, or None if the package is not in the index."""
+        metadata = self._metadata.get(pkg_name)
+        if metadata is None:
+            data = self.packages.get(pkg_name)
+            if data is None:
+                return None
+            metadata = self._metadata[pkg_name] = PackageMetadata(data)
+        return metadata
+
+    def __contains__(self, pkg_name: str) -> bool:
+        return pkg_name in self.packages
+
+    def merge(self, other: "MetadataIndex") -> None:
+        """Merge another metadata index into this one. Packages in the other index take
+        precedence over the ones in this index.
+
+        Args:
+            other: metadata index to be merged
+        """
+        self.packages.update(other.packages)
+        for pkg_name in other.packages:
+            self._metadata.pop(pkg_name, None)
+
+    def update_package(self, pkg_name: str, repo: "spack.repo.Repo") -> None:
+        """Updates a package in the metadata index.
+
+        Args:
+            pkg_name: name of the package to be updated
+            repo: repository containing the package
+        """
+        data = None
+        if repo.exists(pkg_name):
+            data = metadata_from_package_class(repo.get_pkg_class(pkg_name))
+        self.set_package(pkg_name, data)
+
+    def set_package(self, pkg_name: str, data: Optional[Dict[str, Any]]) -> None:
+        """Replaces the metadata of a package in the metadata index.
+
+        Args:
+            pkg_name: name of the package to be updated
+            data: metadata of the package, as returned by ``metadata_from_package_class``, or
+                None to remove the package from the index
+        """
+        if data is None:
+            self.packages.pop(pkg_name, None)
+        else:
+            self.packages[pkg_name] = data
+        self._metadata.pop(pkg_name, None)
+
+
+class MetadataIndexError(spack.error.SpackError):
+    """Raised when there is a problem with a MetadataIndex."""
@@ -0,0 +1,215 @@
+# Copyright Spack Project Developers. See COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Fetch the sources of many specs concurrently, ahead of their installation.
+
+Sources are fetched in a thread pool, with a bound on the total number of concurrent fetches, and
+on the number of concurrent fetches from the same host. Archives that have a checksum are verified
+and stored in the fetch cache (:data:`spack.caches.FETCH_CACHE`), from which the stages of source
+builds are then populated."""
+
+import concurrent.futures
+import contextlib
+import threading
+import urllib.parse
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import spack.config
+import spack.fetch_strategy
+import spack.spec
+import spack.util.parallel
+from spack.version import GitVersion
+
+#: Maximum number of concurrent fetches
+MAX_FETCHES = 16
+
+#: Maximum number of concurrent fetches from the same host
+MAX_FETCHES_PER_HOST = 4
+
+
+def _is_thread_safe(fetcher: spack.fetch_strategy.FetchStrategy) -> bool:
+    """Whether a fetcher leaves the working directory of the process alone, so that it can run
+    on a thread. Version control fetchers, and URL fetches through curl, change it."""
+    return isinstance(fetcher, spack.fetch_strategy.URLFetchStrategy) and not spack.config.get(
+        "config:url_fetch_method", "urllib"
+    ).startswith("curl")
+
+
+def can_prefetch(spec: spack.spec.Spec, *, keep_stage: bool = False) -> bool:
+    """Whether the sources of a spec can be fetched ahead of time. That excludes specs without
+    code, externals, develop specs, and specs that can only be fetched after the user confirms
+    it, because their version has no checksum or is deprecated. Since fetches run on threads,
+    specs with any source that is not fetched through urllib, e.g. from a git repository, are
+    excluded too.
+
+    Unless stages are kept, specs are prefetched only into the fetch cache, so specs with sources
+    that cannot be cached are excluded too: they would be fetched again when they are built."""
+    if spec.external or "dev_path" in spec.variants:
+        return False
+
+    pkg = spec.package
+    if not pkg.has_code:
+        return False
+
+    if (
+        spack.config.get("config:checksum")
+        and pkg.version not in pkg.versions
+        and not isinstance(pkg.version, GitVersion)
+    ):
+        return False
+
+    if not spack.config.get("config:deprecated") and pkg.versions.get(pkg.version, {}).get(
+        "deprecated", False
+    ):
+        return False
+
+    fetchers = [stage.default_fetcher for stage in pkg.stage if hasattr(stage, "default_fetcher")]
+    if not all(_is_thread_safe(fetcher) for fetcher in fetchers):
+        return False
+
+    if not keep_stage and not all(fetcher.cachable for fetcher in fetchers):
+        return False
+
+    return True
+
+
+def fetch_host(spec: spack.spec.Spec) -> str:
+    """Returns the host the sources of a spec are fetched from first, i.e. the first source
+    mirror if there is one, else the host in the URL of the package."""
+    stage = spec.package.stage[0]
+    mirrors = getattr(stage, "mirrors", None)
+    if mirrors:
+        url = mirrors[0].fetch_url
+    else:
+        url = getattr(getattr(stage, "default_fetcher", None), "url", None)
+    return urllib.parse.urlparse(url).netloc if isinstance(url, str) else ""
+
+
+def _source_key(spec: spack.spec.Spec) -> str:
+    """Specs with the same key store their sources at the same path in the fetch cache"""
+    mirror_layout = getattr(spec.package.stage[0], "mirror_layout", None)
+    return mirror_layout.path if mirror_layout else spec.dag_hash()
+
+
+class SourcePrefetcher:
+    """Fetches the sources of specs concurrently.
+
+    Fetches start when the object is created, and :meth:`wait` blocks until the sources of a given
+    spec are fetched. Specs whose sources are stored at the same path in the fetch cache are
+    fetched one after the other, so that they don't write to the same cache entry concurrently.
+
+    Example:
+
+        .. code-block:: python
+
+           with SourcePrefetcher(specs) as prefetcher:
+               for spec in specs:
+                   prefetcher.wait(spec)
+    """
+
+    def __init__(
+        self,
+        specs: Iterable[spack.spec.Spec],
+        *,
+        keep_stage: bool = False,
+        jobs: Optional[int] = None,
+        jobs_per_host: int = MAX_FETCHES_PER_HOST,
+    ) -> None:
+        """
+        Args:
+            specs: specs whose sources are fetched. They must satisfy :func:`can_prefetch`, with
+                the same value of ``keep_stage``.
+            keep_stage: whether to keep the stages of the specs after fetching, otherwise the
+                fetched sources are only retained in the fetch cache
+            jobs: maximum number of concurrent fetches
+            jobs_per_host: maximum number of concurrent fetches from the same host
+        """
+        self.keep_stage = keep_stage
+        #: Serializes locking and unlocking stages, since file locks are not thread safe
+        self._stage_lock = threading.Lock()
+
+        #: Specs grouped by the path of their sources in the fetch cache
+        groups: Dict[str, List[spack.spec.Spec]] = {}
+        for spec in specs:
+            groups.setdefault(_source_key(spec), []).append(spec)
+
+        #: Bounds the number of concurrent fetches per host
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        for group in groups.values():
+            host = fetch_host(group[0])
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(jobs_per_host)
+
+        #: Specs and the futures of their fetches, by DAG hash
+        self._futures: Dict[str, Tuple[spack.spec.Spec, concurrent.futures.Future]] = {
+            spec.dag_hash(): (spec, concurrent.futures.Future())
+            for group in groups.values()
+            for spec in group
+        }
+        self._executor = spack.util.parallel.make_thread_executor(
+            max(1, min(len(groups), jobs or MAX_FETCHES))
+        )
+        self._group_futures = [
+            self._executor.submit(self._fetch_group, group) for group in groups.values()
+        ]
+
+    def __contains__(self, spec: spack.spec.Spec) -> bool:
+        return spec.dag_hash() in self._futures
+
+    def __enter__(self) -> "SourcePrefetcher":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown()
+
+    def _fetch_group(self, group: List[spack.spec.Spec]) -> None:
+        """Fetches the sources of specs one after the other"""
+        with self._host_slots[fetch_host(group[0])]:
+            for spec in group:
+                future = self._futures[spec.dag_hash()][1]
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    pkg = spec.package
+                    pkg.stage.keep = self.keep_stage
+                    with self._locked(pkg.stage):
+                        pkg.do_fetch()
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(None)
+
+    @contextlib.contextmanager
+    def _locked(self, stage):
+        """Like entering the context of a stage, but safe to use from multiple threads"""
+        with self._stage_lock:
+            stage.__enter__()
+        try:
+            yield
+        except BaseException as e:
+            with self._stage_lock:
+                stage.__exit__(type(e), e, e.__traceback__)
+            raise
+        with self._stage_lock:
+            stage.__exit__(None, None, None)
+
+    def wait(self, spec: spack.spec.Spec) -> None:
+        """Blocks until the sources of a spec are fetched, and re-raises the error of its fetch,
+        if any. Returns immediately for specs that are not prefetched."""
+        if spec.dag_hash() in self._futures:
+            self._futures[spec.dag_hash()][1].result()
+
+    def as_completed(self) -> Iterator[spack.spec.Spec]:
+        """Yields specs as their fetches complete, successfully or not"""
+        specs = {id(future): spec for spec, future in self._futures.values()}
+        futures = [future for _, future in self._futures.values()]
+        for future in concurrent.futures.as_completed(futures):
+            yield specs[id(future)]
+
+    def shutdown(self) -> None:
+        """Cancels the fetches that did not start yet, and waits for the running ones"""
+        for future in self._group_futures:
+            future.cancel()
+        for _, future in self._futures.values():
+            future.cancel()
+        self._executor.shutdown(wait=True)
@@ -2,25 +2,37 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import collections
+import heapq
 import itertools
 import os
 import re
 import sys
-from typing import Dict, Iterable, List, Optional
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple
 
 import spack.vendor.macholib.mach_o
 import spack.vendor.macholib.MachO
 
+import spack.config
 import spack.llnl.util.filesystem as fs
 import spack.llnl.util.lang
 import spack.llnl.util.tty as tty
 import spack.store
 import spack.util.elf as elf
 import spack.util.executable as executable
+import spack.util.parallel
 from spack.llnl.util.filesystem import readlink, symlink
 from spack.llnl.util.lang import memoized
 
-from .relocate_text import BinaryFilePrefixReplacer, PrefixToPrefix, TextFilePrefixReplacer
+from .relocate_text import (
+    BinaryFilePrefixReplacer,
+    PrefixToPrefix,
+    TextFilePrefixReplacer,
+    find_prefix_offsets,
+    prefix_offsets_in_file,
+)
+
+#: Minimum number of files relocated by each worker process, when relocating in parallel
+FILES_PER_RELOCATION_JOB = 500
 
 
 @memoized
@@ -226,13 +238,80 @@ def relocate_elf_binaries(binaries: Iterable[str], prefix_to_prefix: Dict[str, s
     }
 
     for path in binaries:
-        try:
-            elf.substitute_rpath_and_pt_interp_in_place_or_raise(path, prefix_to_prefix_bin)
-        except elf.ElfCStringUpdatesFailed as e:
-            # Fall back to `patchelf --set-rpath ... --set-interpreter ...`
-            rpaths = e.rpath.new_value.decode("utf-8").split(":") if e.rpath else []
-            interpreter = e.pt_interp.new_value.decode("utf-8") if e.pt_interp else None
-            _set_elf_rpaths_and_interpreter(path, rpaths=rpaths, interpreter=interpreter)
+        _relocate_elf_binary(path, prefix_to_prefix_bin)
+
+
+def _relocate_elf_binary(
+    path: str,
+    prefix_to_prefix_bin: Dict[bytes, bytes],
+    offsets: Optional[Tuple[Optional[int], Optional[int]]] = None,
+) -> bool:
+    """Update the rpath and interpreter of an ELF binary in place if possible, otherwise with
+    patchelf. Returns False if patchelf was used, which can move data around in the file."""
+    try:
+        elf.substitute_rpath_and_pt_interp_in_place_or_raise(path, prefix_to_prefix_bin, offsets)
+        return True
+    except elf.ElfCStringUpdatesFailed as e:
+        # Fall back to `patchelf --set-rpath ... --set-interpreter ...`
+        rpaths = e.rpath.new_value.decode("utf-8").split(":") if e.rpath else []
+        interpreter = e.pt_interp.new_value.decode("utf-8") if e.pt_interp else None
+        _set_elf_rpaths_and_interpreter(path, rpaths=rpaths, interpreter=interpreter)
+        return False
+
+
+def elf_relocation_index_entry(f: IO[bytes], prefixes: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """Returns the offsets in an ELF binary of all occurrences of the prefixes to relocate, and of
+    its rpath and interpreter, so that it can be relocated later without parsing or scanning it.
+    Returns None if the file cannot be parsed as an ELF executable or shared library.
+
+    The entry is a dictionary with the ``size`` of the file, the prefix ``offsets`` as a string of
+    space separated integers (which is much cheaper to load from YAML than a list), and the
+    ``rpath`` and ``interp`` offsets if the binary has an rpath or an interpreter.
+    """
+    try:
+        rpath, interp = elf.rpath_and_pt_interp_offsets(f)
+    except elf.ElfParsingError:
+        return None
+    finally:
+        f.seek(0)
+    offsets = prefix_offsets_in_file(f, [p.encode("utf-8") for p in prefixes])
+    entry: Dict[str, Any] = {
+        "size": os.fstat(f.fileno()).st_size,
+        "offsets": " ".join(str(offset) for offset in offsets),
+    }
+    if rpath is not None:
+        entry["rpath"] = rpath
+    if interp is not None:
+        entry["interp"] = interp
+    return entry
+
+
+def _relocate_indexed_elf_binary(
+    path: str,
+    entry: Dict[str, Any],
+    prefix_to_prefix_bin: Dict[bytes, bytes],
+    binary_replacer: BinaryFilePrefixReplacer,
+) -> bool:
+    """Relocate an ELF binary using its ``elf_relocation_index_entry``. Returns True if prefixes
+    in its strings were replaced."""
+    c_string_offsets = (entry.get("rpath"), entry.get("interp"))
+    if not _relocate_elf_binary(path, prefix_to_prefix_bin, c_string_offsets):
+        # The recorded offsets are no longer valid after patchelf rewrote the file.
+        return binary_replacer.apply_to_filename(path)
+
+    offsets = [int(offset) for offset in entry["offsets"].split()]
+
+    # The rpath and interpreter were just relocated, so prefixes in them may have moved.
+    with open(path, "rb") as f:
+        for start in c_string_offsets:
+            if start is not None:
+                c_string = elf.read_c_string(f, start)
+                offsets.extend(
+                    start + offset
+                    for offset in find_prefix_offsets(c_string, binary_replacer.prefix_to_prefix)
+                )
+
+    return binary_replacer.apply_to_filename_at_offsets(path, offsets)
 
 
 def relocate_links(links: Iterable[str], prefix_to_prefix: Dict[str, str]) -> None:
@@ -279,6 +358,122 @@ def relocate_text_bin(binaries: Iterable[str], prefix_to_prefix: PrefixToPrefix)
     return BinaryFilePrefixReplacer.from_strings_or_bytes(prefix_to_prefix).apply(binaries)
 
 
+def _shard_by_size(files: List[str], num_shards: int) -> List[List[str]]:
+    """Distribute files over shards of roughly equal total size, assigning the largest files
+    first to the shard with the smallest total size."""
+    shards: List[List[str]] = [[] for _ in range(num_shards)]
+    totals = [(0, i) for i in range(num_shards)]
+    for size, path in sorted(((os.lstat(f).st_size, f) for f in files), reverse=True):
+        total, i = heapq.heappop(totals)
+        shards[i].append(path)
+        heapq.heappush(totals, (total + size, i))
+    return shards
+
+
+def _relocate_shard(
+    textfiles: List[str],
+    binaries: List[str],
+    prefix_to_prefix: Dict[str, str],
+    binary_format: Optional[str],
+    text_replacer: TextFilePrefixReplacer,
+    binary_replacer: BinaryFilePrefixReplacer,
+    binary_index: Dict[str, Dict[str, Any]],
+) -> List[str]:
+    # Binaries that changed size since they were indexed are relocated the slow way.
+    indexed = {
+        path: binary_index[path]
+        for path in binaries
+        if path in binary_index and os.lstat(path).st_size == binary_index[path]["size"]
+    }
+    binaries = [path for path in binaries if path not in indexed]
+
+    if binary_format == "macho":
+        relocate_macho_binaries(binaries, prefix_to_prefix)
+    elif binary_format == "elf":
+        relocate_elf_binaries(binaries, prefix_to_prefix)
+    text_replacer.apply(textfiles)
+    changed_files = binary_replacer.apply(binaries)
+
+    prefix_to_prefix_bin = {
+        k.encode("utf-8"): v.encode("utf-8") for k, v in prefix_to_prefix.items()
+    }
+    for path, entry in indexed.items():
+        if _relocate_indexed_elf_binary(path, entry, prefix_to_prefix_bin, binary_replacer):
+            changed_files.append(path)
+    return changed_files
+
+
+def relocate_files(
+    textfiles: List[str],
+    binaries: List[str],
+    prefix_to_prefix: Dict[str, str],
+    binary_format: Optional[str] = None,
+    jobs: Optional[int] = None,
+    binary_index: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> List[str]:
+    """Relocate text files, and binaries of the given format, from the original installation
+    prefixes to the new prefixes. When there are many files, they are sharded by size over a pool
+    of worker processes, each of which compiles the prefix regexes only once. Files are modified
+    in place, so hardlinks must be deduplicated from the input lists.
+
+    Args:
+        textfiles: text files to be relocated
+        binaries: binaries to be relocated
+        prefix_to_prefix: ordered prefix to prefix mapping
+        binary_format: either ``"elf"`` or ``"macho"`` to relocate the rpaths and dependencies
+            of binaries, or None to only replace prefixes in their strings
+        jobs: maximum number of worker processes, defaults to the configured number of jobs
+        binary_index: ``elf_relocation_index_entry`` of binaries by path, recorded when they were
+            created. Indexed binaries are relocated at the recorded offsets instead of being
+            parsed and scanned, as long as their size did not change. Only used for ELF binaries,
+            and only valid if all prefixes to relocate were looked for when creating the index.
+
+    Returns:
+        The binaries whose strings were modified
+    """
+    text_replacer = TextFilePrefixReplacer.from_strings_or_bytes(prefix_to_prefix)
+    binary_replacer = BinaryFilePrefixReplacer.from_strings_or_bytes(prefix_to_prefix)
+
+    # Relocation of Mach-O binaries rewrites their load commands, so offsets are not reliable.
+    if binary_format != "elf" or binary_index is None:
+        binary_index = {}
+
+    num_files = len(textfiles) + len(binaries)
+    jobs = min(
+        jobs or spack.config.determine_number_of_jobs(parallel=True),
+        num_files // FILES_PER_RELOCATION_JOB,
+    )
+    if jobs <= 1:
+        return _relocate_shard(
+            textfiles,
+            binaries,
+            prefix_to_prefix,
+            binary_format,
+            text_replacer,
+            binary_replacer,
+            binary_index,
+        )
+
+    shards: List[Tuple[List[str], List[str]]] = list(
+        zip(_shard_by_size(textfiles, jobs), _shard_by_size(binaries, jobs))
+    )
+    with spack.util.parallel.make_concurrent_executor(jobs) as executor:
+        futures = [
+            executor.submit(
+                _relocate_shard,
+                shard_textfiles,
+                shard_binaries,
+                prefix_to_prefix,
+                binary_format,
+                text_replacer,
+                binary_replacer,
+                {path: binary_index[path] for path in shard_binaries if path in binary_index},
+            )
+            for shard_textfiles, shard_binaries in shards
+        ]
+        return [binary for future in futures for binary in future.result()]
+
+
 def is_macho_magic(magic: bytes) -> bool:
     return (
         # In order of popularity: 64-bit mach-o le/be, 32-bit mach-o le/be.
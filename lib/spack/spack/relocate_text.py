@@ -5,8 +5,12 @@
 """This module contains pure-Python classes and functions for replacing
 paths inside text files and binaries."""
 
+import io
+import mmap
+import os
 import re
-from typing import IO, Dict, Iterable, List, Union
+from contextlib import contextmanager
+from typing import IO, Dict, Generator, Iterable, List, Optional, Tuple, Union
 
 import spack.error
 from spack.llnl.util.lang import PatternBytes
@@ -14,6 +18,10 @@
 Prefix = Union[str, bytes]
 PrefixToPrefix = Union[Dict[str, str], Dict[bytes, bytes]]
 
+#: Files of at least this size are scanned through a read-only memory map, so that they are not
+#: read in memory when they don't contain any of the prefixes to replace
+MMAP_THRESHOLD = 1 << 20
+
 
 def encode_path(p: Prefix) -> bytes:
     return p if isinstance(p, bytes) else p.encode("utf-8")
@@ -48,6 +56,58 @@ def filter_identity_mappings(prefix_to_prefix: Dict[bytes, bytes]) -> Dict[bytes
     return {k: v for k, v in prefix_to_prefix.items() if k != v}
 
 
+@contextmanager
+def _file_contents(f: IO[bytes]) -> Generator[Union[bytes, mmap.mmap], None, None]:
+    """Contents of a file opened in binary mode, from its current position. Large files are
+    memory mapped instead of read."""
+    try:
+        fileno = f.fileno()
+        large = f.tell() == 0 and os.fstat(fileno).st_size >= MMAP_THRESHOLD
+    except (OSError, io.UnsupportedOperation):
+        large = False
+
+    if not large:
+        yield f.read()
+        return
+
+    data = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    try:
+        yield data
+    finally:
+        try:
+            data.close()
+        except BufferError:
+            # Match objects in the traceback of an exception still refer to the memory map, which
+            # is then closed when they are garbage collected.
+            pass
+
+
+def find_prefix_offsets(data: Union[bytes, mmap.mmap], prefixes: Iterable[bytes]) -> List[int]:
+    """Returns the sorted offsets of all, possibly overlapping, occurrences of any of the prefixes
+    in data. A prefix that starts with another prefix only occurs where the shorter one occurs, so
+    only the shortest prefixes are searched for: typically only the install root."""
+    candidates = sorted(set(prefixes), key=len)
+    offsets = set()
+    for i, prefix in enumerate(candidates):
+        if not prefix or any(prefix.startswith(p) for p in candidates[:i]):
+            continue
+        offset = data.find(prefix)
+        while offset != -1:
+            offsets.add(offset)
+            offset = data.find(prefix, offset + 1)
+    return sorted(offsets)
+
+
+def prefix_offsets_in_file(f: IO[bytes], prefixes: Iterable[bytes]) -> List[int]:
+    """Like ``find_prefix_offsets``, for the contents of a file opened in binary mode, which is
+    rewound afterwards."""
+    f.seek(0)
+    with _file_contents(f) as data:
+        offsets = find_prefix_offsets(data, prefixes)
+    f.seek(0)
+    return offsets
+
+
 class PrefixReplacer:
     """Base class for applying a prefix to prefix map to a list of binaries or text files. Derived
     classes implement _apply_to_file to do the actual work, which is different when it comes to
@@ -94,6 +154,11 @@ def apply_to_file(self, f: IO[bytes]) -> bool:
     def _apply_to_file(self, f: IO) -> bool:
         raise NotImplementedError("Derived classes must implement this method")
 
+    def _contains_prefix(self, data: Union[bytes, mmap.mmap]) -> bool:
+        """Fast first pass over the contents of a file, which returns False when no prefix needs
+        to be replaced. Substring search is much faster than the regexes of derived classes."""
+        return any(data.find(prefix) != -1 for prefix in self.prefix_to_prefix)
+
 
 class TextFilePrefixReplacer(PrefixReplacer):
     """This class applies prefix to prefix mappings for relocation
@@ -119,9 +184,11 @@ def _apply_to_file(self, f: IO) -> bool:
         """Text replacement implementation simply reads the entire file
         in memory and applies the combined regex."""
         replacement = lambda m: m.group(1) + self.prefix_to_prefix[m.group(2)] + m.group(3)
-        data = f.read()
-        new_data = re.sub(self.regex, replacement, data)
-        if id(data) == id(new_data):
+        with _file_contents(f) as data:
+            if not self._contains_prefix(data):
+                return False
+            new_data, num_replacements = self.regex.subn(replacement, data)
+        if num_replacements == 0:
             return False
         f.seek(0)
         f.write(new_data)
@@ -201,54 +268,100 @@ def _apply_to_file(self, f: IO[bytes]) -> bool:
         assert f.tell() == 0
 
         # We *could* read binary data in chunks to avoid loading all in memory, but it's nasty to
-        # deal with matches across boundaries, so let's stick to something simple.
-
-        modified = False
-
-        for match in self.regex.finditer(f.read()):
-            # The matching prefix (old) and its replacement (new)
-            old = match.group(1)
-            new = self.prefix_to_prefix[old]
-
-            # Did we find a trailing null within a N + 1 bytes window after the prefix?
-            null_terminated = match.end(0) > match.end(1)
-
-            # Suffix string length, excluding the null byte. Only makes sense if null_terminated
-            suffix_strlen = match.end(0) - match.end(1) - 1
-
-            # How many bytes are we shrinking our string?
-            bytes_shorter = len(old) - len(new)
-
-            # We can't make strings larger.
-            if bytes_shorter < 0:
-                raise CannotGrowString(old, new)
-
-            # If we don't know whether this is a null terminated C-string (we're looking only N + 1
-            # bytes ahead), or if it is and we have a common suffix, we can simply pad with leading
-            # dir separators.
-            elif (
-                not null_terminated
-                or suffix_strlen >= self.suffix_safety_size  # == is enough, but let's be defensive
-                or old[-self.suffix_safety_size + suffix_strlen :]
-                == new[-self.suffix_safety_size + suffix_strlen :]
-            ):
-                replacement = b"/" * bytes_shorter + new
-
-            # If it *was* null terminated, all that matters is that we can leave N bytes of old
-            # suffix in place. Note that > is required since we also insert an additional null
-            # terminator.
-            elif bytes_shorter > self.suffix_safety_size:
-                replacement = new + match.group(2)  # includes the trailing null
-
-            # Otherwise... we can't :(
-            else:
-                raise CannotShrinkCString(old, new, match.group()[:-1])
-
-            f.seek(match.start())
-            f.write(replacement)
-            modified = True
+        # deal with matches across boundaries, so let's stick to something simple: large files are
+        # memory mapped instead. All replacements are determined before the file is modified.
+        replacements: List[Tuple[int, bytes]] = []
 
-        return modified
+        with _file_contents(f) as data:
+            if self._contains_prefix(data):
+                replacements = [
+                    self._replacement(match.start(), match.group(1), match.group(2))
+                    for match in self.regex.finditer(data)
+                ]
+
+        return self._write_replacements(f, replacements)
+
+    def apply_to_filename_at_offsets(self, filename: str, offsets: Iterable[int]) -> bool:
+        """Same as ``apply_to_filename``, but only looks for prefixes at the given offsets instead
+        of scanning the whole file. The offsets must include every offset at which any of the
+        prefixes to replace occurs, as returned by ``find_prefix_offsets`` on the same file.
+
+        Returns:
+            bool: True if file was modified
+        """
+        if self.is_noop:
+            return False
+
+        replacements: List[Tuple[int, bytes]] = []
+
+        with open(filename, "rb+") as f:
+            with _file_contents(f) as data:
+                # Mimic the leftmost, non-overlapping matches of the regex in _apply_to_file
+                end = 0
+                for start in sorted(set(offsets)):
+                    if start < end:
+                        continue
+                    old = next(
+                        (p for p in self.prefix_to_prefix if data[start : start + len(p)] == p),
+                        None,
+                    )
+                    if old is None:
+                        continue
+                    end = start + len(old)
+                    lookahead = data[end : end + self.suffix_safety_size + 1]
+                    null = lookahead.find(b"\0")
+                    suffix = lookahead[: null + 1] if null != -1 else None
+                    if suffix is not None:
+                        end += len(suffix)
+                    replacements.append(self._replacement(start, old, suffix))
+
+            return self._write_replacements(f, replacements)
+
+    @staticmethod
+    def _write_replacements(f: IO[bytes], replacements: List[Tuple[int, bytes]]) -> bool:
+        for start, replacement in replacements:
+            f.seek(start)
+            f.write(replacement)
+        return bool(replacements)
+
+    def _replacement(self, start: int, old: bytes, suffix: Optional[bytes]) -> Tuple[int, bytes]:
+        """Returns the offset and the bytes that replace the prefix ``old`` found at offset
+        ``start``, where ``suffix`` is the null terminated string following it within the
+        lookahead window, if any."""
+        new = self.prefix_to_prefix[old]
+
+        # Suffix string length, excluding the null byte. Only makes sense if null terminated
+        suffix_strlen = len(suffix) - 1 if suffix is not None else -1
+
+        # How many bytes are we shrinking our string?
+        bytes_shorter = len(old) - len(new)
+
+        # We can't make strings larger.
+        if bytes_shorter < 0:
+            raise CannotGrowString(old, new)
+
+        # If we don't know whether this is a null terminated C-string (we're looking only N + 1
+        # bytes ahead), or if it is and we have a common suffix, we can simply pad with leading
+        # dir separators.
+        elif (
+            suffix is None
+            or suffix_strlen >= self.suffix_safety_size  # == is enough, but let's be defensive
+            or old[-self.suffix_safety_size + suffix_strlen :]
+            == new[-self.suffix_safety_size + suffix_strlen :]
+        ):
+            replacement = b"/" * bytes_shorter + new
+
+        # If it *was* null terminated, all that matters is that we can leave N bytes of old
+        # suffix in place. Note that > is required since we also insert an additional null
+        # terminator.
+        elif bytes_shorter > self.suffix_safety_size:
+            replacement = new + suffix  # includes the trailing null
+
+        # Otherwise... we can't :(
+        else:
+            raise CannotShrinkCString(old, new, old + suffix[:-1])
+
+        return start, replacement
 
 
 class BinaryTextReplaceError(spack.error.SpackError):
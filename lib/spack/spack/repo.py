@@ -44,6 +44,7 @@
 import spack.llnl.util.filesystem as fs
 import spack.llnl.util.lang
 import spack.llnl.util.tty as tty
+import spack.package_metadata
 import spack.patch
 import spack.paths
 import spack.provider_index
@@ -54,6 +55,7 @@
 import spack.util.hash
 import spack.util.lock
 import spack.util.naming as nm
+import spack.util.parallel
 import spack.util.path
 import spack.util.spack_yaml as syaml
 from spack.llnl.util.filesystem import working_dir
@@ -452,7 +454,12 @@ def __len__(self) -> int:
 
 
 class Indexer(metaclass=abc.ABCMeta):
-    """Adaptor for indexes that need to be generated when repos are updated."""
+    """Adaptor for indexes that need to be generated when repos are updated.
+
+    Updates are split in two steps, so that packages can be imported in worker processes:
+    ``fragment`` computes the part of the index of a single package, and ``merge_fragment``
+    replaces the entries of that package in the index with the fragment.
+    """
 
     def __init__(self, repository):
         self.repository = repository
@@ -480,13 +487,28 @@ def needs_update(self, pkg) -> bool:
         """
         return False
 
+    def modules(self) -> List[str]:
+        """Paths of the Python modules, other than package files, that the index depends on.
+        When any of them is newer than the index, the index is updated for all packages."""
+        return []
+
     @abc.abstractmethod
     def read(self, stream):
         """Read this index from a provided file object."""
 
     @abc.abstractmethod
+    def fragment(self, pkg_fullname):
+        """Compute the part of the index for a single package. The result must be picklable,
+        since this may be called in a worker process."""
+
+    @abc.abstractmethod
+    def merge_fragment(self, pkg_fullname, fragment):
+        """Replace the entries of a package in the index in memory with a fragment computed
+        by ``fragment``."""
+
     def update(self, pkg_fullname):
         """Update the index in memory with information about a package."""
+        self.merge_fragment(pkg_fullname, self.fragment(pkg_fullname))
 
     @abc.abstractmethod
     def write(self, stream):
@@ -502,8 +524,12 @@ def _create(self) -> spack.tag.TagIndex:
     def read(self, stream):
         self.index = spack.tag.TagIndex.from_json(stream)
 
-    def update(self, pkg_fullname):
-        self.index.update_package(pkg_fullname.split(".")[-1], self.repository)
+    def fragment(self, pkg_fullname):
+        pkg_cls = self.repository.get_pkg_class(pkg_fullname.split(".")[-1])
+        return list(getattr(pkg_cls, "tags", []))
+
+    def merge_fragment(self, pkg_fullname, fragment):
+        self.index.set_package_tags(pkg_fullname.split(".")[-1], fragment)
 
     def write(self, stream):
         self.index.to_json(stream)
@@ -518,15 +544,64 @@ def _create(self) -> "spack.provider_index.ProviderIndex":
     def read(self, stream):
         self.index = spack.provider_index.ProviderIndex.from_json(stream, self.repository)
 
-    def update(self, pkg_fullname):
+    def fragment(self, pkg_fullname):
         name = pkg_fullname.split(".")[-1]
         is_virtual = (
             not self.repository.exists(name) or self.repository.get_pkg_class(name).virtual
         )
         if is_virtual:
+            return None
+        partial_index = self._create()
+        partial_index.update(pkg_fullname)
+        return partial_index.providers
+
+    def merge_fragment(self, pkg_fullname, fragment):
+        if fragment is None:
             return
+        partial_index = self._create()
+        partial_index.providers = fragment
         self.index.remove_provider(pkg_fullname)
-        self.index.update(pkg_fullname)
+        self.index.merge(partial_index)
+
+    def write(self, stream):
+        self.index.to_json(stream)
+
+
+class MetadataIndexer(Indexer):
+    """Lifecycle methods for the metadata of packages."""
+
+    def _create(self) -> spack.package_metadata.MetadataIndex:
+        return spack.package_metadata.MetadataIndex()
+
+    def read(self, stream):
+        self.index = spack.package_metadata.MetadataIndex.from_json(stream)
+
+    def modules(self) -> List[str]:
+        # Directives are inherited from the build systems of the repository, or of the builtin
+        # repository for packages of other repositories. The format of the metadata is defined
+        # in spack.package_metadata.
+        dirs = {self.repository.build_systems_path}
+        with contextlib.suppress(ImportError, ValueError):
+            builtin = importlib.util.find_spec("spack_repo.builtin.build_systems")
+            if builtin is not None and builtin.submodule_search_locations:
+                dirs.update(builtin.submodule_search_locations)
+        return [spack.package_metadata.__file__] + [
+            os.path.join(d, f)
+            for d in sorted(dirs)
+            if os.path.isdir(d)
+            for f in os.listdir(d)
+            if f.endswith(".py")
+        ]
+
+    def fragment(self, pkg_fullname):
+        name = pkg_fullname.split(".")[-1]
+        if not self.repository.exists(name):
+            return None
+        pkg_cls = self.repository.get_pkg_class(name)
+        return spack.package_metadata.metadata_from_package_class(pkg_cls)
+
+    def merge_fragment(self, pkg_fullname, fragment):
+        self.index.set_package(pkg_fullname.split(".")[-1], fragment)
 
     def write(self, stream):
         self.index.to_json(stream)
@@ -551,8 +626,36 @@ def read(self, stream):
     def write(self, stream):
         self.index.to_json(stream)
 
-    def update(self, pkg_fullname):
-        self.index.update_package(pkg_fullname)
+    def fragment(self, pkg_fullname):
+        pkg_cls = self.repository.get_pkg_class(pkg_fullname)
+        return spack.patch.PatchCache._index_patches(pkg_cls, self.repository)
+
+    def merge_fragment(self, pkg_fullname, fragment):
+        self.index.replace_package(pkg_fullname, fragment)
+
+
+#: Minimum number of packages to update in the indexes of a repository, to do it in parallel
+_PARALLEL_INDEX_THRESHOLD = 64
+
+
+def _index_packages(
+    args: Tuple["Repo", Dict[str, Type[Indexer]], List[Tuple[str, List[str]]]],
+) -> Dict[str, Dict[str, Any]]:
+    """Computes the index fragments of a few packages, possibly in a worker process.
+
+    Args:
+        args: repository, types of its indexers by name, and list of packages paired with the
+            names of the indexers to update for them
+
+    Returns:
+        Fragments of each package, by indexer name
+    """
+    repository, indexer_types, packages = args
+    indexers = {name: indexer_type(repository) for name, indexer_type in indexer_types.items()}
+    return {
+        pkg_fullname: {name: indexers[name].fragment(pkg_fullname) for name in names}
+        for pkg_fullname, names in packages
+    }
 
 
 class RepoIndex:
@@ -611,45 +714,114 @@ def _build_all_indexes(self):
         because the main bottleneck here is loading all the packages.  It
         can take tens of seconds to regenerate sequentially, and we'd
         rather only pay that cost once rather than on several
-        invocations."""
-        for name, indexer in self.indexers.items():
-            self.indexes[name] = self._build_index(name, indexer)
-
-    def _build_index(self, name: str, indexer: Indexer):
-        """Determine which packages need an update, and update indexes."""
-
+        invocations. Packages are loaded only once for all indexes, and
+        in parallel when many of them need an update."""
         # Filename of the provider index cache (we assume they're all json)
         from spack.spec import SPECFILE_FORMAT_VERSION
 
-        cache_filename = f"{name}/{self.namespace}-specfile_v{SPECFILE_FORMAT_VERSION}-index.json"
+        with contextlib.ExitStack() as stack:
+            # Indexes being rewritten, and the packages that need an update in each of them
+            outdated: Dict[str, Tuple[Indexer, Any, List[str]]] = {}
 
-        # Compute which packages needs to be updated in the cache
-        index_mtime = self.cache.mtime(cache_filename)
-        needs_update = self.checker.modified_since(index_mtime)
+            for name, indexer in self.indexers.items():
+                cache_filename = (
+                    f"{name}/{self.namespace}-specfile_v{SPECFILE_FORMAT_VERSION}-index.json"
+                )
 
-        index_existed = self.cache.init_entry(cache_filename)
-        if index_existed and not needs_update:
-            # If the index exists and doesn't need an update, read it
-            with self.cache.read_transaction(cache_filename) as f:
-                indexer.read(f)
+                # Compute which packages needs to be updated in the cache
+                index_mtime = self.cache.mtime(cache_filename)
+                needs_update = self._modified_since(indexer, index_mtime)
 
-        else:
-            # Otherwise update it and rewrite the cache file
-            with self.cache.write_transaction(cache_filename) as (old, new):
+                index_existed = self.cache.init_entry(cache_filename)
+                if index_existed and not needs_update:
+                    # If the index exists and doesn't need an update, read it
+                    with self.cache.read_transaction(cache_filename) as f:
+                        indexer.read(f)
+                    self.indexes[name] = indexer.index
+                    continue
+
+                # Otherwise update it and rewrite the cache file. Write transactions are always
+                # entered in the same order, so concurrent processes can't deadlock.
+                old, new = stack.enter_context(self.cache.write_transaction(cache_filename))
                 indexer.read(old) if old else indexer.create()
 
                 # Compute which packages needs to be updated **again** in case someone updated them
                 # while we waited for the lock
                 new_index_mtime = self.cache.mtime(cache_filename)
                 if new_index_mtime != index_mtime:
-                    needs_update = self.checker.modified_since(new_index_mtime)
+                    needs_update = self._modified_since(indexer, new_index_mtime)
 
-                for pkg_name in needs_update:
-                    indexer.update(f"{self.namespace}.{pkg_name}")
+                outdated[name] = (indexer, new, needs_update)
+
+            if not outdated:
+                return
+
+            fragments = self._index_fragments(
+                {name: indexer for name, (indexer, _, _) in outdated.items()},
+                {name: needs_update for name, (_, _, needs_update) in outdated.items()},
+            )
 
+            for name, (indexer, new, needs_update) in outdated.items():
+                for pkg_name in needs_update:
+                    pkg_fullname = f"{self.namespace}.{pkg_name}"
+                    indexer.merge_fragment(pkg_fullname, fragments[pkg_fullname][name])
                 indexer.write(new)
+                self.indexes[name] = indexer.index
 
-        return indexer.index
+    def _modified_since(self, indexer: Indexer, since: float) -> List[str]:
+        """Returns the packages modified since a given time, or all of them if any of the other
+        modules the index depends on was modified since then."""
+        for path in indexer.modules():
+            try:
+                if os.stat(path).st_mtime > since:
+                    return list(self.checker)
+            except OSError:
+                pass
+        return self.checker.modified_since(since)
+
+    def _index_fragments(
+        self, indexers: Dict[str, Indexer], needs_update: Dict[str, List[str]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Computes the index fragments of the packages that need an update, loading each
+        package only once. Packages are split among worker processes, if there are enough of
+        them to make it worthwhile.
+
+        Args:
+            indexers: indexers that need an update, by name
+            needs_update: packages to update in each index, by indexer name
+
+        Returns:
+            Fragments of each package, by indexer name
+        """
+        names_by_package: Dict[str, List[str]] = {}
+        for name, pkg_names in needs_update.items():
+            for pkg_name in pkg_names:
+                names_by_package.setdefault(f"{self.namespace}.{pkg_name}", []).append(name)
+        packages = list(names_by_package.items())
+
+        repository = next(iter(indexers.values())).repository
+        indexer_types = {name: type(indexer) for name, indexer in indexers.items()}
+
+        parallel = spack.util.parallel.ENABLE_PARALLELISM
+        if not parallel or len(packages) < _PARALLEL_INDEX_THRESHOLD:
+            return _index_packages((repository, indexer_types, packages))
+
+        jobs = spack.config.determine_number_of_jobs(parallel=True)
+        if jobs < 2:
+            return _index_packages((repository, indexer_types, packages))
+
+        # Give a few chunks to each worker, so that they're evenly loaded
+        chunk_size = max(len(packages) // (4 * jobs), 1)
+        chunks = [
+            (repository, indexer_types, packages[i : i + chunk_size])
+            for i in range(0, len(packages), chunk_size)
+        ]
+
+        fragments: Dict[str, Dict[str, Any]] = {}
+        with spack.util.parallel.make_concurrent_executor(jobs) as executor:
+            for result in executor.map(_index_packages, chunks):
+                fragments.update(result)
+        return fragments
 
 
 class RepoPath:
@@ -898,6 +1070,10 @@ def get_pkg_class(self, pkg_name: str) -> Type["spack.package_base.PackageBase"]
         """Find a class for the spec's package and return the class object."""
         return self.repo_for_pkg(pkg_name).get_pkg_class(pkg_name)
 
+    def package_metadata(self, pkg_name: str) -> spack.package_metadata.PackageMetadata:
+        """Find the metadata of the spec's package, without importing its package file."""
+        return self.repo_for_pkg(pkg_name).package_metadata(pkg_name)
+
     @autospec
     def dump_provenance(self, spec, path):
         """Dump provenance information for a spec to a particular path.
@@ -1272,6 +1448,7 @@ def index(self) -> RepoIndex:
             self._repo_index.add_indexer("providers", ProviderIndexer(self))
             self._repo_index.add_indexer("tags", TagIndexer(self))
             self._repo_index.add_indexer("patches", PatchIndexer(self))
+            self._repo_index.add_indexer("metadata", MetadataIndexer(self))
         return self._repo_index
 
     @property
@@ -1289,6 +1466,23 @@ def patch_index(self) -> spack.patch.PatchCache:
         """Index of patches and packages they're defined on."""
         return self.index["patches"]
 
+    @property
+    def metadata_index(self) -> spack.package_metadata.MetadataIndex:
+        """Index of the metadata of each package, which can be read without importing them."""
+        return self.index["metadata"]
+
+    def package_metadata(self, pkg_name: str) -> spack.package_metadata.PackageMetadata:
+        """Returns the metadata of a package, without importing its ``package.py`` file.
+
+        The metadata reflects the directives in the package file, and ignores the package
+        attributes overridden in configuration.
+        """
+        _, pkg_name = self.partition_package_name(pkg_name)
+        metadata = self.metadata_index.get(pkg_name)
+        if metadata is None:
+            raise UnknownPackageError(pkg_name, self)
+        return metadata
+
     def providers_for(self, virtual: Union[str, "spack.spec.Spec"]) -> List["spack.spec.Spec"]:
         providers = self.provider_index.providers_for(virtual)
         if not providers:
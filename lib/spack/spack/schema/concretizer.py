@@ -252,6 +252,30 @@
                         "description": "Limit on the number of concretization results that "
                         "Spack will cache (0 disables pruning)",
                     },
+                    "size_limit": {
+                        "type": "integer",
+                        "minimum": 0,
+                        "description": "Limit on the size in bytes of the concretization "
+                        "results that Spack will cache (0 disables pruning)",
+                    },
+                },
+            },
+            "setup_cache": {
+                "type": "object",
+                "description": "Configuration for caching the facts that the solver derives "
+                "from the directives of each package",
+                "properties": {
+                    "enable": {
+                        "type": "boolean",
+                        "description": "Whether to reuse the facts derived from package "
+                        "directives across concretizations, for packages whose inputs did not "
+                        "change",
+                    },
+                    "url": {
+                        "type": "string",
+                        "description": "Path to the location where Spack will root the "
+                        "setup cache",
+                    },
                 },
             },
             "externals": {
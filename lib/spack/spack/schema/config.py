@@ -190,6 +190,26 @@
                 "minimum": 1,
                 "description": "How long to wait to lock the Spack installation database",
             },
+            "db_lazy_read": {
+                "type": "boolean",
+                "description": "When true, the specs in the installation database are "
+                "constructed only when they are accessed, instead of when the database is read. "
+                "Lazily constructed specs are linked only to the dependents that have been "
+                "constructed too",
+            },
+            "db_format": {
+                "type": "string",
+                "enum": ["json", "binary"],
+                "description": "Format of the Spack installation database file. Use `spack "
+                "reindex` to convert an existing database after changing it",
+            },
+            "db_journal_size": {
+                "type": "integer",
+                "minimum": 0,
+                "description": "Maximum number of write transactions appended to the journal of "
+                "the installation database before it is compacted into a new database file. 0 "
+                "disables the journal, and every write rewrites the database file",
+            },
             "package_lock_timeout": {
                 "anyOf": [{"type": "integer", "minimum": 1}, {"type": "null"}],
                 "description": "How long to wait when attempting to modify a package (null for "
@@ -214,12 +234,39 @@
                 "items": {"type": "string"},
                 "description": "Additional paths to search for external packages",
             },
+            "buildcache_compression": {
+                "type": "object",
+                "additionalProperties": False,
+                "properties": {
+                    "type": {
+                        "type": "string",
+                        "enum": ["gzip", "zstd"],
+                        "description": "Compression format of the tarballs pushed to "
+                        "buildcaches. zstd requires Python 3.14+ or the zstandard module",
+                    },
+                    "level": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": 22,
+                        "description": "Compression level, from 1 to 9 for gzip and from 1 to "
+                        "22 for zstd. Defaults to 6 for gzip and 3 for zstd",
+                    },
+                },
+                "description": "Compression of the tarballs pushed to buildcaches",
+            },
             "binary_index_ttl": {
                 "type": "integer",
                 "minimum": 0,
                 "description": "Number of seconds a buildcache's index.json is cached locally "
                 "before probing for updates",
             },
+            "binary_index_timeout": {
+                "type": "integer",
+                "minimum": 0,
+                "description": "Maximum number of seconds to wait for the indices of buildcaches "
+                "to be fetched, after which unresponsive buildcaches are skipped (0 disables "
+                "the timeout)",
+            },
             "aliases": {
                 "type": "object",
                 "additionalProperties": {"type": "string"},
@@ -231,6 +278,13 @@
                 "enum": ["old", "new"],
                 "description": "Which installer to use. The new installer is experimental.",
             },
+            "concurrent_binary_installs": {
+                "type": "integer",
+                "minimum": 1,
+                "description": "The maximum number of concurrent installs from binaries of the "
+                "new installer, which are not limited by concurrent_packages. Defaults to the "
+                "number of build jobs",
+            },
         },
     }
 }
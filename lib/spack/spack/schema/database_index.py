@@ -34,6 +34,7 @@
                 },
             },
             "version": {"type": "string"},
+            "snapshot": {"type": "string"},
         },
     }
 }
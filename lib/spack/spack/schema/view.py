@@ -50,6 +50,13 @@
                             "description": "How files are linked in the view: 'symlink' "
                             "(default), 'hardlink', or 'copy'",
                         },
+                        "incremental": {
+                            "type": "boolean",
+                            "description": "Update the view in place by linking and unlinking "
+                            "only the files of added and removed specs, instead of regenerating "
+                            "it from scratch. Updates are not atomic, and views of link_type "
+                            "'copy' are always regenerated",
+                        },
                         "select": {
                             "type": "array",
                             "items": {"type": "string"},
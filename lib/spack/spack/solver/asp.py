@@ -5,6 +5,7 @@
 import collections.abc
 import enum
 import gzip
+import hashlib
 import io
 import itertools
 import json
@@ -14,6 +15,7 @@
 import random
 import re
 import sys
+import tempfile
 import time
 import warnings
 from typing import (
@@ -44,11 +46,13 @@
 import spack.deptypes as dt
 import spack.environment as ev
 import spack.error
+import spack.llnl.util.filesystem
 import spack.llnl.util.lang
 import spack.llnl.util.tty as tty
 import spack.package_base
 import spack.package_prefs
 import spack.platforms
+import spack.package_metadata
 import spack.repo
 import spack.solver.splicing
 import spack.spec
@@ -78,10 +82,15 @@
     fn,
     using_libc_compatibility,
 )
-from .input_analysis import create_counter, create_graph_analyzer
+from .input_analysis import PossibleDependencyGraph, create_counter, create_graph_analyzer
 from .requirements import RequirementKind, RequirementOrigin, RequirementParser, RequirementRule
-from .reuse import ReusableSpecsSelector, create_external_parser
-from .runtimes import RuntimePropertyRecorder, all_libcs, external_config_with_implicit_externals
+from .reuse import ReusableSpecsSelector, create_external_parser, prune_reusable_specs
+from .runtimes import (
+    RuntimePropertyRecorder,
+    all_libcs,
+    external_config_with_implicit_externals,
+    libc_is_compatible,
+)
 from .versions import Provenance
 
 GitOrStandardVersion = Union[vn.GitVersion, vn.StandardVersion]
@@ -224,14 +233,6 @@ def dag_closure_by_deptype(
     return facts
 
 
-def libc_is_compatible(lhs: spack.spec.Spec, rhs: spack.spec.Spec) -> bool:
-    return (
-        lhs.name == rhs.name
-        and lhs.external_path == rhs.external_path
-        and lhs.version >= rhs.version
-    )
-
-
 def c_compiler_runs(compiler) -> bool:
     return CompilerPropertyDetector(compiler).compiler_verbose_output() is not None
 
@@ -515,64 +516,189 @@ class ConcretizationCache:
     Serializes solver result objects and statistics to json and stores
     at a given endpoint in a cache associated by the sha256 of the
     asp problem and the involved control files.
+
+    Entries are sharded in subdirectories named after the first character of their key. Each
+    shard has its own lock, and an access log where the key and the size of an entry are
+    appended every time the entry is stored or fetched. The access log drives the LRU pruning
+    of its shard, so processes sharing the cache only contend on the shards they use, and the
+    cache is never scanned as a whole.
     """
 
+    #: Name of the lock file in each shard
+    LOCK_FILE = ".lock"
+
+    #: Name of the access log in each shard
+    ACCESS_LOG = ".access"
+
+    #: Number of shards, one for each character of the base32 alphabet of the keys
+    NUMBER_OF_SHARDS = 32
+
+    #: Name of the file marking that the entries of the former flat layout have been moved into
+    #: their shards
+    SHARDED_MARKER = ".sharded"
+
+    #: Age in seconds after which temporary files are considered left over by killed processes
+    STALE_TMP_FILE_AGE = 3600
+
     def __init__(self, root: Union[str, None] = None):
         root = root or spack.config.get("concretizer:concretization_cache:url", None)
         if root is None:
             root = os.path.join(spack.caches.misc_cache_location(), "concretization")
         self.root = pathlib.Path(spack.util.path.canonicalize_path(root))
         self.root.mkdir(parents=True, exist_ok=True)
-        self._lockfile = self.root / ".cc_lock"
+
+        #: Number of successful lookups, failed lookups and evicted entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Shards that have been accessed since the last cleanup
+        self._accessed_shards: Set[pathlib.Path] = set()
 
     def cleanup(self):
-        """Prunes the concretization cache according to configured entry
-        count limits. Cleanup is done in LRU ordering."""
+        """Prunes the shards accessed since the last cleanup, according to the configured
+        entry count and size limits. Cleanup is done in LRU ordering.
+
+        Limits are split evenly among shards. When a shard exceeds one of its limits, the least
+        recently used entries are removed until 10% of the limit has been freed.
+        """
         entry_limit = spack.config.get("concretizer:concretization_cache:entry_limit", 1000)
+        size_limit = spack.config.get("concretizer:concretization_cache:size_limit", 0)
+        shard_entry_limit = -(-entry_limit // self.NUMBER_OF_SHARDS)
+        shard_size_limit = -(-size_limit // self.NUMBER_OF_SHARDS)
 
-        # determine if we even need to clean up
-        entries = list(self.cache_entries())
-        if len(entries) <= entry_limit:
-            return
+        self._shard_flat_layout()
 
-        # collect stat info for mod time about all entries
-        removal_queue = []
-        for entry in entries:
+        shards, self._accessed_shards = self._accessed_shards, set()
+        for shard in sorted(shards):
             try:
-                entry_stat_info = entry.stat()
-                # mtime will always be time of last use as we update it after
-                # each read and obviously after each write
-                mod_time = entry_stat_info.st_mtime
-                removal_queue.append((mod_time, entry))
-            except FileNotFoundError:
-                # don't need to cleanup the file, it's not there!
+                # If we can't get a lock, another process is likely cleaning the same shard, or
+                # the system is busy, but we don't really need to wait just for cache cleanup.
+                with self.write_transaction(shard / self.ACCESS_LOG, timeout=1e-6):
+                    self._cleanup_shard(
+                        shard, entry_limit=shard_entry_limit, size_limit=shard_size_limit
+                    )
+            except lk.LockTimeoutError:
                 pass
 
-        removal_queue.sort()  # sort items for removal, ascending, so oldest first
+    def _shard_flat_layout(self) -> None:
+        """Moves the entries of the former flat layout, directly in the root of the cache, into
+        their shards. This is done only once, and the lock file of that layout is removed."""
+        marker = self.root / self.SHARDED_MARKER
+        if marker.exists():
+            return
+        try:
+            for entry in self.root.iterdir():
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                try:
+                    (self.root / entry.name[0]).mkdir(exist_ok=True)
+                    os.replace(entry, self.root / entry.name[0] / entry.name)
+                except OSError as e:
+                    tty.debug(f"Cannot move {entry} into a shard of the concretization cache: {e}")
+                    self._safe_remove(entry)
+            self._safe_remove(self.root / ".cc_lock")
+            marker.touch()
+        except OSError as e:
+            tty.debug(f"Cannot shard the concretization cache: {e}")
 
-        # Try to remove the oldest half of the cache.
-        for _, entry_to_rm in removal_queue[: entry_limit // 2]:
-            # cache bucket was removed by another process -- that's fine; move on
-            if not entry_to_rm.exists():
-                continue
+    def _remove_stale_tmp_files(self, shard: pathlib.Path) -> None:
+        """Removes temporary files of entries left over by processes that were killed while
+        storing them. Must be called with the shard locked for writing."""
+        expired = time.time() - self.STALE_TMP_FILE_AGE
+        try:
+            for path in shard.iterdir():
+                if path.name in (self.LOCK_FILE, self.ACCESS_LOG) or not path.name.startswith("."):
+                    continue
+                try:
+                    if path.stat().st_mtime < expired:
+                        self._safe_remove(path)
+                except FileNotFoundError:
+                    pass  # stored or removed in the meantime
+        except OSError:
+            pass
 
-            try:
-                with self.write_transaction(entry_to_rm, timeout=1e-6):
-                    self._safe_remove(entry_to_rm)
-            except lk.LockTimeoutError:
-                # if we can't get a lock, it's either
-                # 1) being read, so it's been used recently, i.e. not a good candidate for LRU,
-                # 2) it's already being removed by another process, so we don't care, or
-                # 3) system is busy, but we don't really need to wait just for cache cleanup.
-                pass  # so skip it
-
-    def cache_entries(self):
-        """Generator producing cache entries within a bucket"""
-        for cache_entry in self.root.iterdir():
-            # Lockfile starts with "."
-            # old style concretization cache entries are in directories
-            if not cache_entry.name.startswith(".") and cache_entry.is_file():
-                yield cache_entry
+    def _cleanup_shard(self, shard: pathlib.Path, *, entry_limit: int, size_limit: int) -> None:
+        """Prunes a single shard. Must be called with the shard locked for writing."""
+        self._remove_stale_tmp_files(shard)
+        entries, number_of_records = self._entries_by_last_access(shard)
+        total_size = sum(entries.values())
+
+        over_entries = bool(entry_limit) and len(entries) > entry_limit
+        over_size = bool(size_limit) and total_size > size_limit
+        if over_entries or over_size:
+            target_entries = entry_limit - entry_limit // 10 if over_entries else len(entries)
+            target_size = size_limit - size_limit // 10 if over_size else total_size
+            for name, size in list(entries.items()):
+                if len(entries) <= target_entries and total_size <= target_size:
+                    break
+                self._safe_remove(shard / name)
+                self.evictions += 1
+                total_size -= size
+                del entries[name]
+
+        # Compact the access log, if it has grown much larger than the shard
+        elif number_of_records <= 2 * len(entries) + 16:
+            return
+
+        try:
+            with spack.llnl.util.filesystem.write_tmp_and_move(
+                str(shard / self.ACCESS_LOG), encoding="utf-8"
+            ) as f:
+                f.writelines(f"{name} {size}\n" for name, size in entries.items())
+        except OSError as e:
+            tty.debug(f"Cannot compact the access log of the concretization cache: {e}")
+
+    def _entries_by_last_access(self, shard: pathlib.Path) -> Tuple[Dict[str, int], int]:
+        """Returns the size of the entries in a shard, ordered from the least to the most
+        recently used, and the number of records in the access log of the shard.
+        """
+        try:
+            names = [x.name for x in shard.iterdir() if not x.name.startswith(".")]
+        except FileNotFoundError:
+            return {}, 0
+
+        # Entries that are not in the access log are considered the least recently used
+        sizes: Dict[str, Optional[int]] = dict.fromkeys(names)
+        number_of_records = 0
+        try:
+            with open(shard / self.ACCESS_LOG, "r", encoding="utf-8") as f:
+                for line in f:
+                    number_of_records += 1
+                    record = line.split()
+                    if len(record) != 2 or record[0] not in sizes or not record[1].isdigit():
+                        continue
+                    del sizes[record[0]]
+                    sizes[record[0]] = int(record[1])
+        except FileNotFoundError:
+            pass
+
+        result = {}
+        for name, size in sizes.items():
+            if size is None:
+                try:
+                    size = (shard / name).stat().st_size
+                except FileNotFoundError:
+                    continue
+            result[name] = size
+        return result, number_of_records
+
+    def _record_access(self, cache_path: pathlib.Path) -> None:
+        """Appends an entry to the access log of its shard."""
+        shard = cache_path.parent
+        self._accessed_shards.add(shard)
+        try:
+            size = cache_path.stat().st_size
+            # Appends can happen concurrently, but not while the log is being compacted
+            with self.read_transaction(cache_path, timeout=2):
+                with open(shard / self.ACCESS_LOG, "a", encoding="utf-8") as f:
+                    f.write(f"{cache_path.name} {size}\n")
+        except (OSError, lk.LockTimeoutError) as e:
+            tty.debug(f"Cannot record an access to the concretization cache: {e}")
+
+    def statistics(self) -> Dict[str, int]:
+        """Returns the number of hits, misses and evictions of this cache instance."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
 
     def _results_from_cache(self, cache_entry_file: str) -> Union[Result, None]:
         """Returns a Results object from the concretizer cache
@@ -603,7 +729,7 @@ def _cache_path_from_problem(self, problem: str) -> pathlib.Path:
         """Returns a Path object representing the path to the cache
         entry for the given problem where the problem is the sha256 of the given asp problem"""
         prefix = self._prefix_digest(problem)
-        return self.root / prefix
+        return self.root / prefix[0] / prefix
 
     def _safe_remove(self, cache_dir: pathlib.Path) -> bool:
         """Removes cache entries with handling for the case where the entry has been
@@ -623,20 +749,13 @@ def _safe_remove(self, cache_dir: pathlib.Path) -> bool:
         return False
 
     def _lock(self, path: pathlib.Path) -> lk.Lock:
-        """Returns a lock over the byte range correspnding to the hash of the asp problem.
-
-        ``path`` is a path to a file in the cache, and its basename is the hash of the problem.
+        """Returns the lock of the shard containing the given path.
 
         Args:
-            path: absolute or relative path to concretization cache entry to be locked
+            path: absolute or relative path to a file in a shard of the concretization cache
         """
         return lk.Lock(
-            str(self._lockfile),
-            start=spack.util.hash.base32_prefix_bits(
-                path.name, spack.util.crypto.bit_length(sys.maxsize)
-            ),
-            length=1,
-            desc=f"Concretization cache lock for {path}",
+            str(path.parent / self.LOCK_FILE), desc=f"Concretization cache lock for {path.parent}"
         )
 
     def read_transaction(
@@ -668,17 +787,33 @@ def store(self, problem: str, result: Result, statistics: List) -> None:
 
         Hash membership is computed based on the sha256 of the provided asp
         problem.
+
+        Entries are written to a temporary file and moved into place, so readers never see
+        partial entries, and don't need to take any lock.
         """
         cache_path = self._cache_path_from_problem(problem)
-        with self.write_transaction(cache_path, timeout=30):
-            if cache_path.exists():
-                # if cache path file exists, we already have a cache entry, likely created
-                # by another process.  Exit early.
-                return
-
-            with gzip.open(cache_path, "xb", compresslevel=6) as cache_entry:
-                cache_dict = {"results": result.to_dict(), "statistics": statistics}
+        if cache_path.exists():
+            # if cache path file exists, we already have a cache entry, likely created
+            # by another process.  Exit early.
+            return
+
+        cache_dict = {"results": result.to_dict(), "statistics": statistics}
+        tmp = None
+        try:
+            cache_path.parent.mkdir(exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=cache_path.parent, prefix=f".{cache_path.name}.")
+            with os.fdopen(fd, "wb") as f, gzip.GzipFile(
+                fileobj=f, mode="wb", compresslevel=6
+            ) as cache_entry:
                 cache_entry.write(json.dumps(cache_dict).encode())
+            os.replace(tmp, cache_path)
+        except OSError as e:
+            tty.debug(f"Cannot store an entry in the concretization cache: {e}")
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+            return
+
+        self._record_access(cache_path)
 
     def fetch(self, problem: str) -> Union[Tuple[Result, Dict], Tuple[None, None]]:
         """Returns the concretization cache result for a lookup based on the given problem.
@@ -688,44 +823,101 @@ def fetch(self, problem: str) -> Union[Tuple[Result, Dict], Tuple[None, None]]:
         or returns none if no cache entry was found.
         """
         cache_path = self._cache_path_from_problem(problem)
-        if not cache_path.exists():
-            return None, None  # if exists is false, then there's no chance of a hit
-
         cache_content = None
         try:
-            with self.read_transaction(cache_path, timeout=2):
-                try:
-                    with gzip.open(cache_path, "rb", compresslevel=6) as f:
-                        f.peek(1)  # Try to read at least one byte
-                        f.seek(0)
-                        cache_content = f.read().decode("utf-8")
-
-                except OSError:
-                    # Cache may have been created pre compression check if gzip, and if not,
-                    # read from plaintext otherwise re raise
-                    with open(cache_path, "rb") as f:
-                        # raise if this is a gzip file we failed to open
-                        if GZipFileType().matches_magic(f):
-                            raise
-                        cache_content = f.read().decode()
+            with gzip.open(cache_path, "rb", compresslevel=6) as f:
+                f.peek(1)  # Try to read at least one byte
+                f.seek(0)
+                cache_content = f.read().decode("utf-8")
 
-                except FileNotFoundError:
-                    pass  # cache miss, already cleaned up
+        except FileNotFoundError:
+            pass  # cache miss, or already cleaned up
 
-        except lk.LockTimeoutError:
-            pass  # if the lock times, out skip the cache
+        except OSError:
+            # Cache may have been created pre compression check if gzip, and if not,
+            # read from plaintext otherwise re raise
+            try:
+                with open(cache_path, "rb") as f:
+                    # raise if this is a gzip file we failed to open
+                    if GZipFileType().matches_magic(f):
+                        raise
+                    cache_content = f.read().decode()
+            except FileNotFoundError:
+                pass
 
         if not cache_content:
+            self.misses += 1
             return None, None
 
-        # update mod/access time for use w/ LRU cleanup
-        os.utime(cache_path)
+        self.hits += 1
+        self._record_access(cache_path)
         return (
             self._results_from_cache(cache_content),
             self._stats_from_cache(cache_content),
         )  # type: ignore
 
 
+#: Version of the format of the setup cache entries. Bump it when the facts emitted for the
+#: directives of a package change.
+SETUP_CACHE_FORMAT = 1
+
+
+class SetupCache:
+    """Store for the facts derived from the directives of each package.
+
+    There is one entry per package, that is overwritten whenever the inputs of the package
+    change. Entries are written atomically, and validated against their key when read, so
+    concurrent processes can share the same cache without locking.
+    """
+
+    def __init__(self, root: Union[str, None] = None):
+        root = root or spack.config.get("concretizer:setup_cache:url", None)
+        if root is None:
+            root = os.path.join(spack.caches.misc_cache_location(), "setup")
+        self.root = pathlib.Path(spack.util.path.canonicalize_path(root))
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _cache_path(self, pkg_fullname: str) -> pathlib.Path:
+        return self.root / f"{pkg_fullname}.json"
+
+    def fetch(self, pkg_fullname: str, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the entry for a package, or None if there is no entry with the given key.
+
+        Args:
+            pkg_fullname: fully qualified name of the package
+            key: hash of the inputs of the package
+        """
+        try:
+            with open(self._cache_path(pkg_fullname), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(entry, dict) or entry.get("key") != key:
+            return None
+        return entry
+
+    def store(self, pkg_fullname: str, entry: Dict[str, Any]) -> None:
+        """Stores the entry for a package, replacing any previous entry.
+
+        Args:
+            pkg_fullname: fully qualified name of the package
+            entry: facts of the package, and the key they were computed from
+        """
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.root, prefix=f".{pkg_fullname}.", delete=False, encoding="utf-8"
+            ) as f:
+                tmp = f.name
+                json.dump(entry, f)
+            os.replace(tmp, self._cache_path(pkg_fullname))
+        except OSError as e:
+            tty.debug(f"[SETUP CACHE]: cannot store the entry for {pkg_fullname}: {e}")
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+
+
 def _is_checksummed_git_version(v):
     return isinstance(v, vn.GitVersion) and v.is_commit
 
@@ -1124,6 +1316,12 @@ def solve(
 
         if output.timers:
             timer.write_tty()
+            if conc_cache_enabled and self._conc_cache:
+                cache_stats = self._conc_cache.statistics()
+                print(
+                    "    Concretization cache: {hits} hits, {misses} misses, "
+                    "{evictions} evictions".format(**cache_stats)
+                )
             print()
 
         concretization_stats = concretization_stats or self.control.statistics
@@ -1321,8 +1519,13 @@ class SpackSolverSetup:
     gen: "ProblemInstanceBuilder"
     possible_versions: Dict[str, Dict[GitOrStandardVersion, List[Provenance]]]
 
-    def __init__(self, tests: spack.concretize.TestsType = False):
-        self.possible_graph = create_graph_analyzer()
+    def __init__(
+        self,
+        tests: spack.concretize.TestsType = False,
+        *,
+        possible_graph: Optional[PossibleDependencyGraph] = None,
+    ):
+        self.possible_graph = possible_graph or create_graph_analyzer()
 
         # these are all initialized in setup()
         self.requirement_parser = RequirementParser(spack.config.CONFIG)
@@ -1374,6 +1577,15 @@ def __init__(self, tests: spack.concretize.TestsType = False):
         # If true, we have to load the code for synthesizing splices
         self.enable_splicing: bool = spack.config.CONFIG.get("concretizer:splice:automatic")
 
+        # If not None, the facts derived from package directives are reused across solves
+        self.setup_cache: Optional[SetupCache] = None
+        if spack.config.CONFIG.get("concretizer:setup_cache:enable", False):
+            self.setup_cache = SetupCache()
+        self._input_hashes: Dict[str, str] = {}
+        self._file_hashes: Dict[str, str] = {}
+        # Names of the packages referenced by the facts being recorded, if any
+        self._referenced_names: Optional[Set[str]] = None
+
     def pkg_version_rules(self, pkg: Type[spack.package_base.PackageBase]) -> None:
         """Declares known versions, their origins, and their weights."""
         version_provenance = self.possible_versions[pkg.name]
@@ -1439,7 +1651,7 @@ def target_ranges(
         return [fn.attr("node_target_satisfies", name, target)]
 
     def conflict_rules(self, pkg):
-        for when_spec, conflict_specs in pkg.conflicts.items():
+        for when_spec, conflict_specs in self.pkg_metadata(pkg.name).conflicts().items():
             when_spec_msg = f"conflict constraint {when_spec}"
             when_spec_id = self.condition(when_spec, required_name=pkg.name, msg=when_spec_msg)
             when_spec_str = str(when_spec)
@@ -1492,17 +1704,11 @@ def pkg_rules(self, pkg, tests):
         self.pkg_version_rules(pkg)
         self.gen.newline()
 
-        # variants
-        self.variant_rules(pkg)
-
-        # conflicts
-        self.conflict_rules(pkg)
-
-        # virtuals
-        self.package_provider_rules(pkg)
-
-        # dependencies
-        self.package_dependencies_rules(pkg)
+        # variants, conflicts, virtuals and dependencies
+        if self.setup_cache is not None:
+            self.cached_package_directive_rules(pkg)
+        else:
+            self.package_directive_rules(pkg)
 
         # splices
         if self.enable_splicing:
@@ -1514,6 +1720,186 @@ def pkg_rules(self, pkg, tests):
         self.trigger_rules()
         self.effect_rules()
 
+    def package_directive_rules(self, pkg: Type[spack.package_base.PackageBase]) -> None:
+        """Emits the facts derived from the variants, conflicts, virtuals and dependencies
+        declared by a package.
+        """
+        self.variant_rules(pkg)
+        self.conflict_rules(pkg)
+        self.package_provider_rules(pkg)
+        self.package_dependencies_rules(pkg)
+
+    def cached_package_directive_rules(self, pkg: Type[spack.package_base.PackageBase]) -> None:
+        """Same as ``package_directive_rules``, but reuses the facts in the setup cache if the
+        inputs of the package, and of the packages its directives refer to, didn't change.
+        """
+        assert self.setup_cache is not None, "the setup cache must be enabled"
+        key = self._setup_cache_key(pkg)
+        entry = self.setup_cache.fetch(pkg.fullname, key)
+        if entry is None or any(
+            self._package_inputs_hash(name) != inputs_hash
+            for name, inputs_hash in entry["references"].items()
+        ):
+            entry = self._record_package_directive_rules(pkg)
+            entry["key"] = key
+            self.setup_cache.store(pkg.fullname, entry)
+        self._replay_package_directive_rules(pkg, entry)
+
+    def _setup_cache_key(self, pkg: Type[spack.package_base.PackageBase]) -> str:
+        """Returns the hash of all the inputs of the facts derived from package directives"""
+        tests = self.tests is True or (not isinstance(self.tests, bool) and pkg.name in self.tests)
+        virtuals = sorted(
+            x
+            for x in self.pkg_metadata(pkg.name).provided_virtual_names()
+            if x in self.possible_virtuals
+        )
+        key = [
+            SETUP_CACHE_FORMAT,
+            spack.spack_version,
+            self._package_inputs_hash(pkg.name),
+            tests,
+            virtuals,
+        ]
+        return spack.util.hash.b32_hash(json.dumps(key))
+
+    def _package_inputs_hash(self, name: str) -> str:
+        """Returns a hash of the files defining the package class with the given name, or a
+        placeholder if the name is a virtual or an unknown package.
+        """
+        if spack.repo.PATH.is_virtual(name):
+            return "virtual"
+
+        try:
+            pkg_cls = self.pkg_class(name)
+        except spack.repo.UnknownEntityError:
+            return "unknown"
+
+        result = self._input_hashes.get(pkg_cls.fullname)
+        if result is not None:
+            return result
+
+        # Include the files of base classes, where directives may be declared too
+        hasher = hashlib.sha256(pkg_cls.fullname.encode())
+        paths = {}
+        for cls in pkg_cls.__mro__:
+            path = getattr(sys.modules.get(cls.__module__), "__file__", None)
+            if path:
+                paths[path] = None
+
+        for path in paths:
+            if path not in self._file_hashes:
+                self._file_hashes[path] = spack.util.crypto.checksum(hashlib.sha256, path)
+            hasher.update(self._file_hashes[path].encode())
+
+        result = self._input_hashes[pkg_cls.fullname] = hasher.hexdigest()
+        return result
+
+    def _variant_definition_indices(self, pkg_name: str) -> Dict[int, Tuple[str, int]]:
+        """Maps the ids of the variant definitions of a package to their variant name, and to
+        their index in ``variant_definitions``.
+        """
+        pkg_cls = self.pkg_class(pkg_name)
+        return {
+            id(variant_def): (name, idx)
+            for name in pkg_cls.variant_names()
+            for idx, (_, variant_def) in enumerate(pkg_cls.variant_definitions(name))
+        }
+
+    def _record_package_directive_rules(
+        self, pkg: Type[spack.package_base.PackageBase]
+    ) -> Dict[str, Any]:
+        """Records the facts derived from the directives of a package, together with the
+        side effects on the state of the setup, as an entry of the setup cache.
+        """
+        saved_state = (
+            self.gen,
+            self._id_counter,
+            self._trigger_cache,
+            self._effect_cache,
+            self.version_constraints,
+            self.target_constraints,
+            self.variant_values_from_specs,
+            self.variant_ids_by_def_id,
+            self._referenced_names,
+        )
+        recorder = PackageFactsRecorder()
+        self.gen = recorder
+        self._id_counter = map(_LocalId, itertools.count())
+        self._trigger_cache = collections.defaultdict(dict)
+        self._effect_cache = collections.defaultdict(dict)
+        self.version_constraints = set()
+        self.target_constraints = set()
+        self.variant_values_from_specs = set()
+        self.variant_ids_by_def_id = {}
+        self._referenced_names = {pkg.name}
+        try:
+            self.package_directive_rules(pkg)
+            self.trigger_rules()
+            self.effect_rules()
+
+            number_of_ids = next(self._id_counter)
+            indices = {pkg.name: self._variant_definition_indices(pkg.name)}
+            variant_values = []
+            for name, variant_def_id, value in self.variant_values_from_specs:
+                if name not in indices:
+                    indices[name] = self._variant_definition_indices(name)
+                variant_values.append([name, *indices[name][variant_def_id], value])
+
+            return {
+                "statements": recorder.statements,
+                "ids": number_of_ids,
+                "references": {
+                    name: self._package_inputs_hash(name)
+                    for name in sorted(self._referenced_names)
+                },
+                "version_constraints": sorted(
+                    [name, str(versions)] for name, versions in self.version_constraints
+                ),
+                "target_constraints": sorted(str(x) for x in self.target_constraints),
+                "variant_values": variant_values,
+                "variant_ids": [
+                    [*indices[pkg.name][variant_def_id], int(vid)]
+                    for variant_def_id, vid in self.variant_ids_by_def_id.items()
+                ],
+            }
+        finally:
+            (
+                self.gen,
+                self._id_counter,
+                self._trigger_cache,
+                self._effect_cache,
+                self.version_constraints,
+                self.target_constraints,
+                self.variant_values_from_specs,
+                self.variant_ids_by_def_id,
+                self._referenced_names,
+            ) = saved_state
+
+    def _replay_package_directive_rules(
+        self, pkg: Type[spack.package_base.PackageBase], entry: Dict[str, Any]
+    ) -> None:
+        """Emits the facts recorded in an entry of the setup cache, shifting their local ids
+        to unused ids of this problem instance.
+        """
+        base = next(self._id_counter)
+        self._id_counter = itertools.count(base + entry["ids"])
+        for statement in entry["statements"]:
+            self.gen.append("".join(x if type(x) is str else str(base + x) for x in statement))
+
+        for name, versions in entry["version_constraints"]:
+            self.version_constraints.add((name, vn.VersionList(versions)))
+
+        for target in entry["target_constraints"]:
+            self.target_constraints.add(spack.spec.ArchSpec((None, None, target)).target)
+
+        for name, variant_name, idx, value in entry["variant_values"]:
+            _, variant_def = self.pkg_class(name).variant_definitions(variant_name)[idx]
+            self.variant_values_from_specs.add((name, id(variant_def), value))
+
+        for variant_name, idx, vid in entry["variant_ids"]:
+            _, variant_def = pkg.variant_definitions(variant_name)[idx]
+            self.variant_ids_by_def_id[id(variant_def)] = base + vid
+
     def trigger_rules(self):
         """Flushes all the trigger rules collected so far, and clears the cache."""
         if not self._trigger_cache:
@@ -1687,6 +2073,10 @@ def _get_condition_id(
             The id of the cached trigger or effect.
 
         """
+        if self._referenced_names is not None:
+            self._referenced_names.add(name)
+            self._referenced_names.update(x.name for x in cond.traverse() if x.name)
+
         pkg_cache = cache[name]
         cond_str = str(cond) if cond.name else f"{name} {cond}"
         named_cond_key = (cond_str, context.transform)
@@ -1795,12 +2185,13 @@ def condition(
         return condition_id
 
     def package_provider_rules(self, pkg: Type[spack.package_base.PackageBase]) -> None:
-        for vpkg_name in pkg.provided_virtual_names():
+        metadata = self.pkg_metadata(pkg.name)
+        for vpkg_name in metadata.provided_virtual_names():
             if vpkg_name not in self.possible_virtuals:
                 continue
             self.gen.fact(fn.pkg_fact(pkg.name, fn.possible_provider(vpkg_name)))
 
-        for when, provided in pkg.provided.items():
+        for when, provided in metadata.provided().items():
             for vpkg in sorted(provided):  # type: ignore[type-var]
                 if vpkg.name not in self.possible_virtuals:
                     continue
@@ -1812,7 +2203,7 @@ def package_provider_rules(self, pkg: Type[spack.package_base.PackageBase]) -> N
                 )
             self.gen.newline()
 
-        for when, sets_of_virtuals in pkg.provided_together.items():
+        for when, sets_of_virtuals in metadata.provided_together().items():
             condition_id = self.condition(
                 when, required_name=pkg.name, msg="Virtuals are provided together"
             )
@@ -1825,12 +2216,11 @@ def package_provider_rules(self, pkg: Type[spack.package_base.PackageBase]) -> N
 
     def package_dependencies_rules(self, pkg):
         """Translate ``depends_on`` directives into ASP logic."""
-
-        for cond, deps_by_name in pkg.dependencies.items():
+        metadata = self.pkg_metadata(pkg.name)
+        for cond, deps_by_name in metadata.dependencies().items():
             cond_str = str(cond)
             cond_str_suffix = f" when {cond_str}" if cond_str else ""
-            for _, dep in deps_by_name.items():
-                depflag = dep.depflag
+            for dep_spec, depflag in deps_by_name.values():
                 # Skip test dependencies if they're not requested
                 if not self.tests:
                     depflag &= ~dt.TEST
@@ -1844,7 +2234,7 @@ def package_dependencies_rules(self, pkg):
                 if not depflag:
                     continue
 
-                msg = f"{pkg.name} depends on {dep.spec}{cond_str_suffix}"
+                msg = f"{pkg.name} depends on {dep_spec}{cond_str_suffix}"
 
                 def dependency_holds(
                     name: str, input_spec: spack.spec.Spec, requirements: List[AspFunction]
@@ -1861,7 +2251,7 @@ def dependency_holds(
                         for t in dt.ALL_FLAGS
                         if t & depflag
                     ]
-                    if name not in pkg.extendees:
+                    if name not in metadata.extendees:
                         return result
                     return result + [fn.attr("extends", pkg.name, name)]
 
@@ -1872,7 +2262,7 @@ def dependency_holds(
                 context.transform_required = _track_dependencies
                 context.transform_imposed = dependency_holds
 
-                self.condition(cond, dep.spec, required_name=pkg.name, msg=msg, context=context)
+                self.condition(cond, dep_spec, required_name=pkg.name, msg=msg, context=context)
 
                 self.gen.newline()
 
@@ -2585,11 +2975,15 @@ def keyfun(os):
         for i, os_name in enumerate(ordered_oses):
             self.gen.fact(fn.os(os_name, i))
 
-    def target_defaults(self, specs):
-        """Add facts about targets and target compatibility."""
-        self.gen.h2("Target compatibility")
+    def candidate_targets(
+        self, specs: Sequence[spack.spec.Spec]
+    ) -> List[spack.vendor.archspec.cpu.Microarchitecture]:
+        """Returns the targets that can be used in the solve.
 
-        # Add targets explicitly requested from specs
+        Arguments:
+            specs: input specs, whose targets are added to the candidates if they are not
+                compatible with the host
+        """
         candidate_targets = []
         for x in self.possible_graph.candidate_targets():
             if all(
@@ -2600,6 +2994,7 @@ def target_defaults(self, specs):
                 continue
             candidate_targets.append(x)
 
+        # Add targets explicitly requested from specs
         host_compatible = spack.config.CONFIG.get("concretizer:targets:host_compatible")
         for spec in specs:
             if not spec.architecture or not spec.architecture.target:
@@ -2607,7 +3002,6 @@ def target_defaults(self, specs):
 
             target = spack.vendor.archspec.cpu.TARGETS.get(spec.target.name)
             if not target:
-                self.target_ranges(spec, None)
                 continue
 
             if target not in candidate_targets and not host_compatible:
@@ -2616,6 +3010,19 @@ def target_defaults(self, specs):
                     if ancestor not in candidate_targets:
                         candidate_targets.append(ancestor)
 
+        return candidate_targets
+
+    def target_defaults(self, specs, candidate_targets):
+        """Add facts about targets and target compatibility."""
+        self.gen.h2("Target compatibility")
+
+        for spec in specs:
+            if not spec.architecture or not spec.architecture.target:
+                continue
+
+            if spec.target.name not in spack.vendor.archspec.cpu.TARGETS:
+                self.target_ranges(spec, None)
+
         platform = spack.platforms.host()
         uarch = spack.vendor.archspec.cpu.TARGETS.get(platform.default)
         best_targets = {uarch.family.name}
@@ -2970,10 +3377,18 @@ def setup(
 
         specs = tuple(specs)  # ensure compatible types to add
 
+        candidate_targets = self.candidate_targets(specs + dev_specs)
+
         self.gen.h1("Reusable concrete specs")
         self.define_concrete_input_specs(specs, self.pkgs)
         if reuse:
             self.gen.fact(fn.optimize_for_reuse())
+            reuse = prune_reusable_specs(
+                reuse,
+                possible_packages=self.pkgs,
+                targets={x.name for x in candidate_targets},
+                libcs=self.libcs if using_libc_compatibility() else None,
+            )
             for reusable_spec in reuse:
                 self.register_concrete_spec(reusable_spec, self.pkgs)
         self.concrete_specs()
@@ -2992,7 +3407,7 @@ def setup(
         # architecture defaults
         self.platform_defaults()
         self.os_defaults(specs + dev_specs)
-        self.target_defaults(specs + dev_specs)
+        self.target_defaults(specs + dev_specs, candidate_targets)
 
         self.virtual_requirements_and_weights()
         self.external_packages(packages_with_externals)
@@ -3297,6 +3712,15 @@ def pkg_class(self, pkg_name: str) -> Type[spack.package_base.PackageBase]:
             request = f"{namespace}.{pkg_name}"
         return spack.repo.PATH.get_pkg_class(request)
 
+    def pkg_metadata(self, pkg_name: str) -> spack.package_metadata.PackageMetadata:
+        """Returns the metadata of a package from the index of its repository, which is used
+        instead of the package class for the rules derived from its dependencies, virtuals,
+        conflicts and requirements."""
+        namespace = self.explicitly_required_namespaces.get(pkg_name)
+        if namespace is None:
+            return spack.repo.PATH.package_metadata(pkg_name)
+        return spack.repo.PATH.get_repo(namespace).package_metadata(pkg_name)
+
 
 class _Head:
     """ASP functions used to express spec clauses in the HEAD of a rule"""
@@ -3381,6 +3805,53 @@ def newline(self):
         self.asp_problem.append("")
 
 
+class _LocalId(int):
+    """Id local to the facts recorded by a ``PackageFactsRecorder``"""
+
+
+class PackageFactsRecorder(ProblemInstanceBuilder):
+    """Records the facts derived from the directives of a single package, so that they can be
+    stored in the setup cache, and replayed in any problem instance.
+
+    Each statement is stored as a list of strings and of ids local to the package. The local ids
+    are shifted to the ids of the problem instance when the statements are replayed.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.statements: List[List[Union[str, int]]] = []
+
+    def fact(self, atom: AspFunction) -> None:
+        parts: List[Union[str, int]] = []
+        self._render(atom, parts)
+        parts.append(".")
+
+        statement: List[Union[str, int]] = []
+        for part in parts:
+            if statement and type(part) is str and type(statement[-1]) is str:
+                statement[-1] += part
+            else:
+                statement.append(part)
+        self.statements.append(statement)
+
+    def append(self, rule: str) -> None:
+        self.statements.append([rule])
+
+    def _render(self, atom: AspFunction, parts: List[Union[str, int]]) -> None:
+        parts.append(f"{atom.name}(")
+        for i, arg in enumerate(atom.args):
+            if i:
+                parts.append(",")
+            if type(arg) is _LocalId:
+                parts.append(int(arg))
+            elif type(arg) is AspFunction:
+                self._render(arg, parts)
+            else:
+                # Strip the parentheses, to render the argument as AspFunction does
+                parts.append(str(AspFunction("", (arg,)))[1:-1])
+        parts.append(")")
+
+
 def possible_compilers(*, configuration) -> Tuple[Set["spack.spec.Spec"], Set["spack.spec.Spec"]]:
     result, rejected = set(), set()
 
@@ -3887,6 +4358,9 @@ def __init__(self):
         self._conc_cache = ConcretizationCache()
         self.driver = PyclingoDriver(conc_cache=self._conc_cache)
 
+        # The analysis of possible dependencies memoizes its results, so share it among solves
+        self.possible_graph = create_graph_analyzer()
+
         # Compute packages configuration with implicit externals once and reuse it
         self.packages_with_externals = external_config_with_implicit_externals(spack.config.CONFIG)
         completion_mode = spack.config.CONFIG.get("concretizer:externals:completion")
@@ -3896,12 +4370,11 @@ def __init__(self):
             packages_with_externals=self.packages_with_externals,
         )
 
-    @staticmethod
     def _check_input_and_extract_concrete_specs(
-        specs: Sequence[spack.spec.Spec],
+        self, specs: Sequence[spack.spec.Spec]
     ) -> List[spack.spec.Spec]:
         reusable: List[spack.spec.Spec] = []
-        analyzer = create_graph_analyzer()
+        analyzer = self.possible_graph
         for root in specs:
             for s in root.traverse():
                 if s.concrete:
@@ -3963,7 +4436,7 @@ def solve_with_stats(
         specs = [s.lookup_hash() for s in specs]
         reusable_specs = self._check_input_and_extract_concrete_specs(specs)
         reusable_specs.extend(self.selector.reusable_specs(specs))
-        setup = SpackSolverSetup(tests=tests)
+        setup = SpackSolverSetup(tests=tests, possible_graph=self.possible_graph)
         output = OutputConfiguration(timers=timers, stats=stats, out=out, setup_only=setup_only)
 
         result = self.driver.solve(
@@ -4014,7 +4487,7 @@ def solve_in_rounds(
         specs = [s.lookup_hash() for s in specs]
         reusable_specs = self._check_input_and_extract_concrete_specs(specs)
         reusable_specs.extend(self.selector.reusable_specs(specs))
-        setup = SpackSolverSetup(tests=tests)
+        setup = SpackSolverSetup(tests=tests, possible_graph=self.possible_graph)
 
         # Tell clingo that we don't have to solve all the inputs at once
         setup.concretize_everything = False
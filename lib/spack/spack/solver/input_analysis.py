@@ -85,8 +85,8 @@ def is_virtual(self, name: str) -> bool:
     @lang.memoized
     def is_allowed_on_this_platform(self, *, pkg_name: str) -> bool:
         """Returns true if a package is allowed on the current host"""
-        pkg_cls = self.repo.get_pkg_class(pkg_name)
-        for when_spec, conditions in pkg_cls.requirements.items():
+        metadata = self.repo.package_metadata(pkg_name)
+        for when_spec, conditions in metadata.requirements().items():
             # Restrict analysis to unconditional requirements
             if when_spec != EMPTY_SPEC:
                 continue
@@ -164,16 +164,17 @@ def possible_dependencies(
             if pkg_name in self.libc_pkgs:
                 continue
 
-            pkg_cls = self.repo.get_pkg_class(pkg_name=pkg_name)
-            for when_spec, dependencies in pkg_cls.dependencies.items():
+            # Read dependencies from the metadata cache, to avoid importing package files
+            metadata = self.repo.package_metadata(pkg_name)
+            for when_spec, dependencies in metadata.dependencies().items():
                 # Check if we need to process this condition at all. We can skip the unreachable
                 # check if all dependencies in this condition are already accounted for.
                 new_dependencies: List[str] = []
-                for name, dep in dependencies.items():
+                for name, (_, depflag) in dependencies.items():
                     if strict_depflag:
-                        if dep.depflag != allowed_deps:
+                        if depflag != allowed_deps:
                             continue
-                    elif not (dep.depflag & allowed_deps):
+                    elif not (depflag & allowed_deps):
                         continue
 
                     if name in edges[pkg_name] or name in virtuals:
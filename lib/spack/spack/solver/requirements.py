@@ -134,8 +134,10 @@ def rules_from_input_specs(self, pkg: spack.package_base.PackageBase) -> List[Re
         ]
 
     def rules_from_package_py(self, pkg: spack.package_base.PackageBase) -> List[RequirementRule]:
+        # Read from the metadata index of the repository, like other directives in the solver
+        metadata = spack.repo.PATH.get_repo(pkg.namespace).package_metadata(pkg.name)
         rules = []
-        for when_spec, requirement_list in pkg.requirements.items():
+        for when_spec, requirement_list in metadata.requirements().items():
             for requirements, policy, message in requirement_list:
                 rules.append(
                     RequirementRule(
@@ -3,10 +3,11 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import enum
 import functools
-from typing import Any, Callable, List, Mapping
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set
 
 import spack.binary_distribution
 import spack.config
+import spack.deptypes as dt
 import spack.environment
 import spack.llnl.path
 import spack.repo
@@ -20,7 +21,7 @@
     extract_dicts_from_configuration,
 )
 
-from .runtimes import all_libcs
+from .runtimes import all_libcs, external_config_with_implicit_externals, libc_is_compatible
 
 
 class SpecFilter:
@@ -180,6 +181,75 @@ def _is_reusable(spec: spack.spec.Spec, packages_with_externals, local: bool) ->
     return False
 
 
+def prune_reusable_specs(
+    specs: Iterable[spack.spec.Spec],
+    *,
+    possible_packages: Set[str],
+    targets: Set[str],
+    libcs: Optional[Iterable[spack.spec.Spec]] = None,
+) -> List[spack.spec.Spec]:
+    """Returns the specs, among the input ones, that can be part of the solution of a solve.
+
+    A concrete spec cannot be reused if its package is not a possible dependency of the input
+    specs, if its target is not among the targets of the solve, or if it needs a libc that is
+    not compatible with any of the host libcs. Since the dependencies of a reused spec, except
+    pure build dependencies and runtimes, are imposed by hash, a spec is also pruned if any of
+    these dependencies is pruned.
+
+    Duplicate specs, i.e. specs with the same hash, are returned only once.
+
+    Args:
+        specs: candidate specs for reuse
+        possible_packages: names of the packages that can be part of the solution
+        targets: names of the targets that can be used in the solve
+        libcs: host libcs reused specs must be compatible with, or None if libc compatibility
+            is not checked
+    """
+    libcs = list(libcs) if libcs is not None else None
+    runtime_pkgs = spack.repo.PATH.packages_with_tags("runtime")
+    reusable: Dict[str, bool] = {}
+
+    def _is_possible(spec: spack.spec.Spec) -> bool:
+        key = spec.dag_hash()
+        if key in reusable:
+            return reusable[key]
+
+        # Assume the spec is not reusable while visiting its dependencies, to stop at cycles
+        reusable[key] = False
+
+        result = spec.name in possible_packages
+        if result and spec.architecture and spec.architecture.target:
+            result = spec.target.name in targets
+
+        for edge in spec.edges_to_dependencies():
+            if not result:
+                break
+
+            if "libc" in edge.virtuals:
+                # libc is solved again, so it must only be compatible with one of the host libcs
+                if libcs is not None and not spec.external:
+                    result = any(libc_is_compatible(x, edge.spec) for x in libcs)
+                continue
+
+            if edge.depflag == dt.BUILD or edge.spec.name in runtime_pkgs:
+                continue
+
+            result = _is_possible(edge.spec)
+
+        reusable[key] = result
+        return result
+
+    result, seen = [], set()
+    for spec in specs:
+        key = spec.dag_hash()
+        if key in seen:
+            continue
+        seen.add(key)
+        if _is_possible(spec):
+            result.append(spec)
+    return result
+
+
 def _specs_from_store(configuration):
     store = spack.store.create(configuration)
     with store.db.read_transaction():
@@ -241,13 +311,30 @@ class ReusableSpecsSelector:
     def __init__(
         self,
         configuration: spack.config.Configuration,
-        external_parser: ExternalSpecsParser,
-        packages_with_externals: Any,
+        external_parser: Optional[ExternalSpecsParser] = None,
+        packages_with_externals: Any = None,
     ) -> None:
+        """
+        Args:
+            configuration: configuration with the reuse sources
+            external_parser: parser of the externals in packages.yaml. Created from
+                ``packages_with_externals`` if not given
+            packages_with_externals: packages configuration with implicit externals. Computed
+                from ``configuration`` if not given
+        """
+        if packages_with_externals is None:
+            packages_with_externals = external_config_with_implicit_externals(configuration)
+        if external_parser is None:
+            external_parser = create_external_parser(
+                packages_with_externals, configuration.get("concretizer:externals:completion")
+            )
         self.configuration = configuration
         self.store = spack.store.create(configuration)
         self.reuse_strategy = ReuseStrategy.ROOTS
 
+        #: If not None, the specs selected from the reuse sources, computed beforehand
+        self.candidates: Optional[List[spack.spec.Spec]] = None
+
         reuse_yaml = self.configuration.get("concretizer:reuse", False)
         self.reuse_sources = []
         if not isinstance(reuse_yaml, Mapping):
@@ -378,10 +465,20 @@ def __init__(
                     )
                 )
 
-    def reusable_specs(self, specs: List[spack.spec.Spec]) -> List[spack.spec.Spec]:
+    def select_candidates(self) -> List[spack.spec.Spec]:
+        """Returns the specs selected from all the reuse sources, including roots. If the
+        ``candidates`` attribute is set, they are returned without reading the sources again.
+        """
+        if self.candidates is not None:
+            return list(self.candidates)
+
         result = []
         for reuse_source in self.reuse_sources:
             result.extend(reuse_source.selected_specs())
+        return result
+
+    def reusable_specs(self, specs: List[spack.spec.Spec]) -> List[spack.spec.Spec]:
+        result = self.select_candidates()
         # If we only want to reuse dependencies, remove the root specs
         if self.reuse_strategy == ReuseStrategy.DEPENDENCIES:
             result = [spec for spec in result if not any(root in spec for root in specs)]
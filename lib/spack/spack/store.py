@@ -149,6 +149,10 @@ class Store:
             truncated to this length
         upstreams: optional list of upstream databases
         lock_cfg: lock configuration for the database
+        lazy_db: whether the database constructs the spec of each record only when accessed
+        db_format: format of the database file, either "json" or "binary"
+        db_journal_size: maximum number of entries in the journal of the database, or 0 to
+            disable journaling
     """
 
     def __init__(
@@ -159,6 +163,9 @@ def __init__(
         hash_length: Optional[int] = None,
         upstreams: Optional[List[spack.database.Database]] = None,
         lock_cfg: spack.database.LockConfiguration = spack.database.NO_LOCK,
+        lazy_db: bool = False,
+        db_format: str = "json",
+        db_journal_size: int = 0,
     ) -> None:
         self.root = root
         self.unpadded_root = unpadded_root or root
@@ -166,11 +173,20 @@ def __init__(
         self.hash_length = hash_length
         self.upstreams = upstreams
         self.lock_cfg = lock_cfg
+        self.lazy_db = lazy_db
+        self.db_format = db_format
+        self.db_journal_size = db_journal_size
         self.layout = spack.directory_layout.DirectoryLayout(
             root, projections=projections, hash_length=hash_length
         )
         self.db = spack.database.Database(
-            root, upstream_dbs=upstreams, lock_cfg=lock_cfg, layout=self.layout
+            root,
+            upstream_dbs=upstreams,
+            lock_cfg=lock_cfg,
+            layout=self.layout,
+            lazy=lazy_db,
+            index_format=db_format,
+            journal_size=db_journal_size,
         )
 
         timeout_format_str = (
@@ -197,6 +213,9 @@ def __reduce__(self):
             self.hash_length,
             self.upstreams,
             self.lock_cfg,
+            self.lazy_db,
+            self.db_format,
+            self.db_journal_size,
         )
 
 
@@ -215,7 +234,8 @@ def create(configuration: spack.config.Configuration) -> Store:
         install_properties["install_tree"]
         for install_properties in configuration.get_config("upstreams").values()
     ]
-    upstreams = _construct_upstream_dbs_from_install_roots(install_roots)
+    lazy_db = config_dict.get("db_lazy_read", False)
+    upstreams = _construct_upstream_dbs_from_install_roots(install_roots, lazy=lazy_db)
 
     return Store(
         root=root,
@@ -224,6 +244,9 @@ def create(configuration: spack.config.Configuration) -> Store:
         hash_length=hash_length,
         upstreams=upstreams,
         lock_cfg=spack.database.lock_configuration(configuration),
+        lazy_db=lazy_db,
+        db_format=config_dict.get("db_format", "json"),
+        db_journal_size=config_dict.get("db_journal_size", 0),
     )
 
 
@@ -255,7 +278,7 @@ def restore(token):
 
 
 def _construct_upstream_dbs_from_install_roots(
-    install_roots: List[str],
+    install_roots: List[str], lazy: bool = False
 ) -> List[spack.database.Database]:
     accumulated_upstream_dbs: List[spack.database.Database] = []
     for install_root in reversed(install_roots):
@@ -264,6 +287,7 @@ def _construct_upstream_dbs_from_install_roots(
             spack.util.path.canonicalize_path(install_root),
             is_upstream=True,
             upstream_dbs=upstream_dbs,
+            lazy=lazy,
         )
         next_db._read()
         accumulated_upstream_dbs.insert(0, next_db)
@@ -58,19 +58,27 @@ def update_package(self, pkg_name: str, repo: "spack.repo.Repo") -> None:
             pkg_name: name of the package to be updated
         """
         pkg_cls = repo.get_pkg_class(pkg_name)
+        self.set_package_tags(pkg_name, getattr(pkg_cls, "tags", []))
 
+    def set_package_tags(self, pkg_name: str, tags: List[str]) -> None:
+        """Replaces the tags of a package in the tag index.
+
+        Args:
+            pkg_name: name of the package to be updated
+            tags: new tags of the package
+        """
         # Remove the package from the list of packages, if present
         for pkg_list in self.tags.values():
             if pkg_name in pkg_list:
                 pkg_list.remove(pkg_name)
 
         # Add it again under the appropriate tags
-        for tag in getattr(pkg_cls, "tags", []):
+        for tag in tags:
             tag = tag.lower()
             if tag not in self.tags:
-                self.tags[tag] = [pkg_cls.name]
+                self.tags[tag] = [pkg_name]
             else:
-                self.tags[tag].append(pkg_cls.name)
+                self.tags[tag].append(pkg_name)
 
 
 class TagIndexError(spack.error.SpackError):
@@ -10,6 +10,7 @@
 import pathlib
 import re
 import tarfile
+import threading
 import urllib.error
 import urllib.request
 import urllib.response
@@ -30,7 +31,9 @@
 import spack.stage
 import spack.store
 import spack.url_buildcache
+import spack.util.archive
 import spack.util.gpg
+import spack.util.parallel
 import spack.util.spack_yaml as syaml
 import spack.util.url as url_util
 import spack.util.web as web_util
@@ -43,6 +46,7 @@
     INDEX_MANIFEST_FILE,
     BuildcacheComponent,
     BuildcacheEntryError,
+    BuildcacheManifest,
     URLBuildcacheEntry,
     URLBuildcacheEntryV2,
     compression_writer,
@@ -294,6 +298,243 @@ def test_use_bin_index(monkeypatch, tmp_path: pathlib.Path, mutable_config):
     assert "libdwarf" in cache_list
 
 
+@pytest.mark.usefixtures("install_mockery", "mock_packages", "mock_fetch")
+def test_push_does_not_upload_existing_blobs(monkeypatch, tmp_path: pathlib.Path):
+    """Force pushing specs whose tarballs did not change only pushes their manifests"""
+    mirror_dir = tmp_path / "mirror_dir"
+    mirror_url = url_util.path_to_file_url(str(mirror_dir))
+    s = spack.concretize.concretize_one("libelf")
+    install_cmd("--fake", "--no-cache", s.name)
+    buildcache_cmd("push", "-u", str(mirror_dir), s.name)
+
+    cache_class = get_url_buildcache_class(
+        spack.binary_distribution.CURRENT_BUILD_CACHE_LAYOUT_VERSION
+    )
+    entry = cache_class(mirror_url, s, allow_unsigned=True)
+    records = entry.read_manifest().data
+    entry.destroy()
+
+    pushed = []
+    push_to_url = web_util.push_to_url
+
+    def _push_to_url(local_path, remote_url, **kwargs):
+        pushed.append(remote_url)
+        return push_to_url(local_path, remote_url, **kwargs)
+
+    monkeypatch.setattr(web_util, "push_to_url", _push_to_url)
+    buildcache_cmd("push", "-f", "-u", str(mirror_dir), s.name)
+
+    assert cache_class.get_manifest_url(s, mirror_url) in pushed
+    assert all(url.endswith(".spec.manifest.json") for url in pushed)
+    entry = cache_class(mirror_url, s, allow_unsigned=True)
+    assert [r.to_dict() for r in entry.read_manifest().data] == [r.to_dict() for r in records]
+    assert all(entry.check_blob_exists(record) for record in records)
+    entry.destroy()
+
+
+@pytest.mark.enable_parallelism
+@pytest.mark.usefixtures("install_mockery", "mock_packages", "mock_fetch")
+def test_update_index_reads_manifests_concurrently(
+    monkeypatch, tmp_path: pathlib.Path, mutable_config
+):
+    """Spec manifests are read concurrently, and unreadable manifests are skipped"""
+    mirror_dir = tmp_path / "mirror_dir"
+    mirror_url = url_util.path_to_file_url(str(mirror_dir))
+    spack.config.set("mirrors", {"test": mirror_url})
+    s = spack.concretize.concretize_one("libdwarf")
+    install_cmd("--fake", "--no-cache", s.name)
+    buildcache_cmd("push", "-u", str(mirror_dir), s.name)
+
+    cache_class = get_url_buildcache_class(
+        spack.binary_distribution.CURRENT_BUILD_CACHE_LAYOUT_VERSION
+    )
+    broken = s["libelf"]
+    with open(
+        url_util.local_file_path(cache_class.get_manifest_url(broken, mirror_url)),
+        "w",
+        encoding="utf-8",
+    ) as f:
+        f.write("not a manifest")
+
+    threads = []
+    fetch_spec_dict = spack.binary_distribution._fetch_spec_dict
+
+    def _fetch_spec_dict(*args):
+        threads.append(threading.current_thread())
+        return fetch_spec_dict(*args)
+
+    monkeypatch.setattr(spack.binary_distribution, "_fetch_spec_dict", _fetch_spec_dict)
+    # Put all manifests in a single index shard, so that they are read together
+    monkeypatch.setattr(spack.binary_distribution, "INDEX_SHARD_PREFIX_LENGTH", 0)
+    out = buildcache_cmd("update-index", str(mirror_dir))
+    assert "Unable to fetch spec for manifest" in out
+    assert threads and threading.main_thread() not in threads
+
+    index = spack.binary_distribution.BinaryCacheIndex(str(tmp_path / "index_cache"))
+    index.update()
+    assert not index.find_built_spec(broken)
+    assert index.find_built_spec(s)
+
+
+@pytest.mark.usefixtures("install_mockery", "mock_packages", "mock_fetch")
+def test_bin_index_is_loaded_lazily(monkeypatch, tmp_path: pathlib.Path, mutable_config):
+    """Indices in the local cache are loaded from their binary form, and specs are constructed
+    only when they are needed."""
+    mirror_dir = tmp_path / "mirror_dir"
+    spack.config.set("mirrors", {"test": url_util.path_to_file_url(str(mirror_dir))})
+    s = spack.concretize.concretize_one("libdwarf")
+    install_cmd("--fake", "--no-cache", s.name)
+    buildcache_cmd("push", "-u", str(mirror_dir), s.name)
+    buildcache_cmd("update-index", str(mirror_dir))
+
+    cache_root = tmp_path / "index_cache"
+    spack.binary_distribution.BinaryCacheIndex(str(cache_root)).update()
+    assert len(list(cache_root.glob("*.bin"))) == 1
+
+    # A new process does not need to parse the JSON index
+    def _read_from_file(*args, **kwargs):
+        raise AssertionError("the JSON index should not be read")
+
+    monkeypatch.setattr(
+        spack.binary_distribution.BuildCacheDatabase, "_read_from_file", _read_from_file
+    )
+    index = spack.binary_distribution.BinaryCacheIndex(str(cache_root))
+    index.regenerate_spec_cache()
+    assert all(index.find_built_spec(x) for x in s.traverse())
+    assert not index._known_specs
+
+    assert set(index.get_all_built_specs()) == set(s.traverse())
+
+
+@pytest.mark.enable_parallelism
+@pytest.mark.usefixtures("install_mockery", "mock_packages", "mock_fetch")
+def test_update_index_skips_failing_and_slow_mirrors(
+    monkeypatch, tmp_path: pathlib.Path, mutable_config, capfd
+):
+    """Indices of mirrors are fetched concurrently, and mirrors that fail or do not respond in
+    time do not prevent the indices of the other mirrors from being used."""
+    mirror_dir = tmp_path / "mirror_dir"
+    mirror_url = url_util.path_to_file_url(str(mirror_dir))
+    spack.config.set("mirrors", {"test": mirror_url})
+    s = spack.concretize.concretize_one("libdwarf")
+    install_cmd("--fake", "--no-cache", s.name)
+    buildcache_cmd("push", "-u", str(mirror_dir), s.name)
+    buildcache_cmd("update-index", str(mirror_dir))
+
+    spack.config.set(
+        "mirrors", {"test": mirror_url, "broken": "file:///broken", "slow": "file:///slow"}
+    )
+    spack.config.set("config:binary_index_timeout", 1)
+
+    unblock = threading.Event()
+    fetch_index = spack.binary_distribution._fetch_index
+
+    def _fetch_index(mirror_metadata, *args):
+        if mirror_metadata.url == "file:///slow":
+            unblock.wait()
+        if mirror_metadata.url != mirror_url:
+            raise spack.binary_distribution.FetchIndexError("Oops!")
+        return fetch_index(mirror_metadata, *args)
+
+    monkeypatch.setattr(spack.binary_distribution, "_fetch_index", _fetch_index)
+
+    index = spack.binary_distribution.BinaryCacheIndex(str(tmp_path / "index_cache"))
+    try:
+        index.update()
+    finally:
+        unblock.set()
+
+    assert index.find_built_spec(s)
+    err = capfd.readouterr()[1]
+    assert "Oops!" in err
+    assert "Timed out fetching the index of file:///slow" in err
+
+
+@pytest.mark.usefixtures("install_mockery", "mock_packages", "mock_fetch")
+def test_sharded_index_is_updated_incrementally(
+    monkeypatch, tmp_path: pathlib.Path, mutable_config
+):
+    """Updating the index of a mirror only reads the specs of changed shards, and clients only
+    fetch changed shards, while the merged index stays available for older clients."""
+    mirror_dir = tmp_path / "mirror_dir"
+    mirror_url = url_util.path_to_file_url(str(mirror_dir))
+    spack.config.set("mirrors", {"test": mirror_url})
+    s = spack.concretize.concretize_one("libdwarf")
+    install_cmd("--fake", "--no-cache", s.name)
+    buildcache_cmd("push", "-u", str(mirror_dir), s.name)
+    buildcache_cmd("update-index", str(mirror_dir))
+
+    bindist = spack.binary_distribution
+    cache_class = get_url_buildcache_class(bindist.CURRENT_BUILD_CACHE_LAYOUT_VERSION)
+    with open(url_util.local_file_path(cache_class.get_index_url(mirror_url)), "rb") as f:
+        manifest = BuildcacheManifest.from_dict(
+            cache_class.verify_and_extract_manifest(f.read().decode("utf-8"), verify=False)
+        )
+    media_types = {record.media_type for record in manifest.data}
+    assert media_types == {
+        cache_class.component_to_media_type(BuildcacheComponent.INDEX),
+        cache_class.BUILDCACHE_INDEX_SHARDS_MEDIATYPE,
+    }
+
+    index = bindist.BinaryCacheIndex(str(tmp_path / "index_cache"))
+    index.update()
+    assert all(index.find_built_spec(x) for x in s.traverse())
+    shards_dir = tmp_path / "index_cache" / "shards"
+    num_shards = len(os.listdir(shards_dir))
+    assert num_shards > 1
+
+    # Modify one spec in the mirror, only the specs of its shard are read again
+    changed = s["libelf"]
+    changed_manifest = url_util.local_file_path(cache_class.get_manifest_url(changed, mirror_url))
+    mtime = os.stat(changed_manifest).st_mtime + 10
+    os.utime(changed_manifest, (mtime, mtime))
+
+    read_hashes = []
+    read_spec = bindist._read_specs_into_db
+
+    def _read_specs_into_db(file_list, *args):
+        read_hashes.extend(bindist._hash_from_manifest_name(f) for f in file_list)
+        return read_spec(file_list, *args)
+
+    monkeypatch.setattr(bindist, "_read_specs_into_db", _read_specs_into_db)
+    buildcache_cmd("update-index", str(mirror_dir))
+
+    prefix_length = bindist.INDEX_SHARD_PREFIX_LENGTH
+    assert changed.dag_hash() in read_hashes
+    assert all(h[:prefix_length] == changed.dag_hash()[:prefix_length] for h in read_hashes)
+
+    # Remove the spec, the client only fetches the changed blobs and drops the old shard
+    os.remove(changed_manifest)
+    buildcache_cmd("update-index", str(mirror_dir))
+
+    fetched = []
+    fetch_blob = bindist.IndexFetcher.fetch_index_blob
+
+    def fetch_index_blob(self, cache_entry, blob_record):
+        fetched.append(blob_record)
+        return fetch_blob(self, cache_entry, blob_record)
+
+    monkeypatch.setattr(bindist.IndexFetcher, "fetch_index_blob", fetch_index_blob)
+    in_flight = shards_dir / f"{'a' * 64}.json.1234.5678.tmp"
+    in_flight.write_text("{}")
+    index.update()
+    assert len(fetched) <= 2
+    assert len(list(shards_dir.glob("*.json"))) <= num_shards
+    assert not index.find_built_spec(changed)
+    assert index.find_built_spec(s)
+
+    # Temporary files of concurrent fetches are not removed
+    assert in_flight.exists()
+
+    # Shards that cannot be stored locally are just not cached
+    other_cache = tmp_path / "other_cache"
+    other_cache.mkdir()
+    (other_cache / "shards").write_text("not a directory")
+    other_index = bindist.BinaryCacheIndex(str(other_cache))
+    other_index.update()
+    assert other_index.find_built_spec(s)
+
+
 @pytest.mark.usefixtures("install_mockery", "mock_packages", "mock_fetch")
 def test_use_bin_index_active_env_with_view(
     monkeypatch, tmp_path: pathlib.Path, mutable_config, mutable_mock_env_path
@@ -799,6 +1040,7 @@ def test_tarball_doesnt_include_buildinfo_twice(tmp_path: Path):
             "relocate_binaries": [],
             "relocate_textfiles": [],
             "relocate_links": [],
+            "relocation_index": {"prefixes": [], "binaries": {}},
         }
         assert tar.getnames() == [
             *_all_parents(expected_prefix),
@@ -947,6 +1189,127 @@ def test_tarball_common_prefix(dummy_prefix, tmp_path: pathlib.Path):
         )
 
 
+@pytest.mark.parametrize("mode", ["w", "w:gz"])
+def test_extract_buildcache_tarball(dummy_prefix, tmp_path: pathlib.Path, mode):
+    """Tests that the package prefix in a tarball is extracted in the destination directory,
+    with the parent directories of the prefix stripped, when reading the tarball as a stream."""
+    os.link(os.path.join(dummy_prefix, "share", "file"), os.path.join(dummy_prefix, "hardlink"))
+    tarball = str(tmp_path / "example.tar")
+    with tarfile.open(tarball, mode=mode) as tar:
+        tar.add(name=dummy_prefix)
+
+    destination = tmp_path / "destination"
+    spack.binary_distribution.extract_buildcache_tarball(tarball, destination=str(destination))
+
+    assert set(os.listdir(destination)) == {"bin", "share", ".spack", "hardlink"}
+    assert (destination / "hardlink").read_text() == "hello world"
+    assert os.path.samefile(destination / "hardlink", destination / "share" / "file")
+    assert readlink(str(destination / "bin" / "relative_app_link")) == "app"
+
+
+def test_extract_buildcache_tarball_merges_existing_directories(
+    dummy_prefix, tmp_path: pathlib.Path
+):
+    """Tests that the tarball is merged into directories that already exist in the destination,
+    as when rewiring a spec whose prefix was created by pre-install hooks."""
+    tarball = str(tmp_path / "example.tar")
+    with tarfile.open(tarball, mode="w") as tar:
+        tar.add(name=dummy_prefix)
+
+    destination = tmp_path / "destination"
+    (destination / "share").mkdir(parents=True)
+    (destination / "share" / "existing").write_text("existing")
+    (destination / "share" / "file").write_text("stale")
+    spack.binary_distribution.extract_buildcache_tarball(tarball, destination=str(destination))
+
+    assert set(os.listdir(destination)) == {"bin", "share", ".spack"}
+    assert (destination / "share" / "existing").read_text() == "existing"
+    assert (destination / "share" / "file").read_text() == "hello world"
+
+
+def test_extract_buildcache_tarball_multiple_gzip_members(dummy_prefix, tmp_path: pathlib.Path):
+    """Tarballs compressed in independent blocks are extracted as a single stream."""
+    tarball = str(tmp_path / "example.tar.gz")
+    with open(tarball, "wb") as f, spack.util.archive.ParallelGzipWriter(
+        f, jobs=2, block_size=512
+    ) as compressed, tarfile.open(fileobj=compressed, mode="w") as tar:
+        tar.add(name=dummy_prefix)
+
+    destination = tmp_path / "destination"
+    spack.binary_distribution.extract_buildcache_tarball(tarball, destination=str(destination))
+    assert set(os.listdir(destination)) == {"bin", "share", ".spack"}
+    assert (destination / "share" / "file").read_text() == "hello world"
+
+
+def test_tarball_blob_record_compression(tmp_path: pathlib.Path):
+    """Tarball blob records are found regardless of their compression format, and archives that
+    cannot be decompressed are not fetched."""
+    cache_entry = URLBuildcacheEntry(url_util.path_to_file_url(str(tmp_path)))
+    record = spack.url_buildcache.BlobRecord(
+        10, URLBuildcacheEntry.tarball_media_type("zstd"), "zstd", "sha256", "abcd"
+    )
+    cache_entry.manifest = spack.url_buildcache.BuildcacheManifest(3, [record])
+    assert cache_entry.get_blob_record(BuildcacheComponent.TARBALL).compression_alg == "zstd"
+    assert cache_entry.exists([BuildcacheComponent.TARBALL]) is False
+
+    if not spack.util.archive.ZSTD_SUPPORTED:
+        with pytest.raises(BuildcacheEntryError, match="Cannot decompress zstd"):
+            cache_entry.fetch_archive()
+
+
+@pytest.mark.skipif(spack.util.archive.ZSTD_SUPPORTED, reason="zstd is available")
+def test_buildcache_compression_fallback(mutable_config):
+    mutable_config.set("config:buildcache_compression", {"type": "zstd", "level": 19})
+    assert spack.binary_distribution.buildcache_compression() == ("gzip", None)
+    mutable_config.set("config:buildcache_compression", {"type": "gzip", "level": 9})
+    assert spack.binary_distribution.buildcache_compression() == ("gzip", 9)
+
+
+def test_buildcache_compression_level_is_clamped(mutable_config):
+    """Levels that are only valid for zstd are clamped to the maximum level of gzip"""
+    mutable_config.set("config:buildcache_compression", {"type": "gzip", "level": 12})
+    assert spack.binary_distribution.buildcache_compression() == ("gzip", 9)
+
+
+@pytest.mark.parametrize("name", ["/etc/config_file", "prefix/../../config_file"])
+def test_extract_buildcache_tarball_outside_of_prefix(
+    name, dummy_prefix, tmp_path: pathlib.Path
+):
+    """Entries that would be extracted outside of the destination are rejected before any of
+    them is written to disk."""
+    tarball = str(tmp_path / "broken.tar")
+    with tarfile.open(tarball, mode="w") as tar:
+        tar.addfile(tarfile.TarInfo(name=name), fileobj=io.BytesIO(b""))
+        tar.add(name=dummy_prefix)
+
+    destination = tmp_path / "destination"
+    with pytest.raises(ValueError, match="outside of prefix"):
+        spack.binary_distribution.extract_buildcache_tarball(tarball, destination=str(destination))
+    assert not os.listdir(destination)
+    assert not (tmp_path / "config_file").exists()
+
+
+def test_extract_buildcache_tarball_through_symlink(dummy_prefix, tmp_path: pathlib.Path):
+    """Entries that would be extracted through a symlink in the tarball are rejected, since the
+    symlink may point outside of the destination."""
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    tarball = str(tmp_path / "broken.tar")
+    with tarfile.open(tarball, mode="w") as tar:
+        tar.add(name=dummy_prefix)
+        prefix = str(dummy_prefix).lstrip("/")
+        link = tarfile.TarInfo(name=f"{prefix}/escape")
+        link.type = tarfile.SYMTYPE
+        link.linkname = str(outside)
+        tar.addfile(link)
+        tar.addfile(tarfile.TarInfo(name=f"{prefix}/escape/file"), fileobj=io.BytesIO(b""))
+
+    destination = tmp_path / "destination"
+    with pytest.raises(ValueError, match="outside of prefix"):
+        spack.binary_distribution.extract_buildcache_tarball(tarball, destination=str(destination))
+    assert not os.listdir(outside)
+
+
 def test_tarfile_missing_binary_distribution_file(tmp_path: pathlib.Path):
     """A tarfile that does not contain a .spack/binary_distribution file cannot be
     used to install."""
@@ -19,6 +19,7 @@
 import spack.deptypes as dt
 import spack.package_base
 import spack.spec
+import spack.user_environment
 import spack.util.environment
 import spack.util.spack_yaml as syaml
 from spack.build_environment import UseMode, _static_to_shared_library, dso_suffix
@@ -899,3 +900,73 @@ def test_build_process_timeout(mock_build_process, runtime, timeout, expected_ca
     _ = spack.build_environment.complete_build_process(process)
 
     assert _TestProcess.calls == expected_calls
+
+
+def test_run_environment_is_memoized_across_specs(mock_packages, mutable_config, monkeypatch):
+    """Tests that the run environment of dependencies shared by many specs is computed once
+    within a memoized session, and that it does not change the resulting modifications."""
+    specs = [spack.concretize.concretize_one(x) for x in ("mpileaks", "callpath")]
+    dyninst_cls = type(specs[0]["dyninst"].package)
+    calls = collections.Counter()
+
+    def setup_run_environment(self, env):
+        calls["setup_run_environment"] += 1
+        env.prepend_path("DYNINST_PATH", self.prefix)
+
+    def setup_dependent_run_environment(self, env, dependent_spec):
+        calls["setup_dependent_run_environment"] += 1
+        env.set("DYNINST_DEPENDENT", dependent_spec.name)
+
+    monkeypatch.setattr(dyninst_cls, "setup_run_environment", setup_run_environment)
+    monkeypatch.setattr(
+        dyninst_cls, "setup_dependent_run_environment", setup_dependent_run_environment
+    )
+
+    def modifications():
+        return [
+            [(type(x).__name__, x.name, getattr(x, "value", None)) for x in env]
+            for env in (
+                spack.user_environment.environment_modifications_for_specs(s) for s in specs
+            )
+        ]
+
+    expected = modifications()
+    assert calls == {"setup_run_environment": 2, "setup_dependent_run_environment": 2}
+
+    calls.clear()
+    with spack.build_environment.memoized_run_environment():
+        assert modifications() == expected
+        assert modifications() == expected
+    assert calls == {"setup_run_environment": 1, "setup_dependent_run_environment": 1}
+
+
+def test_memoized_run_environment_depends_on_config(mock_packages, mutable_config, tmp_path):
+    """Tests that the memoized run environment is not reused across configuration scopes"""
+    spec = spack.concretize.concretize_one("pkg-a")
+    spec.set_prefix(str(tmp_path))
+    (tmp_path / "custom").mkdir()
+
+    def names():
+        env = spack.user_environment.environment_modifications_for_specs(spec)
+        return {x.name for x in env}
+
+    with spack.build_environment.memoized_run_environment():
+        assert "CUSTOM_PATH" not in names()
+        with spack.config.override("modules:prefix_inspections", {"custom": ["CUSTOM_PATH"]}):
+            assert "CUSTOM_PATH" in names()
+        assert "CUSTOM_PATH" not in names()
+
+
+def test_run_environment_memo_of_worker_processes(monkeypatch):
+    """Tests that worker processes which do not inherit a memo get one for their whole life, and
+    that forked workers keep the memo they inherited."""
+    monkeypatch.setattr(spack.build_environment, "_RUN_ENVIRONMENT_MEMO", None)
+    spack.build_environment.enable_run_environment_memo()
+    memo = spack.build_environment._RUN_ENVIRONMENT_MEMO
+    assert memo is not None
+
+    spack.build_environment.enable_run_environment_memo()
+    assert spack.build_environment._RUN_ENVIRONMENT_MEMO is memo
+    with spack.build_environment.memoized_run_environment() as active:
+        assert active is memo
+    assert spack.build_environment._RUN_ENVIRONMENT_MEMO is memo
@@ -3105,6 +3105,101 @@ def test_view_link_type(link_type, installed_environment, tmp_path: pathlib.Path
             assert bin_file.is_symlink() == (link_type == "symlink")
 
 
+def test_incremental_view_update(installed_environment, tmp_path: pathlib.Path):
+    """Tests that an incremental view is updated in place, and moved to its new root"""
+    view_dir = tmp_path / "view"
+    with installed_environment(
+        f"""\
+spack:
+  specs:
+    - mpileaks
+  view:
+    default:
+      root: {view_dir}
+      incremental: true"""
+    ) as test:
+        old_root = test.default_view._current_root
+        bin_file = os.path.join(old_root, "bin", "mpileaks")
+        inode = os.lstat(bin_file).st_ino
+
+        test.add("pkg-c")
+        test.concretize()
+        test.install_all(fake=True)
+        test.write(regenerate=True)
+
+        new_root = test.default_view._current_root
+        assert new_root != old_root and not os.path.exists(old_root)
+        assert os.lstat(os.path.join(new_root, "bin", "mpileaks")).st_ino == inode
+        assert os.path.exists(os.path.join(new_root, "bin", "pkg-c"))
+        assert os.path.isdir(view_dir / ".spack" / "pkg-c")
+
+
+def test_incremental_view_update_with_changed_descriptor(
+    installed_environment, tmp_path: pathlib.Path
+):
+    """Tests that an incremental view is regenerated from scratch when its projections or link
+    type change, whether or not the specs in the view change too"""
+    view_dir = tmp_path / "view"
+    with installed_environment(
+        f"""\
+spack:
+  specs:
+    - mpileaks
+  view:
+    default:
+      root: {view_dir}
+      incremental: true"""
+    ) as test:
+        test.default_view.projections = {"all": "{name}"}
+        test.regenerate_views()
+        assert (view_dir / "mpileaks" / "bin" / "mpileaks").is_symlink()
+        assert not (view_dir / "bin").exists()
+
+        test.default_view.link_type = "hardlink"
+        test.add("pkg-c")
+        test.concretize()
+        test.install_all(fake=True)
+        test.regenerate_views()
+        for name in ("mpileaks", "pkg-c"):
+            bin_file = view_dir / name / "bin" / name
+            assert bin_file.is_file() and not bin_file.is_symlink()
+
+
+def test_incremental_view_update_with_files_written_by_packages(
+    installed_environment, tmp_path: pathlib.Path, monkeypatch
+):
+    """Tests that an incremental view is regenerated from scratch when packages write files that
+    depend on the view root, since those would point to the old root after the view is moved"""
+
+    def add_files_to_view(self, view, merge_map, skip_if_exists=True):
+        spack.package_base.PackageBase.add_files_to_view(self, view, merge_map, skip_if_exists)
+        with open(os.path.join(view._root, "view-root"), "w", encoding="utf-8") as f:
+            f.write(view.get_projection_for_spec(self.spec))
+
+    mpileaks_cls = spack.repo.PATH.get_pkg_class("mpileaks")
+    monkeypatch.setattr(mpileaks_cls, "add_files_to_view", add_files_to_view)
+
+    view_dir = tmp_path / "view"
+    with installed_environment(
+        f"""\
+spack:
+  specs:
+    - mpileaks
+  view:
+    default:
+      root: {view_dir}
+      incremental: true"""
+    ) as test:
+        test.add("pkg-c")
+        test.concretize()
+        test.install_all(fake=True)
+        test.write(regenerate=True)
+
+        root = (view_dir / "view-root").read_text()
+        assert root.startswith(test.default_view._current_root)
+        assert os.path.isdir(root)
+
+
 def test_view_link_all(installed_environment, template_combinatorial_env, tmp_path: pathlib.Path):
     view_dir = tmp_path / "view"
     content = template_combinatorial_env.format(
@@ -2,6 +2,7 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import inspect
 import os
 import re
 
@@ -11,7 +12,9 @@
 import spack.config
 import spack.main
 import spack.modules
+import spack.modules.common
 import spack.modules.lmod
+import spack.modules.tcl
 import spack.repo
 import spack.store
 from spack.installer import PackageInstaller
@@ -90,6 +93,52 @@ def test_remove_and_add(database, module_type):
         assert os.path.exists(item)
 
 
+@pytest.mark.db
+def test_refresh_skips_up_to_date_module_files(database, monkeypatch):
+    """Tests that refresh only renders the module files whose inputs changed"""
+    module("tcl", "refresh", "-y", "libelf", "mpileaks")
+
+    rendered = []
+    render = spack.modules.common.BaseModuleFileWriter.render
+
+    def _render(writer):
+        rendered.append(writer.layout.filename)
+        return render(writer)
+
+    monkeypatch.setattr(spack.modules.common.BaseModuleFileWriter, "render", _render)
+
+    module("tcl", "refresh", "-y", "libelf", "mpileaks")
+    assert not rendered
+
+    (libelf_module,) = _module_files("tcl", "libelf")
+    os.unlink(libelf_module)
+    module("tcl", "refresh", "-y", "libelf", "mpileaks")
+    assert rendered == [libelf_module]
+    assert os.path.exists(libelf_module)
+
+    rendered.clear()
+    monkeypatch.setattr(spack.modules.tcl, "configuration_registry", {})
+    tcl_config = {"tcl": {"all": {"environment": {"set": {"FOO": "1"}}}}}
+    with spack.config.override("modules:default", tcl_config):
+        module("tcl", "refresh", "-y", "libelf")
+    assert rendered == [libelf_module]
+    with open(libelf_module, encoding="utf-8") as f:
+        assert "FOO" in f.read()
+
+    # Base classes of the package, like build systems, are inputs of the module file too
+    module("tcl", "refresh", "-y", "libelf")
+    rendered.clear()
+    libelf = spack.store.STORE.db.query_one("libelf")
+    base_module = inspect.getfile(type(libelf.package).__mro__[1])
+    st = os.stat(base_module)
+    os.utime(base_module, ns=(st.st_atime_ns, st.st_mtime_ns + 10**10))
+    try:
+        module("tcl", "refresh", "-y", "libelf")
+    finally:
+        os.utime(base_module, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert rendered == [libelf_module]
+
+
 @pytest.mark.db
 @pytest.mark.parametrize("cli_args", [["libelf"], ["--full-path", "libelf"]])
 def test_find(database, cli_args, module_type):
@@ -8,6 +8,7 @@
 import platform
 import re
 import sys
+import time
 from typing import Any, Dict
 
 import pytest
@@ -189,6 +190,10 @@ def reverser(pkg_name):
             pkg_cls = spack.repo.PATH.get_pkg_class(pkg_name)
             reversed_dict = dict(reversed(list(pkg_cls.dependencies.items())))
             monkeypatch.setattr(pkg_cls, "dependencies", reversed_dict)
+            # The solver reads dependencies from the metadata index
+            metadata = spack.repo.PATH.package_metadata(pkg_name)
+            reversed_list = list(reversed(metadata.data["dependencies"]))
+            monkeypatch.setitem(metadata.data, "dependencies", reversed_list)
 
     return reverser
 
@@ -2330,8 +2335,9 @@ def test_installed_specs_disregard_conflicts(self, mutable_database, monkeypatch
         where a conflict is added on a package after a spec matching the conflict was installed.
         """
         # Add a conflict to "mpich" that match an already installed "mpich~debug"
-        pkg_cls = spack.repo.PATH.get_pkg_class("mpich")
-        monkeypatch.setitem(pkg_cls.conflicts, Spec(), [(Spec("~debug"), None)])
+        metadata = spack.repo.PATH.package_metadata("mpich")
+        conflict = {"when": "", "spec": "~debug", "msg": None}
+        monkeypatch.setitem(metadata.data, "conflicts", [*metadata.data["conflicts"], conflict])
 
         # If we concretize with --fresh the conflict is taken into account
         with spack.config.override("concretizer:reuse", False):
@@ -3329,6 +3335,44 @@ def test_spec_filters(specs, include, exclude, expected):
     assert f.selected_specs() == expected
 
 
+@pytest.mark.usefixtures("database")
+def test_prune_reusable_specs():
+    """Tests that reusable specs are pruned if they, or any of their link/run dependencies,
+    cannot be part of the solution.
+    """
+    specs = spack.store.STORE.db.query_local(installed=True)
+    names = {x.name for x in specs}
+    targets = {x.target.name for x in specs}
+    assert "callpath" in names and "mpileaks" in names
+
+    # Nothing is pruned if all packages and targets are possible, but duplicates are removed
+    result = spack.solver.reuse.prune_reusable_specs(
+        specs + specs, possible_packages=names, targets=targets
+    )
+    assert result == specs
+
+    # Packages that are not possible are pruned, together with the specs depending on them
+    result = spack.solver.reuse.prune_reusable_specs(
+        specs, possible_packages=names - {"callpath"}, targets=targets
+    )
+    assert result
+    assert all("callpath" not in x for x in result)
+    assert any(x.name == "mpich" for x in result)
+
+    # Specs with a target that is not possible are pruned
+    assert not spack.solver.reuse.prune_reusable_specs(
+        specs, possible_packages=names, targets=set()
+    )
+
+    # Runtimes are solved again, so they don't prune the specs depending on them
+    runtimes = spack.repo.PATH.packages_with_tags("runtime")
+    assert names & runtimes
+    result = spack.solver.reuse.prune_reusable_specs(
+        specs, possible_packages=names - runtimes, targets=targets
+    )
+    assert {x.name for x in result} == names - runtimes
+
+
 @pytest.mark.regression("38484")
 def test_git_ref_version_can_be_reused(install_mockery, do_not_check_runtimes_on_reuse):
     first_spec = spack.concretize.concretize_one(
@@ -3399,6 +3443,29 @@ def test_parallel_concretization(mutable_config, mock_packages):
     assert {s.name for s, _ in result} == {"pkg-a", "pkg-b"}
 
 
+def test_concretize_separately_selects_reusable_specs_once(
+    mutable_config, mock_packages, monkeypatch
+):
+    """Tests that reusable specs are selected once for all the specs, rather than once per
+    spec.
+    """
+    calls = []
+    selected_specs = spack.solver.reuse.SpecFilter.selected_specs
+
+    def _selected_specs(self):
+        calls.append(self)
+        return selected_specs(self)
+
+    monkeypatch.setattr(spack.solver.reuse.SpecFilter, "selected_specs", _selected_specs)
+    specs = [(Spec(x), None) for x in ("pkg-a", "pkg-b", "pkg-c")]
+    result = spack.concretize.concretize_separately(specs)
+
+    assert {s.name for s, _ in result} == {"pkg-a", "pkg-b", "pkg-c"}
+    selector = spack.solver.reuse.ReusableSpecsSelector(mutable_config)
+    assert len(calls) == len(selector.reuse_sources)
+    assert spack.concretize._WORKER_SOLVER is None
+
+
 @pytest.mark.usefixtures("mutable_config", "mock_packages", "do_not_check_runtimes_on_reuse")
 @pytest.mark.parametrize(
     "spec_str, error_type",
@@ -4442,33 +4509,93 @@ def test_concretization_cache_count_cleanup(use_concretization_cache, mutable_co
     """Tests to ensure we are cleaning the cache when we should be respective to the
     number of entries allowed in the cache"""
     conc_cache_dir = use_concretization_cache
+    shards = spack.solver.asp.ConcretizationCache.NUMBER_OF_SHARDS
 
-    spack.config.set("concretizer:concretization_cache:entry_limit", 1000)
+    # Allow 10 entries per shard
+    spack.config.set("concretizer:concretization_cache:entry_limit", 10 * shards)
 
     def names():
-        return set(
-            x.name
-            for x in conc_cache_dir.iterdir()
-            if (not x.is_dir() and not x.name.startswith("."))
-        )
+        return set(x.name for x in conc_cache_dir.glob("*/*") if not x.name.startswith("."))
 
     assert len(names()) == 0
 
-    for i in range(1000):
+    for i in range(10 * shards):
         name = spack.util.hash.b32_hash(f"mock_cache_file_{i}")
-        mock_cache_file = conc_cache_dir / name
+        mock_cache_file = conc_cache_dir / "abcdefghijklmnopqrstuvwxyz234567"[i % shards] / name
+        mock_cache_file.parent.mkdir(exist_ok=True)
         mock_cache_file.touch()
 
     before = names()
-    assert len(before) == 1000
+    assert len(before) == 10 * shards
 
-    # cleanup should be run after the 1,001st execution
+    # cleanup should be run on the shard of the new entry, which now exceeds its limit
     spack.concretize.concretize_one("hdf5")
 
-    # ensure that half the elements were removed and that one more was created
+    # ensure that 10% of the shard limit was freed, and that one more entry was created
     after = names()
-    assert len(after) == 501
-    assert len(after - before) == 1  # one additional hash added by 1001st concretization
+    assert len(after) == 10 * shards - 1
+    assert len(after - before) == 1  # one additional hash added by the concretization
+
+
+def test_concretization_cache_lru_cleanup(tmp_path, mutable_config):
+    """Tests that the least recently used entries of a shard are removed first, when the shard
+    exceeds its size limit, and that evictions are counted.
+    """
+    cache = spack.solver.asp.ConcretizationCache(root=str(tmp_path))
+    spack.config.set("concretizer:concretization_cache:entry_limit", 0)
+    spack.config.set("concretizer:concretization_cache:size_limit", 300 * cache.NUMBER_OF_SHARDS)
+
+    shard = tmp_path / "a"
+    shard.mkdir()
+    for name in ("a1", "a2", "a3", "a4"):
+        (shard / name).write_bytes(b"x" * 100)
+
+    # Recorded accesses determine the LRU order, not the order of creation
+    for name in ("a3", "a1", "a4", "a2"):
+        cache._record_access(shard / name)
+    cache.cleanup()
+
+    assert {x.name for x in shard.iterdir() if not x.name.startswith(".")} == {"a2", "a4"}
+    assert cache.statistics() == {"hits": 0, "misses": 0, "evictions": 2}
+
+    # The access log has been compacted
+    records = (shard / cache.ACCESS_LOG).read_text().splitlines()
+    assert records == ["a4 100", "a2 100"]
+
+
+def test_concretization_cache_cleanup_old_layout_and_tmp_files(tmp_path, mutable_config):
+    """Tests that entries of the flat layout are moved into their shards once, and that stale
+    temporary files are removed from shards."""
+    (tmp_path / "a1").write_bytes(b"x")
+    (tmp_path / ".cc_lock").touch()
+    cache = spack.solver.asp.ConcretizationCache(root=str(tmp_path))
+
+    shard = tmp_path / "b"
+    shard.mkdir()
+    stale, recent = shard / ".b1.abc", shard / ".b2.def"
+    stale.touch()
+    recent.touch()
+    old = time.time() - 2 * cache.STALE_TMP_FILE_AGE
+    os.utime(stale, (old, old))
+    cache._record_access(shard / "b3")
+    cache.cleanup()
+
+    assert (tmp_path / "a" / "a1").read_bytes() == b"x"
+    assert not (tmp_path / "a1").exists() and not (tmp_path / ".cc_lock").exists()
+    assert not stale.exists() and recent.exists()
+
+    # Entries of the flat layout are not looked for again
+    (tmp_path / "a2").touch()
+    cache.cleanup()
+    assert (tmp_path / "a2").exists()
+
+
+def test_concretization_cache_statistics(use_concretization_cache):
+    """Tests that hits and misses of the concretization cache are counted."""
+    solver = spack.solver.asp.Solver()
+    solver.solve([Spec("zlib")])
+    solver.solve([Spec("zlib")])
+    assert solver._conc_cache.statistics() == {"hits": 1, "misses": 1, "evictions": 0}
 
 
 def test_concretization_cache_uncompressed_entry(use_concretization_cache, monkeypatch):
@@ -4522,6 +4649,48 @@ def test_concretization_cache_asp_canonicalization(asp_file):
     )
 
 
+def test_setup_cache_roundtrip(use_setup_cache, monkeypatch):
+    """Tests that the facts replayed from the setup cache give the same problem, and the same
+    concretization, as the facts computed from package directives.
+    """
+    with spack.config.override("concretizer:setup_cache", {"enable": False}):
+        expected = spack.concretize.concretize_one("mpileaks")
+
+    specs = [Spec("mpileaks")]
+    cold = spack.solver.asp.SpackSolverSetup().setup(specs).asp_problem
+    assert any(use_setup_cache.iterdir())
+
+    def _ensure_cache_hit(self, pkg):
+        assert False, f"setup cache hit expected for {pkg.name}"
+
+    monkeypatch.setattr(
+        spack.solver.asp.SpackSolverSetup, "_record_package_directive_rules", _ensure_cache_hit
+    )
+    warm = spack.solver.asp.SpackSolverSetup().setup(specs).asp_problem
+    assert warm == cold
+    assert spack.concretize.concretize_one("mpileaks") == expected
+
+
+def test_setup_cache_is_invalidated_by_changed_inputs(use_setup_cache, monkeypatch):
+    """Tests that only the packages whose inputs changed are recorded again."""
+    specs = [Spec("mpileaks")]
+    spack.solver.asp.SpackSolverSetup().setup(specs)
+
+    recorded = []
+    record = spack.solver.asp.SpackSolverSetup._record_package_directive_rules
+
+    def _record(self, pkg):
+        recorded.append(pkg.name)
+        return record(self, pkg)
+
+    monkeypatch.setattr(
+        spack.solver.asp.SpackSolverSetup, "_record_package_directive_rules", _record
+    )
+    spack.solver.asp.SpackSolverSetup(tests=["mpileaks"]).setup(specs)
+    assert "mpileaks" in recorded
+    assert "callpath" not in recorded
+
+
 @pytest.mark.parametrize(
     "node_completion,expected,not_expected",
     [
@@ -454,6 +454,18 @@ def use_concretization_cache(mock_packages, mutable_config, tmp_path: Path):
         yield conc_cache_dir
 
 
+@pytest.fixture(scope="function")
+def use_setup_cache(mock_packages, mutable_config, tmp_path: Path):
+    """Enables the use of the setup cache"""
+    setup_cache_dir = tmp_path / "setup"
+    setup_cache_dir.mkdir()
+
+    with spack.config.override(
+        "concretizer:setup_cache", {"enable": True, "url": str(setup_cache_dir)}
+    ):
+        yield setup_cache_dir
+
+
 #
 # These fixtures are applied to all tests
 #
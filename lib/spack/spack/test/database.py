@@ -1347,3 +1347,174 @@ def test_querying_reindexed_database_specfilev5(tmp_path: pathlib.Path):
     assert len(specs) == 8
     assert len([x for x in specs if x.external]) == 2
     assert len([x for x in specs if x.original_spec_format() < 5]) == 8
+
+
+def _unindexed_query(db: spack.database.Database, query_spec, **kwargs):
+    """Reference query, checking every record in the database"""
+    kwargs.setdefault("installed", True)
+    installed = spack.database.normalize_query(kwargs["installed"])
+    explicit = kwargs.get("explicit")
+    query_spec = spack.spec.Spec(query_spec) if query_spec else None
+    return sorted(
+        rec.spec
+        for rec in db._data.values()
+        if rec.install_type_matches(installed)
+        and (explicit is None or rec.explicit == explicit)
+        and (query_spec is None or rec.spec.satisfies(query_spec))
+    )
+
+
+@pytest.mark.parametrize(
+    "query_spec,kwargs",
+    [
+        (None, {}),
+        (None, {"explicit": True}),
+        (None, {"explicit": False, "installed": InstallRecordStatus.ANY}),
+        ("mpileaks", {}),
+        ("callpath@1.0", {}),
+        ("libelf@0.8.10:", {"installed": InstallRecordStatus.ANY}),
+        ("mpi", {}),
+        ("mpi@2:", {}),
+        ("mpileaks ^mpich", {}),
+        ("^mpich", {}),
+        ("not-in-db", {}),
+    ],
+)
+def test_indexed_query_matches_full_scan(database, query_spec, kwargs):
+    """Tests that narrowing candidates with the secondary indexes doesn't change results"""
+    assert sorted(database.query_local(query_spec, **kwargs)) == _unindexed_query(
+        database, query_spec, **kwargs
+    )
+
+
+def test_indexes_are_updated_on_write(mutable_database):
+    """Tests that the secondary indexes follow in-place changes to install records"""
+    mpileaks_zmpi = mutable_database.query_one("mpileaks ^zmpi")
+    assert mutable_database.query_local("mpileaks ^zmpi", explicit=True) == [mpileaks_zmpi]
+
+    mutable_database.mark(mpileaks_zmpi, "explicit", False)
+    assert not mutable_database.query_local("mpileaks ^zmpi", explicit=True)
+    assert mpileaks_zmpi in mutable_database.query_local(explicit=False)
+    assert mpileaks_zmpi not in mutable_database.query_local(explicit=True)
+
+    # Removing a dependency with dependents only marks it as missing
+    zmpi = mutable_database.query_one("zmpi")
+    mutable_database.remove(zmpi)
+    assert zmpi not in mutable_database.query_local()
+    assert mutable_database.query_local(installed=False) == [zmpi]
+
+    mutable_database.remove(mpileaks_zmpi)
+    assert not mutable_database.query_local("mpileaks ^zmpi", installed=InstallRecordStatus.ANY)
+    assert sorted(mutable_database.query_local(installed=InstallRecordStatus.ANY)) == (
+        _unindexed_query(mutable_database, None, installed=InstallRecordStatus.ANY)
+    )
+
+
+def test_lazy_read_constructs_specs_on_access(database):
+    """Tests that a lazy database constructs only the specs that are accessed, and gives the
+    same results as a database read eagerly.
+    """
+    lazy_db = spack.database.Database(database.root, layout=database.layout, lazy=True)
+    with lazy_db.read_transaction():
+        assert all(not rec.materialized for rec in lazy_db._data.values())
+
+    mpileaks = lazy_db.query_one("mpileaks ^mpich")
+    materialized = {h for h, rec in lazy_db._data.items() if rec.materialized}
+    assert mpileaks.dag_hash() in materialized
+    assert all(s.dag_hash() in materialized for s in mpileaks.traverse())
+    assert len(materialized) < len(lazy_db._data)
+
+    # Specs still share nodes, and have the same hashes as in the eager database
+    mpich = next(s for s in mpileaks.traverse() if s.name == "mpich")
+    _, record = lazy_db.query_by_spec_hash(mpich.dag_hash())
+    assert record.spec is mpich
+    assert record.spec.concrete
+    assert sorted(lazy_db.query(installed=InstallRecordStatus.ANY)) == sorted(
+        database.query(installed=InstallRecordStatus.ANY)
+    )
+
+
+def test_lazy_read_links_dependents_on_materialize(database):
+    lazy_db = spack.database.Database(database.root, layout=database.layout, lazy=True)
+    mpich = lazy_db.query_one("mpich")
+    assert not mpich.dependents()
+
+    lazy_db.materialize()
+    assert {s.name for s in mpich.dependents()} == {"callpath", "mpileaks"}
+    assert lazy_db.installed_relatives(mpich, direction="parents") == database.installed_relatives(
+        database.query_one("mpich"), direction="parents"
+    )
+
+
+def test_lazy_read_write_roundtrip(mutable_database):
+    """Tests that writing a lazy database doesn't need to construct specs, and that the result
+    can be read back.
+    """
+    lazy_db = spack.database.Database(
+        mutable_database.root, layout=mutable_database.layout, lazy=True
+    )
+    with lazy_db.write_transaction():
+        pass
+    assert all(not rec.materialized for rec in lazy_db._data.values())
+
+    expected = sorted(mutable_database.query(installed=InstallRecordStatus.ANY))
+    new_db = spack.database.Database(mutable_database.root, layout=mutable_database.layout)
+    assert sorted(new_db.query(installed=InstallRecordStatus.ANY)) == expected
+
+
+def test_journal_appends_changes_and_compacts(mutable_database):
+    """Tests that write transactions append to the journal, that other databases replay it, and
+    that it's compacted once it's full.
+    """
+    root, layout = mutable_database.root, mutable_database.layout
+    db = spack.database.Database(root, layout=layout, journal_size=2)
+    # The first write creates a database file the journal can refer to
+    with db.write_transaction():
+        pass
+    index_content = db._index_path.read_text()
+    assert not db._journal_path.exists()
+
+    db.remove(db.query_one("mpileaks ^mpich"))
+    db.mark(db.query_one("mpich"), "explicit", True)
+    assert db._index_path.read_text() == index_content
+    assert len(db._journal_path.read_text().split()) == 2
+
+    # Databases replay the journal whether or not they write to it
+    expected = sorted(db.query(installed=InstallRecordStatus.ANY))
+    other_db = spack.database.Database(root, layout=layout)
+    assert sorted(other_db.query(installed=InstallRecordStatus.ANY)) == expected
+    assert other_db.query("mpich", explicit=True)
+
+    # The journal is full, so the next write creates a new database file
+    db.remove(db.query_one("mpileaks ^zmpi"))
+    assert not db._journal_path.exists()
+    assert db._index_path.read_text() != index_content
+    with open(db._index_path, encoding="utf-8") as f:
+        spack.vendor.jsonschema.validate(json.load(f), schema)
+
+    other_db = spack.database.Database(root, layout=layout)
+    assert sorted(other_db.query(installed=InstallRecordStatus.ANY)) == sorted(
+        db.query(installed=InstallRecordStatus.ANY)
+    )
+
+
+def test_journal_skips_partial_and_stale_entries(mutable_database):
+    root, layout = mutable_database.root, mutable_database.layout
+    db = spack.database.Database(root, layout=layout, journal_size=10)
+    with db.write_transaction():
+        pass
+    db.remove(db.query_one("mpileaks ^mpich"))
+    expected = sorted(db.query(installed=InstallRecordStatus.ANY))
+
+    with open(db._journal_path, "a", encoding="utf-8") as f:
+        f.write('\n{"snapshot": "unknown", "installs": {}, "removed": ["' + "a" * 32 + '"]}')
+        f.write('\n{"snapshot": "')
+
+    other_db = spack.database.Database(root, layout=layout, journal_size=10)
+    assert sorted(other_db.query(installed=InstallRecordStatus.ANY)) == expected
+    assert other_db._journal_entries == 1
+
+    # Entries appended after a partial one are read
+    other_db.remove(other_db.query_one("mpileaks ^zmpi"))
+    db._state_is_inconsistent = True
+    assert not db.query("mpileaks ^zmpi")
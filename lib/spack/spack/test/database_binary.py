@@ -0,0 +1,147 @@
+# Copyright Spack Project Developers. See COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import io
+
+import pytest
+
+import spack.database
+import spack.database_binary
+from spack.enums import InstallRecordStatus
+
+
+def _records(db: spack.database.Database):
+    with db.read_transaction():
+        return {
+            key: (rec.spec, rec.path, rec.installed, rec.explicit, rec.ref_count)
+            for key, rec in db._data.items()
+        }
+
+
+def test_dump_and_read_binary_index(database):
+    """Tests that raw records read from the binary format match those in the JSON format"""
+    with database.read_transaction():
+        installs = database._installs_to_dict()
+
+    stream = io.BytesIO()
+    spack.database_binary.dump(stream, "8", installs)
+    index = spack.database_binary.BinaryIndex(stream.getvalue())
+
+    assert index.db_version == "8"
+    assert set(index) == set(installs)
+    for hash_key, position in index.hashes.items():
+        fields = index.fields(position)
+        expected = installs[hash_key]
+        assert fields["path"] == expected["path"]
+        assert fields["installed"] == expected["installed"]
+        assert fields["ref_count"] == expected["ref_count"]
+        assert fields["installation_time"] == expected["installation_time"]
+
+        node = index[hash_key]["spec"]
+        expected_node = expected["spec"]
+        assert set(node) == set(expected_node)
+        assert node["name"] == expected_node["name"]
+        assert node[spack.database_binary.ht.dag_hash.name] == hash_key
+        assert [d["hash"] for d in node.get("dependencies", [])] == [
+            d["hash"] for d in expected_node.get("dependencies", [])
+        ]
+
+
+@pytest.mark.parametrize(
+    "content,msg",
+    [
+        (b"", "too short"),
+        (b"{" * 128, "not a binary database"),
+    ],
+)
+def test_invalid_binary_index(content, msg):
+    with pytest.raises(spack.database_binary.BinaryDatabaseError, match=msg):
+        spack.database_binary.BinaryIndex(content)
+
+
+def test_truncated_binary_index(database):
+    with database.read_transaction():
+        installs = database._installs_to_dict()
+    stream = io.BytesIO()
+    spack.database_binary.dump(stream, "8", installs)
+    with pytest.raises(spack.database_binary.BinaryDatabaseError, match="truncated"):
+        spack.database_binary.BinaryIndex(stream.getvalue()[:-10])
+
+
+def test_binary_database_roundtrip(mutable_database):
+    """Tests converting a database to the binary format with reindex, and reading it back"""
+    expected = _records(mutable_database)
+    expected_query = sorted(mutable_database.query("mpileaks ^mpich"))
+
+    # The database has not been converted yet
+    unconverted_db = spack.database.Database(mutable_database.root, index_format="binary")
+    with pytest.raises(spack.database.ExplicitDatabaseUpgradeError):
+        unconverted_db.query()
+
+    binary_db = spack.database.Database(
+        mutable_database.root, layout=mutable_database.layout, index_format="binary"
+    )
+    binary_db.reindex()
+    assert binary_db._index_path.name == spack.database.INDEX_BINARY_FILE
+    assert binary_db._index_path.is_file()
+    assert not (binary_db.database_directory / spack.database.INDEX_JSON_FILE).exists()
+
+    new_db = spack.database.Database(
+        mutable_database.root, layout=mutable_database.layout, index_format="binary"
+    )
+    assert _records(new_db) == expected
+    assert sorted(new_db.query("mpileaks ^mpich")) == expected_query
+
+    # Writes keep the binary format
+    new_db.remove(new_db.query_one("mpileaks ^mpich"))
+    assert len(new_db.query(installed=InstallRecordStatus.ANY)) == len(expected) - 1
+    assert not (new_db.database_directory / spack.database.INDEX_JSON_FILE).exists()
+
+
+def test_upstream_reads_any_format(mutable_database):
+    """Tests that upstream databases are read whatever format they're in"""
+    binary_db = spack.database.Database(
+        mutable_database.root, layout=mutable_database.layout, index_format="binary"
+    )
+    binary_db.reindex()
+
+    upstream = spack.database.Database(mutable_database.root, is_upstream=True)
+    upstream._read()
+    assert sorted(upstream._query(installed=InstallRecordStatus.ANY)) == sorted(
+        binary_db.query(installed=InstallRecordStatus.ANY)
+    )
+
+
+def test_binary_records_are_decoded_on_first_access(mutable_database, monkeypatch):
+    """Tests that reading a binary database decodes only the hashes of records, and that the
+    fields of a record are decoded when first accessed, without overwriting assigned fields"""
+    expected = _records(mutable_database)
+    expected_query = sorted(mutable_database.query("mpileaks ^mpich"))
+    binary_db = spack.database.Database(
+        mutable_database.root, layout=mutable_database.layout, index_format="binary"
+    )
+    binary_db.reindex()
+
+    decoded = []
+    fields = spack.database_binary.BinaryIndex.fields
+    monkeypatch.setattr(
+        spack.database_binary.BinaryIndex,
+        "fields",
+        lambda self, position: decoded.append(position) or fields(self, position),
+    )
+
+    new_db = spack.database.Database(
+        mutable_database.root, layout=mutable_database.layout, index_format="binary"
+    )
+    with new_db.read_transaction():
+        assert not decoded
+        key = next(iter(expected))
+        record = new_db._data[key]
+        record.explicit = not expected[key][3]
+        assert record.installed == expected[key][2]
+        assert record.explicit != expected[key][3]
+        assert len(decoded) == 1
+
+        # Queries index the remaining records
+        assert sorted(new_db._query("mpileaks ^mpich")) == expected_query
+        assert len(decoded) == len(expected)
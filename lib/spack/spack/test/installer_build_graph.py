@@ -584,3 +584,40 @@ def test_pruning_root_node_with_install_package_false(
         # dep1 should not appear in any mappings
         assert dep1_hash not in graph.parent_to_child
         assert dep1_hash not in graph.child_to_parent
+
+    def test_topological_order(self, diamond_dag: Dict[str, Spec], temporary_store: Store):
+        """Test that every node comes after all of its children in topological order."""
+        graph = BuildGraph(
+            specs=[diamond_dag["root"]],
+            root_policy="auto",
+            dependencies_policy="auto",
+            include_build_deps=False,
+            install_package=True,
+            install_deps=True,
+            database=temporary_store.db,
+        )
+
+        order = graph.topological_order()
+        assert sorted(order) == sorted(graph.nodes)
+        position = {key: i for i, key in enumerate(order)}
+        for parent, children in graph.parent_to_child.items():
+            assert all(position[child] < position[parent] for child in children)
+        assert order[0] == diamond_dag["shared"].dag_hash()
+        assert order[-1] == diamond_dag["root"].dag_hash()
+
+    def test_dependents(self, mock_specs: Dict[str, Spec], temporary_store: Store):
+        """Test that dependents include direct and transitive parents only."""
+        graph = BuildGraph(
+            specs=[mock_specs["root"]],
+            root_policy="auto",
+            dependencies_policy="auto",
+            include_build_deps=False,
+            install_package=True,
+            install_deps=True,
+            database=temporary_store.db,
+        )
+
+        hashes = {name: spec.dag_hash() for name, spec in mock_specs.items()}
+        assert graph.dependents(hashes["dep2"]) == {hashes["dep1"], hashes["root"]}
+        assert graph.dependents(hashes["dep3"]) == {hashes["root"]}
+        assert graph.dependents(hashes["root"]) == set()
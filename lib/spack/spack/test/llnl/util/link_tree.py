@@ -19,7 +19,12 @@
     visit_directory_tree,
     working_dir,
 )
-from spack.llnl.util.link_tree import DestinationMergeVisitor, LinkTree, SourceMergeVisitor
+from spack.llnl.util.link_tree import (
+    DestinationMergeVisitor,
+    LinkTree,
+    SourceMergeVisitor,
+    record_source_tree,
+)
 
 
 @pytest.fixture
@@ -380,6 +385,96 @@ def u(path: str) -> str:
     assert visitor_2.directories[str(tmp_path / "view" / "dir")] == (str(tmp_path / "a"), "dir")
 
 
+def test_replayed_source_tree_merges_like_visited_tree(tmp_path: pathlib.Path):
+    """Traversals of prefixes recorded with record_source_tree can be replayed into a
+    SourceMergeVisitor, with the same result as visiting the prefixes directly. This includes
+    skipping directories that the visitor does not descend into due to conflicts."""
+    (tmp_path / "a" / "lib" / "sub").mkdir(parents=True)
+    (tmp_path / "a" / "lib" / "sub" / "file").write_bytes(b"a")
+    (tmp_path / "a" / "lib" / "LICENSE").write_bytes(b"a")
+    (tmp_path / "a" / "blocked").write_bytes(b"a")
+    (tmp_path / "a" / "lib64").symlink_to(tmp_path / "a" / "lib")
+    (tmp_path / "a" / "ignored").mkdir()
+    (tmp_path / "a" / "ignored" / "file").write_bytes(b"a")
+
+    (tmp_path / "b" / "lib").mkdir(parents=True)
+    (tmp_path / "b" / "lib" / "LICENSE").write_bytes(b"b")
+    (tmp_path / "b" / "blocked" / "sub").mkdir(parents=True)
+    (tmp_path / "b" / "blocked" / "sub" / "file").write_bytes(b"b")
+    (tmp_path / "b" / "blocked" / "file").write_bytes(b"b")
+    (tmp_path / "b" / "other").write_bytes(b"b")
+
+    def ignore(path):
+        return os.path.basename(path) == "ignored"
+
+    def summary(visitor):
+        return (
+            list(visitor.files.items()),
+            list(visitor.directories.items()),
+            [(c.dst, c.src_a, c.src_b) for c in visitor.file_conflicts],
+            [(c.dst, c.src_a, c.src_b) for c in visitor.fatal_conflicts],
+        )
+
+    for order in (("a", "b"), ("b", "a")):
+        visited = SourceMergeVisitor(ignore=ignore)
+        replayed = SourceMergeVisitor(ignore=ignore)
+        for name in order:
+            prefix = str(tmp_path / name)
+            visit_directory_tree(prefix, visited)
+            record_source_tree(prefix, ignore=ignore).replay(prefix, replayed)
+
+        assert visited.fatal_conflicts and visited.file_conflicts
+        assert summary(visited) == summary(replayed)
+
+
+class EventVisitor(spack.llnl.util.filesystem.BaseDirectoryVisitor):
+    """Visitor that logs all events, and does not descend into symlinked dirs and dirs named
+    skip"""
+
+    def __init__(self):
+        self.events = []
+
+    def before_visit_dir(self, root, rel_path, depth):
+        self.events.append(("bd", rel_path, depth))
+        return os.path.basename(rel_path) != "skip"
+
+    def before_visit_symlinked_dir(self, root, rel_path, depth):
+        self.events.append(("bsd", rel_path, depth))
+        return False
+
+    def after_visit_dir(self, root, rel_path, depth):
+        self.events.append(("ad", rel_path, depth))
+
+    def after_visit_symlinked_dir(self, root, rel_path, depth):
+        self.events.append(("asd", rel_path, depth))
+
+    def visit_file(self, root, rel_path, depth):
+        self.events.append(("f", rel_path, depth))
+
+    def visit_symlinked_file(self, root, rel_path, depth):
+        self.events.append(("sf", rel_path, depth))
+
+
+def test_replayed_source_tree_visits_like_visited_tree(tmp_path: pathlib.Path):
+    """Replaying a recorded traversal gives the same events as visiting the tree directly, when
+    the visitor skips directories the recorder did or did not descend into, including the last
+    entry of their parent."""
+    (tmp_path / "a" / "skip").mkdir(parents=True)
+    (tmp_path / "a" / "skip" / "file").write_bytes(b"a")
+    (tmp_path / "a" / "z").symlink_to(tmp_path)
+    (tmp_path / "c" / "lib").mkdir(parents=True)
+    (tmp_path / "c" / "lib" / "file").write_bytes(b"c")
+    (tmp_path / "c" / "lib64").symlink_to(tmp_path / "c" / "lib")
+
+    root = str(tmp_path)
+    visited, replayed = EventVisitor(), EventVisitor()
+    visit_directory_tree(root, visited)
+    record_source_tree(root).replay(root, replayed)
+
+    assert ("ad", "a", 0) in visited.events
+    assert visited.events == replayed.events
+
+
 def test_source_merge_visitor_deals_with_dangling_symlinks(tmp_path: pathlib.Path):
     """When a file and a dangling symlink conflict, this should be handled like a file conflict."""
     (tmp_path / "dir_a").mkdir()
@@ -3,16 +3,36 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 """Tests for the new_installer.py module"""
 
+import os
 import pathlib as pathlb
 import sys
+import threading
+import time
+from multiprocessing import Pipe
+from typing import Dict, List, Set, Tuple
 
 import pytest
 
 if sys.platform == "win32":
     pytest.skip("No Windows support", allow_module_level=True)
 
+import spack.binary_distribution
+import spack.concretize
 import spack.error
-from spack.new_installer import OVERWRITE_GARBAGE_SUFFIX, PrefixPivoter
+import spack.new_installer
+import spack.prefetch
+import spack.spec
+import spack.store
+import spack.url_buildcache
+from spack.new_installer import (
+    DEPENDENCIES_INSTALLED,
+    EXIT_ABORTED,
+    EXIT_NO_BINARY,
+    OVERWRITE_GARBAGE_SUFFIX,
+    PackageInstaller,
+    PrefixPivoter,
+    SourcePrefetch,
+)
 
 
 @pytest.fixture
@@ -199,3 +219,190 @@ def test_garbage_move_failure_leaves_backup(
         assert (existing_prefix / "partial_file").exists()
         # Backup directory, failed prefix, and empty garbage directory should exist
         assert len(list(tmp_path.iterdir())) == 3
+
+
+class MockBuilds:
+    """Replaces the build processes of the installer with processes that install an empty prefix.
+    Specs in ``binaries`` are in a mock binary cache, and the build processes started for them
+    behave as if ``no_binary`` specs were missing from it. Source builds of ``failing`` specs fail.
+    """
+
+    def __init__(self, tmp_path: pathlb.Path, monkeypatch) -> None:
+        self.binaries: Set[str] = set()
+        self.no_binary: Set[str] = set()
+        self.failing: Set[str] = set()
+        #: Name of each started build, whether it installs a binary, and whether the dependencies
+        #: of the spec were installed when it started
+        self.started: List[Tuple[str, bool, bool]] = []
+        #: Events recorded by the build processes
+        self.events_file = tmp_path / "events"
+        self.events_file.touch()
+
+        mirror = spack.url_buildcache.MirrorMetadata("file:///mock-mirror", 3)
+        index = spack.binary_distribution.BINARY_INDEX
+        monkeypatch.setattr(index, "update", lambda *args, **kwargs: None)
+        monkeypatch.setattr(
+            index,
+            "find_by_hash",
+            lambda dag_hash: [mirror] if self._names[dag_hash] in self.binaries else [],
+        )
+        monkeypatch.setattr(spack.prefetch, "can_prefetch", lambda spec, **kwargs: False)
+        monkeypatch.setattr(spack.new_installer, "worker_function", self.worker_function)
+
+        start_build = spack.new_installer.start_build
+
+        def record_start(spec, *args, ahead_of_dependencies=False, **kwargs):
+            installed = all(dep.installed for dep in spec.dependencies())
+            self.started.append((spec.name, ahead_of_dependencies, installed))
+            return start_build(spec, *args, ahead_of_dependencies=ahead_of_dependencies, **kwargs)
+
+        monkeypatch.setattr(spack.new_installer, "start_build", record_start)
+
+        # The installer monitors stdin for key presses
+        r, w = os.pipe()
+        monkeypatch.setattr(sys, "stdin", os.fdopen(r))
+        self._stdin_w = w
+
+        #: Package names by DAG hash
+        self._names: Dict[str, str] = {}
+
+    def concretize(self, name: str, to_install: Set[str]) -> spack.spec.Spec:
+        """Concretize a spec, and add the nodes that are not in ``to_install`` to the database"""
+        spec = spack.concretize.concretize_one(name)
+        for node in spec.traverse(order="post"):
+            self._names[node.dag_hash()] = node.name
+            if node.name not in to_install:
+                if not node.external:
+                    spack.store.STORE.layout.create_install_directory(node)
+                spack.store.STORE.db.add(node)
+        return spec
+
+    def events(self) -> List[str]:
+        return self.events_file.read_text().splitlines()
+
+    def record(self, event: str) -> None:
+        with open(self.events_file, "a") as f:
+            f.write(f"{event}\n")
+
+    def worker_function(self, spec, explicit, mirrors, *args) -> None:
+        """Run in the build process instead of the function installing the spec"""
+        dependencies = args[11]
+        if dependencies is not None:
+            if spec.name in self.no_binary:
+                sys.exit(EXIT_NO_BINARY)
+            message = dependencies.recv_bytes()
+            self.record(f"{spec.name} notified {message.decode()}")
+            if message != DEPENDENCIES_INSTALLED:
+                sys.exit(EXIT_ABORTED)
+        elif spec.name in self.failing:
+            sys.exit(1)
+        spack.store.STORE.layout.create_install_directory(spec)
+        self.record(f"{spec.name} installed")
+        sys.exit(0)
+
+    def close(self) -> None:
+        os.close(self._stdin_w)
+
+
+@pytest.fixture
+def mock_builds(tmp_path: pathlb.Path, monkeypatch, install_mockery):
+    builds = MockBuilds(tmp_path, monkeypatch)
+    yield builds
+    builds.close()
+
+
+class TestScheduler:
+    """Tests for the scheduling of binary installs and source builds by the installer."""
+
+    def test_binaries_start_before_dependencies_are_installed(
+        self, mock_builds: MockBuilds, mutable_config
+    ):
+        """Test that binaries are fetched ahead of their dependencies, and notified once their
+        dependencies are installed."""
+        spec = mock_builds.concretize("libdwarf", {"libdwarf", "libelf"})
+        mock_builds.binaries = {"libdwarf", "libelf"}
+        mutable_config.set("config:concurrent_binary_installs", 2)
+
+        PackageInstaller([spec.package], explicit=True).install()
+
+        assert mock_builds.started == [("libelf", True, True), ("libdwarf", True, False)]
+        events = mock_builds.events()
+        assert events.index("libelf installed") < events.index("libdwarf notified installed")
+        assert spec.installed and spec["libelf"].installed
+
+    def test_binary_installs_are_limited(self, mock_builds: MockBuilds, mutable_config):
+        """Test that binaries are not started ahead of their dependencies when only one binary
+        install may run at a time."""
+        spec = mock_builds.concretize("libdwarf", {"libdwarf", "libelf"})
+        mock_builds.binaries = {"libdwarf", "libelf"}
+        mutable_config.set("config:concurrent_binary_installs", 1)
+
+        PackageInstaller([spec.package], explicit=True).install()
+
+        assert mock_builds.started == [("libelf", True, True), ("libdwarf", True, True)]
+        assert spec.installed
+
+    def test_missing_binary_is_built_from_sources(self, mock_builds: MockBuilds):
+        """Test that a spec whose binary cannot be fetched is built from sources, and that its
+        dependents still install from binaries."""
+        spec = mock_builds.concretize("libdwarf", {"libdwarf", "libelf"})
+        mock_builds.binaries = {"libdwarf", "libelf"}
+        mock_builds.no_binary = {"libelf"}
+
+        PackageInstaller([spec.package], explicit=True).install()
+
+        assert mock_builds.started == [
+            ("libelf", True, True),
+            ("libdwarf", True, False),
+            ("libelf", False, True),
+        ]
+        assert "libdwarf notified installed" in mock_builds.events()
+        assert spec.installed and spec["libelf"].installed
+
+    def test_failed_dependency_aborts_binary_installs(self, mock_builds: MockBuilds):
+        """Test that binaries waiting for a dependency that fails to build are aborted, and not
+        reported as failures themselves."""
+        spec = mock_builds.concretize("libdwarf", {"libdwarf", "libelf"})
+        mock_builds.binaries = {"libdwarf"}
+        mock_builds.failing = {"libelf"}
+
+        with pytest.raises(spack.error.InstallError) as e:
+            PackageInstaller([spec.package], explicit=True).install()
+
+        assert "libelf" in str(e.value) and "libdwarf" not in str(e.value)
+        assert mock_builds.started == [("libdwarf", True, False), ("libelf", False, True)]
+        assert mock_builds.events() == ["libdwarf notified failed"]
+        assert not spec.installed
+
+    def test_source_builds_wait_for_prefetched_sources(self, mock_builds: MockBuilds, monkeypatch):
+        """Test that a source build starts only once the prefetch reports its sources."""
+
+        class MockPrefetch(SourcePrefetch):
+            def __init__(self, specs: List[spack.spec.Spec]) -> None:
+                self.pending = {spec.dag_hash() for spec in specs}
+                self.done_r_conn, done_w_conn = Pipe(duplex=False)
+
+                def fetch():
+                    time.sleep(0.2)
+                    for spec in specs:
+                        mock_builds.record(f"{spec.name} fetched")
+                        done_w_conn.send_bytes(spec.dag_hash().encode())
+                    done_w_conn.close()
+
+                self.thread = threading.Thread(target=fetch)
+                self.thread.start()
+
+            def close(self) -> None:
+                self.thread.join()
+                self.done_r_conn.close()
+
+        monkeypatch.setattr(spack.new_installer, "SourcePrefetch", MockPrefetch)
+        monkeypatch.setattr(spack.prefetch, "can_prefetch", lambda spec, **kwargs: True)
+        spec = mock_builds.concretize("libdwarf", {"libdwarf", "libelf"})
+
+        PackageInstaller([spec.package], explicit=True).install()
+
+        events = mock_builds.events()
+        assert events.index("libelf fetched") < events.index("libelf installed")
+        assert events.index("libdwarf fetched") < events.index("libdwarf installed")
+        assert spec.installed
@@ -0,0 +1,109 @@
+# Copyright Spack Project Developers. See COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import collections
+import os
+import threading
+import time
+
+import pytest
+
+import spack.concretize
+import spack.error
+import spack.package_base
+import spack.prefetch
+import spack.repo
+import spack.util.parallel
+from spack.main import SpackCommand
+from spack.version import Version
+
+pytestmark = pytest.mark.usefixtures("mock_packages", "mutable_config")
+
+
+@pytest.fixture()
+def concurrent_fetches(monkeypatch):
+    """Replaces fetching with a function that records the maximum number of concurrent fetches,
+    in total and per host. Fetching pkg-b fails."""
+    lock = threading.Lock()
+    current = collections.Counter()
+    maximum = collections.Counter()
+
+    def do_fetch(pkg, mirror_only=False):
+        host = spack.prefetch.fetch_host(pkg.spec)
+        with lock:
+            for key in (host, "total"):
+                current[key] += 1
+                maximum[key] = max(maximum[key], current[key])
+        time.sleep(0.05)
+        with lock:
+            for key in (host, "total"):
+                current[key] -= 1
+        if pkg.name == "pkg-b":
+            raise spack.error.FetchError("cannot fetch pkg-b")
+
+    monkeypatch.setattr(spack.package_base.PackageBase, "do_fetch", do_fetch)
+    monkeypatch.setattr(spack.util.parallel, "ENABLE_PARALLELISM", True)
+    return maximum
+
+
+@pytest.mark.disable_clean_stage_check
+def test_prefetch_limits_concurrent_fetches_per_host(concurrent_fetches):
+    """Tests that sources are fetched concurrently, within the limits per host, and that errors
+    are raised when waiting for the spec whose fetch failed."""
+    names = ("pkg-a", "pkg-b", "pkg-c", "libelf", "zlib")
+    specs = [spack.concretize.concretize_one(name) for name in names]
+    assert all(spack.prefetch.can_prefetch(s) for s in specs)
+    assert spack.prefetch.fetch_host(specs[0]) == "www.example.com"
+
+    with spack.prefetch.SourcePrefetcher(specs, jobs=4, jobs_per_host=2) as prefetcher:
+        assert sorted(s.name for s in prefetcher.as_completed()) == sorted(names)
+        for spec in specs:
+            if spec.name == "pkg-b":
+                with pytest.raises(spack.error.FetchError, match="cannot fetch pkg-b"):
+                    prefetcher.wait(spec)
+            else:
+                prefetcher.wait(spec)
+
+    assert concurrent_fetches["www.example.com"] <= 2
+    assert concurrent_fetches["total"] <= 4
+
+
+def test_cannot_prefetch_specs_needing_confirmation(mutable_config):
+    """Tests that specs whose fetch needs the user to confirm it are not prefetched"""
+    spec = spack.concretize.concretize_one("pkg-a@=3.0")
+    assert not spack.prefetch.can_prefetch(spec)
+
+    mutable_config.set("config:checksum", False)
+    assert spack.prefetch.can_prefetch(spec, keep_stage=True)
+
+    # Without a checksum the sources are not cached, so they'd be fetched twice
+    assert not spack.prefetch.can_prefetch(spec)
+
+
+@pytest.mark.disable_clean_stage_check
+def test_git_sources_are_not_fetched_concurrently(
+    mock_git_repository, mock_stage, mutable_mock_repo, monkeypatch
+):
+    """Tests that git fetches, which change the working directory of the process, are not run on
+    threads, and that two of them still end up in their own stage"""
+    pkg_class = spack.repo.PATH.get_pkg_class("git-test-commit")
+    monkeypatch.setattr(pkg_class, "git", mock_git_repository.url, raising=False)
+    checks = mock_git_repository.checks
+    commits = {
+        "c1": (checks["commit"].revision, checks["commit"].file),
+        "c2": (mock_git_repository.unversioned_commit, checks["annotated-tag"].file),
+    }
+    for version, (commit, _) in commits.items():
+        monkeypatch.setitem(pkg_class.versions, Version(version), {"commit": commit})
+    specs = [spack.concretize.concretize_one(f"git-test-commit@={v}") for v in commits]
+
+    # Commits are cachable, but git fetches can't run on threads
+    assert all(s.package.stage[0].default_fetcher.cachable for s in specs)
+    assert not any(spack.prefetch.can_prefetch(s, keep_stage=True) for s in specs)
+
+    monkeypatch.setattr(spack.util.parallel, "ENABLE_PARALLELISM", True)
+    cwd = os.getcwd()
+    SpackCommand("fetch")(*(f"git-test-commit@={v}" for v in commits))
+    assert os.getcwd() == cwd
+    for spec, (_, file) in zip(specs, commits.values()):
+        assert os.path.isfile(os.path.join(spec.package.stage.source_path, file))
@@ -12,6 +12,7 @@
 import spack.platforms
 import spack.relocate
 import spack.relocate_text as relocate_text
+import spack.util.elf
 import spack.util.executable
 
 pytestmark = pytest.mark.not_on_windows("Tests fail on Windows")
@@ -191,6 +192,74 @@ def test_relocate_text_bin_raise_if_new_prefix_is_longer(tmp_path: pathlib.Path)
         spack.relocate.relocate_text_bin([fpath], {short_prefix: long_prefix})
 
 
+def test_relocate_files_in_shards(tmp_path: pathlib.Path, monkeypatch):
+    """Files are relocated in shards of similar total size, and the modified binaries of all
+    shards are reported."""
+    monkeypatch.setattr(spack.relocate, "FILES_PER_RELOCATION_JOB", 2)
+    textfiles, binaries = [], []
+    for i in range(6):
+        textfile, binary = tmp_path / f"text{i}", tmp_path / f"binary{i}"
+        textfile.write_text(f"/old/prefix/{i}" + " " * i)
+        binary.write_bytes(b"/old/prefix/bin/executable\0" if i % 2 else b"/unrelated\0")
+        textfiles.append(str(textfile))
+        binaries.append(str(binary))
+
+    shards = spack.relocate._shard_by_size(textfiles, 3)
+    assert sorted(len(shard) for shard in shards) == [2, 2, 2]
+    assert shards[0][0] == textfiles[-1]
+
+    changed = spack.relocate.relocate_files(textfiles, binaries, {"/old/prefix": "/new"}, jobs=3)
+    assert sorted(changed) == binaries[1::2]
+    assert all((tmp_path / f"text{i}").read_text().startswith(f"/new/{i}") for i in range(6))
+    relocated_binary = b"////////new/bin/executable\0"
+    assert all((tmp_path / f"binary{i}").read_bytes() == relocated_binary for i in range(1, 6, 2))
+
+
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_relocate_files_with_binary_index(binary_with_rpaths, tmp_path: pathlib.Path):
+    """ELF binaries relocated at the offsets recorded in their index end up identical to binaries
+    that are parsed and scanned, also when the index is ignored because the size changed."""
+    old = "/very/long/old/prefix"
+    executable = binary_with_rpaths(
+        rpaths=[f"{old}/lib"], message=f"{old}/share/data", dynamic_linker=f"{old}/lib/ld.so"
+    )
+    scanned, indexed, modified = (tmp_path / name for name in ("scanned", "indexed", "modified"))
+    for binary in (scanned, indexed, modified):
+        shutil.copy(executable, binary)
+    with open(modified, "ab") as f:
+        f.write(f"{old}/lib\0".encode())
+
+    with open(indexed, "rb") as f:
+        entry = spack.relocate.elf_relocation_index_entry(f, ["/very/long", old])
+    with open(modified, "rb") as f:
+        modified_entry = spack.relocate.elf_relocation_index_entry(f, ["/very/long", old])
+    assert entry is not None and modified_entry is not None
+    assert entry["rpath"] is not None and entry["interp"] is not None
+    assert len(entry["offsets"].split()) >= 3
+    modified_entry["size"] -= 1
+
+    (tmp_path / "text").write_bytes(b"not an ELF file")
+    with open(tmp_path / "text", "rb") as f:
+        assert spack.relocate.elf_relocation_index_entry(f, [old]) is None
+
+    prefix_to_prefix = {f"{old}/lib": "/new/lib", old: "/new"}
+    binaries = [str(scanned), str(indexed), str(modified)]
+    changed = spack.relocate.relocate_files(
+        [],
+        binaries,
+        prefix_to_prefix,
+        binary_format="elf",
+        binary_index={str(indexed): entry, str(modified): modified_entry},
+    )
+    assert sorted(changed) == sorted(binaries)
+    assert indexed.read_bytes() == scanned.read_bytes()
+    assert modified.read_bytes().startswith(scanned.read_bytes())
+    assert spack.util.elf.get_rpaths(str(indexed))[0] == "/new/lib"
+    assert spack.util.elf.get_interpreter(str(indexed)) == "/new/lib/ld.so"
+    assert not text_in_bin(old, indexed)
+
+
 @pytest.mark.requires_executables("install_name_tool", "cc")
 def test_fixup_macos_rpaths(make_dylib, make_object_file):
     # Get Apple Clang major version for XCode 15+ linker behavior
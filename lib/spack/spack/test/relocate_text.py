@@ -236,3 +236,59 @@ def test_relocate_text_filters_redundant_entries():
     replacer_2 = relocate_text.TextFilePrefixReplacer.from_strings_or_bytes(mapping)
     assert not replacer_1.prefix_to_prefix
     assert not replacer_2.prefix_to_prefix
+
+
+@pytest.mark.parametrize("mmap_threshold", [0, 1 << 20])
+def test_replacers_skip_files_without_prefixes(mmap_threshold, tmp_path, monkeypatch):
+    """Files are only modified when they contain a prefix, whether they are read in memory or
+    memory mapped."""
+    monkeypatch.setattr(relocate_text, "MMAP_THRESHOLD", mmap_threshold)
+    mapping = OrderedDict([(b"/old/prefix", b"/new")])
+    text = tmp_path / "text"
+    binary = tmp_path / "binary"
+    unrelated = tmp_path / "unrelated"
+    text.write_bytes(b"#!/old/prefix/bin/python\n")
+    binary.write_bytes(b"\0/old/prefix/lib/libfoo.so\0")
+    unrelated.write_bytes(b"/old/other/prefix\0")
+
+    text_replacer = relocate_text.TextFilePrefixReplacer(mapping)
+    binary_replacer = relocate_text.BinaryFilePrefixReplacer(mapping)
+    assert text_replacer.apply([str(text), str(unrelated)]) == [str(text)]
+    assert binary_replacer.apply([str(binary), str(unrelated)]) == [str(binary)]
+    assert text.read_bytes() == b"#!/new/bin/python\n"
+    assert binary.read_bytes() == b"\0////////new/lib/libfoo.so\0"
+    assert unrelated.read_bytes() == b"/old/other/prefix\0"
+
+
+def test_binary_replacer_does_not_modify_file_on_error(tmp_path):
+    """All replacements in a binary are determined before the file is modified."""
+    binary = tmp_path / "binary"
+    binary.write_bytes(b"/old/prefix\0/old/prefix/lib\0")
+    replacer = relocate_text.BinaryFilePrefixReplacer(OrderedDict([(b"/old/prefix", b"/new/pfx")]))
+    with pytest.raises(relocate_text.CannotShrinkCString):
+        replacer.apply([str(binary)])
+    assert binary.read_bytes() == b"/old/prefix\0/old/prefix/lib\0"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"\0/old/prefix/lib/libfoo.so\0/old/prefix/sub/bin\0/old/prefixx",
+        b"/old/prefix/sub/old/prefix/lib/libfoo.so\0/old/prefix/sub/share/data\0",
+        b"/old/prefix/old/prefix/lib/libbar.so\0/old/other/prefix\0",
+        b"/unrelated\0",
+    ],
+)
+def test_binary_replacer_at_offsets(data, tmp_path):
+    """Replacing at the offsets of all prefix occurrences is equivalent to scanning the file."""
+    mapping = OrderedDict([(b"/old/prefix/sub", b"/new/sub"), (b"/old/prefix", b"/new")])
+    scanned, indexed = tmp_path / "scanned", tmp_path / "indexed"
+    scanned.write_bytes(data)
+    indexed.write_bytes(data)
+    offsets = relocate_text.find_prefix_offsets(data, [b"/old", b"/old/prefix"])
+    assert offsets == [i for i in range(len(data)) if data.startswith(b"/old", i)]
+
+    replacer = relocate_text.BinaryFilePrefixReplacer(mapping)
+    modified = replacer.apply_to_filename(str(scanned))
+    assert replacer.apply_to_filename_at_offsets(str(indexed), offsets) == modified
+    assert indexed.read_bytes() == scanned.read_bytes()
@@ -6,6 +6,7 @@
 
 import pytest
 
+import spack.config
 import spack.environment
 import spack.package_base
 import spack.paths
@@ -140,6 +141,106 @@ def test_get_all_mock_packages(mock_packages):
         mock_packages.get_pkg_class(name)
 
 
+@pytest.mark.parametrize("pkg_name", ["mpileaks", "conflict", "requires-clang", "patch"])
+def test_package_metadata_matches_package_class(pkg_name, mock_packages):
+    """Tests that the metadata cache has the same content as the directives of the package."""
+    pkg_cls = mock_packages.get_pkg_class(pkg_name)
+    metadata = mock_packages.package_metadata(pkg_name)
+
+    assert metadata.name == pkg_cls.name
+    assert metadata.versions == [str(v) for v in sorted(pkg_cls.versions, reverse=True)]
+    assert {
+        when: {name: (dep.spec, dep.depflag) for name, dep in deps.items()}
+        for when, deps in pkg_cls.dependencies.items()
+    } == metadata.dependencies()
+    assert dict(pkg_cls.provided) == metadata.provided()
+    assert dict(pkg_cls.provided_together) == metadata.provided_together()
+    assert pkg_cls.provided_virtual_names() == metadata.provided_virtual_names()
+    assert sorted(pkg_cls.extendees) == metadata.extendees
+    assert dict(pkg_cls.conflicts) == metadata.conflicts()
+    assert dict(pkg_cls.requirements) == metadata.requirements()
+    assert {
+        when: {name: variant.default for name, variant in variants.items()}
+        for when, variants in pkg_cls.variants.items()
+    } == {
+        when: {name: variant["default"] for name, variant in variants.items()}
+        for when, variants in metadata.variants().items()
+    }
+    assert {
+        when: [patch.sha256 for patch in patches] for when, patches in pkg_cls.patches.items()
+    } == {
+        when: [patch["sha256"] for patch in patches]
+        for when, patches in metadata.patches().items()
+    }
+
+
+def test_package_metadata_is_memoized(mock_packages):
+    """Tests that the metadata of a package is built once, until the package is updated."""
+    index = mock_packages.repo_for_pkg("mpileaks").metadata_index
+    metadata = index.get("mpileaks")
+    assert index.get("mpileaks") is metadata
+
+    index.set_package("mpileaks", metadata.data)
+    assert index.get("mpileaks") is not metadata
+
+
+def test_package_metadata_unknown_package(mock_packages):
+    with pytest.raises(spack.repo.UnknownPackageError):
+        mock_packages.package_metadata("not-a-real-package")
+
+
+@pytest.mark.enable_parallelism
+def test_parallel_reindex(mock_packages_repo, tmp_path: pathlib.Path, monkeypatch, config):
+    """Tests that indexes computed by worker processes are the same as those computed serially."""
+
+    def build_indexes(cache_dir):
+        cache = spack.util.file_cache.FileCache(str(cache_dir))
+        repo = spack.repo.Repo(mock_packages_repo.root, cache=cache)
+        return repo.provider_index, repo.tag_index, repo.patch_index, repo.metadata_index
+
+    serial = build_indexes(tmp_path / "serial")
+    monkeypatch.setattr(spack.repo, "_PARALLEL_INDEX_THRESHOLD", 1)
+    monkeypatch.setattr(spack.config, "determine_number_of_jobs", lambda **kwargs: 2)
+    parallel = build_indexes(tmp_path / "parallel")
+
+    assert parallel[0] == serial[0]
+    assert {tag: sorted(x) for tag, x in parallel[1].tags.items()} == {
+        tag: sorted(x) for tag, x in serial[1].tags.items()
+    }
+    assert parallel[2].index == serial[2].index
+    assert parallel[3].packages == serial[3].packages
+
+
+def test_metadata_index_is_updated_when_build_systems_change(
+    tmp_path: pathlib.Path, repo_builder: RepoBuilder, monkeypatch, config
+):
+    """Tests that the metadata of all packages is computed again when a build system module is
+    newer than the index, since packages inherit directives from it."""
+    repo_builder.add_package("pkg-c")
+    cache = spack.util.file_cache.FileCache(str(tmp_path / "cache"))
+    assert spack.repo.Repo(repo_builder.root, cache=cache).package_metadata("pkg-c")
+
+    updated = []
+    fragment = spack.repo.MetadataIndexer.fragment
+
+    def _fragment(self, pkg_fullname):
+        updated.append(pkg_fullname)
+        return fragment(self, pkg_fullname)
+
+    monkeypatch.setattr(spack.repo.MetadataIndexer, "fragment", _fragment)
+
+    # The index is up to date
+    assert spack.repo.Repo(repo_builder.root, cache=cache).package_metadata("pkg-c")
+    assert not updated
+
+    # Modify the build system, the metadata of its packages is outdated
+    build_system_py = os.path.join(repo_builder.root, "build_systems", "test_build_system.py")
+    mtime = os.stat(build_system_py).st_mtime + 10
+    os.utime(build_system_py, (mtime, mtime))
+    assert spack.repo.Repo(repo_builder.root, cache=cache).package_metadata("pkg-c")
+    assert updated == [f"{repo_builder.namespace}.pkg-c"]
+
+
 def test_repo_path_handles_package_removal(mock_packages, repo_builder: RepoBuilder):
     repo_builder.add_package("pkg-c")
     with spack.repo.use_repositories(repo_builder.root, override=False) as repos:
@@ -54,6 +54,10 @@ def _mock(pkg_name, spec):
         cond = Spec(pkg_cls.name)
         dependency = Dependency(pkg_cls, spec)
         monkeypatch.setitem(pkg_cls.dependencies, cond, {spec.name: dependency})
+        # The solver reads dependencies from the metadata index
+        metadata = spack.repo.PATH.package_metadata(pkg_name)
+        entry = {"when": str(cond), "spec": str(spec), "type": list(dt.flag_to_tuple(dt.DEFAULT))}
+        monkeypatch.setitem(metadata.data, "dependencies", [*metadata.data["dependencies"], entry])
 
     return _mock
 
@@ -4,6 +4,7 @@
 
 import gzip
 import hashlib
+import io
 import os
 import shutil
 import tarfile
@@ -15,6 +16,11 @@
 import spack.version
 from spack.llnl.util.filesystem import working_dir
 from spack.util.archive import (
+    ZSTD_SUPPORTED,
+    ParallelGzipWriter,
+    compressed_tarfile,
+    compressor,
+    decompressor,
     gzip_compressed_tarfile,
     reproducible_tarfile_from_prefix,
     retrieve_commit_from_archive,
@@ -232,3 +238,72 @@ def test_can_tell_if_archive_has_git(mock_git_repository, tmp_path: Path):
             with pytest.raises(AssertionError) as err:
                 retrieve_commit_from_archive(archive_file, "main")
                 assert "does not contain git data" in str(err.value)
+
+
+@pytest.mark.parametrize("size", [0, 1000, 2500])
+def test_parallel_gzip_writer(size):
+    """The output of ParallelGzipWriter can be read by any gzip decompressor, and does not depend
+    on the number of threads or on how the data is written."""
+    data = bytes(i % 251 for i in range(size))
+    outputs = []
+    for jobs, write_size in ((1, size or 1), (4, 7)):
+        output = io.BytesIO()
+        with ParallelGzipWriter(output, jobs=jobs, block_size=1000) as writer:
+            for i in range(0, size, write_size):
+                writer.write(data[i : i + write_size])
+        outputs.append(output.getvalue())
+
+    assert outputs[0] == outputs[1]
+    assert gzip.decompress(outputs[0]) == data
+    # One gzip member per block, and at least one member
+    assert outputs[0].count(b"\x1f\x8b\x08") == max((size + 999) // 1000, 1)
+
+
+def test_parallel_gzip_writer_invalid_level():
+    with pytest.raises(ValueError, match="Invalid gzip compression level"):
+        ParallelGzipWriter(io.BytesIO(), compresslevel=10)
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [
+        "gzip",
+        pytest.param(
+            "zstd", marks=pytest.mark.skipif(not ZSTD_SUPPORTED, reason="zstd not available")
+        ),
+    ],
+)
+def test_compressed_tarfile_roundtrip(compression, tmp_path: Path):
+    """Compressed tarfiles can be read back, detecting the compression format from their
+    contents."""
+    (tmp_path / "prefix").mkdir()
+    (tmp_path / "prefix" / "file").write_text("hello world")
+    archive = str(tmp_path / "archive.tar")
+    with compressed_tarfile(archive, compression=compression, jobs=2) as (
+        tar,
+        compressed_checksum,
+        tarfile_checksum,
+    ):
+        reproducible_tarfile_from_prefix(tar, str(tmp_path / "prefix"))
+
+    with open(archive, "rb") as f:
+        assert hashlib.sha256(f.read()).hexdigest() == compressed_checksum.hexdigest()
+
+    with open(archive, "rb") as f, decompressor(f) as stream:
+        assert hashlib.sha256(stream.read()).hexdigest() == tarfile_checksum.hexdigest()
+
+    with open(archive, "rb") as f, decompressor(f) as stream:
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            assert [PurePath(m.name).name for m in tar] == ["prefix", "file"]
+
+
+def test_decompressor_of_uncompressed_data():
+    stream = io.BytesIO(b"uncompressed")
+    assert decompressor(stream) is stream
+    assert stream.read() == b"uncompressed"
+
+
+@pytest.mark.skipif(ZSTD_SUPPORTED, reason="zstd is available")
+def test_zstd_not_available():
+    with pytest.raises(ValueError, match="zstd compression requires"):
+        compressor(io.BytesIO(), "zstd")
@@ -4,10 +4,15 @@
 
 import os
 import pathlib
+import threading
 
 import pytest
 
 import spack.concretize
+import spack.filesystem_view
+import spack.package_base
+import spack.repo
+import spack.util.parallel
 from spack.directory_layout import DirectoryLayout
 from spack.filesystem_view import SimpleFilesystemView, YamlFilesystemView
 from spack.installer import PackageInstaller
@@ -66,3 +71,160 @@ def pkg_a_add_files_to_view(view, merge_map, skip_if_exists=True):
     view.add_specs(a, b)
     assert os.path.lexists(os.path.join(view_dir, "file"))
     assert os.path.lexists(os.path.join(view_dir, "subdir", "file"))
+
+
+def test_incremental_view_update(mock_packages, tmp_path: pathlib.Path):
+    """Tests that an incremental view only links and unlinks the files of specs that were added
+    and removed, and ends up like a view that was generated from scratch."""
+
+    def make_spec(name, files):
+        spec = Spec(name)
+        spec.set_prefix(str(tmp_path / name))
+        spec._mark_concrete()
+        os.makedirs(os.path.join(spec.prefix, ".spack"))
+        for f in files:
+            path = os.path.join(spec.prefix, f)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(name)
+        return spec
+
+    a = make_spec("pkg-a", ["bin/a", "share/a/data"])
+    b = make_spec("pkg-b", ["bin/b", "lib/libb.so"])
+    c = make_spec("pkg-c", ["bin/c", "share/c/data"])
+
+    def view_contents(root):
+        return sorted(
+            os.path.relpath(os.path.join(dirpath, f), root)
+            for dirpath, dirnames, filenames in os.walk(root)
+            for f in dirnames + filenames
+        )
+
+    view_dir = str(tmp_path / "view")
+    os.mkdir(view_dir)
+    view = SimpleFilesystemView(view_dir, DirectoryLayout(view_dir), incremental=True)
+    view.add_specs(a, b)
+    unchanged_link = os.lstat(os.path.join(view_dir, "bin", "a"))
+
+    # Replace b with c
+    assert view.update_specs(a, c)
+    assert os.lstat(os.path.join(view_dir, "bin", "a")).st_ino == unchanged_link.st_ino
+    assert not os.path.lexists(os.path.join(view_dir, "lib"))
+    assert os.readlink(os.path.join(view_dir, "bin", "c")) == os.path.join(c.prefix, "bin", "c")
+
+    reference_dir = str(tmp_path / "reference")
+    os.mkdir(reference_dir)
+    SimpleFilesystemView(reference_dir, DirectoryLayout(reference_dir)).add_specs(a, c)
+    contents = view_contents(view_dir)
+    contents.remove(os.path.join(".spack", "merge_map.json"))
+    assert contents == view_contents(reference_dir)
+
+    # Nothing to do when the specs are the same
+    assert view.update_specs(a, c)
+
+    # Views without a merge map cannot be updated incrementally
+    reference = SimpleFilesystemView(reference_dir, DirectoryLayout(reference_dir))
+    assert not reference.update_specs(a)
+
+
+def test_incremental_view_update_with_conflicts(mock_packages, tmp_path: pathlib.Path):
+    """Tests that incremental updates are refused when the winner of a file conflict would
+    depend on the order of the specs."""
+    specs = []
+    for name in ("pkg-a", "pkg-b", "pkg-c"):
+        spec = Spec(name)
+        spec.set_prefix(str(tmp_path / name))
+        spec._mark_concrete()
+        os.makedirs(os.path.join(spec.prefix, ".spack"))
+        with open(os.path.join(spec.prefix, "LICENSE"), "w", encoding="utf-8") as f:
+            f.write(name)
+        specs.append(spec)
+    a, b, c = specs
+
+    view_dir = str(tmp_path / "view")
+    os.mkdir(view_dir)
+    view = SimpleFilesystemView(
+        view_dir, DirectoryLayout(view_dir), ignore_conflicts=True, incremental=True
+    )
+    view.add_specs(a, b)
+
+    # Adding a spec that conflicts with a file in the view
+    assert not view.update_specs(a, b, c)
+
+    # Removing a spec that was part of a conflict
+    assert not view.update_specs(a)
+    assert os.readlink(os.path.join(view_dir, "LICENSE")) == os.path.join(a.prefix, "LICENSE")
+
+
+def test_view_is_populated_concurrently(mock_packages, tmp_path: pathlib.Path, monkeypatch):
+    """Tests that prefixes traversed and files linked by multiple threads give the same view as
+    a sequentially created one."""
+    specs = []
+    for name in ("pkg-a", "pkg-b", "pkg-c"):
+        spec = Spec(name)
+        spec.set_prefix(str(tmp_path / name))
+        spec._mark_concrete()
+        os.makedirs(os.path.join(spec.prefix, ".spack"))
+        for i in range(10):
+            path = os.path.join(spec.prefix, "share", f"dir{i}", f"{name}-{i}")
+            os.makedirs(os.path.dirname(path))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(name)
+        specs.append(spec)
+
+    def view_contents(root):
+        return sorted(
+            (os.path.relpath(path, root), os.path.islink(path))
+            for dirpath, dirnames, filenames in os.walk(root)
+            for path in (os.path.join(dirpath, f) for f in dirnames + filenames)
+        )
+
+    sequential_dir = str(tmp_path / "sequential")
+    os.mkdir(sequential_dir)
+    SimpleFilesystemView(sequential_dir, DirectoryLayout(sequential_dir)).add_specs(*specs)
+
+    monkeypatch.setattr(spack.util.parallel, "ENABLE_PARALLELISM", True)
+    monkeypatch.setattr(spack.filesystem_view, "LINK_BATCH_SIZE", 3)
+    concurrent_dir = str(tmp_path / "concurrent")
+    os.mkdir(concurrent_dir)
+    SimpleFilesystemView(concurrent_dir, DirectoryLayout(concurrent_dir)).add_specs(*specs)
+
+    assert view_contents(concurrent_dir) == view_contents(sequential_dir)
+
+
+def test_add_files_to_view_overrides_get_the_full_merge_map(
+    mock_packages, tmp_path: pathlib.Path, monkeypatch
+):
+    """Tests that packages overriding add_files_to_view are called once, from the main thread,
+    with all their files, even when other packages are linked concurrently in batches."""
+    specs = []
+    for name in ("pkg-a", "pkg-b"):
+        spec = Spec(name)
+        spec.set_prefix(str(tmp_path / name))
+        spec._mark_concrete()
+        os.makedirs(os.path.join(spec.prefix, ".spack"))
+        for i in range(10):
+            path = os.path.join(spec.prefix, "share", f"{name}-{i}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(name)
+        specs.append(spec)
+
+    calls = []
+
+    def add_files_to_view(self, view, merge_map, skip_if_exists=True):
+        calls.append((len(merge_map), threading.current_thread() is threading.main_thread()))
+        spack.package_base.PackageBase.add_files_to_view(self, view, merge_map, skip_if_exists)
+
+    monkeypatch.setattr(
+        spack.repo.PATH.get_pkg_class("pkg-b"), "add_files_to_view", add_files_to_view
+    )
+    monkeypatch.setattr(spack.util.parallel, "ENABLE_PARALLELISM", True)
+    monkeypatch.setattr(spack.filesystem_view, "LINK_BATCH_SIZE", 3)
+
+    view_dir = str(tmp_path / "view")
+    os.mkdir(view_dir)
+    SimpleFilesystemView(view_dir, DirectoryLayout(view_dir)).add_specs(*specs)
+
+    assert calls == [(10, True)]
+    assert len(os.listdir(os.path.join(view_dir, "share"))) == 20
@@ -2,6 +2,7 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import collections
+import datetime
 import email.message
 import os
 import pathlib
@@ -276,6 +277,36 @@ def head_object(self, Bucket=None, Key=None):
         raise self.ClientError
 
 
+def test_list_s3_url_stats(monkeypatch):
+    """Sizes and mtimes of S3 objects are taken from the listing, without a request per object"""
+
+    class MockStatPages:
+        def search(self, *args, **kwargs):
+            modified = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+            return [
+                {"Key": "mirror/a.json", "Size": 1, "LastModified": modified},
+                {"Key": "mirror/dir/b.json", "Size": 2, "LastModified": modified},
+            ]
+
+    class MockStatS3Client(MockS3Client):
+        def get_paginator(self, *args, **kwargs):
+            paginator = MockPaginator()
+            paginator.paginate = lambda *args, **kwargs: MockStatPages()
+            return paginator
+
+        def head_object(self, *args, **kwargs):
+            raise AssertionError("objects should not be queried one by one")
+
+    monkeypatch.setattr(spack.util.web, "get_s3_session", lambda *args, **kw: MockStatS3Client())
+
+    timestamp = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+    assert spack.util.web.list_url_stats("s3://my-bucket/mirror") == {
+        "a.json": (1, timestamp),
+        "dir/b.json": (2, timestamp),
+    }
+    assert spack.util.web.list_url_stats("file:///some/dir") is None
+
+
 def test_gather_s3_information(monkeypatch):
     mirror = spack.mirrors.mirror.Mirror(
         {
@@ -4,6 +4,7 @@
 
 import enum
 import fnmatch
+import functools
 import gzip
 import io
 import json
@@ -15,7 +16,7 @@
 from datetime import datetime
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from typing import Any, Callable, Container, Dict, List, Optional, Tuple, Type
 
 import spack.vendor.jsonschema
 
@@ -28,6 +29,7 @@
 import spack.mirrors.mirror
 import spack.spec
 import spack.stage
+import spack.util.archive
 import spack.util.crypto
 import spack.util.gpg
 import spack.util.url as url_util
@@ -140,18 +142,18 @@ def from_dict(cls, manifest_json: Dict[str, Any]) -> "BuildcacheManifest":
             data=[BlobRecord.from_dict(blob_json) for blob_json in manifest_json["data"]],
         )
 
-    def get_blob_records(self, media_type: str) -> List[BlobRecord]:
-        """Return any blob records from the manifest matching the given media type"""
+    def get_blob_records(self, *media_types: str) -> List[BlobRecord]:
+        """Return any blob records from the manifest matching any of the given media types"""
         matches: List[BlobRecord] = []
 
         for record in self.data:
-            if record.media_type == media_type:
+            if record.media_type in media_types:
                 matches.append(record)
 
         if matches:
             return matches
 
-        raise NoSuchBlobException(f"Manifest has no blobs of type {media_type}")
+        raise NoSuchBlobException(f"Manifest has no blobs of type {', '.join(media_types)}")
 
 
 class URLBuildcacheEntry:
@@ -187,8 +189,11 @@ class URLBuildcacheEntry:
     SPEC_URL_REGEX = re.compile(r"(.+)/v([\d]+)/manifests/.+")
     LAYOUT_VERSION = 3
     BUILDCACHE_INDEX_MEDIATYPE = f"application/vnd.spack.db.v{spack.database._DB_VERSION}+json"
+    #: Table of the shards of a buildcache index, see ``binary_distribution._push_sharded_index``
+    BUILDCACHE_INDEX_SHARDS_MEDIATYPE = "application/vnd.spack.db-shards.v1+json"
     SPEC_MEDIATYPE = f"application/vnd.spack.spec.v{spack.spec.SPECFILE_FORMAT_VERSION}+json"
     TARBALL_MEDIATYPE = "application/vnd.spack.install.v2.tar+gzip"
+    TARBALL_ZSTD_MEDIATYPE = "application/vnd.spack.install.v2.tar+zstd"
     PUBLIC_KEY_MEDIATYPE = "application/pgp-keys"
     PUBLIC_KEY_INDEX_MEDIATYPE = "application/vnd.spack.keyindex.v1+json"
     BUILDCACHE_INDEX_FILE = "index.manifest.json"
@@ -320,6 +325,24 @@ def component_to_media_type(cls, component: BuildcacheComponent) -> str:
 
         raise BuildcacheEntryError(f"Not a blob component: {component}")
 
+    @classmethod
+    def component_to_media_types(cls, component: BuildcacheComponent) -> Tuple[str, ...]:
+        """Mapping from buildcache component to all the media types its blobs can have, which
+        differ by compression format"""
+        if component == BuildcacheComponent.TARBALL:
+            return (cls.TARBALL_MEDIATYPE, cls.TARBALL_ZSTD_MEDIATYPE)
+        return (cls.component_to_media_type(component),)
+
+    @classmethod
+    def tarball_media_type(cls, compression: str) -> str:
+        """Media type of a tarball compressed with the given compression format"""
+        if compression == "gzip":
+            return cls.TARBALL_MEDIATYPE
+        elif compression == "zstd":
+            return cls.TARBALL_ZSTD_MEDIATYPE
+
+        raise BuildcacheEntryError(f"Unknown compression type: {compression}")
+
     def get_local_spec_path(self) -> str:
         """Convenience method to return the local path of a fetched spec file"""
         return self.get_staged_blob_path(self.get_blob_record(BuildcacheComponent.SPEC))
@@ -334,7 +357,7 @@ def get_blob_record(self, blob_type: BuildcacheComponent) -> BlobRecord:
         if not self.manifest:
             raise BuildcacheEntryError("Read manifest before accessing blob records")
 
-        records = self.manifest.get_blob_records(self.component_to_media_type(blob_type))
+        records = self.manifest.get_blob_records(*self.component_to_media_types(blob_type))
 
         if len(records) == 0:
             raise BuildcacheEntryError(f"Manifest has no blob record of type {blob_type}")
@@ -409,7 +432,7 @@ def exists(self, components: List[BuildcacheComponent]) -> bool:
 
         for component in components:
             component_blobs = self.manifest.get_blob_records(
-                self.component_to_media_type(component)
+                *self.component_to_media_types(component)
             )
 
             if len(component_blobs) == 0:
@@ -508,14 +531,24 @@ def fetch_archive(self) -> str:
             # Raises if problems encountered, including not being able to verify signagure
             self.read_manifest()
 
-        return self.fetch_blob(self.get_blob_record(BuildcacheComponent.TARBALL))
+        record = self.get_blob_record(BuildcacheComponent.TARBALL)
+
+        # Don't download archives that cannot be decompressed
+        if not spack.util.archive.compression_available(record.compression_alg):
+            raise BuildcacheEntryError(
+                f"Cannot decompress {record.compression_alg} compressed archive of "
+                f"{self.spec.name if self.spec else self.remote_manifest_url}"
+            )
+
+        return self.fetch_blob(record)
 
     def get_archive_stage(self) -> Optional[spack.stage.Stage]:
         return self.stages[self.get_blob_record(BuildcacheComponent.TARBALL)]
 
-    def remove(self):
+    def remove(self, keep_checksums: Container[str] = ()):
         """Remove a binary package (spec file and tarball) and the associated
-        manifest from the mirror."""
+        manifest from the mirror. Blobs with a checksum in ``keep_checksums`` are
+        not removed."""
         if self.manifest:
             try:
                 web_util.remove_url(self.remote_manifest_url)
@@ -523,20 +556,16 @@ def remove(self):
                 tty.debug(f"Failed to remove previous manfifest: {e}")
 
             try:
-                web_util.remove_url(
-                    self.get_blob_url(
-                        self.mirror_url, self.get_blob_record(BuildcacheComponent.TARBALL)
-                    )
-                )
+                record = self.get_blob_record(BuildcacheComponent.TARBALL)
+                if record.checksum not in keep_checksums:
+                    web_util.remove_url(self.get_blob_url(self.mirror_url, record))
             except Exception as e:
                 tty.debug(f"Failed to remove previous archive: {e}")
 
             try:
-                web_util.remove_url(
-                    self.get_blob_url(
-                        self.mirror_url, self.get_blob_record(BuildcacheComponent.SPEC)
-                    )
-                )
+                record = self.get_blob_record(BuildcacheComponent.SPEC)
+                if record.checksum not in keep_checksums:
+                    web_util.remove_url(self.get_blob_url(self.mirror_url, record))
             except Exception as e:
                 tty.debug(f"Failed to remove previous metadata: {e}")
 
@@ -598,8 +627,27 @@ def push_local_file_as_blob(
         is ``"gzip"`` the blob will be compressed before pushing, otherwise it will be pushed
         uncompressed."""
         cache_class = get_url_buildcache_class()
+        record = cls.push_local_file_as_blob_only(
+            local_file_path,
+            mirror_url,
+            cache_class.component_to_media_type(component_type),
+            compression=compression,
+        )
+        manifest = BuildcacheManifest(
+            layout_version=CURRENT_BUILD_CACHE_LAYOUT_VERSION, data=[record]
+        )
+        with TemporaryDirectory(dir=spack.stage.get_stage_root()) as tmpdir:
+            cls.push_manifest(
+                mirror_url, manifest_name, manifest, tmpdir, component_type=component_type
+            )
+
+    @classmethod
+    def push_local_file_as_blob_only(
+        cls, local_file_path: str, mirror_url: str, media_type: str, compression: str = "none"
+    ) -> BlobRecord:
+        """Push a local file to a mirror as a blob of the given media type, without a manifest
+        referring to it, and return the record of the blob."""
         checksum_algo = "sha256"
-        blob_to_push = local_file_path
 
         with TemporaryDirectory(dir=spack.stage.get_stage_root()) as tmpdir:
             blob_to_push = os.path.join(tmpdir, os.path.basename(local_file_path))
@@ -611,19 +659,11 @@ def push_local_file_as_blob(
                 shutil.copyfileobj(fin, fout)
 
             record = BlobRecord(
-                checker.length,
-                cache_class.component_to_media_type(component_type),
-                compression,
-                checksum_algo,
-                checker.hexdigest(),
-            )
-            manifest = BuildcacheManifest(
-                layout_version=CURRENT_BUILD_CACHE_LAYOUT_VERSION, data=[record]
+                checker.length, media_type, compression, checksum_algo, checker.hexdigest()
             )
             cls.push_blob(mirror_url, blob_to_push, record)
-            cls.push_manifest(
-                mirror_url, manifest_name, manifest, tmpdir, component_type=component_type
-            )
+
+        return record
 
     def push_binary_package(
         self,
@@ -633,77 +673,53 @@ def push_binary_package(
         tarball_checksum: str,
         tmpdir: str,
         signing_key: Optional[str],
+        compression: str = "gzip",
     ) -> None:
         """Convenience method to push tarball, specfile, and manifest to the remote mirror
 
         Pushing should only be done after checking for the pre-existence of a
         buildcache entry for this spec, and represents a force push if one is
-        found.  Thus, any pre-existing files are first removed.
+        found.  Thus, any pre-existing files are first removed. The ``compression``
+        format of the tarball determines its media type in the manifest.
+
+        Blobs are content-addressed, so blobs that already exist in the mirror are not
+        uploaded again, and only the manifest referring to them is pushed. Tarballs are
+        reproducible, so this is common when rebuilding specs.
         """
 
         spec_dict = spec.to_dict(hash=ht.dag_hash)
         # TODO: Remove this key once oci buildcache no longer uses it
         spec_dict["buildcache_layout_version"] = 2
         tarball_content_length = os.stat(tarball_path).st_size
-        compression = "gzip"
-
-        # Delete the previously existing version
-        self.remove()
-
-        if not self.remote_manifest_url:
-            self.remote_manifest_url = self.get_manifest_url(spec, self.mirror_url)
+        tarball_media_type = self.tarball_media_type(compression)
 
-        # Any previous archive/tarball is gone, compute the path to the new one
-        remote_archive_url = url_util.join(
-            self.mirror_url,
-            *self.get_relative_path_components(BuildcacheComponent.BLOB),
-            checksum_algorithm,
-            tarball_checksum[:2],
-            tarball_checksum,
+        # compress the spec dict and compute its checksum
+        specfile = os.path.join(tmpdir, f"{spec.dag_hash()}.spec.json")
+        metadata_checksum, metadata_size = compressed_json_from_dict(
+            specfile, spec_dict, checksum_algorithm
         )
 
-        # push the archive/tarball blob to the remote
-        web_util.push_to_url(tarball_path, remote_archive_url, keep_original=False)
-
-        # Clear out the previous data, then add a record for the new blob
-        blobs: List[BlobRecord] = []
-        blobs.append(
+        blobs = [
             BlobRecord(
                 tarball_content_length,
-                self.TARBALL_MEDIATYPE,
+                tarball_media_type,
                 compression,
                 checksum_algorithm,
                 tarball_checksum,
-            )
-        )
-
-        # compress the spec dict and compute its checksum
-        specfile = os.path.join(tmpdir, f"{spec.dag_hash()}.spec.json")
-        metadata_checksum, metadata_size = compressed_json_from_dict(
-            specfile, spec_dict, checksum_algorithm
-        )
+            ),
+            BlobRecord(
+                metadata_size, self.SPEC_MEDIATYPE, "gzip", checksum_algorithm, metadata_checksum
+            ),
+        ]
 
-        # Any previous metadata blob is gone, compute the path to the new one
-        remote_spec_url = url_util.join(
-            self.mirror_url,
-            *self.get_relative_path_components(BuildcacheComponent.BLOB),
-            checksum_algorithm,
-            metadata_checksum[:2],
-            metadata_checksum,
-        )
+        # Delete the previously existing version, except for blobs that are pushed again
+        self.remove(keep_checksums={tarball_checksum, metadata_checksum})
 
-        # push the metadata/spec blob to the remote
-        web_util.push_to_url(specfile, remote_spec_url, keep_original=False)
+        if not self.remote_manifest_url:
+            self.remote_manifest_url = self.get_manifest_url(spec, self.mirror_url)
 
-        blobs.append(
-            BlobRecord(
-                metadata_size,
-                self.SPEC_MEDIATYPE,
-                compression,
-                checksum_algorithm,
-                metadata_checksum,
-            )
-        )
+        for blob_path, record in zip((tarball_path, specfile), blobs):
+            self._push_blob_unless_exists(blob_path, record)
 
         # generate the manifest
         manifest = {
@@ -729,6 +745,15 @@ def push_binary_package(
         # even if we deleted the pre-existing one.
         web_util.push_to_url(manifest_path, self.remote_manifest_url, keep_original=False)
 
+    def _push_blob_unless_exists(self, blob_path: str, record: BlobRecord) -> None:
+        """Push the blob_path file to the mirror as the blob represented by record, unless the
+        blob already exists. The local file is removed in either case."""
+        if self.check_blob_exists(record):
+            tty.debug(f"Blob {record.checksum} already exists in {self.mirror_url}, not pushing")
+            os.remove(blob_path)
+            return
+        self.push_blob(self.mirror_url, blob_path, record)
+
     def destroy(self):
         """Destroy any existing stages"""
         for blob_stage in self.stages.values():
@@ -977,7 +1002,7 @@ def get_buildcache_component_include_pattern(
     def read_manifest(self, manifest_url: Optional[str] = None) -> BuildcacheManifest:
         raise BuildcacheEntryError("v2 buildcache entries do not have a manifest file")
 
-    def remove(self):
+    def remove(self, keep_checksums: Container[str] = ()):
         raise BuildcacheEntryError("Spack cannot delete v2 buildcache entries")
 
     def get_blob_record(self, blob_type: BuildcacheComponent) -> BlobRecord:
@@ -1031,6 +1056,12 @@ def push_local_file_as_blob(
     ) -> None:
         raise BuildcacheEntryError("v2 buildcache layout is unaware of manifests and blobs")
 
+    @classmethod
+    def push_local_file_as_blob_only(
+        cls, local_file_path: str, mirror_url: str, media_type: str, compression: str = "none"
+    ) -> BlobRecord:
+        raise BuildcacheEntryError("v2 buildcache layout is unaware of manifests and blobs")
+
     def push_binary_package(
         self,
         spec: spack.spec.Spec,
@@ -1039,6 +1070,7 @@ def push_binary_package(
         tarball_checksum: str,
         tmpdir: str,
         signing_key: Optional[str],
+        compression: str = "gzip",
     ) -> None:
         raise BuildcacheEntryError("Spack can no longer push v2 buildcache entries")
 
@@ -1102,11 +1134,6 @@ def _entries_from_cache_aws_cli(url: str, tmpspecsdir: str, component_type: Buil
         tty.warn("Failed to use aws s3 sync to retrieve specs, falling back to parallel fetch")
         return file_list, read_fn
 
-    def file_read_method(manifest_path: str) -> URLBuildcacheEntry:
-        cache_entry = cache_class(mirror_url=url, allow_unsigned=True)
-        cache_entry.read_manifest(manifest_url=manifest_path)
-        return cache_entry
-
     include_pattern = cache_class.get_buildcache_component_include_pattern(component_type)
     component_prefix = cache_class.get_relative_path_components(component_type)
 
@@ -1132,7 +1159,7 @@ def file_read_method(manifest_path: str) -> URLBuildcacheEntry:
     try:
         aws(*sync_command_args, output=os.devnull, error=os.devnull)
         file_list = fsys.find(tmpspecsdir, [include_pattern])
-        read_fn = file_read_method
+        read_fn = functools.partial(_read_manifest, cache_class, url)
 
         # Use `aws s3 ls` to get mtimes of manifests
         for line in aws(*ls_command_args, output=str, error=os.devnull).splitlines():
@@ -1158,6 +1185,16 @@ def file_read_method(manifest_path: str) -> URLBuildcacheEntry:
     return filename_to_mtime, read_fn
 
 
+def _read_manifest(
+    cache_class: Type[URLBuildcacheEntry], mirror_url: str, manifest_url: str
+) -> URLBuildcacheEntry:
+    """Read the manifest at the given url or file path. Used as a picklable read method, so that
+    manifests can be read in worker processes."""
+    cache_entry = cache_class(mirror_url=mirror_url, allow_unsigned=True)
+    cache_entry.read_manifest(manifest_url)
+    return cache_entry
+
+
 def _entries_from_cache_fallback(url: str, tmpspecsdir: str, component_type: BuildcacheComponent):
     """Use spack.util.web module to get a list of all the manifests at the remote url.
 
@@ -1177,23 +1214,25 @@ def _entries_from_cache_fallback(url: str, tmpspecsdir: str, component_type: Bui
 
     cache_class = get_url_buildcache_class(layout_version=CURRENT_BUILD_CACHE_LAYOUT_VERSION)
 
-    def url_read_method(manifest_url: str) -> URLBuildcacheEntry:
-        cache_entry = cache_class(mirror_url=url, allow_unsigned=True)
-        cache_entry.read_manifest(manifest_url)
-        return cache_entry
-
     try:
         filename_to_mtime = {}
         component_path_parts = cache_class.get_relative_path_components(component_type)
         component_prefix: str = url_util.join(url, *component_path_parts)
         component_pattern = cache_class.get_buildcache_component_include_pattern(component_type)
-        for entry in web_util.list_url(component_prefix, recursive=True):
-            if fnmatch.fnmatch(entry, component_pattern):
-                entry_url = url_util.join(component_prefix, entry)
-                stat_result = web_util.stat_url(entry_url)
-                if stat_result is not None:
-                    filename_to_mtime[entry_url] = stat_result[1]  # mtime is second element
-        read_fn = url_read_method
+        # Object stores return mtimes when listing, which avoids one request per manifest
+        stats = web_util.list_url_stats(component_prefix)
+        if stats is not None:
+            for entry, (_, mtime) in stats.items():
+                if fnmatch.fnmatch(entry, component_pattern):
+                    filename_to_mtime[url_util.join(component_prefix, entry)] = mtime
+        else:
+            for entry in web_util.list_url(component_prefix, recursive=True):
+                if fnmatch.fnmatch(entry, component_pattern):
+                    entry_url = url_util.join(component_prefix, entry)
+                    stat_result = web_util.stat_url(entry_url)
+                    if stat_result is not None:
+                        filename_to_mtime[entry_url] = stat_result[1]  # mtime is second element
+        read_fn = functools.partial(_read_manifest, cache_class, url)
     except Exception as err:
         # If we got some kind of S3 (access denied or other connection error), the first non
         # boto-specific class in the exception is Exception.  Just print a warning and return
@@ -1242,19 +1281,20 @@ def validate_checksum(file_path, checksum_algorithm, expected_checksum) -> None:
 
 
 def _get_compressor(compression: str, writable: io.BufferedIOBase) -> io.BufferedIOBase:
-    if compression == "gzip":
-        return gzip.GzipFile(filename="", mode="wb", compresslevel=6, mtime=0, fileobj=writable)
-    elif compression == "none":
+    if compression == "none":
         return writable
-    else:
+    elif compression not in spack.util.archive.COMPRESSION_FORMATS:
         raise BuildcacheEntryError(f"Unknown compression type: {compression}")
+    elif not spack.util.archive.compression_available(compression):
+        raise BuildcacheEntryError(f"Compression type {compression} is not available")
+    return spack.util.archive.compressor(writable, compression)
 
 
 @contextmanager
 def compression_writer(output_path: str, compression: str, checksum_algo: str):
     """Create and return a writer capable of writing compressed data. Available
-    options for ``compression`` are ``"gzip"`` or ``"none"``, ``checksum_algo`` is used to pick
-    the checksum algorithm used by the :class:`~spack.util.archive.ChecksumWriter`.
+    options for ``compression`` are ``"gzip"``, ``"zstd"`` or ``"none"``, ``checksum_algo`` is
+    used to pick the checksum algorithm used by the :class:`~spack.util.archive.ChecksumWriter`.
 
     Yields:
         A tuple containing
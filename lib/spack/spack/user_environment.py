@@ -101,8 +101,13 @@ def environment_modifications_for_specs(
 
     # Static environment changes (prefix inspections)
     for s in reversed(topo_ordered):
-        static = environment.inspect_path(
-            s.prefix, prefix_inspections(s.platform), exclude=environment.is_system_path
+        static = spack.build_environment.run_environment_modifications(
+            ("prefix_inspections", s.dag_hash()),
+            lambda e, s=s: e.extend(
+                environment.inspect_path(
+                    s.prefix, prefix_inspections(s.platform), exclude=environment.is_system_path
+                )
+            ),
         )
         env.extend(static)
 
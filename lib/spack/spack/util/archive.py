@@ -1,20 +1,56 @@
 # Copyright Spack Project Developers. See COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import collections
+import concurrent.futures
 import errno
 import hashlib
 import io
 import os
 import pathlib
+import struct
 import tarfile
+import zlib
 from contextlib import closing, contextmanager
 from gzip import GzipFile
-from typing import Callable, Dict, Generator, List, Tuple
+from typing import IO, Callable, Deque, Dict, Generator, List, Optional, Tuple
 
 from spack.llnl.util import tty
 from spack.llnl.util.filesystem import readlink
 from spack.util.git import is_git_commit_sha
 
+try:
+    from compression import zstd  # type: ignore # novermin
+except ImportError:
+    zstd = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+#: Whether zstd compression is available, either from the standard library (Python 3.14+) or
+#: from the ``zstandard`` module
+ZSTD_SUPPORTED = zstd is not None or zstandard is not None
+
+#: Compression formats supported by :func:`compressed_tarfile`
+COMPRESSION_FORMATS = ("gzip", "zstd")
+
+#: Default compression level of each compression format
+DEFAULT_COMPRESSION_LEVEL = {"gzip": 6, "zstd": 3}
+
+#: Maximum compression level of each compression format
+MAX_COMPRESSION_LEVEL = {"gzip": 9, "zstd": 22}
+
+#: Size of the blocks of data that :class:`ParallelGzipWriter` compresses independently
+GZIP_BLOCK_SIZE = 1 << 20
+
+#: Header of a gzip member without file name and with zero mtime, like ``gzip --no-name``
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
 
 class ChecksumWriter(io.BufferedIOBase):
     """Checksum writer computes a checksum while writing to a file."""
@@ -96,6 +132,203 @@ def readline(self, size=-1):
         raise OSError(errno.EBADF, "readline() on write-only object")
 
 
+def _gzip_member(data: bytes, compresslevel: int) -> bytes:
+    """Compress data into a single gzip member"""
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    trailer = struct.pack("<II", zlib.crc32(data), len(data) & 0xFFFFFFFF)
+    return b"".join((_GZIP_HEADER, compressor.compress(data), compressor.flush(), trailer))
+
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    """Write-only file object that compresses data in gzip format using multiple threads, like
+    ``pigz``. The data is split in blocks of fixed size, which are compressed as independent gzip
+    members, so the output can be read by any gzip decompressor. The output does not depend on the
+    number of threads."""
+
+    def __init__(
+        self,
+        fileobj: IO[bytes],
+        compresslevel: int = DEFAULT_COMPRESSION_LEVEL["gzip"],
+        jobs: int = 1,
+        block_size: int = GZIP_BLOCK_SIZE,
+    ):
+        if not 0 <= compresslevel <= 9:
+            raise ValueError(f"Invalid gzip compression level: {compresslevel}")
+        self.fileobj: Optional[IO[bytes]] = fileobj
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self.buffer = bytearray()
+        self.offset = 0
+        self.empty = True
+        # zlib releases the GIL while compressing, so threads are enough to use multiple cores.
+        # Only a few blocks are compressed ahead of the writes, to bound the memory usage.
+        self.executor = concurrent.futures.ThreadPoolExecutor(jobs) if jobs > 1 else None
+        self.pending: Deque[concurrent.futures.Future] = collections.deque()
+        self.max_pending = 2 * jobs
+
+    def _compress_block(self, block: bytes) -> None:
+        assert self.fileobj is not None
+        self.empty = False
+        if self.executor is None:
+            self.fileobj.write(_gzip_member(block, self.compresslevel))
+            return
+        if len(self.pending) >= self.max_pending:
+            self.fileobj.write(self.pending.popleft().result())
+        self.pending.append(self.executor.submit(_gzip_member, block, self.compresslevel))
+
+    def write(self, data) -> int:
+        if self.fileobj is None:
+            raise ValueError("write() on closed file")
+        view = memoryview(data).cast("B")
+        length = view.nbytes
+        self.offset += length
+        while view.nbytes:
+            chunk_size = min(self.block_size - len(self.buffer), view.nbytes)
+            self.buffer += view[:chunk_size]
+            view = view[chunk_size:]
+            if len(self.buffer) == self.block_size:
+                self._compress_block(bytes(self.buffer))
+                self.buffer.clear()
+        return length
+
+    @property
+    def closed(self):
+        return self.fileobj is None
+
+    def close(self):
+        if self.fileobj is None:
+            return
+        try:
+            # Always write at least one member, so that the output is a valid gzip file
+            if self.buffer or self.empty:
+                self._compress_block(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self.fileobj.write(self.pending.popleft().result())
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+            self.fileobj = None
+
+    def flush(self):
+        # Partial blocks are not compressed, so that the output does not depend on when the data
+        # is flushed.
+        if self.fileobj is not None:
+            self.fileobj.flush()
+
+    def tell(self):
+        return self.offset
+
+    def readable(self):
+        return False
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+
+def compression_available(compression: str) -> bool:
+    """Whether data can be compressed and decompressed in the given format"""
+    return compression == "gzip" or (compression == "zstd" and ZSTD_SUPPORTED)
+
+
+def compressor(
+    fileobj: IO[bytes], compression: str, level: Optional[int] = None, jobs: int = 1
+) -> io.BufferedIOBase:
+    """Return a write-only file object that compresses the data written to it into ``fileobj``.
+    Closing the returned object does not close ``fileobj``.
+
+    Args:
+        fileobj: where the compressed data is written
+        compression: compression format, one of :data:`COMPRESSION_FORMATS`
+        level: compression level, or None for the default level of the format
+        jobs: number of threads used to compress
+    """
+    if level is None:
+        level = DEFAULT_COMPRESSION_LEVEL.get(compression, 0)
+    if compression == "gzip":
+        return ParallelGzipWriter(fileobj, compresslevel=level, jobs=jobs)
+    elif compression != "zstd":
+        raise ValueError(f"Unknown compression format: {compression}")
+    # zstd output is the same for any number of workers greater than zero, so always use workers
+    # for reproducibility.
+    if zstd is not None:
+        options = {zstd.CompressionParameter.compression_level: level}
+        if zstd.CompressionParameter.nb_workers.bounds()[1] > 0:
+            options[zstd.CompressionParameter.nb_workers] = max(jobs, 1)
+        return zstd.ZstdFile(fileobj, "wb", options=options)
+    elif zstandard is not None:
+        writer = zstandard.ZstdCompressor(level=level, threads=max(jobs, 1))
+        return writer.stream_writer(fileobj, closefd=False)
+    raise ValueError("zstd compression requires Python 3.14+ or the zstandard module")
+
+
+def decompressor(fileobj: IO[bytes], compression: Optional[str] = None) -> IO[bytes]:
+    """Return a file object that reads the decompressed data of ``fileobj``. If ``compression``
+    is None, the compression format is detected from the magic number at the start of the stream,
+    and ``fileobj`` itself is returned when it is not gzip or zstd compressed. Closing the returned
+    object does not close ``fileobj``.
+
+    Args:
+        fileobj: seekable file object with the compressed data
+        compression: compression format, one of :data:`COMPRESSION_FORMATS` or ``"none"``
+    """
+    if compression is None:
+        magic = fileobj.read(len(_ZSTD_MAGIC))
+        fileobj.seek(-len(magic), io.SEEK_CUR)
+        if magic.startswith(_GZIP_MAGIC):
+            compression = "gzip"
+        elif magic == _ZSTD_MAGIC:
+            compression = "zstd"
+        else:
+            compression = "none"
+
+    if compression == "none":
+        return fileobj
+    elif compression == "gzip":
+        return GzipFile(fileobj=fileobj, mode="rb")
+    elif compression != "zstd":
+        raise ValueError(f"Unknown compression format: {compression}")
+    elif zstd is not None:
+        return zstd.ZstdFile(fileobj, "rb")
+    elif zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(
+            fileobj, read_across_frames=True, closefd=False
+        )
+    raise ValueError("zstd decompression requires Python 3.14+ or the zstandard module")
+
+
+@contextmanager
+def compressed_tarfile(
+    path: str, compression: str = "gzip", level: Optional[int] = None, jobs: int = 1
+) -> Generator[Tuple[tarfile.TarFile, ChecksumWriter, ChecksumWriter], None, None]:
+    """Create a reproducible, compressed tarfile using multiple threads, and keep track of shasums
+    of both the compressed and uncompressed tarfile. Gzip compressed tarfiles consist of multiple
+    gzip members, see :class:`ParallelGzipWriter`.
+
+    Args:
+        path: path of the tarfile
+        compression: compression format, one of :data:`COMPRESSION_FORMATS`
+        level: compression level, or None for the default level of the format
+        jobs: number of threads used to compress
+
+    Yields:
+        A tuple of three elements
+
+        * :class:`tarfile.TarFile`: tarfile object
+        * :class:`ChecksumWriter`: checksum of the compressed tarfile
+        * :class:`ChecksumWriter`: checksum of the uncompressed tarfile
+    """
+    with open(path, "wb") as f, ChecksumWriter(f) as compressed_checksum, closing(
+        compressor(compressed_checksum, compression, level, jobs)
+    ) as compressed_file, ChecksumWriter(compressed_file) as tarfile_checksum, tarfile.TarFile(
+        name="", mode="w", fileobj=tarfile_checksum
+    ) as tar:
+        yield tar, compressed_checksum, tarfile_checksum
+
+
 @contextmanager
 def gzip_compressed_tarfile(
     path: str,
@@ -636,18 +636,69 @@ def _get_pt_interp_substitution(
     )
 
 
+def read_c_string(f: BinaryIO, offset: int) -> bytes:
+    """Read the C-string at a given offset in a file, excluding the terminating null byte"""
+    f.seek(offset)
+    chunks = []
+    while True:
+        chunk = f.read(4096)
+        end = chunk.find(b"\0")
+        if end != -1:
+            chunks.append(chunk[:end])
+            return b"".join(chunks)
+        if not chunk:
+            raise ElfParsingError("C-string is not null terminated")
+        chunks.append(chunk)
+
+
+def rpath_and_pt_interp_offsets(f: BinaryIO) -> Tuple[Optional[int], Optional[int]]:
+    """Returns the file offsets of the rpath and of the interpreter of an ELF file, which are
+    None if the file does not have them. Raises ElfParsingError if the file cannot be parsed."""
+    elf = parse_elf(f, interpreter=True, dynamic_section=True)
+    rpath = elf.pt_dynamic_strtab_offset + elf.rpath_strtab_offset if elf.has_rpath else None
+    pt_interp = elf.pt_interp_p_offset if elf.has_pt_interp else None
+    return rpath, pt_interp
+
+
+def _parse_c_strings_at_offsets(
+    f: BinaryIO, rpath_offset: Optional[int], pt_interp_offset: Optional[int]
+) -> ElfFile:
+    """Returns an ElfFile with only the rpath and interpreter, read from known offsets as
+    returned by ``rpath_and_pt_interp_offsets``, without parsing the rest of the file."""
+    elf = ElfFile()
+    if rpath_offset is not None:
+        elf.has_rpath = True
+        elf.dt_rpath_str = read_c_string(f, rpath_offset)
+        elf.pt_dynamic_strtab_offset = rpath_offset
+        elf.rpath_strtab_offset = 0
+    if pt_interp_offset is not None:
+        elf.has_pt_interp = True
+        elf.pt_interp_str = read_c_string(f, pt_interp_offset)
+        elf.pt_interp_p_offset = pt_interp_offset
+    return elf
+
+
 def substitute_rpath_and_pt_interp_in_place_or_raise(
-    path: str, substitutions: Dict[bytes, bytes]
+    path: str,
+    substitutions: Dict[bytes, bytes],
+    offsets: Optional[Tuple[Optional[int], Optional[int]]] = None,
 ) -> bool:
     """Returns true if the rpath and interpreter were modified, false if there was nothing to do.
     Raises ElfCStringUpdatesFailed if the ELF file cannot be updated in-place. This exception
     contains a list of actions to perform with other tools. The file is left untouched in this
-    case."""
+    case.
+
+    If the offsets of the rpath and of the interpreter are known from a previous call to
+    ``rpath_and_pt_interp_offsets`` on the same file, they can be passed as ``offsets`` to
+    avoid parsing the file."""
     regex = re.compile(b"|".join(re.escape(p) for p in substitutions.keys()))
 
     try:
         with open(path, "rb+") as f:
-            elf = parse_elf(f, interpreter=True, dynamic_section=True)
+            if offsets is None:
+                elf = parse_elf(f, interpreter=True, dynamic_section=True)
+            else:
+                elf = _parse_c_strings_at_offsets(f, *offsets)
 
             # Get the actions to perform.
             rpath = _get_rpath_substitution(elf, regex, substitutions)
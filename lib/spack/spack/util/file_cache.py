@@ -90,6 +90,10 @@ def __init__(self, root: Union[str, pathlib.Path], timeout=120):
         self._locks: Dict[Union[pathlib.Path, str], Lock] = {}
         self.lock_timeout = timeout
 
+    def __reduce__(self):
+        # Locks are held by the current process, so they're not sent to other processes
+        return FileCache, (self.root, self.lock_timeout)
+
     def destroy(self):
         """Remove all files under the cache root."""
         for f in self.root.iterdir():
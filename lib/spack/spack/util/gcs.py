@@ -11,7 +11,7 @@
 import sys
 import urllib.parse
 import urllib.response
-from typing import List
+from typing import Dict, List, Tuple
 from urllib.error import URLError
 from urllib.request import BaseHandler
 
@@ -127,6 +127,14 @@ def get_all_blobs(self, recursive: bool = True, relative: bool = True) -> List[s
 
         return blob_list
 
+    def get_all_blob_stats(self) -> Dict[str, Tuple[int, float]]:
+        """Get the size and modification time of all blobs, by path relative to the prefix"""
+        stats: Dict[str, Tuple[int, float]] = {}
+        if self.exists():
+            for blob in self.bucket.list_blobs(prefix=self.prefix):
+                stats[self._relative_blob_name(blob.name)] = (blob.size, blob.updated.timestamp())
+        return stats
+
     def _relative_blob_name(self, blob_name):
         return os.path.relpath(blob_name, self.prefix)
 
@@ -6,7 +6,7 @@
 import os
 import sys
 import traceback
-from typing import Optional
+from typing import Callable, Optional
 
 import spack.config
 
@@ -59,8 +59,31 @@ def __call__(self, *args, **kwargs):
         return value
 
 
+class _Initializer:
+    """Restores the global state of Spack in a worker process, and then calls an optional
+    initializer. A class is used, since it is pickleable.
+    """
+
+    def __init__(self, marshaler, initializer: Optional[Callable], initargs: tuple) -> None:
+        self.marshaler = marshaler
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def __call__(self) -> None:
+        self.marshaler.restore()
+        if self.initializer is not None:
+            self.initializer(*self.initargs)
+
+
 def imap_unordered(
-    f, list_of_args, *, processes: int, maxtaskperchild: Optional[int] = None, debug=False
+    f,
+    list_of_args,
+    *,
+    processes: int,
+    maxtaskperchild: Optional[int] = None,
+    debug=False,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
 ):
     """Wrapper around multiprocessing.Pool.imap_unordered.
 
@@ -72,12 +95,16 @@ def imap_unordered(
             from workers, if True an exception with complete stacktraces
         maxtaskperchild: number of tasks to be executed by a child before being
             killed and substituted
+        initializer: if given, called with ``initargs`` once in each worker before it executes
+            any task, or once in the current process if tasks are executed serially
 
     Raises:
         RuntimeError: if any error occurred in the worker processes
     """
 
     if not ENABLE_PARALLELISM or len(list_of_args) <= 1:
+        if initializer is not None:
+            initializer(*initargs)
         yield from map(f, list_of_args)
         return
 
@@ -85,7 +112,9 @@ def imap_unordered(
 
     marshaler = GlobalStateMarshaler()
     with multiprocessing.Pool(
-        processes, initializer=marshaler.restore, maxtasksperchild=maxtaskperchild
+        processes,
+        initializer=_Initializer(marshaler, initializer, initargs),
+        maxtasksperchild=maxtaskperchild,
     ) as p:
         for result in p.imap_unordered(Task(f), list_of_args):
             if isinstance(result, ErrorFromWorker):
@@ -126,3 +155,12 @@ def make_concurrent_executor(
     jobs = jobs or spack.config.determine_number_of_jobs(parallel=True)
     marshaler = GlobalStateMarshaler()
     return concurrent.futures.ProcessPoolExecutor(jobs, initializer=marshaler.restore)  # novermin
+
+
+def make_thread_executor(jobs: Optional[int] = None) -> concurrent.futures.Executor:
+    """Create an executor for I/O bound tasks, which runs them in a thread pool. The executor is
+    sequential if parallelism is disabled or a single job is requested."""
+    jobs = jobs or spack.config.determine_number_of_jobs(parallel=True)
+    if not ENABLE_PARALLELISM or jobs <= 1:
+        return SequentialExecutor()
+    return concurrent.futures.ThreadPoolExecutor(jobs)
@@ -628,6 +628,41 @@ def list_url(url, recursive=False):
         return gcs.get_all_blobs(recursive=recursive)
 
 
+def list_url_stats(url: str) -> Optional[Dict[str, Tuple[int, float]]]:
+    """Recursively list the objects under the URL of an object store, with their size and
+    modification time.
+
+    Unlike calling :func:`stat_url` on each entry of :func:`list_url`, this does not need a
+    request per object, since object stores return the size and mtime of objects when listing.
+
+    Args:
+        url: URL of the prefix to list
+    Returns:
+        A dictionary mapping the path of each object relative to the URL to a tuple of (size,
+        mtime), or None if the URL is not in an object store.
+    """
+    parsed_url = urllib.parse.urlparse(url)
+
+    if parsed_url.scheme == "s3":
+        s3 = get_s3_session(parsed_url, method="fetch")
+        prefix = re.sub(r"^/*", "/", parsed_url.path)
+        # list_objects_v2 returns up to 1000 items at a time, so paginate to get them all
+        paginator = s3.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=parsed_url.netloc, Prefix=prefix[1:])
+        stats: Dict[str, Tuple[int, float]] = {}
+        for item in pages.search("Contents"):
+            if not item:
+                continue
+            for key in _iter_s3_contents([item], prefix):
+                stats[key] = (item["Size"], item["LastModified"].timestamp())
+        return stats
+
+    elif parsed_url.scheme == "gs":
+        return GCSBucket(parsed_url).get_all_blob_stats()
+
+    return None
+
+
 def stat_url(url: str) -> Optional[Tuple[int, float]]:
     """Get stat result for a URL.
 